@@ -1,6 +1,8 @@
+from functools import lru_cache
 from cryptography.fernet import Fernet, InvalidToken
 from .settings import settings
 
+@lru_cache(maxsize=1)
 def _fernet() -> Fernet:
     return Fernet(settings.master_key.encode())
 
@@ -1,12 +1,86 @@
+import asyncio
+import contextvars
 import os
-from sqlalchemy import create_engine
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import Connection, Engine, create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
-DB_URL = os.getenv("DB_URL", "sqlite:///./app.db")
+from .tracing import tracer
+
+
+def _normalize_url(url: str) -> str:
+    """postgres:// / postgresql:// 주소는 psycopg(3) 드라이버로 연결한다."""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+DB_URL = _normalize_url(os.getenv("DB_URL", "sqlite:///./app.db"))
+# 이벤트 루프를 막지 않도록 동기 DB 작업(과 Fernet 복호화)을 실행하는 전용 스레드풀 크기
+DB_THREADS = int(os.getenv("DB_THREADS", "4"))
+# SQLite 연결 pragma. WAL이면 읽기와 쓰기가 서로 막지 않고, NORMAL은 WAL에서 commit마다 fsync하지 않는다.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "128"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# write batcher: 한 트랜잭션에 묶는 최대 작업 수와, 첫 작업 뒤 다음 작업을 기다리는 시간
+DB_WRITE_BATCH = int(os.getenv("DB_WRITE_BATCH", "64"))
+DB_WRITE_DELAY_MS = float(os.getenv("DB_WRITE_DELAY_MS", "2"))
+# 서버 DB(Postgres) connection pool. replica마다 최대 pool_size + max_overflow개를 연다.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SEC = float(os.getenv("DB_POOL_TIMEOUT_SEC", "10"))
+DB_POOL_RECYCLE_SEC = int(os.getenv("DB_POOL_RECYCLE_SEC", "1800"))
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# 시작 시 마이그레이션을 한 replica만 실행하도록 잡는 pg_advisory_lock 키 (임의의 고정값)
+_MIGRATION_LOCK_ID = 7146001
+
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SEC,
+        "pool_recycle": DB_POOL_RECYCLE_SEC,
+        "pool_pre_ping": True,  # DB 재시작/유휴 끊김 뒤 죽은 연결을 쓰지 않도록
+    }
+
+
+engine = create_engine(DB_URL, **_engine_options(DB_URL))
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA cache_size={-SQLITE_CACHE_SIZE_KB}")  # 음수 = KiB 단위
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cur.close()
 
-engine = create_engine(DB_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+T = TypeVar("T")
+
 class Base(DeclarativeBase):
     pass
 
@@ -16,3 +90,166 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def run_in_db_thread(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    # 현재 context(trace span 등)를 DB 스레드로 넘긴다.
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_db_executor, lambda: ctx.run(fn, *args, **kwargs))
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """fn(db, *args)를 전용 스레드에서 새 세션으로 실행한다. fn은 ORM 객체 대신 일반 값을 반환해야 한다."""
+    def call() -> T:
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    with tracer.span(f"db {fn.__name__}", timing="db"):
+        return await run_in_db_thread(call)
+
+class WriteBatcher:
+    """단일 writer 스레드. 여러 run이 보낸 쓰기 작업을 모아 한 트랜잭션으로 commit한다 (group commit).
+
+    SQLite는 writer가 하나뿐이라 run마다 따로 commit하면 `database is locked` 경합이 생긴다.
+    작업 fn(db, ...)은 commit하지 않고 add/flush만 하며, ORM 객체 대신 일반 값을 반환해야 한다.
+    await write(...)는 그 작업이 들어간 트랜잭션이 commit된 뒤에 반환하므로 호출자 입장에서는 동기 저장과 같다.
+    묶음 중 하나가 실패하면 롤백 후 작업을 하나씩 다시 실행해 실패한 작업만 예외를 받는다.
+    """
+
+    def __init__(self, max_batch: int = DB_WRITE_BATCH, max_delay_ms: float = DB_WRITE_DELAY_MS):
+        self.max_batch = max_batch
+        self.max_delay_ms = max_delay_ms
+        self.jobs = 0
+        self.commits = 0
+        self._queue: "queue.SimpleQueue[tuple | None]" = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def configure(self, max_batch: int, max_delay_ms: float) -> None:
+        self.max_batch, self.max_delay_ms = max(1, max_batch), max(0.0, max_delay_ms)
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        fut: Future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((fn, args, kwargs, fut))
+        return fut
+
+    async def write(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        # span은 다른 작업과 묶인 commit까지 기다린 시간을 잰다.
+        with tracer.span(f"db.write {fn.__name__}", timing="db"):
+            return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """남은 작업을 모두 쓰고 writer 스레드를 끝낸다."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _collect(self) -> tuple[list[tuple], bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay_ms / 1000
+        while len(batch) < self.max_batch:
+            try:
+                job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            batch, stopping = self._collect()
+            jobs = [job for job in batch if job[3].set_running_or_notify_cancel()]
+            if jobs:
+                self._commit(jobs)
+            if stopping:
+                return
+
+    def _commit(self, jobs: list[tuple]) -> None:
+        db = SessionLocal()
+        try:
+            results = [fn(db, *args, **kwargs) for fn, args, kwargs, _ in jobs]
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.close()
+            if len(jobs) == 1:
+                jobs[0][3].set_exception(e)
+            else:
+                for job in jobs:
+                    self._commit([job])
+            return
+        db.close()
+        self.jobs += len(jobs)
+        self.commits += 1
+        for (_, _, _, fut), result in zip(jobs, results):
+            fut.set_result(result)
+
+
+db_writer = WriteBatcher()
+
+
+def add_missing_columns(bind: Engine | None = None) -> None:
+    """create_all로 만든 예전 DB에 그 뒤 모델에 생긴 컬럼을 ALTER TABLE로 붙인다. (alembic 도입 전 DB용)"""
+    bind = bind or engine
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(bind.dialect)}"
+                if col.server_default is not None:
+                    ddl += f" DEFAULT '{col.server_default.arg}'"
+                conn.execute(text(ddl))
+
+
+def alembic_config(conn: Connection) -> Config:
+    cfg = Config()
+    cfg.set_main_option("script_location", MIGRATIONS_DIR)
+    cfg.attributes["connection"] = conn
+    return cfg
+
+
+def upgrade_schema(bootstrap: Callable[[], None] | None = None, bind: Engine | None = None) -> None:
+    """alembic 마이그레이션을 head까지 적용하고, 같은 lock 안에서 bootstrap(기본 사용자 생성 등)을 실행한다.
+
+    alembic_version이 없는 create_all 시절 DB는 빠진 컬럼을 채운 뒤 0001로 stamp하고 올린다.
+    Postgres에서는 advisory lock으로 여러 replica가 동시에 시작해도 한 번에 하나만 실행한다.
+    """
+    bind = bind or engine
+    with bind.connect() as conn:
+        locked = conn.dialect.name == "postgresql"
+        if locked:
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _MIGRATION_LOCK_ID})
+            conn.commit()
+        try:
+            insp = inspect(conn)
+            legacy = not insp.has_table("alembic_version") and insp.has_table("users")
+            conn.commit()
+            cfg = alembic_config(conn)
+            if legacy:
+                add_missing_columns(bind)
+                command.stamp(cfg, "0001")
+            command.upgrade(cfg, "head")
+            conn.commit()
+            if bootstrap is not None:
+                bootstrap()
+        finally:
+            if locked:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _MIGRATION_LOCK_ID})
+                conn.commit()
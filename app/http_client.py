@@ -0,0 +1,143 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+import httpx
+
+
+@dataclass
+class HttpClientConfig:
+    timeout_sec: float = 60.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_sec: float = 30.0
+    http2: bool = False
+
+
+# provider별 기본 타임아웃 (config.timeout_sec보다 우선)
+CLIENT_TIMEOUTS = {
+    "telegram": 20.0,
+}
+
+_config = HttpClientConfig()
+_clients: dict[str, tuple[asyncio.AbstractEventLoop | None, httpx.AsyncClient]] = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configure(config: HttpClientConfig) -> None:
+    global _config
+    _config = config
+
+
+class PhaseTimer:
+    """httpcore의 "trace" request extension. 요청 단계가 시작/끝난 시각(perf_counter)을 기록한다.
+
+    이벤트는 "connection.connect_tcp.started", "http11.receive_response_headers.complete"처럼 오며,
+    앞의 prefix(connection/http11/http2)를 떼고 처음 시각만 남긴다.
+    """
+    __slots__ = ("started", "marks")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks: dict[str, float] = {}
+
+    async def __call__(self, event: str, info: dict) -> None:
+        self.marks.setdefault(event.partition(".")[2], time.perf_counter())
+
+
+async def _attach_phase_timer(request: httpx.Request) -> None:
+    request.extensions.setdefault("trace", PhaseTimer())
+
+
+# (결과 키, 시작 이벤트, 끝 이벤트). connect는 DNS 조회를 포함한다. (httpcore가 둘을 나눠 알려주지 않는다)
+_PHASES = (
+    ("connect_ms", "connect_tcp.started", "connect_tcp.complete"),
+    ("tls_ms", "start_tls.started", "start_tls.complete"),
+    ("send_ms", "send_request_headers.started", "send_request_body.complete"),
+    ("ttfb_ms", "send_request_body.complete", "receive_response_headers.complete"),
+    ("download_ms", "receive_response_headers.complete", "receive_response_body.complete"),
+)
+# SSE를 [DONE]에서 끊고 닫으면 receive_response_body.complete 없이 response_closed만 온다.
+_BODY_END_FALLBACK = "response_closed.started"
+
+
+def network_timings(response: httpx.Response, parse_ms: float | None = None) -> dict:
+    """응답 하나의 네트워크 단계별 시간(ms)과 응답 크기.
+
+    pool_wait_ms: 요청을 보낸 뒤 커넥션을 얻기까지 (새 커넥션이면 connect 시작 전까지)
+    connect_ms / tls_ms: 새 커넥션일 때만 (connection_reused=False)
+    ttfb_ms: 요청 본문을 다 보낸 뒤 응답 헤더가 오기까지 (vendor 처리 시간)
+    download_ms: 응답 본문 수신. 스트리밍 응답에서는 생성이 끝날 때까지의 시간이다.
+    response_bytes: 받은 바이트 수 (압축된 크기)
+    """
+    out: dict = {"response_bytes": response.num_bytes_downloaded}
+    timer = response.request.extensions.get("trace")
+    if isinstance(timer, PhaseTimer) and timer.marks:
+        marks = timer.marks
+        first = marks.get("connect_tcp.started", marks.get("send_request_headers.started"))
+        if first is not None:
+            out["pool_wait_ms"] = round((first - timer.started) * 1000, 1)
+        out["connection_reused"] = "connect_tcp.started" not in marks
+        for key, start, end in _PHASES:
+            end_at = marks.get(end, marks.get(_BODY_END_FALLBACK) if key == "download_ms" else None)
+            if start in marks and end_at is not None:
+                out[key] = round((end_at - marks[start]) * 1000, 1)
+    if parse_ms is not None:
+        out["parse_ms"] = round(parse_ms, 1)
+    return out
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=_config.max_connections,
+        max_keepalive_connections=_config.max_keepalive_connections,
+        keepalive_expiry=_config.keepalive_expiry_sec,
+    )
+    timeout = CLIENT_TIMEOUTS.get(name, _config.timeout_sec)
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=limits,
+        http2=_config.http2 and _http2_available(),
+        event_hooks={"request": [_attach_phase_timer]},
+    )
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """name(provider/telegram)별로 공유되는 keep-alive 클라이언트를 반환한다.
+
+    커넥션 풀은 이벤트 루프에 묶이므로, 다른 루프에서 만들어진 클라이언트는 새로 만든다.
+    """
+    loop = _running_loop()
+    entry = _clients.get(name)
+    if entry and not entry[1].is_closed and (entry[0] is None or entry[0] is loop):
+        return entry[1]
+    client = _build_client(name)
+    _clients[name] = (loop, client)
+    return client
+
+
+def open_clients(names: list[str]) -> None:
+    for name in names:
+        get_client(name)
+
+
+async def aclose_all() -> None:
+    entries = list(_clients.values())
+    _clients.clear()
+    for _, client in entries:
+        if not client.is_closed:
+            await client.aclose()
@@ -0,0 +1,261 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .db import run_in_db_thread
+from .models import TelegramJob
+
+JobHandler = Callable[[str, str], Awaitable[None]]
+FailureHandler = Callable[[str, str], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+def _claimable(now: datetime):
+    # queued job의 lease_until은 재시도 backoff가 끝나는 시각(그 전에는 claim하지 않는다)이다.
+    return or_(
+        and_(TelegramJob.status == "queued", or_(TelegramJob.lease_until.is_(None), TelegramJob.lease_until <= now)),
+        and_(TelegramJob.status == "running", TelegramJob.lease_until < now),
+    )
+
+
+class TelegramJobQueue:
+    """Telegram 업데이트를 DB 테이블에 쌓고, worker가 lease를 잡아 처리하는 영속 큐.
+
+    - update_id unique 제약으로 Telegram 재전송을 걸러낸다.
+    - handler가 예외를 내면 max_attempts까지 다시 queued로 돌리고, 마지막 실패 때만 on_failed(chat_id, error)를 부른다.
+      재시도는 retry_backoff_sec부터 시도마다 두 배씩 늘어나는 backoff가 지난 뒤에 claim된다.
+    - worker는 실행 중 lease를 주기적으로 연장한다. lease가 끊긴 job은 다른 worker가 다시 가져간다.
+    - 정상 종료(stop)로 끊긴 job은 lease를 풀고 시도 횟수를 되돌려 queued로 둔다. 재시작하면 바로 다시 처리한다.
+    - 시작 시 lease가 끝난 running job(죽은 프로세스가 잡고 있던 것)만 다시 queued로 돌린다.
+      lease가 살아 있는 job은 다른 replica가 처리 중일 수 있으므로 건드리지 않는다.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        lease_sec: int = 900,
+        max_attempts: int = 3,
+        poll_interval_sec: float = 2.0,
+        retention_days: int = 7,
+        retry_backoff_sec: float = 30.0,
+    ):
+        self.workers = workers
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self.poll_interval_sec = poll_interval_sec
+        self.retention_days = retention_days
+        self.retry_backoff_sec = retry_backoff_sec
+        self._session_factory: Callable[[], Session] | None = None
+        self._handler: JobHandler | None = None
+        self._on_failed: FailureHandler | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def configure(self, workers: int, lease_sec: int, max_attempts: int, retry_backoff_sec: float = 30.0) -> None:
+        self.workers, self.lease_sec, self.max_attempts = workers, lease_sec, max_attempts
+        self.retry_backoff_sec = retry_backoff_sec
+
+    # ── DB 연산 ────────────────────────────────────────────────────────────
+
+    def enqueue(self, db: Session, update_id: int | None, chat_id: str, text: str) -> bool:
+        """새 job이면 True, 이미 받은 update_id면 False."""
+        db.add(TelegramJob(update_id=update_id, chat_id=chat_id, text=text))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        return True
+
+    def claim(self, db: Session) -> TelegramJob | None:
+        now = datetime.utcnow()
+        candidate = (
+            db.query(TelegramJob.id)
+            .filter(_claimable(now))
+            .order_by(TelegramJob.id)
+            .with_for_update(skip_locked=True)  # Postgres: 다른 replica가 잡고 있는 행은 건너뛴다 (SQLite는 무시)
+            .first()
+        )
+        if not candidate:
+            return None
+        # 조건부 UPDATE로 compare-and-set: 다른 worker가 먼저 가져갔으면 rowcount == 0
+        res = db.execute(
+            update(TelegramJob)
+            .where(TelegramJob.id == candidate.id, _claimable(now))
+            .values(
+                status="running",
+                attempts=TelegramJob.attempts + 1,
+                lease_until=now + timedelta(seconds=self.lease_sec),
+                updated_at=now,
+            )
+        )
+        db.commit()
+        if res.rowcount != 1:
+            return None
+        return db.get(TelegramJob, candidate.id)
+
+    def renew(self, db: Session, job_id: int) -> None:
+        now = datetime.utcnow()
+        db.execute(
+            update(TelegramJob)
+            .where(TelegramJob.id == job_id, TelegramJob.status == "running")
+            .values(lease_until=now + timedelta(seconds=self.lease_sec), updated_at=now)
+        )
+        db.commit()
+
+    def complete(self, db: Session, job_id: int) -> None:
+        db.execute(
+            update(TelegramJob)
+            .where(TelegramJob.id == job_id)
+            .values(status="done", lease_until=None, updated_at=datetime.utcnow())
+        )
+        db.commit()
+
+    def fail(self, db: Session, job_id: int, error: str) -> bool:
+        """재시도 횟수를 다 썼으면 failed로 두고 True, 아니면 backoff 뒤에 claim되도록 queued로 돌리고 False."""
+        job = db.get(TelegramJob, job_id)
+        if not job:
+            return False
+        now = datetime.utcnow()
+        if job.attempts >= self.max_attempts:
+            job.status = "failed"
+            job.lease_until = None
+        else:
+            job.status = "queued"
+            job.lease_until = now + timedelta(seconds=self.retry_backoff_sec * 2 ** max(0, job.attempts - 1))
+        job.last_error = error[:2000]
+        job.updated_at = now
+        db.commit()
+        return job.status == "failed"
+
+    def release(self, db: Session, job_id: int) -> None:
+        """종료로 처리를 끝내지 못한 job을 바로 다시 claim할 수 있게 돌려놓는다. 끊긴 시도는 세지 않는다."""
+        db.execute(
+            update(TelegramJob)
+            .where(TelegramJob.id == job_id, TelegramJob.status == "running")
+            .values(
+                status="queued",
+                attempts=TelegramJob.attempts - 1,
+                lease_until=None,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        db.commit()
+
+    def recover(self, db: Session) -> int:
+        """lease가 끝난 running job을 다시 queued로 돌리고, 오래된 완료 job을 정리한다."""
+        now = datetime.utcnow()
+        res = db.execute(
+            update(TelegramJob)
+            .where(
+                TelegramJob.status == "running",
+                or_(TelegramJob.lease_until.is_(None), TelegramJob.lease_until < now),
+            )
+            .values(status="queued", lease_until=None, updated_at=now)
+        )
+        cutoff = now - timedelta(days=self.retention_days)
+        db.query(TelegramJob).filter(
+            TelegramJob.status.in_(("done", "failed")),
+            TelegramJob.updated_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.commit()
+        return res.rowcount or 0
+
+    # ── worker ─────────────────────────────────────────────────────────────
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(
+        self, session_factory: Callable[[], Session], handler: JobHandler, on_failed: FailureHandler | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._handler = handler
+        self._on_failed = on_failed
+        self._wakeup = asyncio.Event()
+        await self._with_session(self.recover)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _with_session(self, fn: Callable, *args):
+        """fn(db, *args)를 DB 스레드에서 새 세션으로 실행한다. (이벤트 루프를 막지 않음)"""
+        def call():
+            db = self._session_factory()
+            try:
+                return fn(db, *args)
+            finally:
+                db.close()
+        return await run_in_db_thread(call)
+
+    def _claim_values(self, db: Session) -> tuple[int | None, str, str]:
+        job = self.claim(db)
+        return (job.id, job.chat_id, job.text) if job else (None, "", "")
+
+    async def _keep_lease(self, job_id: int) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.lease_sec / 3))
+            await self._with_session(self.renew, job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                processed = await self._process_next()
+            except Exception:
+                # DB 오류 등으로 worker가 죽지 않게 한다. 처리 중이던 job은 lease가 끝나면 다시 claim된다.
+                logger.exception("telegram job worker iteration failed")
+                await asyncio.sleep(self.poll_interval_sec)
+                continue
+            if not processed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval_sec)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _process_next(self) -> bool:
+        """job 하나를 claim해서 처리한다. 가져올 job이 없으면 False."""
+        job_id, chat_id, text = await self._with_session(self._claim_values)
+        if job_id is None:
+            return False
+
+        heartbeat = asyncio.create_task(self._keep_lease(job_id))
+        error = ""
+        try:
+            await self._handler(chat_id, text)
+        except asyncio.CancelledError:
+            # 종료 중: lease를 풀어 두면 다음 시작이나 다른 replica가 lease 만료를 기다리지 않고 바로 가져간다.
+            # 이 기록마저 실패하면 job은 running으로 남고 lease가 끝난 뒤 다시 claim된다.
+            heartbeat.cancel()
+            try:
+                await self._with_session(self.release, job_id)
+            except Exception:
+                logger.exception("failed to release telegram job %s on shutdown", job_id)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            heartbeat.cancel()
+
+        if error:
+            if await self._with_session(self.fail, job_id, error) and self._on_failed is not None:
+                try:
+                    await self._on_failed(chat_id, error)
+                except Exception:
+                    logger.exception("telegram job failure notification failed")  # 알림 실패로 worker가 멈추지 않도록 한다.
+        else:
+            await self._with_session(self.complete, job_id)
+        return True
+
+telegram_jobs = TelegramJobQueue()
@@ -0,0 +1,300 @@
+import asyncio
+import itertools
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .db import db_writer, run_in_db_thread
+from .models import UsageEvent
+
+# (한도 이름, datetime → 구간 키)
+_WINDOWS: Tuple[Tuple[str, Callable[[datetime], str]], ...] = (
+    ("hourly", lambda t: t.strftime("%Y-%m-%dT%H")),
+    ("daily", lambda t: t.strftime("%Y-%m-%d")),
+    ("monthly", lambda t: t.strftime("%Y-%m")),
+)
+
+
+def _window_start(window: str, now: datetime) -> datetime:
+    start = now.replace(minute=0, second=0, microsecond=0)
+    if window in ("daily", "monthly"):
+        start = start.replace(hour=0)
+    if window == "monthly":
+        start = start.replace(day=1)
+    return start
+
+
+@dataclass
+class LedgerConfig:
+    """USD 지출 한도. 0이면 그 한도는 없다. 구간은 UTC 기준 (UsageEvent.created_at과 같은 시계)."""
+    user_hourly_usd: float = 0.0
+    user_daily_usd: float = 0.0
+    user_monthly_usd: float = 0.0
+    provider_hourly_usd: float = 0.0
+    provider_daily_usd: float = 0.0
+    provider_monthly_usd: float = 0.0
+    flush_interval_sec: float = 5.0
+
+    def cap(self, kind: str, window: str) -> float:
+        return float(getattr(self, f"{kind}_{window}_usd"))
+
+
+class SpendCapExceeded(Exception):
+    pass
+
+
+@dataclass
+class Reservation:
+    id: int
+    user_id: int
+    provider: str
+    amount_usd: float
+
+
+class SpendLedger:
+    """여러 run에 걸친 사용자/provider별 시간·일·월 지출 한도.
+
+    - 호출 전에 예상 비용을 reserve하고, 끝나면 실제 비용으로 commit(정산)한다.
+      확인과 예약은 한 lock 안에서 끝나므로 동시 run끼리 같은 여유분을 두 번 쓰지 않는다.
+    - 구간별 합계는 메모리에 두고, 시작 시와 flush 뒤마다 UsageEvent 집계로 다시 맞춘다.
+      (다른 replica가 쓴 지출은 다음 동기화 때 반영된다. 진행 중 예약은 replica마다 따로 센다)
+    - commit된 호출은 UsageEvent 행으로 버퍼에 쌓았다가 flush_interval_sec마다 db_writer로 한 번에 쓴다.
+      (호출마다 SQL 집계나 INSERT를 하지 않는다)
+    """
+
+    def __init__(self, config: LedgerConfig | None = None):
+        self.config = config or LedgerConfig()
+        self._lock = threading.Lock()
+        self._spent: Dict[Tuple[str, str, str], float] = {}     # (scope, window, 구간 키) → USD
+        self._reserved: Dict[str, float] = {}                   # scope → 진행 중 예약 합계
+        self._reservations: Dict[int, Reservation] = {}
+        self._pending: List[UsageEvent] = []
+        self._ids = itertools.count(1)
+        self._task: asyncio.Task | None = None
+        self._session_factory: Callable[[], Session] | None = None
+
+    def configure(self, config: LedgerConfig) -> None:
+        self.config = config
+
+    @property
+    def enabled(self) -> bool:
+        return any(
+            self.config.cap(kind, window) > 0 for kind in ("user", "provider") for window, _ in _WINDOWS
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spent.clear()
+            self._reserved.clear()
+            self._reservations.clear()
+            self._pending.clear()
+
+    # ── 한도 계산 ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _scopes(user_id: int, provider: str) -> List[Tuple[str, str]]:
+        return [("user", f"user:{user_id}"), ("provider", f"provider:{provider}")]
+
+    def _add_spent(self, scope: str, amount: float, at: datetime) -> None:
+        for window, key_of in _WINDOWS:
+            k = (scope, window, key_of(at))
+            self._spent[k] = self._spent.get(k, 0.0) + amount
+
+    def _check(self, user_id: int, provider: str, amount: float, now: datetime) -> None:
+        for kind, scope in self._scopes(user_id, provider):
+            for window, key_of in _WINDOWS:
+                cap = self.config.cap(kind, window)
+                if cap <= 0:
+                    continue
+                used = self._spent.get((scope, window, key_of(now)), 0.0) + self._reserved.get(scope, 0.0)
+                if used + amount > cap:
+                    raise SpendCapExceeded(
+                        f"{scope} {window} 한도 ${cap} 초과 (사용+예약 ${round(used, 6)}, 이번 호출 예상 ${round(amount, 6)})"
+                    )
+
+    def check(self, user_id: int, provider: str, amount_usd: float = 0.0) -> None:
+        """amount_usd를 지금 쓸 수 있는지만 본다. 안 되면 SpendCapExceeded."""
+        with self._lock:
+            self._check(user_id, provider, amount_usd, datetime.utcnow())
+
+    def usage(self, user_id: int, provider: str) -> Dict[str, Dict[str, float]]:
+        """현재 구간의 지출/예약 합계 (monitoring 표시용)."""
+        now = datetime.utcnow()
+        with self._lock:
+            return {
+                scope: {
+                    **{window: round(self._spent.get((scope, window, key_of(now)), 0.0), 6) for window, key_of in _WINDOWS},
+                    "reserved": round(self._reserved.get(scope, 0.0), 6),
+                }
+                for _, scope in self._scopes(user_id, provider)
+            }
+
+    # ── 예약/정산 ──────────────────────────────────────────────────────────
+
+    def reserve(self, user_id: int, provider: str, amount_usd: float) -> Reservation:
+        with self._lock:
+            self._check(user_id, provider, amount_usd, datetime.utcnow())
+            res = Reservation(next(self._ids), user_id, provider, amount_usd)
+            self._reservations[res.id] = res
+            for _, scope in self._scopes(user_id, provider):
+                self._reserved[scope] = self._reserved.get(scope, 0.0) + amount_usd
+            return res
+
+    def _release_locked(self, res: Reservation) -> bool:
+        if self._reservations.pop(res.id, None) is None:
+            return False
+        for _, scope in self._scopes(res.user_id, res.provider):
+            left = self._reserved.get(scope, 0.0) - res.amount_usd
+            if left > 1e-12:
+                self._reserved[scope] = left
+            else:
+                self._reserved.pop(scope, None)
+        return True
+
+    def release(self, res: Reservation) -> None:
+        """호출하지 않고 끝난 예약을 반납한다."""
+        with self._lock:
+            self._release_locked(res)
+
+    def commit(
+        self,
+        res: Reservation,
+        *,
+        provider: str,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost_usd: float,
+    ) -> None:
+        """예약을 실제 비용으로 바꾼다. failover로 다른 provider가 처리했으면 그 provider에 기록한다."""
+        now = datetime.utcnow()
+        provider = provider or res.provider
+        with self._lock:
+            if not self._release_locked(res):
+                return  # 이미 정산된 예약
+            for _, scope in self._scopes(res.user_id, provider):
+                self._add_spent(scope, cost_usd, now)
+            if cost_usd > 0 or input_tokens or output_tokens:
+                self._pending.append(UsageEvent(
+                    user_id=res.user_id,
+                    provider=provider[:32],
+                    model=(model or "")[:64],
+                    input_tokens=int(input_tokens or 0),
+                    output_tokens=int(output_tokens or 0),
+                    cost_usd=float(cost_usd or 0.0),
+                    created_at=now,
+                ))
+
+    # ── UsageEvent 동기화 ──────────────────────────────────────────────────
+
+    def load(self, db: Session) -> None:
+        """현재 시간/일/월 구간의 UsageEvent 합계로 메모리 합계를 다시 만든다. (구간마다 집계 쿼리 1번)"""
+        now = datetime.utcnow()
+        totals = []
+        for window, key_of in _WINDOWS:
+            rows = (
+                db.query(UsageEvent.user_id, UsageEvent.provider, func.sum(UsageEvent.cost_usd))
+                .filter(UsageEvent.created_at >= _window_start(window, now))
+                .group_by(UsageEvent.user_id, UsageEvent.provider)
+                .all()
+            )
+            totals.append((window, key_of(now), rows))
+        with self._lock:
+            self._spent.clear()
+            for window, key, rows in totals:
+                for user_id, provider, cost in rows:
+                    for _, scope in self._scopes(user_id, provider):
+                        k = (scope, window, key)
+                        self._spent[k] = self._spent.get(k, 0.0) + float(cost or 0.0)
+            # 아직 쓰지 않은 버퍼도 합계에 남긴다.
+            for ev in self._pending:
+                for _, scope in self._scopes(ev.user_id, ev.provider):
+                    self._add_spent(scope, ev.cost_usd, ev.created_at)
+
+    def _take_pending(self) -> List[UsageEvent]:
+        with self._lock:
+            rows, self._pending = self._pending, []
+        return rows
+
+    def _restore_pending(self, rows: List[UsageEvent]) -> None:
+        """쓰기에 실패한 행을 버퍼 앞에 되돌린다. (실패한 세션에 붙었던 객체 대신 새 객체로)"""
+        with self._lock:
+            self._pending[:0] = [
+                UsageEvent(
+                    user_id=r.user_id, provider=r.provider, model=r.model, input_tokens=r.input_tokens,
+                    output_tokens=r.output_tokens, cost_usd=r.cost_usd, created_at=r.created_at,
+                )
+                for r in rows
+            ]
+
+    def flush(self, db: Session) -> int:
+        """버퍼에 쌓인 UsageEvent를 한 번에 쓴다. 실패하면 다음 flush에서 다시 시도한다."""
+        rows = self._take_pending()
+        if not rows:
+            return 0
+        try:
+            db.add_all(rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._restore_pending(rows)
+            raise
+        return len(rows)
+
+    async def flush_async(self) -> int:
+        """flush를 db_writer 트랜잭션에 얹는다. (다른 run의 결과 저장과 같은 commit으로 묶일 수 있다)"""
+        rows = self._take_pending()
+        if not rows:
+            return 0
+        try:
+            await db_writer.write(lambda db: db.add_all(rows))
+        except Exception:
+            self._restore_pending(rows)
+            raise
+        return len(rows)
+
+    def _prune(self) -> None:
+        """지난 구간 합계를 버린다."""
+        now = datetime.utcnow()
+        current = {window: key_of(now) for window, key_of in _WINDOWS}
+        with self._lock:
+            for k in [k for k in self._spent if k[2] != current[k[1]]]:
+                del self._spent[k]
+
+    async def _with_session(self, fn: Callable[[Session], int | None]):
+        def call():
+            db = self._session_factory()
+            try:
+                return fn(db)
+            finally:
+                db.close()
+        return await run_in_db_thread(call)
+
+    async def start(self, session_factory: Callable[[], Session]) -> None:
+        self._session_factory = session_factory
+        await self._with_session(self.load)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session_factory is not None:
+            await self.flush_async()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.flush_interval_sec)
+            try:
+                await self.flush_async()
+                await self._with_session(self.load)
+            except Exception:
+                self._prune()  # 버퍼는 남아 있으므로 다음 주기에 다시 쓴다.
+
+
+spend_ledger = SpendLedger()
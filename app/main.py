@@ -1,29 +1,63 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
 from typing import List
-from fastapi import FastAPI, Request, Depends, Form, BackgroundTasks, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse
+from fastapi import FastAPI, Request, Depends, Form, HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from pydantic import BaseModel
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from datetime import datetime
+import jinja2
 
 from .settings import settings
-from .db import Base, engine, get_db
-from .models import User, ApiKey, TelegramLink, Thread, Message, UsageEvent
-from .crypto import encrypt_text, decrypt_text
-from .telegram import send_message
-from .orchestrator.runner import run_orchestrator, Budget
+from .db import db_writer, get_db, run_db, upgrade_schema
+from .models import User, ApiKey, TelegramLink
+from .crypto import encrypt_text
+from .telegram import send_message, StreamingReply
+from .http_client import HttpClientConfig, configure as configure_http, open_clients, aclose_all
+from .orchestrator.runner import run_orchestrator, Budget, ExecutionConfig, PROVIDERS
+from .orchestrator.cache import CacheConfig, response_cache
+from .orchestrator.ratelimit import RateLimitConfig, rate_limiters
+from .orchestrator.breaker import BreakerConfig, breakers
 from .orchestrator.clarifier import analyze_request_clarity
+from .runs import run_manager, RunQueueFull
+from .jobqueue import telegram_jobs
+from .ledger import LedgerConfig, spend_ledger
+from .metrics import registry as metrics_registry
+from .tracing import TraceConfig, TracingMiddleware, tracer
+from .search import search_messages
 from .repositories import (
     create_link_code, consume_valid_link_code, get_link_code,
     get_pipeline_stages, save_pipeline_stages, ensure_default_pipeline,
-    get_synth_model, save_synth_model,
+    get_synth_model, get_synth_fallbacks, save_synth_model, get_key_flags,
+    load_run_inputs, start_thread_turn,
+    list_answered_threads, decode_history_cursor, get_first_answers, get_stage_messages,
+    save_thread_run_result_async, save_cancelled_run_async, delete_thread_async, discard_thread_turn_async,
     MAX_PIPELINE_STAGES,
 )
 
 app = FastAPI(title="Debait")
+app.add_middleware(TracingMiddleware)
+
+
+class TracedTemplate(jinja2.Template):
+    """렌더링 시간을 render span으로 남긴다. (TemplateResponse는 응답을 만들 때 바로 렌더링한다)"""
+
+    def render(self, *args, **kwargs) -> str:
+        with tracer.span(f"render {self.name}", timing="render"):
+            return super().render(*args, **kwargs)
+
+
 templates = Jinja2Templates(directory="app/templates")
+templates.env.template_class = TracedTemplate
 
 SINGLE_USER_ID = 1
 
+# 스트리밍 응답과 분리되어 끝까지 실행되는 파이프라인 task (GC 방지용 참조)
+_background_runs: set[asyncio.Task] = set()
+
 
 def ensure_single_user(db: Session) -> User:
     u = db.query(User).filter(User.id == SINGLE_USER_ID).first()
@@ -35,34 +69,93 @@ def ensure_single_user(db: Session) -> User:
     return u
 
 
-def get_user_keys(db: Session, user: User) -> dict:
-    keys = {}
-    for k in db.query(ApiKey).filter(ApiKey.user_id == user.id).all():
-        try:
-            keys[k.provider] = decrypt_text(k.encrypted_key)
-        except Exception:
-            pass
-    return keys
+@dataclass
+class PipelineRun:
+    user_id: int
+    thread_id: int
+    question: str
+    thread_summary: str
+    user_api_keys: dict
+    stages: list[dict]
+    synth_model: str
+    synth_fallbacks: list[str] = field(default_factory=list)
+
+
+def prepare_pipeline_run(db: Session, user_id: int, thread_key: str, question: str) -> PipelineRun:
+    """thread와 user 메시지를 기록하고, 파이프라인 실행에 필요한 값을 일반 값으로 모은다."""
+    inputs = load_run_inputs(db, user_id)
+    thread_id, summary = start_thread_turn(db, user_id, thread_key, question)
+    return PipelineRun(
+        user_id=user_id,
+        thread_id=thread_id,
+        question=question,
+        thread_summary=summary,
+        user_api_keys=inputs.user_api_keys,
+        stages=inputs.stages,
+        synth_model=inputs.synth_model,
+        synth_fallbacks=inputs.synth_fallbacks,
+    )
 
 
-def get_or_create_thread(db: Session, user_id: int, thread_key: str) -> Thread:
-    t = db.query(Thread).filter(Thread.user_id == user_id, Thread.thread_key == thread_key).first()
-    if not t:
-        t = Thread(user_id=user_id, thread_key=thread_key, summary="")
-        db.add(t)
-        db.commit()
-        db.refresh(t)
-    return t
+def execution_config() -> ExecutionConfig:
+    """settings에서 run별 실행 옵션을 만든다."""
+    return ExecutionConfig(
+        enable_hedging=settings.hedging_enabled,
+        hedge_percentile=settings.hedge_percentile,
+        hedge_model=settings.hedge_model,
+        run_deadline_sec=settings.run_deadline_sec,
+        synth_reserve_sec=settings.synth_reserve_sec,
+        budget_policy=settings.budget_policy,
+    )
 
 
-def update_summary(prev: str, question: str, answer: str) -> str:
-    chunk = f"Q: {question}\nA: {answer}\n"
-    return (prev + "\n" + chunk).strip()[-4000:]
+async def watch_disconnect(request: Request, cancel_event: asyncio.Event, interval_sec: float = 0.5) -> None:
+    """클라이언트 연결이 끊기면 cancel_event를 set해 남은 provider 호출을 취소한다."""
+    while not cancel_event.is_set():
+        if await request.is_disconnected():
+            cancel_event.set()
+            return
+        await asyncio.sleep(interval_sec)
 
 
-@app.on_event("startup")
-def on_startup():
-    Base.metadata.create_all(bind=engine)
+async def prepare_web_run(question: str) -> PipelineRun:
+    thread_key = f"web:{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+    return await run_db(prepare_pipeline_run, SINGLE_USER_ID, thread_key, question)
+
+
+async def execute_run(ctx: PipelineRun, on_event=None, cancel_event: asyncio.Event | None = None) -> tuple[dict, str]:
+    """파이프라인을 실행하고 결과를 저장한다. 실패하면 빈 thread를 지운다.
+
+    cancel_event로 취소된 run은 답변으로 저장하지 않고 turn을 지운다. 그때까지 쓴 토큰은 UsageEvent에 남긴다.
+    """
+    try:
+        result = await run_orchestrator(
+            question=ctx.question,
+            thread_summary=ctx.thread_summary,
+            user_api_keys=ctx.user_api_keys,
+            stages=ctx.stages,
+            synth_model=ctx.synth_model,
+            synth_fallbacks=ctx.synth_fallbacks,
+            budget=Budget(),
+            use_llm_gate=False,
+            execution_config=execution_config(),
+            on_event=on_event,
+            cancel_event=cancel_event,
+            user_id=ctx.user_id,
+        )
+    except Exception:
+        # 실패한 thread는 DB에서 제거 (내용 없는 빈 기록이 history에 남지 않도록)
+        await delete_thread_async(ctx.thread_id)
+        raise
+
+    if result.get("cancelled"):
+        await save_cancelled_run_async(ctx.user_id, ctx.thread_id, ctx.question, result)
+        return result, result.get("final", "")
+    final = await save_thread_run_result_async(ctx.user_id, ctx.thread_id, ctx.question, result)
+    return result, final
+
+
+def bootstrap_single_user() -> None:
     from .db import SessionLocal
     db = SessionLocal()
     try:
@@ -72,12 +165,148 @@ def on_startup():
         db.close()
 
 
+@app.on_event("startup")
+def configure_tracing():
+    tracer.configure(TraceConfig(enabled=settings.tracing_enabled, export_path=settings.trace_export_path))
+
+
+@app.on_event("startup")
+def on_startup():
+    # 스키마는 alembic 마이그레이션으로 맞춘다. (replica 여러 개가 동시에 시작해도 하나씩)
+    upgrade_schema(bootstrap=bootstrap_single_user)
+
+
+@app.on_event("startup")
+async def open_http_clients():
+    configure_http(HttpClientConfig(
+        timeout_sec=settings.http_timeout_sec,
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive,
+        keepalive_expiry_sec=settings.http_keepalive_expiry_sec,
+        http2=settings.http2_enabled,
+    ))
+    open_clients([*PROVIDERS.keys(), "telegram"])
+
+
+@app.on_event("startup")
+def configure_provider_base_urls():
+    overrides = {
+        "openai": settings.openai_base_url,
+        "anthropic": settings.anthropic_base_url,
+        "google": settings.google_base_url,
+        "groq": settings.groq_base_url,
+        "mistral": settings.mistral_base_url,
+    }
+    for name, provider in PROVIDERS.items():
+        url = (overrides.get(name) or settings.provider_base_url).rstrip("/")
+        provider.base_url = url or type(provider).base_url
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    await aclose_all()
+
+
+@app.on_event("startup")
+def configure_response_cache():
+    response_cache.configure(CacheConfig(
+        enabled=settings.response_cache_enabled,
+        max_entries=settings.response_cache_max_entries,
+        ttl_sec=settings.response_cache_ttl_sec,
+        path=settings.response_cache_path,
+        max_disk_entries=settings.response_cache_max_disk_entries,
+    ))
+
+
+@app.on_event("startup")
+def configure_rate_limiters():
+    rate_limiters.configure(RateLimitConfig(
+        rpm=settings.rate_limit_rpm,
+        tpm=settings.rate_limit_tpm,
+        max_concurrency=settings.rate_limit_max_concurrency,
+    ))
+
+
+@app.on_event("startup")
+def configure_circuit_breakers():
+    breakers.configure(BreakerConfig(
+        failure_threshold=settings.breaker_failure_threshold,
+        reset_timeout_sec=settings.breaker_reset_timeout_sec,
+        half_open_max_calls=settings.breaker_half_open_max_calls,
+    ))
+
+
+@app.on_event("startup")
+async def start_spend_ledger():
+    from .db import SessionLocal
+    spend_ledger.configure(LedgerConfig(
+        user_hourly_usd=settings.spend_cap_user_hourly_usd,
+        user_daily_usd=settings.spend_cap_user_daily_usd,
+        user_monthly_usd=settings.spend_cap_user_monthly_usd,
+        provider_hourly_usd=settings.spend_cap_provider_hourly_usd,
+        provider_daily_usd=settings.spend_cap_provider_daily_usd,
+        provider_monthly_usd=settings.spend_cap_provider_monthly_usd,
+        flush_interval_sec=settings.ledger_flush_interval_sec,
+    ))
+    if spend_ledger.enabled:
+        await spend_ledger.start(SessionLocal)
+
+
+@app.on_event("shutdown")
+async def stop_spend_ledger():
+    await spend_ledger.stop()
+
+
+@app.on_event("shutdown")
+def stop_db_writer():
+    # spend ledger의 마지막 flush 뒤에 실행되도록 그 뒤에 등록한다.
+    db_writer.stop()
+
+
+@app.on_event("startup")
+async def start_run_workers():
+    run_manager.configure(
+        workers=settings.run_workers,
+        max_queue=settings.run_queue_size,
+        retention=settings.run_retention,
+    )
+    await run_manager.start()
+
+
+@app.on_event("shutdown")
+async def stop_run_workers():
+    await run_manager.stop()
+
+
+@app.on_event("startup")
+async def start_telegram_workers():
+    from .db import SessionLocal
+    telegram_jobs.configure(
+        workers=settings.telegram_workers,
+        lease_sec=settings.telegram_job_lease_sec,
+        max_attempts=settings.telegram_job_max_attempts,
+        retry_backoff_sec=settings.telegram_job_retry_backoff_sec,
+    )
+    await telegram_jobs.start(SessionLocal, process_telegram_message, on_failed=notify_telegram_failure)
+
+
+@app.on_event("shutdown")
+async def stop_telegram_workers():
+    await telegram_jobs.stop()
+
+
+@app.on_event("shutdown")
+def stop_tracing():
+    # run/telegram worker가 끝난 뒤에 남은 trace를 파일에 쓴다.
+    tracer.shutdown()
+
+
 # ── Chat ─────────────────────────────────────────────────────────────────────
 
 @app.get("/", response_class=HTMLResponse)
 def dashboard(request: Request, db: Session = Depends(get_db)):
     ensure_single_user(db)
-    keys = {k.provider: True for k in db.query(ApiKey).filter(ApiKey.user_id == SINGLE_USER_ID).all()}
+    keys = get_key_flags(db, SINGLE_USER_ID)
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
         "title": "Chat · Debait",
@@ -94,11 +323,9 @@ async def ask(
     question: str = Form(...),
     clarification_context: str = Form(default=""),
     skip_clarify: str = Form(default="0"),
-    db: Session = Depends(get_db),
 ):
-    u = ensure_single_user(db)
-    keys_db   = get_user_keys(db, u)
-    keys_flag = {k.provider: True for k in db.query(ApiKey).filter(ApiKey.user_id == SINGLE_USER_ID).all()}
+    # DB/복호화 작업은 run_db로 DB 스레드에서 실행해 이벤트 루프를 막지 않는다.
+    keys_flag = await run_db(get_key_flags, SINGLE_USER_ID)
     question = (question or "").strip()
     clarification_context = (clarification_context or "").strip()
 
@@ -121,29 +348,12 @@ async def ask(
     if clarification_context:
         effective_question = f"{question}\n\n[User Clarifications]\n{clarification_context}"
 
-    stages     = get_pipeline_stages(db, SINGLE_USER_ID)
-    synth_mdl  = get_synth_model(db, SINGLE_USER_ID)
-    stages_dicts = [{"name": s.name, "system_prompt": s.system_prompt, "model": s.model} for s in stages]
-
-    thread_key = f"web:{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
-    thread = get_or_create_thread(db, SINGLE_USER_ID, thread_key)
-    db.add(Message(thread_id=thread.id, role="user", content=effective_question))
-    db.commit()
-
+    ctx = await prepare_web_run(effective_question)
+    cancel_event = asyncio.Event()
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_event))
     try:
-        result = await run_orchestrator(
-            question=effective_question,
-            thread_summary=thread.summary or "",
-            user_api_keys=keys_db,
-            stages=stages_dicts,
-            synth_model=synth_mdl,
-            budget=Budget(),
-            use_llm_gate=False,
-        )
+        result, _ = await execute_run(ctx, cancel_event=cancel_event)
     except Exception as e:
-        # 실패한 thread는 DB에서 제거 (내용 없는 빈 기록이 history에 남지 않도록)
-        db.delete(thread)
-        db.commit()
         return templates.TemplateResponse("dashboard.html", {
             "request": request,
             "title": "Chat · Debait",
@@ -153,29 +363,8 @@ async def ask(
             "error": f"{type(e).__name__}: {e}",
             "clarification": None,
         })
-
-    final = result.get("final", "").strip() or "(빈 응답)"
-
-    for sr in result.get("stages", []):
-        db.add(Message(thread_id=thread.id, role=sr["name"], content=sr["text"]))
-    db.add(Message(thread_id=thread.id, role="assistant", content=final))
-    thread.summary = update_summary(thread.summary or "", effective_question, final)
-    thread.updated_at = datetime.utcnow()
-    db.commit()
-
-    usage = result.get("usage") or {}
-    for stage_name, su in usage.items():
-        if not su:
-            continue
-        db.add(UsageEvent(
-            user_id=SINGLE_USER_ID,
-            provider=(su.get("provider") or "")[:32],
-            model=(su.get("model") or "")[:64],
-            input_tokens=int(su.get("input_tokens", 0) or 0),
-            output_tokens=int(su.get("output_tokens", 0) or 0),
-            cost_usd=float(su.get("cost_usd", 0.0) or 0.0),
-        ))
-    db.commit()
+    finally:
+        watcher.cancel()
 
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
@@ -187,34 +376,202 @@ async def ask(
     })
 
 
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(
+    question: str = Form(...),
+    clarification_context: str = Form(default=""),
+    skip_clarify: str = Form(default="0"),
+):
+    """/ask의 SSE 버전. 스테이지 진행과 토큰을 도착하는 대로 내보낸다."""
+    question = (question or "").strip()
+    clarification_context = (clarification_context or "").strip()
+
+    clarity = analyze_request_clarity(question)
+    if clarity.score >= 0.55 and not clarification_context and skip_clarify != "1":
+        # 명확화 UI는 기존 /ask 폼 흐름으로 처리한다.
+        return StreamingResponse(
+            iter([_sse({"type": "clarify", "score": clarity.score})]),
+            media_type="text/event-stream",
+        )
+
+    effective_question = question
+    if clarification_context:
+        effective_question = f"{question}\n\n[User Clarifications]\n{clarification_context}"
+    ctx = await prepare_web_run(effective_question)
+
+    async def event_stream():
+        queue: asyncio.Queue = asyncio.Queue()
+        cancel_event = asyncio.Event()
+
+        async def run():
+            try:
+                result, final = await execute_run(ctx, on_event=queue.put, cancel_event=cancel_event)
+                await queue.put({
+                    "type": "result",
+                    "final": final,
+                    "decision": result.get("decision"),
+                    "quality": result.get("quality"),
+                    "monitoring": result.get("monitoring"),
+                })
+            except Exception as e:
+                await queue.put({"type": "error", "error": f"{type(e).__name__}: {e}"})
+            finally:
+                await queue.put(None)
+
+        # 클라이언트가 끊기면 스트림이 취소된다. 그때 남은 호출을 취소하고,
+        # 이미 쓴 토큰은 별도 task로 도는 run이 부분 결과로 저장한다.
+        task = asyncio.create_task(run())
+        _background_runs.add(task)
+        task.add_done_callback(_background_runs.discard)
+        try:
+            while (event := await queue.get()) is not None:
+                yield _sse(event)
+        finally:
+            if not task.done():
+                cancel_event.set()
+        await task
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ── Runs (async API) ──────────────────────────────────────────────────────────
+
+class RunRequest(BaseModel):
+    question: str
+    clarification_context: str = ""
+
+
+@app.post("/runs", status_code=202)
+async def create_run(body: RunRequest):
+    question = (body.question or "").strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="question is required")
+    clarification_context = (body.clarification_context or "").strip()
+    if clarification_context:
+        question = f"{question}\n\n[User Clarifications]\n{clarification_context}"
+
+    ctx = await prepare_web_run(question)
+
+    async def job(run, emit):
+        result, final = await execute_run(ctx, on_event=emit)
+        return {
+            "final": final,
+            "thread_id": ctx.thread_id,
+            "decision": result.get("decision"),
+            "stages": result.get("stages", []),
+            "quality": result.get("quality"),
+            "monitoring": result.get("monitoring"),
+        }
+
+    try:
+        run = run_manager.submit(question, job)
+    except RunQueueFull:
+        await delete_thread_async(ctx.thread_id)
+        raise HTTPException(status_code=503, detail="Too many queued runs, retry later")
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "status_url": f"/runs/{run.id}",
+        "events_url": f"/runs/{run.id}/events",
+    }
+
+
+@app.get("/runs/{run_id}")
+def get_run(run_id: str):
+    run = run_manager.get(run_id)
+    if not run:
+        raise HTTPException(status_code=404)
+    return run.snapshot()
+
+
+@app.get("/runs/{run_id}/events")
+async def run_events(run_id: str):
+    if not run_manager.get(run_id):
+        raise HTTPException(status_code=404)
+
+    async def event_stream():
+        async for event in run_manager.subscribe(run_id):
+            yield _sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ── Conversations ─────────────────────────────────────────────────────────────
 
+HISTORY_PAGE_SIZE = 30
+SEARCH_LIMIT = 20
+
+
 @app.get("/conversations", response_class=HTMLResponse)
-def conversations(request: Request, db: Session = Depends(get_db)):
+def conversations(request: Request, before: str | None = None, q: str = "", db: Session = Depends(get_db)):
     ensure_single_user(db)
-    threads = (
-        db.query(Thread)
-        .filter(Thread.user_id == SINGLE_USER_ID)
-        .order_by(Thread.updated_at.desc())
-        .limit(30)
-        .all()
-    )
-    for t in threads:
-        t.messages = (
-            db.query(Message)
-            .filter(Message.thread_id == t.id)
-            .order_by(Message.created_at.asc())
-            .all()
-        )
-    # assistant 메시지가 없는 thread(에러로 중단된 것)는 표시하지 않음
-    threads = [t for t in threads if any(m.role == "assistant" for m in t.messages)]
+    if q.strip():
+        return templates.TemplateResponse("conversations.html", {
+            "request": request,
+            "title": "History · Debait",
+            "query": q,
+            "hits": search_messages(db, SINGLE_USER_ID, q, limit=SEARCH_LIMIT),
+        })
+    try:
+        cursor = decode_history_cursor(before) if before else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    # assistant 메시지가 없는 thread(에러로 중단된 것)는 has_answer로 걸러진다.
+    threads, next_cursor = list_answered_threads(db, SINGLE_USER_ID, HISTORY_PAGE_SIZE, cursor)
+    # 최종 답변만 한 번에 읽고, 토론 과정은 펼칠 때 /conversations/{id}/stages로 읽는다.
+    answers = get_first_answers(db, [t.id for t in threads])
     return templates.TemplateResponse("conversations.html", {
         "request": request,
         "title": "History · Debait",
         "threads": threads,
+        "answers": answers,
+        "next_cursor": next_cursor,
+        "is_first_page": cursor is None,
     })
 
 
+@app.get("/conversations/search")
+def conversation_search(q: str, limit: int = SEARCH_LIMIT, db: Session = Depends(get_db)):
+    t0 = time.perf_counter()
+    hits = search_messages(db, SINGLE_USER_ID, q, limit=max(1, min(limit, 100)))
+    return {
+        "query": q,
+        "took_ms": round((time.perf_counter() - t0) * 1000, 2),
+        "results": [
+            {
+                "thread_id": h.thread_id,
+                "message_id": h.message_id,
+                "role": h.role,
+                "preview": h.preview,
+                "updated_at": h.updated_at.isoformat() if h.updated_at else None,
+                "snippet": h.snippet,
+                "rank": h.rank,
+            }
+            for h in hits
+        ],
+    }
+
+
+@app.get("/conversations/{thread_id}/stages", response_class=HTMLResponse)
+def conversation_stages(request: Request, thread_id: int, db: Session = Depends(get_db)):
+    messages = get_stage_messages(db, SINGLE_USER_ID, thread_id)
+    if messages is None:
+        raise HTTPException(status_code=404)
+    return templates.TemplateResponse("_stages.html", {"request": request, "stage_msgs": messages})
+
+
 # ── Settings ──────────────────────────────────────────────────────────────────
 
 @app.get("/settings", response_class=HTMLResponse)
@@ -222,9 +579,10 @@ def settings_page(request: Request, db: Session = Depends(get_db)):
     ensure_single_user(db)
     link_code   = create_link_code(db, SINGLE_USER_ID, ttl_minutes=5)
     webhook_url = f"{settings.base_url}/tg/{settings.webhook_secret}"
-    keys        = {k.provider: True for k in db.query(ApiKey).filter(ApiKey.user_id == SINGLE_USER_ID).all()}
+    keys        = get_key_flags(db, SINGLE_USER_ID)
     stages      = get_pipeline_stages(db, SINGLE_USER_ID)
     synth_mdl   = get_synth_model(db, SINGLE_USER_ID)
+    synth_fb    = get_synth_fallbacks(db, SINGLE_USER_ID)
     return templates.TemplateResponse("settings.html", {
         "request": request,
         "title": "Settings · Debait",
@@ -233,6 +591,7 @@ def settings_page(request: Request, db: Session = Depends(get_db)):
         "keys": keys,
         "stages": stages,
         "synth_model": synth_mdl,
+        "synth_fallbacks": ", ".join(synth_fb),
         "max_stages": MAX_PIPELINE_STAGES,
     })
 
@@ -270,19 +629,21 @@ def save_pipeline(
     stage_name:   List[str] = Form(default=[]),
     stage_prompt: List[str] = Form(default=[]),
     stage_model:  List[str] = Form(default=[]),
+    stage_fallbacks: List[str] = Form(default=[]),
     synth_model:  str       = Form(default=""),
+    synth_fallbacks: str    = Form(default=""),
     db: Session = Depends(get_db),
 ):
     ensure_single_user(db)
-    save_pipeline_stages(db, SINGLE_USER_ID, stage_name, stage_prompt, stage_model)
-    save_synth_model(db, SINGLE_USER_ID, synth_model)
+    save_pipeline_stages(db, SINGLE_USER_ID, stage_name, stage_prompt, stage_model, stage_fallbacks)
+    save_synth_model(db, SINGLE_USER_ID, synth_model, synth_fallbacks)
     return RedirectResponse("/settings#pipeline", status_code=302)
 
 
 # ── Telegram webhook ──────────────────────────────────────────────────────────
 
 @app.post("/tg/{secret}")
-async def telegram_webhook(secret: str, request: Request, background: BackgroundTasks, db: Session = Depends(get_db)):
+async def telegram_webhook(secret: str, request: Request):
     if secret != settings.webhook_secret:
         raise HTTPException(status_code=404)
 
@@ -293,99 +654,111 @@ async def telegram_webhook(secret: str, request: Request, background: Background
 
     chat_id = str(msg.get("chat", {}).get("id"))
     text    = (msg.get("text") or "").strip()
-    background.add_task(process_telegram_message, chat_id, text)
+    # 빠르게 200을 돌려주고 처리는 영속 큐 worker에 맡긴다. 재전송된 update_id는 무시된다.
+    if await run_db(telegram_jobs.enqueue, update.get("update_id"), chat_id, text):
+        telegram_jobs.notify()
     return {"ok": True}
 
 
-async def process_telegram_message(chat_id: str, text: str):
-    from .db import SessionLocal
-    db = SessionLocal()
-    try:
-        if text.startswith("/start"):
-            await send_message(chat_id, "안녕! 웹앱에서 'Telegram 연결 코드'를 생성한 다음, 그 코드를 그대로 나에게 보내면 연결돼.")
-            return
+def handle_link_code(db: Session, chat_id: str, text: str) -> str | None:
+    """text가 연결 코드면 연결을 처리하고 답장 문구를 반환한다. 연결 코드가 아니면 None."""
+    code_record = get_link_code(db, text.upper())
+    if not code_record:
+        return None
+    if code_record.status == "consumed":
+        return "이미 사용된 연결 코드야. 웹앱에서 새 코드를 생성해줘."
+    if datetime.utcnow() >= code_record.expires_at:
+        return "연결 코드가 만료됐어. 웹앱에서 새 코드를 생성해줘."
+    if db.query(TelegramLink).filter(TelegramLink.chat_id == chat_id).first():
+        return "이미 연결되어 있어! 질문을 보내줘."
+    consumed = consume_valid_link_code(db, text.upper())
+    if not consumed:
+        return "연결 코드가 유효하지 않아."
+    db.add(TelegramLink(user_id=consumed.user_id, chat_id=chat_id))
+    db.commit()
+    return "연결 완료! 이제 질문을 보내면 AI 단톡방이 답해줄게."
+
+
+def prepare_telegram_run(db: Session, chat_id: str, text: str) -> PipelineRun | str:
+    """연결된 사용자의 파이프라인 실행을 준비한다. 실행할 수 없으면 답장 문구를 반환한다."""
+    link = db.query(TelegramLink).filter(TelegramLink.chat_id == chat_id).first()
+    if not link:
+        return "아직 웹앱과 연결되지 않았어. (/start)"
+    user = db.query(User).filter(User.id == link.user_id).first()
+    if not user:
+        return "계정 정보를 찾지 못했어."
+    return prepare_pipeline_run(db, user.id, f"telegram:{chat_id}", text)
 
-        if text:
-            code_record = get_link_code(db, text.upper())
-            if code_record:
-                if code_record.status == "consumed":
-                    await send_message(chat_id, "이미 사용된 연결 코드야. 웹앱에서 새 코드를 생성해줘.")
-                    return
-                if datetime.utcnow() >= code_record.expires_at:
-                    await send_message(chat_id, "연결 코드가 만료됐어. 웹앱에서 새 코드를 생성해줘.")
-                    return
-                if db.query(TelegramLink).filter(TelegramLink.chat_id == chat_id).first():
-                    await send_message(chat_id, "이미 연결되어 있어! 질문을 보내줘.")
-                    return
-                consumed = consume_valid_link_code(db, text.upper())
-                if not consumed:
-                    await send_message(chat_id, "연결 코드가 유효하지 않아.")
-                    return
-                db.add(TelegramLink(user_id=consumed.user_id, chat_id=chat_id))
-                db.commit()
-                await send_message(chat_id, "연결 완료! 이제 질문을 보내면 AI 단톡방이 답해줄게.")
-                return
-
-        link = db.query(TelegramLink).filter(TelegramLink.chat_id == chat_id).first()
-        if not link:
-            await send_message(chat_id, "아직 웹앱과 연결되지 않았어. (/start)")
-            return
 
-        user = db.query(User).filter(User.id == link.user_id).first()
-        if not user:
-            await send_message(chat_id, "계정 정보를 찾지 못했어.")
+async def process_telegram_message(chat_id: str, text: str):
+    """queue worker가 부르는 handler. 예외는 worker로 올려 보내 재시도/실패 기록과 사용자 알림을 맡긴다."""
+    if text.startswith("/start"):
+        await send_message(chat_id, "안녕! 웹앱에서 'Telegram 연결 코드'를 생성한 다음, 그 코드를 그대로 나에게 보내면 연결돼.")
+        return
+
+    if text:
+        link_reply = await run_db(handle_link_code, chat_id, text)
+        if link_reply:
+            await send_message(chat_id, link_reply)
             return
 
-        thread = get_or_create_thread(db, user.id, f"telegram:{chat_id}")
-        db.add(Message(thread_id=thread.id, role="user", content=text))
-        db.commit()
+    ctx = await run_db(prepare_telegram_run, chat_id, text)
+    if isinstance(ctx, str):
+        await send_message(chat_id, ctx)
+        return
 
-        stages     = get_pipeline_stages(db, user.id)
-        synth_mdl  = get_synth_model(db, user.id)
-        stages_dicts = [{"name": s.name, "system_prompt": s.system_prompt, "model": s.model} for s in stages]
+    saved = False
+    try:
+        reply = None
+        if settings.telegram_streaming:
+            reply = StreamingReply(chat_id, min_interval_sec=settings.telegram_edit_interval_sec)
+            try:
+                await reply.start("🤔 AI들이 토론을 시작했어...")
+            except Exception:
+                reply = None
 
         result = await run_orchestrator(
-            question=text,
-            thread_summary=thread.summary or "",
-            user_api_keys=get_user_keys(db, user),
-            stages=stages_dicts,
-            synth_model=synth_mdl,
+            question=ctx.question,
+            thread_summary=ctx.thread_summary,
+            user_api_keys=ctx.user_api_keys,
+            stages=ctx.stages,
+            synth_model=ctx.synth_model,
+            synth_fallbacks=ctx.synth_fallbacks,
             budget=Budget(),
             use_llm_gate=False,
+            execution_config=execution_config(),
+            on_event=reply.on_event if reply else None,
+            user_id=ctx.user_id,
         )
 
-        final = result.get("final", "").strip() or "(빈 응답)"
-
-        for sr in result.get("stages", []):
-            db.add(Message(thread_id=thread.id, role=sr["name"], content=sr["text"]))
-        db.add(Message(thread_id=thread.id, role="assistant", content=final))
-        thread.summary = update_summary(thread.summary or "", text, final)
-        thread.updated_at = datetime.utcnow()
-
-        for stage_name, su in (result.get("usage") or {}).items():
-            if not su:
-                continue
-            db.add(UsageEvent(
-                user_id=user.id,
-                provider=(su.get("provider") or "")[:32],
-                model=(su.get("model") or "")[:64],
-                input_tokens=int(su.get("input_tokens", 0) or 0),
-                output_tokens=int(su.get("output_tokens", 0) or 0),
-                cost_usd=float(su.get("cost_usd", 0.0) or 0.0),
-            ))
-        db.commit()
+        final = await save_thread_run_result_async(ctx.user_id, ctx.thread_id, ctx.question, result)
+        saved = True
 
-        await send_message(chat_id, final)
+        if reply:
+            await reply.finish(final)
+        else:
+            await send_message(chat_id, final)
+    except (Exception, asyncio.CancelledError):
+        # 답변 없이 남은 user 메시지를 지운다. 재시도하면 prepare_telegram_run이 다시 기록한다.
+        if not saved:
+            await discard_thread_turn_async(ctx.thread_id, ctx.question)
+        raise
 
-    except Exception as e:
-        try:
-            await send_message(chat_id, f"처리 중 오류: {type(e).__name__}: {e}")
-        except Exception:
-            pass
-    finally:
-        db.close()
+
+async def notify_telegram_failure(chat_id: str, error: str) -> None:
+    """재시도를 다 쓰고 실패한 Telegram job을 사용자에게 알린다."""
+    await send_message(chat_id, f"처리 중 오류: {error}")
 
 
 @app.get("/health")
 def health():
-    return PlainTextResponse("ok")
+    """프로세스 상태와 provider/model별 circuit breaker 상태. open circuit이 있으면 degraded."""
+    circuits = breakers.snapshot()
+    degraded = any(c["state"] != "closed" for c in circuits.values())
+    return {"status": "degraded" if degraded else "ok", "circuits": circuits}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape용. provider/model/stage별 지연시간, 재시도, 실패, 비용과 예산 개입 횟수."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
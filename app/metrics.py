@@ -0,0 +1,166 @@
+"""Prometheus text format으로 내보내는 counter/histogram.
+
+기록은 스레드마다 따로 둔 shard dict에만 쓰므로 lock이 없다. (쓰는 스레드가 하나뿐인 dict라 경합이 없다)
+/metrics를 읽을 때 모든 shard를 복사해 합친다. dict/list 복사는 GIL 아래에서 한 번에 끝나므로
+다른 스레드가 기록 중이어도 깨진 값을 읽지 않는다. (한 scrape 안에서 sum과 count가 한 건 어긋날 수는 있다)
+"""
+import bisect
+import math
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+LabelKey = Tuple[str, ...]
+
+# 초 단위 지연시간 (LLM 호출은 수백 ms ~ 수십 초)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+COST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.histograms: Dict[Tuple[str, LabelKey], List[float]] = {}   # [bucket별 개수..., +Inf, sum]
+
+
+class Counter:
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Sequence[str]):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        counters = self._registry._shard().counters
+        key = (self.name, tuple(str(labels.get(n, "")) for n in self.labelnames))
+        counters[key] = counters.get(key, 0.0) + amount
+
+
+class Histogram:
+    def __init__(
+        self, registry: "MetricsRegistry", name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float],
+    ):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        histograms = self._registry._shard().histograms
+        key = (self.name, tuple(str(labels.get(n, "")) for n in self.labelnames))
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0.0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self._metrics: Dict[str, Counter | Histogram] = {}
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            self._shards.append(shard)  # 스레드가 끝나도 shard는 남아 누적값을 잃지 않는다.
+            return shard
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, self.prefix + name, help, labelnames)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(self, self.prefix + name, help, labelnames, buckets)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def clear(self) -> None:
+        for shard in list(self._shards):
+            shard.counters.clear()
+            shard.histograms.clear()
+
+    def _collect(self) -> tuple[Dict[Tuple[str, LabelKey], float], Dict[Tuple[str, LabelKey], List[float]]]:
+        counters: Dict[Tuple[str, LabelKey], float] = {}
+        histograms: Dict[Tuple[str, LabelKey], List[float]] = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0.0) + value
+            for key, counts in list(shard.histograms.items()):
+                counts = list(counts)
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = counts
+                else:
+                    for i, c in enumerate(counts):
+                        merged[i] += c
+        return counters, histograms
+
+    def value(self, name: str, **labels: str) -> float:
+        """counter 값 또는 histogram 관측 수 (테스트/디버깅용)."""
+        metric = self._metrics[self.prefix + name]
+        key = (metric.name, tuple(str(labels.get(n, "")) for n in metric.labelnames))
+        counters, histograms = self._collect()
+        if isinstance(metric, Counter):
+            return counters.get(key, 0.0)
+        counts = histograms.get(key)
+        return sum(counts[:-1]) if counts else 0.0
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        counters, histograms = self._collect()
+        by_metric: Dict[str, List[Tuple[LabelKey, float | List[float]]]] = {}
+        for (name, key), value in list(counters.items()) + list(histograms.items()):
+            by_metric.setdefault(name, []).append((key, value))
+
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            kind = "counter" if isinstance(metric, Counter) else "histogram"
+            lines.append(f"# HELP {name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(by_metric.get(name, []), key=lambda kv: kv[0]):
+                labels = list(zip(metric.labelnames, key))
+                if isinstance(metric, Counter):
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', _number(bound))])} {_number(cumulative)}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {_number(cumulative)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry(prefix="debait_")
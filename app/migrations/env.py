@@ -0,0 +1,52 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import models  # noqa: F401  (모델을 metadata에 등록)
+from app.db import Base, engine
+from app.search import include_name
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_name=include_name,
+        render_as_batch=engine.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # upgrade_schema()는 lock을 잡은 연결을 넘겨준다. CLI로 실행하면 app 엔진에서 새로 연결한다.
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,  # FTS 검색 테이블은 모델 밖에서 관리
+        render_as_batch=connection.dialect.name == "sqlite",  # SQLite는 ALTER를 테이블 재생성으로 처리
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,138 @@
+"""initial schema (create_all 시절 스키마)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "user_preferences",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("synth_model", sa.String(128), nullable=False),
+        sa.Column("synth_fallbacks", sa.Text(), nullable=False, server_default=""),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_user_preferences_user_id", "user_preferences", ["user_id"], unique=True)
+
+    op.create_table(
+        "pipeline_stages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("name", sa.String(64), nullable=False),
+        sa.Column("system_prompt", sa.Text(), nullable=False),
+        sa.Column("model", sa.String(128), nullable=False),
+        sa.Column("fallback_models", sa.Text(), nullable=False, server_default=""),
+        sa.Column("order_index", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_pipeline_stages_user_id", "pipeline_stages", ["user_id"])
+
+    op.create_table(
+        "link_codes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("code", sa.String(32), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("consumed_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_link_codes_code", "link_codes", ["code"], unique=True)
+    op.create_index("ix_link_codes_expires_at", "link_codes", ["expires_at"])
+    op.create_index("ix_link_codes_user_id", "link_codes", ["user_id"])
+
+    op.create_table(
+        "telegram_links",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("chat_id", sa.String(64), nullable=False),
+        sa.Column("linked_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_telegram_links_chat_id", "telegram_links", ["chat_id"], unique=True)
+    op.create_index("ix_telegram_links_user_id", "telegram_links", ["user_id"])
+
+    op.create_table(
+        "api_keys",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("provider", sa.String(32), nullable=False),
+        sa.Column("encrypted_key", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("user_id", "provider", name="uq_user_provider"),
+    )
+    op.create_index("ix_api_keys_user_id", "api_keys", ["user_id"])
+
+    op.create_table(
+        "threads",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("thread_key", sa.String(128), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_threads_user_id", "threads", ["user_id"])
+    op.create_index("ix_threads_thread_key", "threads", ["thread_key"])
+
+    op.create_table(
+        "messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("thread_id", sa.Integer(), sa.ForeignKey("threads.id"), nullable=False),
+        sa.Column("role", sa.String(64), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_messages_thread_id", "messages", ["thread_id"])
+
+    op.create_table(
+        "usage_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("provider", sa.String(32), nullable=False),
+        sa.Column("model", sa.String(64), nullable=False),
+        sa.Column("input_tokens", sa.Integer(), nullable=False),
+        sa.Column("output_tokens", sa.Integer(), nullable=False),
+        sa.Column("cost_usd", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_usage_events_user_id", "usage_events", ["user_id"])
+
+    op.create_table(
+        "telegram_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("update_id", sa.Integer(), nullable=True, unique=True),
+        sa.Column("chat_id", sa.String(64), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("lease_until", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_telegram_jobs_status", "telegram_jobs", ["status"])
+
+
+def downgrade() -> None:
+    for table in (
+        "telegram_jobs", "usage_events", "messages", "threads", "api_keys",
+        "telegram_links", "link_codes", "pipeline_stages", "user_preferences", "users",
+    ):
+        op.drop_table(table)
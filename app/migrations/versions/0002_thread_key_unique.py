@@ -0,0 +1,42 @@
+"""threads (user_id, thread_key) unique, usage_events.created_at index
+
+여러 replica가 같은 thread를 동시에 만들 수 있으므로 DB에서 중복을 막는다.
+기존 중복 thread는 가장 오래된 것으로 메시지를 옮긴 뒤 지운다.
+usage_events.created_at 인덱스는 spend ledger의 구간 합계 조회용.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE messages SET thread_id = ("
+        " SELECT MIN(t2.id) FROM threads t1 JOIN threads t2"
+        " ON t2.user_id = t1.user_id AND t2.thread_key = t1.thread_key"
+        " WHERE t1.id = messages.thread_id)"
+    )
+    op.execute(
+        "DELETE FROM threads WHERE id NOT IN ("
+        " SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM threads GROUP BY user_id, thread_key) AS keep)"
+    )
+    # 현재 모델로 create_all한 DB를 0001로 stamp해 올리는 경우 인덱스가 이미 있을 수 있다.
+    insp = sa.inspect(op.get_bind())
+    if "ix_threads_user_thread_key" not in {i["name"] for i in insp.get_indexes("threads")}:
+        op.create_index("ix_threads_user_thread_key", "threads", ["user_id", "thread_key"], unique=True)
+    if "ix_usage_events_created_at" not in {i["name"] for i in insp.get_indexes("usage_events")}:
+        op.create_index("ix_usage_events_created_at", "usage_events", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_usage_events_created_at", table_name="usage_events")
+    op.drop_index("ix_threads_user_thread_key", table_name="threads")
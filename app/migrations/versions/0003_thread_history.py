@@ -0,0 +1,71 @@
+"""thread history: has_answer/preview/stage_names columns and keyset pagination indexes
+
+기록 페이지가 thread마다 메시지를 전부 읽지 않도록 목록에 필요한 값을 threads에 둔다.
+기존 thread는 메시지에서 값을 채운다.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # create_all 시절 DB는 add_missing_columns가 컬럼을, 현재 모델로 만든 DB는 인덱스까지 이미 갖고 있을 수 있다.
+    insp = sa.inspect(op.get_bind())
+    columns = {c["name"] for c in insp.get_columns("threads")}
+    with op.batch_alter_table("threads") as batch:
+        if "has_answer" not in columns:
+            batch.add_column(sa.Column("has_answer", sa.Boolean(), nullable=False, server_default="0"))
+        if "preview" not in columns:
+            batch.add_column(sa.Column("preview", sa.String(255), nullable=False, server_default=""))
+        if "stage_names" not in columns:
+            batch.add_column(sa.Column("stage_names", sa.Text(), nullable=False, server_default=""))
+
+    if "ix_threads_user_updated" not in {i["name"] for i in insp.get_indexes("threads")}:
+        op.create_index("ix_threads_user_updated", "threads", ["user_id", "updated_at", "id"])
+    if "ix_messages_thread_created" not in {i["name"] for i in insp.get_indexes("messages")}:
+        op.create_index("ix_messages_thread_created", "messages", ["thread_id", "created_at"])
+
+    op.execute(
+        "UPDATE threads SET has_answer = EXISTS ("
+        " SELECT 1 FROM messages m WHERE m.thread_id = threads.id AND m.role = 'assistant')"
+    )
+    op.execute(
+        "UPDATE threads SET preview = COALESCE(("
+        " SELECT SUBSTR(m.content, 1, 255) FROM messages m"
+        " WHERE m.thread_id = threads.id AND m.role = 'user' ORDER BY m.id LIMIT 1), '')"
+        " WHERE preview = ''"
+    )
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT thread_id, role, MIN(id) AS first_id FROM messages"
+        " WHERE role NOT IN ('user', 'assistant')"
+        " GROUP BY thread_id, role ORDER BY thread_id, first_id"
+    )).all()
+    names: dict[int, list[str]] = {}
+    for thread_id, role, _ in rows:
+        names.setdefault(thread_id, []).append(role)
+    if names:
+        threads = sa.table("threads", sa.column("id", sa.Integer), sa.column("stage_names", sa.Text))
+        bind.execute(
+            threads.update().where(threads.c.id == sa.bindparam("tid")).values(stage_names=sa.bindparam("names")),
+            [{"tid": tid, "names": " · ".join(roles)} for tid, roles in names.items()],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_thread_created", table_name="messages")
+    op.drop_index("ix_threads_user_updated", table_name="threads")
+    with op.batch_alter_table("threads") as batch:
+        batch.drop_column("stage_names")
+        batch.drop_column("preview")
+        batch.drop_column("has_answer")
@@ -0,0 +1,65 @@
+"""full-text search index over messages.content
+
+SQLite: FTS5 외부 content 테이블 messages_fts + messages 트리거로 증분 동기화.
+  SQLite 3.34+는 trigram 토크나이저(한국어/중국어 부분 일치), 그 전 버전은 unicode61.
+  (messages를 batch 재생성하는 마이그레이션을 추가하면 트리거도 다시 만들어야 한다)
+Postgres: to_tsvector('simple', content) GIN 인덱스. 행과 함께 자동으로 갱신된다.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+import sqlite3
+
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_messages_content_fts ON messages"
+            " USING gin (to_tsvector('simple', content))"
+        )
+        return
+    if dialect != "sqlite":
+        return
+
+    tokenizer = "trigram" if sqlite3.sqlite_version_info >= (3, 34, 0) else "unicode61"
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+        f"content, content='messages', content_rowid='id', tokenize='{tokenizer}')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN"
+        " INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN"
+        " INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN"
+        " INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);"
+        " INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END"
+    )
+    # 기존 메시지 색인
+    op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_messages_content_fts")
+        return
+    if dialect != "sqlite":
+        return
+    for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS messages_fts")
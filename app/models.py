@@ -1,4 +1,4 @@
-from sqlalchemy import String, Integer, Float, DateTime, Text, ForeignKey, UniqueConstraint
+from sqlalchemy import Boolean, String, Integer, Float, DateTime, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 from .db import Base
@@ -24,6 +24,7 @@ class UserPreference(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), unique=True, index=True)
     synth_model: Mapped[str] = mapped_column(String(128), default="")
+    synth_fallbacks: Mapped[str] = mapped_column(Text, default="", server_default="")  # "provider:model" 목록 (쉼표/줄바꿈)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="preference")
@@ -37,6 +38,7 @@ class PipelineStage(Base):
     name: Mapped[str] = mapped_column(String(64))           # 표시 이름 (예: "Devil's Advocate")
     system_prompt: Mapped[str] = mapped_column(Text)        # 이 단계의 시스템 프롬프트
     model: Mapped[str] = mapped_column(String(128))         # "provider:model-id"
+    fallback_models: Mapped[str] = mapped_column(Text, default="", server_default="")  # 실패 시 순서대로 시도할 모델 (쉼표/줄바꿈)
     order_index: Mapped[int] = mapped_column(Integer, default=0)
 
     user = relationship("User", back_populates="pipeline_stages")
@@ -81,11 +83,21 @@ class ApiKey(Base):
 
 class Thread(Base):
     __tablename__ = "threads"
+    __table_args__ = (
+        # replica 여러 개가 같은 thread를 동시에 만들지 않도록 DB에서 막는다.
+        Index("ix_threads_user_thread_key", "user_id", "thread_key", unique=True),
+        # 기록 페이지 keyset 페이지네이션 (updated_at desc, id desc)
+        Index("ix_threads_user_updated", "user_id", "updated_at", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
     thread_key: Mapped[str] = mapped_column(String(128), index=True)
     summary: Mapped[str] = mapped_column(Text, default="")
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # 기록 목록용 비정규화 값 (메시지 본문을 읽지 않고 목록을 그린다)
+    has_answer: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0")
+    preview: Mapped[str] = mapped_column(String(255), default="", server_default="")    # 첫 질문 앞부분
+    stage_names: Mapped[str] = mapped_column(Text, default="", server_default="")       # 토론 스테이지 이름 (" · ")
 
     user = relationship("User", back_populates="threads")
     messages = relationship("Message", back_populates="thread", cascade="all, delete-orphan")
@@ -93,6 +105,7 @@ class Thread(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_thread_created", "thread_id", "created_at"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     thread_id: Mapped[int] = mapped_column(ForeignKey("threads.id"), index=True)
     role: Mapped[str] = mapped_column(String(64))   # user|assistant|<stage_name>
@@ -111,4 +124,18 @@ class UsageEvent(Base):
     input_tokens: Mapped[int] = mapped_column(Integer, default=0)
     output_tokens: Mapped[int] = mapped_column(Integer, default=0)
     cost_usd: Mapped[float] = mapped_column(Float, default=0.0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class TelegramJob(Base):
+    __tablename__ = "telegram_jobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    update_id: Mapped[int | None] = mapped_column(Integer, unique=True, nullable=True)   # Telegram 재전송 dedupe
+    chat_id: Mapped[str] = mapped_column(String(64))
+    text: Mapped[str] = mapped_column(Text, default="")
+    status: Mapped[str] = mapped_column(String(16), default="queued", index=True)  # queued|running|done|failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    lease_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, default="")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
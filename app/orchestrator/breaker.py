@@ -0,0 +1,111 @@
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+import httpx
+
+from ..providers.limits import RateLimitError
+
+
+@dataclass
+class BreakerConfig:
+    failure_threshold: int = 5       # 연속 실패가 이만큼 쌓이면 open
+    reset_timeout_sec: float = 30.0  # open 후 이 시간이 지나면 half-open으로 probe 허용
+    half_open_max_calls: int = 1     # half-open 상태에서 동시에 허용하는 probe 수
+
+
+def is_vendor_failure(error: BaseException) -> bool:
+    """장애로 셀 오류인지. 429(용량)와 408 외의 4xx(요청/키 문제)는 vendor 장애가 아니다."""
+    if isinstance(error, RateLimitError):
+        return False
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 408
+    return True
+
+
+class CircuitBreaker:
+    """(provider, model) 하나의 circuit. closed → (연속 실패) open → (timeout) half-open → probe 결과로 closed/open."""
+
+    def __init__(self, config: BreakerConfig):
+        self.config = config
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_in_flight = 0
+        self.last_error = ""
+
+    def _refresh(self, now: float) -> None:
+        if self.state == "open" and now - self.opened_at >= self.config.reset_timeout_sec:
+            self.state = "half_open"
+            self.half_open_in_flight = 0
+
+    def allow(self) -> bool:
+        """호출해도 되는지. half-open이면 probe 자리를 하나 잡는다 (record_*/release로 반납)."""
+        self._refresh(time.monotonic())
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and self.half_open_in_flight < self.config.half_open_max_calls:
+            self.half_open_in_flight += 1
+            return True
+        return False
+
+    def is_open(self) -> bool:
+        self._refresh(time.monotonic())
+        return self.state == "open"
+
+    def release(self) -> None:
+        """결과 없이 끝난(취소된) 호출의 probe 자리를 반납한다."""
+        if self.state == "half_open":
+            self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.half_open_in_flight = 0
+
+    def record_failure(self, error: str = "") -> None:
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == "half_open" or self.consecutive_failures >= self.config.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.half_open_in_flight = 0
+
+    def snapshot(self) -> Dict:
+        self._refresh(time.monotonic())
+        snap: Dict = {"state": self.state, "consecutive_failures": self.consecutive_failures}
+        if self.state == "open":
+            snap["retry_in_sec"] = round(max(0.0, self.opened_at + self.config.reset_timeout_sec - time.monotonic()), 1)
+        if self.last_error and self.state != "closed":
+            snap["last_error"] = self.last_error
+        return snap
+
+
+class BreakerRegistry:
+    def __init__(self, config: BreakerConfig | None = None):
+        self.config = config or BreakerConfig()
+        self._breakers: Dict[tuple[str, str], CircuitBreaker] = {}
+
+    def configure(self, config: BreakerConfig) -> None:
+        self.config = config
+        self._breakers.clear()
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get((provider, model))
+        if breaker is None:
+            breaker = self._breakers[(provider, model)] = CircuitBreaker(self.config)
+        return breaker
+
+    def state(self, provider: str, model: str) -> str:
+        breaker = self._breakers.get((provider, model))
+        return breaker.snapshot()["state"] if breaker else "closed"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {f"{p}:{m}": b.snapshot() for (p, m), b in sorted(self._breakers.items())}
+
+    def clear(self) -> None:
+        self._breakers.clear()
+
+
+breakers = BreakerRegistry()
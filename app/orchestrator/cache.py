@@ -0,0 +1,161 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from ..db import run_in_db_thread
+from ..providers.base import LLMResult
+
+
+@dataclass
+class CacheConfig:
+    enabled: bool = False
+    max_entries: int = 512          # 메모리 LRU 크기
+    ttl_sec: int = 60 * 60 * 24
+    path: str = ""                  # 비어 있으면 디스크 캐시 없이 메모리만 사용
+    max_disk_entries: int = 5000
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    text TEXT NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+
+def cache_key(provider: str, model: str, system: str, user: str, max_tokens: int) -> str:
+    raw = json.dumps([provider, model, system, user, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """동일한 (provider, model, system, user, max_tokens) 호출의 응답을 재사용한다.
+
+    메모리 LRU를 먼저 보고, 없으면 SQLite 파일(TTL/개수 제한)을 본다. 디스크 I/O는 DB 스레드에서 실행한다.
+    """
+
+    def __init__(self, config: CacheConfig | None = None):
+        self.config = config or CacheConfig()
+        self._memory: "OrderedDict[str, tuple[float, LLMResult]]" = OrderedDict()
+        self._schema_ready = False
+
+    def configure(self, config: CacheConfig) -> None:
+        self.config = config
+        self._memory.clear()
+        self._schema_ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled and (self.config.max_entries > 0 or bool(self.config.path))
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self.config.path:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM response_cache")
+
+    # ── memory ────────────────────────────────────────────────────────────
+
+    def _memory_get(self, key: str, now: float) -> LLMResult | None:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        created_at, result = entry
+        if now - created_at > self.config.ttl_sec:
+            self._memory.pop(key, None)
+            return None
+        self._memory.move_to_end(key)
+        return result
+
+    def _memory_put(self, key: str, result: LLMResult, created_at: float) -> None:
+        if self.config.max_entries <= 0:
+            return
+        self._memory[key] = (created_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config.max_entries:
+            self._memory.popitem(last=False)
+
+    # ── disk ──────────────────────────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.config.path, timeout=5)
+        if not self._schema_ready:
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_accessed ON response_cache (accessed_at)")
+            self._schema_ready = True
+        return conn
+
+    def _disk_get(self, key: str, now: float) -> tuple[float, LLMResult] | None:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT provider, model, text, input_tokens, output_tokens, created_at "
+                "FROM response_cache WHERE key = ? AND created_at >= ?",
+                (key, now - self.config.ttl_sec),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        finally:
+            conn.close()
+        provider, model, text, input_tokens, output_tokens, created_at = row
+        return created_at, LLMResult(
+            text=text, provider=provider, model=model,
+            input_tokens=input_tokens, output_tokens=output_tokens,
+        )
+
+    def _disk_put(self, key: str, result: LLMResult, now: float) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, result.provider, result.model, result.text,
+                 result.input_tokens, result.output_tokens, now, now),
+            )
+            # 만료 항목을 지우고, 개수 제한을 넘으면 가장 오래 안 쓰인 것부터 지운다.
+            conn.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.config.ttl_sec,))
+            conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                " SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.config.max_disk_entries,),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ── public ────────────────────────────────────────────────────────────
+
+    async def get(self, key: str) -> LLMResult | None:
+        if not self.enabled:
+            return None
+        now = time.time()
+        result = self._memory_get(key, now)
+        if result is not None or not self.config.path:
+            return result
+        hit = await run_in_db_thread(self._disk_get, key, now)
+        if hit is None:
+            return None
+        created_at, result = hit
+        self._memory_put(key, result, created_at)
+        return result
+
+    async def put(self, key: str, result: LLMResult) -> None:
+        if not self.enabled or not result.text.strip():
+            return
+        now = time.time()
+        self._memory_put(key, result, now)
+        if self.config.path:
+            await run_in_db_thread(self._disk_put, key, result, now)
+
+
+response_cache = ResponseCache()
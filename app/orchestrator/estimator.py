@@ -0,0 +1,92 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from .pricing import cost_usd
+
+# BPE tokenizer(cl100k/o200k 계열)를 흉내 내는 오프라인 근사치.
+# 영문 단어는 5자당 1토큰, 숫자는 3자리씩, 한글/CJK는 글자당 1토큰, 나머지 기호는 1토큰으로 센다.
+_TOKEN_PIECE = re.compile(
+    r"[A-Za-z]+"
+    r"|\d{1,3}"
+    r"|[가-힣぀-ヿ㐀-䶿一-鿿]"
+    r"|[^\sA-Za-z\d가-힣぀-ヿ㐀-䶿一-鿿]+"
+)
+# 호출마다 붙는 role/메시지 구분 토큰
+MESSAGE_OVERHEAD_TOKENS = 8
+
+
+def count_tokens(text: str) -> int:
+    total = 0
+    for piece in _TOKEN_PIECE.findall(text or ""):
+        if piece[0].isascii() and piece[0].isalpha():
+            total += (len(piece) + 4) // 5
+        elif piece[0].isascii() and not piece[0].isdigit():
+            total += (len(piece) + 1) // 2  # 연속 기호는 보통 2자씩 묶인다.
+        else:
+            total += 1
+    return total
+
+
+@dataclass
+class CallEstimate:
+    name: str
+    model: str              # "provider:model"
+    input_tokens: int
+    output_tokens: int      # max_tokens 상한
+    cost_usd: float
+    optional: bool = False  # 조건부로만 실행되는 호출 (quality refine 등)
+
+
+@dataclass
+class RunEstimate:
+    calls: List[CallEstimate] = field(default_factory=list)
+
+    @property
+    def required_usd(self) -> float:
+        return round(sum(c.cost_usd for c in self.calls if not c.optional), 6)
+
+    @property
+    def total_usd(self) -> float:
+        return round(sum(c.cost_usd for c in self.calls), 6)
+
+    def get(self, name: str) -> CallEstimate | None:
+        return next((c for c in self.calls if c.name == name), None)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "required_usd": self.required_usd,
+            "total_usd": self.total_usd,
+            "calls": {
+                c.name: {
+                    "model": c.model,
+                    "input_tokens": c.input_tokens,
+                    "output_tokens": c.output_tokens,
+                    "cost_usd": c.cost_usd,
+                    **({"optional": True} if c.optional else {}),
+                }
+                for c in self.calls
+            },
+        }
+
+
+def estimate_call(
+    name: str,
+    provider: str,
+    model: str,
+    system: str,
+    user: str,
+    max_tokens: int,
+    extra_input_tokens: int = 0,
+    optional: bool = False,
+) -> CallEstimate:
+    """한 호출의 최대 비용. extra_input_tokens는 아직 모르는 앞 스테이지 출력 몫(상한)이다."""
+    input_tokens = count_tokens(system) + count_tokens(user) + extra_input_tokens + MESSAGE_OVERHEAD_TOKENS
+    return CallEstimate(
+        name=name,
+        model=f"{provider}:{model}",
+        input_tokens=input_tokens,
+        output_tokens=max_tokens,
+        cost_usd=cost_usd(provider, model, input_tokens, max_tokens),
+        optional=optional,
+    )
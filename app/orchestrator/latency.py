@@ -0,0 +1,32 @@
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyTracker:
+    """(provider, model)별 최근 성공 호출 지연시간(ms)을 보관하고 백분위를 계산한다."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[tuple[str, str], Deque[int]] = {}
+
+    def record(self, provider: str, model: str, latency_ms: int) -> None:
+        samples = self._samples.get((provider, model))
+        if samples is None:
+            samples = self._samples[(provider, model)] = deque(maxlen=self.window)
+        samples.append(int(latency_ms))
+
+    def percentile(self, provider: str, model: str, q: float) -> float | None:
+        """q(0~1) 백분위 지연시간. 표본이 min_samples보다 적으면 None."""
+        samples = self._samples.get((provider, model))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return float(ordered[idx])
+
+    def clear(self) -> None:
+        self._samples.clear()
+
+
+latency_tracker = LatencyTracker()
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from typing import Dict
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """1M 토큰당 USD. cached_input은 prompt cache에서 읽힌 input 토큰 단가 (None이면 provider 비율로 계산)."""
+    input: float
+    output: float
+    cached_input: float | None = None
+
+
+# 모델을 모를 때 쓰는 provider 기본 단가
+PRICE_PER_1M_TOKENS = {
+    "openai": (0.50, 1.50),
+    "anthropic": (0.80, 4.00),
+    "google": (0.35, 1.05),
+    "groq": (0.10, 0.30),
+    "mistral": (0.20, 0.60),
+}
+
+# prompt cache에서 읽힌 input 토큰에 적용하는 가격 비율 (input 단가 대비)
+CACHED_INPUT_PRICE_RATIO = {
+    "openai": 0.50,
+    "anthropic": 0.10,
+    "google": 0.25,
+    "groq": 0.50,
+    "mistral": 1.00,
+}
+
+# prompt cache에 새로 쓰인 input 토큰에 적용하는 가격 비율 (input 단가 대비). 없는 provider는 쓰기 할증이 없다.
+CACHE_WRITE_PRICE_RATIO = {
+    "anthropic": 1.25,
+}
+
+# "provider:model" 접두어별 단가. 날짜/버전 접미어가 붙은 id는 가장 긴 접두어로 찾는다.
+# vendor 가격표가 바뀌면 여기만 고친다.
+MODEL_PRICES: Dict[str, ModelPrice] = {
+    "openai:gpt-4o-mini": ModelPrice(0.15, 0.60, 0.075),
+    "openai:gpt-4o": ModelPrice(2.50, 10.00, 1.25),
+    "openai:gpt-4.1-nano": ModelPrice(0.10, 0.40, 0.025),
+    "openai:gpt-4.1-mini": ModelPrice(0.40, 1.60, 0.10),
+    "openai:gpt-4.1": ModelPrice(2.00, 8.00, 0.50),
+    "openai:o4-mini": ModelPrice(1.10, 4.40, 0.275),
+    "openai:o3-mini": ModelPrice(1.10, 4.40, 0.55),
+    "anthropic:claude-haiku-4-5": ModelPrice(1.00, 5.00, 0.10),
+    "anthropic:claude-3-5-haiku": ModelPrice(0.80, 4.00, 0.08),
+    "anthropic:claude-3-haiku": ModelPrice(0.25, 1.25, 0.03),
+    "anthropic:claude-sonnet-4": ModelPrice(3.00, 15.00, 0.30),
+    "anthropic:claude-3-7-sonnet": ModelPrice(3.00, 15.00, 0.30),
+    "anthropic:claude-3-5-sonnet": ModelPrice(3.00, 15.00, 0.30),
+    "google:gemini-2.0-flash": ModelPrice(0.10, 0.40, 0.025),
+    "google:gemini-2.5-flash": ModelPrice(0.30, 2.50, 0.075),
+    "google:gemini-2.5-pro": ModelPrice(1.25, 10.00, 0.31),
+    "google:gemini-1.5-flash": ModelPrice(0.075, 0.30, 0.01875),
+    "google:gemini-1.5-pro": ModelPrice(1.25, 5.00, 0.3125),
+    "groq:llama-3.1-8b-instant": ModelPrice(0.05, 0.08),
+    "groq:llama-3.3-70b-versatile": ModelPrice(0.59, 0.79),
+    "mistral:mistral-small": ModelPrice(0.10, 0.30),
+    "mistral:mistral-medium": ModelPrice(0.40, 2.00),
+    "mistral:mistral-large": ModelPrice(2.00, 6.00),
+    "mistral:open-mistral-nemo": ModelPrice(0.15, 0.15),
+}
+
+
+def price_for(provider: str, model: str) -> ModelPrice:
+    """(provider, model)의 단가. 등록된 가장 긴 접두어 → provider 기본값 → openai 기본값 순으로 찾는다."""
+    provider = provider or "openai"
+    full = f"{provider}:{model or ''}"
+    matches = [key for key in MODEL_PRICES if full.startswith(key)]
+    if matches:
+        price = MODEL_PRICES[max(matches, key=len)]
+    else:
+        in_price, out_price = PRICE_PER_1M_TOKENS.get(provider, PRICE_PER_1M_TOKENS["openai"])
+        price = ModelPrice(in_price, out_price)
+    if price.cached_input is None:
+        price = ModelPrice(price.input, price.output, price.input * CACHED_INPUT_PRICE_RATIO.get(provider, 1.0))
+    return price
+
+
+def cost_usd(
+    provider: str,
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    cached_input_tokens: int = 0,
+    cache_write_input_tokens: int = 0,
+) -> float:
+    price = price_for(provider, model)
+    cached = min(cached_input_tokens, input_tokens)
+    written = min(cache_write_input_tokens, input_tokens - cached)
+    write_price = price.input * CACHE_WRITE_PRICE_RATIO.get(provider or "openai", 1.0)
+    return round(
+        (
+            (input_tokens - cached - written) * price.input
+            + cached * price.cached_input
+            + written * write_price
+            + output_tokens * price.output
+        ) / 1_000_000,
+        6,
+    )
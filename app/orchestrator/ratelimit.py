@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+from .estimator import count_tokens
+
+
+@dataclass
+class RateLimitConfig:
+    rpm: int = 0                 # 분당 요청 수 (0 = 제한 없음)
+    tpm: int = 0                 # 분당 토큰 수 (0 = 제한 없음)
+    max_concurrency: int = 8
+    min_concurrency: int = 1
+    default_backoff_sec: float = 2.0  # 429에 retry-after가 없을 때 쉬는 시간
+
+
+class _Bucket:
+    """분당 capacity만큼 연속적으로 채워지는 token bucket."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+
+class ProviderLimiter:
+    """(provider, key) 하나의 요청 한도. rpm/tpm bucket + 429에 반응하는 AIMD 동시성 제한.
+
+    429를 받으면 동시성을 절반으로 줄이고 retry-after 동안 새 요청을 멈춘다. 성공할 때마다 조금씩 늘린다.
+    """
+
+    def __init__(self, config: RateLimitConfig, loop: asyncio.AbstractEventLoop | None = None):
+        self.config = config
+        self.loop = loop
+        self.limit = float(config.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.requests = _Bucket(config.rpm) if config.rpm > 0 else None
+        self.tokens = _Bucket(config.tpm) if config.tpm > 0 else None
+        self._waiters: list[asyncio.Future] = []
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        if self.in_flight >= max(1, int(self.limit)):
+            return math.inf
+        waits = [self.paused_until - now]
+        if self.requests:
+            waits.append(self.requests.wait_time(1, now))
+        if self.tokens:
+            waits.append(self.tokens.wait_time(tokens, now))
+        return max(waits)
+
+    def _wake_all(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for fut in waiters:
+            if not fut.done():
+                fut.set_result(None)
+
+    async def acquire(self, tokens: int) -> int:
+        """용량이 생길 때까지 기다린 뒤 슬롯을 잡는다. 기다린 시간(ms)을 반환한다."""
+        started = time.perf_counter()
+        while True:
+            now = time.monotonic()
+            wait = self._wait_time(tokens, now)
+            if wait <= 0:
+                break
+            # 슬롯 반납(release)이나 bucket/pause 대기 시간 경과 중 먼저 오는 쪽에 깨어나 다시 확인한다.
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append(fut)
+            try:
+                await asyncio.wait_for(fut, timeout=None if wait == math.inf else wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+        if self.requests:
+            self.requests.take(1, now)
+        if self.tokens:
+            self.tokens.take(tokens, now)
+        self.in_flight += 1
+        return int((time.perf_counter() - started) * 1000)
+
+    def try_acquire(self, tokens: int) -> bool:
+        """기다리지 않고 바로 슬롯을 잡을 수 있을 때만 잡는다. (hedge 요청용)"""
+        now = time.monotonic()
+        if self._wait_time(tokens, now) > 0:
+            return False
+        if self.requests:
+            self.requests.take(1, now)
+        if self.tokens:
+            self.tokens.take(tokens, now)
+        self.in_flight += 1
+        return True
+
+    def release(
+        self,
+        *,
+        estimated_tokens: int = 0,
+        used_tokens: int | None = None,
+        rate_limited: bool = False,
+        retry_after: float | None = None,
+        rate_limit: Dict | None = None,
+    ) -> None:
+        """슬롯을 반납하고 결과에 따라 동시성 한도를 조정한다. (취소 경로의 finally에서도 부를 수 있게 동기 함수)"""
+        now = time.monotonic()
+        self.in_flight = max(0, self.in_flight - 1)
+        if rate_limited:
+            self.limit = max(float(self.config.min_concurrency), self.limit / 2)
+            pause = retry_after if retry_after is not None else self.config.default_backoff_sec
+            self.paused_until = max(self.paused_until, now + pause)
+        elif used_tokens is not None:
+            self.limit = min(float(self.config.max_concurrency), self.limit + 1 / max(1.0, self.limit))
+            if self.tokens and used_tokens != estimated_tokens:
+                # 추정치와 실제 사용량의 차이를 bucket에 반영한다.
+                self.tokens.level -= used_tokens - estimated_tokens
+        info = rate_limit or {}
+        if info.get("remaining_requests") == 0 or info.get("remaining_tokens") == 0:
+            self.paused_until = max(self.paused_until, now + float(info.get("reset_sec") or 1.0))
+        self._wake_all()
+
+    def snapshot(self) -> Dict:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "paused_for_sec": round(max(0.0, self.paused_until - time.monotonic()), 2),
+        }
+
+
+def estimate_tokens(system: str, user: str, max_tokens: int) -> int:
+    """요청 전 tpm 예약용 토큰 수 (로컬 tokenizer 근사치 + 최대 출력)."""
+    return count_tokens(system) + count_tokens(user) + max_tokens
+
+
+class RateLimiterRegistry:
+    """(provider, API key)별 ProviderLimiter를 보관한다. 대기 future가 루프에 묶이므로 루프별로 따로 만든다."""
+
+    def __init__(self, config: RateLimitConfig | None = None):
+        self.config = config or RateLimitConfig()
+        self._limiters: Dict[tuple, ProviderLimiter] = {}
+
+    def configure(self, config: RateLimitConfig) -> None:
+        self.config = config
+        self._limiters.clear()
+
+    def get(self, provider: str, api_key: str) -> ProviderLimiter:
+        loop = asyncio.get_running_loop()
+        key = (id(loop), provider, hashlib.sha256(api_key.encode()).hexdigest()[:16])
+        limiter = self._limiters.get(key)
+        if limiter is None or limiter.loop is not loop:
+            self._prune()
+            limiter = ProviderLimiter(self.config, loop)
+            self._limiters[key] = limiter
+        return limiter
+
+    def _prune(self) -> None:
+        for key, limiter in list(self._limiters.items()):
+            if limiter.loop is None or limiter.loop.is_closed():
+                self._limiters.pop(key)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {
+            f"{provider}:{key_hash[:8]}": limiter.snapshot()
+            for (_, provider, key_hash), limiter in self._limiters.items()
+            if limiter.loop is not None and not limiter.loop.is_closed()
+        }
+
+
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,160 @@
+"""run_orchestrator 결과(usage/monitoring)를 /metrics용 counter/histogram으로 옮긴다.
+
+run 하나가 끝날 때 한 번 기록한다. 라벨은 provider/model/stage(스테이지 이름)로, 사용자 입력은 라벨에 넣지 않는다.
+"""
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from ..metrics import COST_BUCKETS, registry
+
+STAGE_LABELS = ("provider", "model", "stage")
+
+RUNS = registry.counter("runs_total", "Orchestrator runs by outcome.", ("outcome",))
+RUN_DURATION = registry.histogram("run_duration_seconds", "Wall-clock time of a whole orchestrator run.", ("outcome",))
+RUN_COST = registry.histogram("run_cost_usd", "Actual cost of a run in USD.", buckets=COST_BUCKETS)
+
+STAGE_CALLS = registry.counter("stage_calls_total", "Stage calls by final status.", STAGE_LABELS + ("status",))
+STAGE_LATENCY = registry.histogram("stage_latency_seconds", "Provider call latency per stage (retries included).", STAGE_LABELS)
+STAGE_TTFT = registry.histogram("stage_ttft_seconds", "Time to first streamed token per stage.", STAGE_LABELS)
+STAGE_RETRIES = registry.counter("stage_retries_total", "Retries spent inside stage calls.", STAGE_LABELS)
+STAGE_FAILOVERS = registry.counter("stage_failovers_total", "Fallback models tried after the primary failed.", STAGE_LABELS)
+STAGE_HEDGES = registry.counter("stage_hedges_total", "Hedged (duplicate) requests sent for slow calls.", STAGE_LABELS)
+STAGE_CACHE_HITS = registry.counter("stage_cache_hits_total", "Stage calls answered from the response cache.", STAGE_LABELS)
+STAGE_FAILURES = registry.counter("stage_failures_total", "Stage calls that failed after retries and fallbacks (including open circuits and deadlines).", STAGE_LABELS)
+STAGE_DEGRADED = registry.counter(
+    "stage_degraded_total", "Pipeline stages whose output was replaced or dropped (failed, circuit open, deadline, skipped, spend capped).",
+    STAGE_LABELS + ("reason",),
+)
+TOKENS = registry.counter("tokens_total", "Tokens billed per stage.", STAGE_LABELS + ("kind",))
+COST = registry.counter("cost_usd_total", "Actual cost in USD per stage.", STAGE_LABELS)
+NETWORK_PHASE = registry.histogram(
+    "provider_network_phase_seconds",
+    "Provider HTTP call time by phase (pool_wait, connect incl. DNS, tls, send, ttfb, download, parse).",
+    ("provider", "model", "phase"),
+)
+RESPONSE_BYTES = registry.counter("provider_response_bytes_total", "Provider HTTP response bytes received.", ("provider", "model"))
+NEW_CONNECTIONS = registry.counter(
+    "provider_new_connections_total", "Provider calls that had to open a new connection (no keep-alive reuse).",
+    ("provider", "model"),
+)
+
+BUDGET_TRIPS = registry.counter(
+    "budget_guard_trips_total",
+    "Budget interventions: runtime guard, spend cap, and preflight downgrade/trim/refuse actions.",
+    ("kind",),
+)
+REFINES = registry.counter("quality_refine_total", "Quality refine attempts by outcome (adopted/rejected/failed/skipped/cancelled).", ("outcome",))
+
+_FINAL_STAGES = ("synth", "quality_refine")
+_PHASES = ("pool_wait", "connect", "tls", "send", "ttfb", "download", "parse")
+# 호출이 끝내 응답을 얻지 못한 상태. 러너는 이 스테이지 자리에 degraded 안내 문구를 넣는다.
+_FAILED = ("failed", "circuit_open", "deadline_exceeded")
+_DEGRADED = _FAILED + ("skipped", "spend_capped")
+
+
+def _outcome(result: Dict[str, Any]) -> str:
+    if result.get("refused"):
+        return "refused"
+    if result.get("cancelled"):
+        return "cancelled"
+    if result.get("failed") or "monitoring" not in result:
+        # 키 없음, 첫 스테이지 실패 등 파이프라인이 시작되지 못했거나 Synth가 최종 답을 만들지 못한 경우
+        return "failed"
+    return "ok"
+
+
+def _configured_models(stages: List[Dict[str, Any]], synth_model: str) -> Dict[str, str]:
+    models = {s.get("name", ""): s.get("model", "") for s in stages or []}
+    models["synth"] = models["quality_refine"] = synth_model or ""
+    return models
+
+
+def record_run(
+    result: Dict[str, Any], duration_sec: float, stages: List[Dict[str, Any]] | None = None, synth_model: str = "",
+) -> None:
+    outcome = _outcome(result)
+    RUNS.inc(outcome=outcome)
+    RUN_DURATION.observe(duration_sec, outcome=outcome)
+    monitoring = result.get("monitoring")
+    if not monitoring:
+        return
+    RUN_COST.observe(float(monitoring.get("total_cost_usd", 0.0) or 0.0))
+
+    usage = result.get("usage") or {}
+    configured = _configured_models(stages or [], synth_model)
+    for name, metric in (monitoring.get("stage_metrics") or {}).items():
+        stage_usage = usage.get(name) or {}
+        provider, model = stage_usage.get("provider"), stage_usage.get("model")
+        if not provider:
+            # 건너뛴 스테이지는 usage가 없으므로 설정된 모델로 라벨을 단다.
+            provider, _, model = configured.get(name, "").partition(":")
+        labels = {"provider": provider or "unknown", "model": model or "unknown", "stage": name}
+        status = metric.get("status", "ok")
+
+        STAGE_CALLS.inc(status=status, **labels)
+        if status != "skipped":
+            STAGE_LATENCY.observe(float(metric.get("latency_ms", 0) or 0) / 1000, **labels)
+        if "ttft_ms" in metric:
+            STAGE_TTFT.observe(float(metric["ttft_ms"]) / 1000, **labels)
+        if metric.get("retries"):
+            STAGE_RETRIES.inc(float(metric["retries"]), **labels)
+        if metric.get("failovers"):
+            STAGE_FAILOVERS.inc(float(metric["failovers"]), **labels)
+        if metric.get("hedges"):
+            STAGE_HEDGES.inc(float(metric["hedges"]), **labels)
+        if metric.get("cached"):
+            STAGE_CACHE_HITS.inc(**labels)
+        if status in _FAILED:
+            STAGE_FAILURES.inc(**labels)
+        if status in _DEGRADED and name not in _FINAL_STAGES:
+            STAGE_DEGRADED.inc(reason=status, **labels)
+
+        for kind, field in (
+            ("input", "input_tokens"), ("output", "output_tokens"),
+            ("cached_input", "cached_input_tokens"), ("cache_write_input", "cache_write_input_tokens"),
+        ):
+            if stage_usage.get(field):
+                TOKENS.inc(float(stage_usage[field]), kind=kind, **labels)
+        if stage_usage.get("cost_usd"):
+            COST.inc(float(stage_usage["cost_usd"]), **labels)
+        network = metric.get("network")
+        if network:
+            _record_network(network, labels["provider"], labels["model"])
+
+    if monitoring.get("budget_guard_triggered"):
+        BUDGET_TRIPS.inc(kind="runtime_guard")
+    if monitoring.get("spend_cap_triggered"):
+        BUDGET_TRIPS.inc(kind="spend_cap")
+    for action in monitoring.get("budget_actions") or []:
+        BUDGET_TRIPS.inc(kind=action.get("action", "unknown"))
+    if result.get("refused") and not monitoring.get("spend_cap_triggered"):
+        BUDGET_TRIPS.inc(kind="refuse")
+    if "refine" in monitoring:
+        REFINES.inc(outcome=monitoring["refine"])
+
+
+def _record_network(network: Dict[str, Any], provider: str, model: str) -> None:
+    for phase in _PHASES:
+        if f"{phase}_ms" in network:
+            NETWORK_PHASE.observe(float(network[f"{phase}_ms"]) / 1000, provider=provider, model=model, phase=phase)
+    if network.get("response_bytes"):
+        RESPONSE_BYTES.inc(float(network["response_bytes"]), provider=provider, model=model)
+    if network.get("connection_reused") is False:
+        NEW_CONNECTIONS.inc(provider=provider, model=model)
+
+
+def observed(fn: Callable[..., Awaitable[Dict[str, Any]]]) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """run_orchestrator를 감싸 끝날 때마다 record_run을 호출한다. 예외로 끝난 run은 outcome="error"."""
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception:
+            RUNS.inc(outcome="error")
+            RUN_DURATION.observe(time.perf_counter() - started, outcome="error")
+            raise
+        record_run(result, time.perf_counter() - started, kwargs.get("stages"), kwargs.get("synth_model", ""))
+        return result
+    return wrapper
@@ -1,17 +1,29 @@
 import asyncio
+import inspect
+import math
 import re
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List
 
 from . import prompts
+from .breaker import breakers, is_vendor_failure
+from .cache import cache_key, response_cache
+from .estimator import RunEstimate, estimate_call
+from .latency import latency_tracker
+from .pricing import cost_usd, price_for
+from .ratelimit import estimate_tokens, rate_limiters
 from .router import rule_based_gate
+from .run_metrics import observed
+from ..ledger import SpendCapExceeded, spend_ledger
 from ..providers.anthropic_provider import AnthropicProvider
 from ..providers.base import LLMResult
+from ..providers.limits import RateLimitError
 from ..providers.google_provider import GoogleProvider
 from ..providers.groq_provider import GroqProvider
 from ..providers.mistral_provider import MistralProvider
 from ..providers.openai_provider import OpenAIProvider
+from ..tracing import KIND_CLIENT, current_span, tracer
 
 PROVIDERS = {
     "openai": OpenAIProvider(),
@@ -21,15 +33,6 @@ PROVIDERS = {
     "mistral": MistralProvider(),
 }
 
-PRICE_PER_1M_TOKENS = {
-    "openai": (0.50, 1.50),
-    "anthropic": (0.80, 4.00),
-    "google": (0.35, 1.05),
-    "groq": (0.10, 0.30),
-    "mistral": (0.20, 0.60),
-}
-
-
 @dataclass
 class Budget:
     max_usd: float = 0.10
@@ -45,6 +48,20 @@ class ExecutionConfig:
     enable_quality_matrix: bool = True
     quality_min_threshold: float = 3.0
     auto_refine_once: bool = True
+    scheduler: str = "dataflow"  # dataflow | levels
+    enable_response_cache: bool = True  # response_cache가 configure로 켜져 있을 때만 동작
+    enable_rate_limiter: bool = True    # (provider, key)별 rpm/tpm/동시성 제한 뒤에서 대기
+    enable_hedging: bool = False        # 느린 호출에 중복(hedge) 요청을 보내 먼저 온 응답을 사용
+    hedge_percentile: float = 0.95      # 이 백분위 지연시간을 넘기면 hedge
+    hedge_model: str = ""               # "provider:model" (비우면 같은 모델로 중복 요청)
+    enable_circuit_breaker: bool = True  # (provider, model) circuit이 open이면 바로 실패
+    run_deadline_sec: float = 0          # run 전체 마감 시간 (0 = 없음). 호출 timeout/재시도는 남은 시간 안에서만
+    synth_reserve_sec: float = 30        # 마감 전 Synth 몫으로 남겨두는 시간 (run_deadline_sec의 절반까지)
+    budget_policy: str = "estimate"      # off | estimate | refuse | trim | downgrade (실행 전 예상 비용이 max_usd를 넘을 때)
+
+
+# 예상 비용이 예산을 넘으면 실행 전에 개입하는 정책들
+_ENFORCING_POLICIES = ("refuse", "trim", "downgrade")
 
 
 def _split_model(full: str) -> tuple[str, str]:
@@ -54,6 +71,16 @@ def _split_model(full: str) -> tuple[str, str]:
     return "openai", full
 
 
+def _model_chain(primary: str, fallbacks: List[str] | None = None) -> List[str]:
+    """primary 뒤에 fallback 모델을 순서대로 붙인다 (중복 제거)."""
+    return list(dict.fromkeys([primary, *(f.strip() for f in fallbacks or [] if f.strip())]))
+
+
+def _remaining(deadline: float | None) -> float:
+    """deadline(time.monotonic 기준)까지 남은 초. deadline이 없으면 inf."""
+    return math.inf if deadline is None else deadline - time.monotonic()
+
+
 def _build_stage_user_prompt(
     question: str,
     thread_summary: str,
@@ -82,6 +109,15 @@ def _build_synth_user_prompt(question: str, stage_results: List[Dict[str, str]])
     return "\n".join(lines)
 
 
+def _build_refine_user_prompt(question: str, answer: str, quality: Any) -> str:
+    return (
+        f"Question:\n{question}\n\n"
+        f"Current answer:\n{answer}\n\n"
+        f"Quality scores:\n{quality}\n\n"
+        "Improve weak dimensions while keeping facts conservative and format clean."
+    )
+
+
 def _contains_any(text: str, keywords: list[str]) -> bool:
     t = text.lower()
     return any(k in t for k in keywords)
@@ -132,6 +168,26 @@ def _topology_levels(num_nodes: int, deps: Dict[int, List[int]]) -> List[List[in
     return levels
 
 
+def _critical_path(
+    stages: List[Dict[str, str]],
+    deps: Dict[int, List[int]],
+    timeline: Dict[int, tuple[int, int]],
+) -> tuple[List[str], int]:
+    """가장 늦게 끝난 스테이지에서 거꾸로, 가장 늦게 끝난 dep을 따라가며 경로를 만든다."""
+    if not timeline:
+        return [], 0
+    node = max(timeline, key=lambda i: (timeline[i][1], i))
+    path_ms = timeline[node][1]
+    path = [node]
+    while True:
+        finished_deps = [d for d in deps.get(node, []) if d in timeline]
+        if not finished_deps:
+            break
+        node = max(finished_deps, key=lambda i: (timeline[i][1], i))
+        path.append(node)
+    return [stages[i]["name"] for i in reversed(path)], path_ms
+
+
 def _quality_matrix(question: str, final_answer: str, stage_results: List[Dict[str, str]]) -> Dict[str, Any]:
     q_words = {w for w in question.lower().split() if len(w) >= 3}
     a_words = {w for w in final_answer.lower().split() if len(w) >= 3}
@@ -179,27 +235,252 @@ def _quality_matrix(question: str, final_answer: str, stage_results: List[Dict[s
     return scores
 
 
-def _payload(result: LLMResult, runtime: Dict[str, Any]) -> Dict[str, Any]:
+def _estimate_run(
+    *,
+    question: str,
+    thread_summary: str,
+    stages: List[Dict[str, Any]],
+    deps: Dict[int, List[int]],
+    synth_model: str,
+    budget: Budget,
+    simple: bool,
+    include_refine: bool,
+) -> RunEstimate:
+    """실행 전 비용 상한. 앞 스테이지 출력은 max_tokens를 다 채운다고 보고 다음 프롬프트 크기에 더한다."""
+    stage_out = budget.max_tokens_per_stage
+    calls = []
+    for idx, stage in enumerate(stages[:1] if simple else stages):
+        dep_names = [] if idx == 0 else [stages[d]["name"] for d in deps.get(idx, [])]
+        if idx == 0:
+            user = _build_stage_user_prompt(question, thread_summary, [])
+        else:
+            user = _build_stage_user_prompt(question, "", [{"name": n, "text": ""} for n in dep_names])
+        p, m = _split_model(stage["model"])
+        calls.append(estimate_call(
+            stage["name"], p, m, stage["system_prompt"], user, stage_out,
+            extra_input_tokens=len(dep_names) * stage_out,
+        ))
+    if not simple:
+        p, m = _split_model(synth_model)
+        synth_user = _build_synth_user_prompt(question, [{"name": s["name"], "text": ""} for s in stages])
+        calls.append(estimate_call(
+            "synth", p, m, prompts.SYNTH_SYSTEM, synth_user, budget.synth_max_tokens,
+            extra_input_tokens=len(stages) * stage_out,
+        ))
+        if include_refine:
+            calls.append(estimate_call(
+                "quality_refine", p, m, prompts.QUALITY_REFINE_SYSTEM,
+                _build_refine_user_prompt(question, "", ""), budget.synth_max_tokens,
+                extra_input_tokens=budget.synth_max_tokens + 60,  # Synth 답변 + 품질 점수
+                optional=True,
+            ))
+    return RunEstimate(calls)
+
+
+def _cheapest_model(chain: List[str], user_api_keys: Dict[str, str], input_tokens: int, output_tokens: int) -> str:
+    """chain 안에서 키가 있는 모델 중 이 호출을 가장 싸게 처리하는 모델. 없으면 chain[0]."""
+    def cost(full: str) -> float:
+        return cost_usd(*_split_model(full), input_tokens, output_tokens)
+
+    candidates = [m for m in chain if PROVIDERS.get(_split_model(m)[0]) and user_api_keys.get(_split_model(m)[0])]
+    best = min(candidates, key=cost, default=chain[0])
+    return best if cost(best) < cost(chain[0]) else chain[0]
+
+
+def _estimate_cost(result: LLMResult) -> float:
     if result.cost_usd and result.cost_usd > 0:
-        cost_usd = float(result.cost_usd)
+        return float(result.cost_usd)
+    return cost_usd(
+        result.provider, result.model, result.input_tokens, result.output_tokens, result.cached_input_tokens,
+        result.cache_write_input_tokens,
+    )
+
+
+def _input_cost(provider_name: str, input_tokens: int, model: str = "") -> float:
+    return round(input_tokens * price_for(provider_name, model).input / 1_000_000, 6)
+
+
+def _payload(result: LLMResult, runtime: Dict[str, Any]) -> Dict[str, Any]:
+    if runtime.get("cached"):
+        # 캐시 응답은 네트워크 호출이 없으므로 과금되지 않는다.
+        cost_usd = 0.0
     else:
-        in_price, out_price = PRICE_PER_1M_TOKENS.get(result.provider or "openai", (0.50, 1.50))
-        cost_usd = round(
-            ((result.input_tokens * in_price) + (result.output_tokens * out_price)) / 1_000_000,
-            6,
-        )
+        cost_usd = round(_estimate_cost(result) + float(runtime.get("hedge_extra_cost_usd", 0.0)), 6)
 
-    return {
+    payload = {
         "text": result.text,
         "provider": result.provider,
         "model": result.model,
         "input_tokens": result.input_tokens,
         "output_tokens": result.output_tokens,
+        "cached_input_tokens": result.cached_input_tokens,
+        "cache_write_input_tokens": result.cache_write_input_tokens,
         "cost_usd": cost_usd,
         "latency_ms": runtime.get("latency_ms", 0),
         "retries": runtime.get("retries", 0),
         "status": runtime.get("status", "ok"),
     }
+    if "ttft_ms" in runtime:
+        payload["ttft_ms"] = runtime["ttft_ms"]
+    if "queue_wait_ms" in runtime:
+        payload["queue_wait_ms"] = runtime["queue_wait_ms"]
+    if runtime.get("hedges"):
+        payload["hedges"] = runtime["hedges"]
+        payload["hedge_extra_cost_usd"] = runtime.get("hedge_extra_cost_usd", 0.0)
+    if runtime.get("cached"):
+        payload["cached"] = True
+    elif result.network:
+        payload["network"] = result.network
+    if "served_by" in runtime:
+        payload["served_by"] = runtime["served_by"]
+    if runtime.get("failovers"):
+        payload["failovers"] = runtime["failovers"]
+    if runtime.get("recorded"):
+        payload["recorded"] = True  # spend ledger가 이미 UsageEvent로 기록했다.
+    return payload
+
+
+def _accumulate_usage(monitoring: Dict[str, Any], stage_usage: Dict[str, Any]) -> None:
+    monitoring["total_latency_ms"] += int(stage_usage.get("latency_ms", 0) or 0)
+    monitoring["total_input_tokens"] += int(stage_usage.get("input_tokens", 0) or 0)
+    monitoring["total_output_tokens"] += int(stage_usage.get("output_tokens", 0) or 0)
+    monitoring["total_cached_input_tokens"] += int(stage_usage.get("cached_input_tokens", 0) or 0)
+    monitoring["total_cost_usd"] = round(
+        float(monitoring["total_cost_usd"]) + float(stage_usage.get("cost_usd", 0.0) or 0.0), 6
+    )
+    total_in = monitoring["total_input_tokens"]
+    monitoring["cache_hit_ratio"] = round(monitoring["total_cached_input_tokens"] / total_in, 3) if total_in else 0.0
+
+
+def _stage_metric(src: Dict[str, Any]) -> Dict[str, Any]:
+    metric = {
+        "latency_ms": src.get("latency_ms", 0),
+        "retries": src.get("retries", 0),
+        "status": src.get("status", "ok"),
+    }
+    if "ttft_ms" in src:
+        metric["ttft_ms"] = src["ttft_ms"]
+    if "queue_wait_ms" in src:
+        metric["queue_wait_ms"] = src["queue_wait_ms"]
+    if src.get("hedges"):
+        metric["hedges"] = src["hedges"]
+    if src.get("cached"):
+        metric["cached"] = True
+    if src.get("network"):
+        metric["network"] = src["network"]
+    if "served_by" in src:
+        metric["served_by"] = src["served_by"]
+    if src.get("failovers"):
+        metric["failovers"] = src["failovers"]
+    if "estimated_cost_usd" in src:
+        metric["cost_usd"] = src.get("cost_usd", 0.0)
+        metric["estimated_cost_usd"] = src["estimated_cost_usd"]
+    return metric
+
+
+StageEventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _supports_streaming(provider: Any) -> bool:
+    return inspect.isasyncgenfunction(getattr(provider, "generate_stream", None))
+
+
+async def _stream_generate(
+    provider: Any,
+    on_event: StageEventCallback,
+    started: float,
+    runtime: Dict[str, Any],
+    **kwargs: Any,
+) -> LLMResult:
+    result: LLMResult | None = None
+    async for ev in provider.generate_stream(**kwargs):
+        if ev.delta:
+            if "ttft_ms" not in runtime:
+                runtime["ttft_ms"] = int((time.perf_counter() - started) * 1000)
+            await on_event({"type": "token", "text": ev.delta})
+        if ev.result is not None:
+            result = ev.result
+    if result is None:
+        raise RuntimeError("stream ended without a final result")
+    return result
+
+
+def _provider_name(provider: Any) -> str:
+    return str(getattr(provider, "provider_name", type(provider).__name__))
+
+
+async def _hedged_generate(
+    primary: Awaitable[LLMResult],
+    *,
+    primary_provider: str,
+    delay_sec: float,
+    target: tuple[Any, str, str],
+    kwargs: Dict[str, Any],
+    cfg: ExecutionConfig,
+    runtime: Dict[str, Any],
+    on_event: StageEventCallback | None,
+) -> LLMResult:
+    """primary가 delay_sec 안에 끝나지 않으면 target(provider, key, model)으로 요청을 하나 더 보낸다.
+
+    먼저 성공한 응답을 쓰고 나머지는 취소한다. 진 요청의 비용은 runtime["hedge_extra_cost_usd"]에 남긴다.
+    """
+    primary_task = asyncio.ensure_future(primary)
+    hedge_task: asyncio.Future | None = None
+    limiter = None
+    estimated = estimate_tokens(kwargs["system"], kwargs["user"], kwargs["max_tokens"])
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay_sec)
+        # 이미 끝났거나, 스트리밍이 토큰을 내보내기 시작했으면 살아 있는 호출이므로 hedge하지 않는다.
+        if done or "ttft_ms" in runtime:
+            return await primary_task
+
+        h_provider, h_key, h_model = target
+        h_name = _provider_name(h_provider)
+        if cfg.enable_circuit_breaker and breakers.get(h_name, h_model).is_open():
+            return await primary_task
+        if cfg.enable_rate_limiter:
+            limiter = rate_limiters.get(h_name, h_key)
+            if not limiter.try_acquire(estimated):
+                limiter = None
+                return await primary_task
+        hedge_task = asyncio.ensure_future(h_provider.generate(**{**kwargs, "api_key": h_key, "model": h_model}))
+        runtime["hedges"] = 1
+
+        winner = None
+        pending = {primary_task, hedge_task}
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((t for t in (primary_task, hedge_task) if t in done and t.exception() is None), None)
+        if winner is None:
+            return await primary_task  # 둘 다 실패하면 primary의 오류를 올린다.
+
+        loser, loser_provider = (hedge_task, h_name) if winner is primary_task else (primary_task, primary_provider)
+        if loser.done() and not loser.cancelled() and loser.exception() is None:
+            runtime["hedge_extra_cost_usd"] = _estimate_cost(loser.result())
+        else:
+            # 취소된 요청도 입력 토큰은 과금될 수 있으므로 추정 입력 비용을 남긴다.
+            loser_model = h_model if loser is hedge_task else kwargs["model"]
+            runtime["hedge_extra_cost_usd"] = _input_cost(loser_provider, estimated - kwargs["max_tokens"], loser_model)
+        result = winner.result()
+        if winner is hedge_task:
+            runtime["hedge_won"] = True
+            if on_event is not None:
+                await on_event({"type": "retry", "attempt": 0, "error": "hedge won"})
+                await on_event({"type": "token", "text": result.text})
+        return result
+    finally:
+        for task in (primary_task, hedge_task):
+            if task is not None and not task.done():
+                task.cancel()
+        if limiter is not None:
+            hedge_ok = hedge_task is not None and hedge_task.done() and not hedge_task.cancelled() \
+                and hedge_task.exception() is None
+            if hedge_ok:
+                used = hedge_task.result()
+                limiter.release(estimated_tokens=estimated, used_tokens=used.input_tokens + used.output_tokens,
+                                rate_limit=used.rate_limit)
+            else:
+                limiter.release()
 
 
 async def _call_with_resilience(
@@ -211,55 +492,306 @@ async def _call_with_resilience(
     user: str,
     max_tokens: int,
     cfg: ExecutionConfig,
+    on_event: StageEventCallback | None = None,
+    hedge_target: tuple[Any, str, str] | None = None,
+    deadline: float | None = None,
 ) -> tuple[LLMResult | None, Dict[str, Any]]:
+    """hedge_target은 hedge 요청을 보낼 (provider, api_key, model). 없으면 같은 호출을 한 번 더 보낸다.
+
+    deadline(time.monotonic 기준)이 주어지면 각 시도의 timeout은 min(stage_timeout_sec, 남은 시간)이고,
+    남은 시간 안에 backoff 후 다시 시도할 수 없으면 재시도하지 않는다.
+    """
+    provider_name = _provider_name(provider)
+    key = ""
+    if cfg.enable_response_cache and response_cache.enabled:
+        key = cache_key(provider_name, model, system, user, max_tokens)
+        cached = await response_cache.get(key)
+        if cached is not None:
+            current_span().add_event("cache.hit", provider=provider_name, model=model)
+            if on_event is not None:
+                await on_event({"type": "token", "text": cached.text})
+            return cached, {"latency_ms": 0, "retries": 0, "status": "ok", "cached": True}
+
     attempts = cfg.retries_per_stage + 1
     last_error = ""
     total_latency_ms = 0
+    stream = on_event is not None and _supports_streaming(provider)
+    limiter = rate_limiters.get(provider_name, api_key) if cfg.enable_rate_limiter else None
+    estimated = estimate_tokens(system, user, max_tokens)
+    breaker = breakers.get(provider_name, model) if cfg.enable_circuit_breaker else None
+    queue_wait_ms = 0
+    hedges = 0
+    hedge_extra_cost = 0.0
+    attempts_made = 0
+    circuit_open = False
+    deadline_hit = False
 
     for attempt in range(attempts):
+        if _remaining(deadline) <= 0:
+            deadline_hit = True
+            break
+        if breaker is not None and not breaker.allow():
+            # vendor 장애 중: 재시도/backoff/timeout을 기다리지 않고 바로 실패한다.
+            circuit_open = True
+            last_error = f"CircuitOpenError: {provider_name}:{model} circuit is open"
+            break
+        attempts_made += 1
+        if limiter is not None:
+            # 용량을 기다리는 시간은 stage_timeout_sec에 포함하지 않는다. (run deadline에는 포함)
+            try:
+                with tracer.span("ratelimit.wait", provider=provider_name):
+                    queue_wait_ms += await asyncio.wait_for(
+                        limiter.acquire(estimated), timeout=None if deadline is None else _remaining(deadline)
+                    )
+            except asyncio.TimeoutError:
+                if breaker is not None:
+                    breaker.release()
+                deadline_hit = True
+                break
+            except BaseException:
+                # 취소 등으로 대기가 끊겨도 half-open probe 슬롯은 돌려줘야 circuit이 half_open에 갇히지 않는다.
+                if breaker is not None:
+                    breaker.release()
+                raise
         started = time.perf_counter()
+        timeout = min(cfg.stage_timeout_sec, _remaining(deadline))
+        attempt_rt: Dict[str, Any] = {}
+        released = False
+        breaker_recorded = False
+        span = tracer.start_span(
+            "llm.call", kind=KIND_CLIENT, timing="provider",
+            **{"gen_ai.system": provider_name, "gen_ai.request.model": model, "llm.attempt": attempt + 1, "llm.stream": stream},
+        )
         try:
-            result = await asyncio.wait_for(
-                provider.generate(
-                    api_key=api_key,
-                    model=model,
-                    system=system,
-                    user=user,
-                    max_tokens=max_tokens,
-                ),
-                timeout=cfg.stage_timeout_sec,
-            )
+            kwargs = dict(api_key=api_key, model=model, system=system, user=user, max_tokens=max_tokens)
+            if stream:
+                call = _stream_generate(provider, on_event, started, attempt_rt, **kwargs)
+            else:
+                call = provider.generate(**kwargs)
+            p = latency_tracker.percentile(provider_name, model, cfg.hedge_percentile) if cfg.enable_hedging else None
+            if p is not None:
+                call = _hedged_generate(
+                    call,
+                    primary_provider=provider_name,
+                    delay_sec=p / 1000,
+                    target=hedge_target or (provider, api_key, model),
+                    kwargs=kwargs,
+                    cfg=cfg,
+                    runtime=attempt_rt,
+                    on_event=on_event if stream else None,
+                )
+            try:
+                result = await asyncio.wait_for(call, timeout=timeout)
+            finally:
+                hedges += attempt_rt.get("hedges", 0)
+                hedge_extra_cost += attempt_rt.get("hedge_extra_cost_usd", 0.0)
+            if limiter is not None:
+                released = True
+                limiter.release(
+                    estimated_tokens=estimated,
+                    used_tokens=result.input_tokens + result.output_tokens,
+                    rate_limit=result.rate_limit,
+                )
+            if breaker is not None:
+                breaker_recorded = True
+                breaker.record_success()
             elapsed = int((time.perf_counter() - started) * 1000)
             total_latency_ms += elapsed
-            return result, {"latency_ms": total_latency_ms, "retries": attempt, "status": "ok"}
+            span.set_attributes(**{
+                "gen_ai.usage.input_tokens": result.input_tokens,
+                "gen_ai.usage.output_tokens": result.output_tokens,
+                "llm.ttft_ms": attempt_rt.get("ttft_ms"),
+                "llm.hedges": attempt_rt.get("hedges"),
+                **{f"llm.network.{k}": v for k, v in result.network.items()},
+            })
+            span.end()
+            if not attempt_rt.get("hedge_won"):
+                latency_tracker.record(provider_name, model, elapsed)
+            rt = {"latency_ms": total_latency_ms, "retries": attempt, "status": "ok"}
+            if "ttft_ms" in attempt_rt:
+                rt["ttft_ms"] = attempt_rt["ttft_ms"]
+            if limiter is not None:
+                rt["queue_wait_ms"] = queue_wait_ms
+            if hedges:
+                rt["hedges"] = hedges
+                rt["hedge_extra_cost_usd"] = round(hedge_extra_cost, 6)
+            if key:
+                await response_cache.put(key, result)
+            return result, rt
         except Exception as e:
+            rate_limited = isinstance(e, RateLimitError)
+            if limiter is not None:
+                released = True
+                limiter.release(
+                    rate_limited=rate_limited,
+                    retry_after=e.retry_after if rate_limited else None,
+                    rate_limit=e.rate_limit if rate_limited else None,
+                )
             elapsed = int((time.perf_counter() - started) * 1000)
             total_latency_ms += elapsed
             last_error = f"{type(e).__name__}: {e}"
+            span.end(e)
+            if isinstance(e, asyncio.TimeoutError) and timeout < cfg.stage_timeout_sec:
+                # run deadline 때문에 줄어든 timeout이므로 vendor 장애로 세지 않는다.
+                deadline_hit = True
+                last_error = f"DeadlineExceeded: no response within the remaining {timeout:.1f}s"
+                break
+            if breaker is not None and is_vendor_failure(e):
+                breaker_recorded = True
+                breaker.record_failure(last_error)
             if attempt < attempts - 1:
-                await asyncio.sleep(min(0.8 * (2 ** attempt), 3.0))
+                if breaker is not None and breaker.is_open():
+                    delay = 0.0  # 다음 시도는 circuit에서 바로 실패하므로 backoff하지 않는다.
+                elif rate_limited and limiter is not None:
+                    delay = 0.0  # limiter가 retry-after 동안 다음 acquire를 대기시킨다.
+                elif rate_limited and e.retry_after is not None:
+                    delay = e.retry_after
+                else:
+                    delay = min(0.8 * (2 ** attempt), 3.0)
+                if delay >= _remaining(deadline):
+                    deadline_hit = True  # backoff 후에는 마감이 지나므로 재시도하지 않는다.
+                    break
+                if stream:
+                    # 부분 출력이 이미 나갔을 수 있으므로 클라이언트가 스테이지 텍스트를 비우도록 알린다.
+                    await on_event({"type": "retry", "attempt": attempt + 1, "error": last_error})
+                if delay:
+                    with tracer.span("retry.backoff", timing="backoff", delay_sec=delay):
+                        await asyncio.sleep(delay)
+        finally:
+            span.end()
+            if limiter is not None and not released:
+                limiter.release()
+            if breaker is not None and not breaker_recorded:
+                breaker.release()
 
-    return None, {
+    if circuit_open and attempts_made == 0:
+        status = "circuit_open"
+    elif deadline_hit:
+        status = "deadline_exceeded"
+        last_error = last_error or "DeadlineExceeded: run deadline reached"
+    else:
+        status = "failed"
+    failed = {
         "latency_ms": total_latency_ms,
-        "retries": max(0, attempts - 1),
-        "status": "failed",
+        "retries": max(0, attempts_made - 1),
+        "status": status,
         "error": last_error,
     }
+    if limiter is not None:
+        failed["queue_wait_ms"] = queue_wait_ms
+    return None, failed
+
+
+async def _call_with_failover(
+    *,
+    chain: List[str],
+    user_api_keys: Dict[str, str],
+    default_provider: Any,
+    default_key: str,
+    system: str,
+    user: str,
+    max_tokens: int,
+    cfg: ExecutionConfig,
+    on_event: StageEventCallback | None = None,
+    hedge_target: tuple[Any, str, str] | None = None,
+    deadline: float | None = None,
+    on_model: Callable[[str], None] | None = None,
+) -> tuple[LLMResult | None, Dict[str, Any]]:
+    """chain의 "provider:model"을 순서대로 시도한다. 실패하거나 circuit이 open이면 다음 모델로 넘어간다.
+
+    첫 모델은 키가 없으면 기존처럼 default provider/key로 부르고, fallback은 키가 등록된 provider만 쓴다.
+    성공하면 rt["served_by"]에 실제로 응답한 모델을 남긴다. on_model은 각 모델을 부르기 직전에 불린다.
+    """
+    total_latency_ms = 0
+    failovers = 0
+    errors: List[str] = []
+    rt: Dict[str, Any] = {"status": "failed", "error": "no usable model"}
+    for idx, full in enumerate(chain):
+        if idx > 0 and (rt.get("status") == "deadline_exceeded" or _remaining(deadline) <= 0):
+            break
+        provider_name, model_id = _split_model(full)
+        if idx == 0:
+            provider = PROVIDERS.get(provider_name, default_provider)
+            key = user_api_keys.get(provider_name) or default_key
+        else:
+            provider = PROVIDERS.get(provider_name)
+            key = user_api_keys.get(provider_name, "")
+            if not provider or not key:
+                continue
+            failovers += 1
+            if on_event is not None:
+                # 앞 모델의 부분 출력을 지우도록 retry로 알린다.
+                await on_event({"type": "retry", "attempt": 0, "error": f"failover → {full}"})
+        if on_model is not None:
+            on_model(full)
+        result, rt = await _call_with_resilience(
+            provider=provider,
+            api_key=key,
+            model=model_id,
+            system=system,
+            user=user,
+            max_tokens=max_tokens,
+            cfg=cfg,
+            on_event=on_event,
+            hedge_target=hedge_target,
+            deadline=deadline,
+        )
+        total_latency_ms += int(rt.get("latency_ms", 0) or 0)
+        rt = {**rt, "latency_ms": total_latency_ms}
+        if failovers:
+            rt["failovers"] = failovers
+        if result is not None:
+            rt["served_by"] = full
+            return result, rt
+        errors.append(f"{full}: {rt.get('error', 'unknown error')}")
+    if failovers:
+        rt["error"] = " | ".join(errors)
+    return None, rt
 
 
+@tracer.traced("orchestrator.run")
+@observed
 async def run_orchestrator(
     *,
     question: str,
     thread_summary: str,
     user_api_keys: Dict[str, str],
-    stages: List[Dict[str, str]],  # [{"name": str, "system_prompt": str, "model": str}]
+    stages: List[Dict[str, Any]],  # [{"name": str, "system_prompt": str, "model": str, "fallback_models": [str]}]
     synth_model: str,
     budget: Budget,
+    synth_fallbacks: List[str] | None = None,
     use_llm_gate: bool = False,
     gate_model: str = "openai:gpt-4o-mini",
     execution_config: ExecutionConfig | None = None,
+    on_event: StageEventCallback | None = None,
+    cancel_event: asyncio.Event | None = None,
+    user_id: int | None = None,
 ) -> Dict[str, Any]:
+    """on_event가 주어지면 스테이지 진행/토큰 이벤트를 스트리밍으로 내보낸다.
+
+    각 스테이지의 fallback_models와 synth_fallbacks는 앞 모델이 실패하거나 circuit이 open일 때 순서대로 시도한다.
+    cfg.run_deadline_sec가 있으면 스테이지는 Synth 몫을 남긴 시점까지만 실행하고, 그 안에 끝낼 수 없는 스테이지는 건너뛴다.
+    cancel_event가 set되면 진행 중인 provider 호출을 모두 취소하고, 그때까지의 usage를 담은 부분 결과를 반환한다.
+    user_id가 있고 spend ledger 한도가 설정돼 있으면 호출마다 예상 비용을 예약하고 실제 비용으로 정산한다.
+    """
     cfg = execution_config or ExecutionConfig()
+    ledger_user_id = user_id if user_id is not None and spend_ledger.enabled else None
+    run_deadline = stage_deadline = None
+    if cfg.run_deadline_sec > 0:
+        run_deadline = time.monotonic() + cfg.run_deadline_sec
+        stage_deadline = run_deadline - min(cfg.synth_reserve_sec, cfg.run_deadline_sec / 2)
+
+    async def _emit(event: Dict[str, Any]) -> None:
+        if on_event is not None:
+            await on_event(event)
+
+    def _stage_events(name: str) -> StageEventCallback | None:
+        if on_event is None:
+            return None
+
+        async def _emit_stage(event: Dict[str, Any]) -> None:
+            await on_event({**event, "stage": name})
+        return _emit_stage
 
     if not stages:
         return {"final": "파이프라인 스테이지가 없습니다. Settings에서 스테이지를 추가해주세요."}
@@ -279,6 +811,7 @@ async def run_orchestrator(
                 user=prompts.gate_user(thread_summary, question),
                 max_tokens=5,
                 cfg=cfg,
+                deadline=stage_deadline,
             )
             if gate_result:
                 gt = gate_result.text.upper()
@@ -289,12 +822,23 @@ async def run_orchestrator(
                     decision = "SIMPLE"
                     decision_reason = "llm gate => SIMPLE"
 
-    first_provider_name, first_model = _split_model(stages[0]["model"])
-    first_provider = PROVIDERS.get(first_provider_name)
-    first_key = user_api_keys.get(first_provider_name, "")
-    if not first_provider or not first_key:
+    chains = [_model_chain(s["model"], s.get("fallback_models")) for s in stages]
+    synth_chain = _model_chain(synth_model, synth_fallbacks)
+
+    # 첫 스테이지 chain에서 키가 있는 첫 provider를 다른 스테이지의 기본 provider/key로 쓴다.
+    first_provider, first_key = None, ""
+    for full in chains[0]:
+        p, _ = _split_model(full)
+        if PROVIDERS.get(p) and user_api_keys.get(p):
+            first_provider, first_key = PROVIDERS[p], user_api_keys[p]
+            break
+    if not first_provider:
+        first_provider_name, _ = _split_model(stages[0]["model"])
         return {"final": f"API Key가 없습니다: {first_provider_name}. Settings에서 등록해주세요."}
 
+    current_span().set_attributes(**{"orchestrator.decision": decision, "orchestrator.stages": len(stages)})
+    await _emit({"type": "decision", "decision": decision, "reason": decision_reason})
+
     stage_results_by_idx: Dict[int, Dict[str, str]] = {}
     usage: Dict[str, Any] = {}
     monitoring = {
@@ -304,34 +848,282 @@ async def run_orchestrator(
         "total_cost_usd": 0.0,
         "total_input_tokens": 0,
         "total_output_tokens": 0,
+        "total_cached_input_tokens": 0,
+        "cache_hit_ratio": 0.0,
         "stage_metrics": {},
         "budget_guard_triggered": False,
+        "skipped_stages": [],
     }
+    if run_deadline is not None:
+        monitoring["run_deadline_sec"] = cfg.run_deadline_sec
     total_cost = 0.0
 
-    deps = _infer_dependencies(stages) if cfg.enable_dynamic_graph else {i: [i - 1] for i in range(1, len(stages))}
-    deps[0] = []
+    def _record_circuits() -> None:
+        if not cfg.enable_circuit_breaker:
+            return
+        models = [m for chain in chains for m in chain] + synth_chain
+        monitoring["circuits"] = {
+            f"{p}:{m}": breakers.state(p, m) for p, m in (_split_model(full) for full in dict.fromkeys(models))
+        }
 
-    if decision == "SIMPLE" or len(stages) == 1:
-        first = stages[0]
-        first_result, rt = await _call_with_resilience(
-            provider=first_provider,
-            api_key=first_key,
-            model=first_model,
-            system=first["system_prompt"],
-            user=_build_stage_user_prompt(question, thread_summary, []),
-            max_tokens=budget.max_tokens_per_stage,
-            cfg=cfg,
+    def _settle(reservation, result: LLMResult | None, rt: Dict[str, Any]) -> None:
+        """spend ledger 예약을 실제 비용으로 정산한다."""
+        if reservation is None:
+            return
+        if result is not None:
+            spend_ledger.commit(
+                reservation, provider=result.provider, model=result.model, input_tokens=result.input_tokens,
+                output_tokens=result.output_tokens, cost_usd=_payload(result, rt)["cost_usd"],
+            )
+        else:
+            # 실패한 호출도 hedge로 쓴 비용은 남는다.
+            spend_ledger.commit(
+                reservation, provider="", model="", input_tokens=0, output_tokens=0,
+                cost_usd=float(rt.get("hedge_extra_cost_usd", 0.0)),
+            )
+        rt["recorded"] = True
+
+    def _record_cancelled(
+        name: str, full_model: str, system: str, user: str, streamed_chars: int, started: float, reservation=None,
+    ) -> None:
+        """취소된 호출도 입력(과 이미 스트리밍된 출력) 토큰은 과금될 수 있으므로 추정 사용량을 남긴다."""
+        nonlocal total_cost
+        p, m = _split_model(full_model)
+        estimated = LLMResult(
+            text="", provider=p, model=m,
+            input_tokens=estimate_tokens(system, user, 0), output_tokens=streamed_chars // 4,
         )
+        rt = {"latency_ms": int((time.perf_counter() - started) * 1000), "status": "cancelled"}
+        _settle(reservation, estimated, rt)
+        stage_usage = _payload(estimated, rt)
+        usage[name] = stage_usage
+        monitoring["stage_metrics"][name] = _stage_metric(stage_usage)
+        _accumulate_usage(monitoring, stage_usage)
+        total_cost += stage_usage["cost_usd"]
+
+    async def _call_tracked(
+        name: str, chain: List[str], system: str, user: str, max_tokens: int, deadline: float | None,
+    ) -> tuple[LLMResult | None, Dict[str, Any]]:
+        """_call_with_failover를 부르고, 도중에 취소되면 _record_cancelled로 추정 사용량을 남긴다.
+
+        spend ledger가 켜져 있으면 호출 전에 chain 첫 모델 기준 예상 비용을 예약하고, 끝나면 정산한다.
+        """
+        streamed_chars = 0
+        in_flight = chain[0]  # failover로 바뀌면 취소 시 실제로 호출 중이던 모델에 사용량을 남긴다.
+        stage_events = _stage_events(name)
+
+        async def count_streamed(event: Dict[str, Any]) -> None:
+            nonlocal streamed_chars
+            if event.get("type") == "token":
+                streamed_chars += len(event.get("text", ""))
+            await stage_events(event)
+
+        counting_events = count_streamed if stage_events is not None else None
+
+        def on_model(full: str) -> None:
+            nonlocal in_flight
+            in_flight = full
+
+        reservation = None
+        if ledger_user_id is not None:
+            p, m = _split_model(chain[0])
+            try:
+                reservation = spend_ledger.reserve(
+                    ledger_user_id, p, estimate_call(name, p, m, system, user, max_tokens).cost_usd,
+                )
+            except SpendCapExceeded as e:
+                monitoring["spend_cap_triggered"] = True
+                return None, {"status": "spend_capped", "error": f"SpendCapExceeded: {e}", "latency_ms": 0, "retries": 0}
+
+        started = time.perf_counter()
+        span = tracer.start_span(f"stage {name}", **{"stage.name": name, "stage.model": chain[0]})
+        try:
+            result, rt = await _call_with_failover(
+                chain=chain,
+                user_api_keys=user_api_keys,
+                default_provider=first_provider,
+                default_key=first_key,
+                system=system,
+                user=user,
+                max_tokens=max_tokens,
+                cfg=cfg,
+                on_event=counting_events,
+                hedge_target=hedge_target,
+                deadline=deadline,
+                on_model=on_model,
+            )
+        except asyncio.CancelledError:
+            span.end("cancelled")
+            _record_cancelled(name, in_flight, system, user, streamed_chars, started, reservation)
+            raise
+        except BaseException as e:
+            span.end(e)
+            if reservation is not None:
+                spend_ledger.release(reservation)
+            raise
+        span.set_attributes(**{
+            "stage.status": rt.get("status"), "stage.served_by": rt.get("served_by"), "stage.failovers": rt.get("failovers"),
+        })
+        span.end(rt.get("error") if result is None else None)
+        _settle(reservation, result, rt)
+        return result, rt
+
+    async def _until_cancelled(aw: Awaitable[Any]) -> tuple[bool, Any]:
+        """aw를 실행하다 cancel_event가 set되면 aw를 취소한다. (취소 여부, 결과)를 반환한다."""
+        task = asyncio.ensure_future(aw)
+        if cancel_event is None:
+            return False, await task
+        waiter = asyncio.ensure_future(cancel_event.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if task.cancelled():
+            return True, None
+        return False, task.result()
+
+    def _cancelled_result(stage_results: List[Dict[str, str]]) -> Dict[str, Any]:
+        monitoring["cancelled"] = True
+        _record_circuits()
+        return {
+            "final": "실행이 취소되었습니다.",
+            "decision": decision,
+            "stages": stage_results,
+            "usage": usage,
+            "monitoring": monitoring,
+            "cancelled": True,
+        }
+
+    hedge_target = None
+    if cfg.enable_hedging and cfg.hedge_model:
+        hp, hm = _split_model(cfg.hedge_model)
+        if PROVIDERS.get(hp) and user_api_keys.get(hp):
+            hedge_target = (PROVIDERS[hp], user_api_keys[hp], hm)
+
+    def _deps_for(stage_list: List[Dict[str, Any]]) -> Dict[int, List[int]]:
+        d = _infer_dependencies(stage_list) if cfg.enable_dynamic_graph else {i: [i - 1] for i in range(1, len(stage_list))}
+        d[0] = []
+        return d
+
+    # ── 실행 전 비용 추정 / 예산 admission ──────────────────────────────────
+    simple = decision == "SIMPLE" or len(stages) == 1
+    stages = list(stages)  # trim/downgrade가 호출자의 목록을 바꾸지 않도록 복사
+    estimate: RunEstimate | None = None
+
+    def _estimate() -> RunEstimate:
+        return _estimate_run(
+            question=question,
+            thread_summary=thread_summary,
+            stages=stages,
+            deps=_deps_for(stages),
+            synth_model=synth_chain[0],
+            budget=budget,
+            simple=simple,
+            include_refine=cfg.enable_quality_matrix and cfg.auto_refine_once,
+        )
+
+    def _over_budget() -> bool:
+        return budget.max_usd > 0 and estimate is not None and estimate.required_usd > budget.max_usd
+
+    if cfg.budget_policy != "off":
+        estimate = _estimate()
+        actions: List[Dict[str, str]] = []
+        if _over_budget() and cfg.budget_policy == "downgrade":
+            # 비싼 호출부터 chain 안에서 키가 있는 가장 싼 모델로 바꾼다.
+            n_stage_calls = 1 if simple else len(stages)
+            order = sorted(
+                (i for i, c in enumerate(estimate.calls) if not c.optional),
+                key=lambda i: -estimate.calls[i].cost_usd,
+            )
+            for i in order:
+                call = estimate.calls[i]
+                chain = chains[i] if i < n_stage_calls else synth_chain
+                cheapest = _cheapest_model(chain, user_api_keys, call.input_tokens, call.output_tokens)
+                if cheapest == chain[0]:
+                    continue
+                actions.append({"action": "downgrade", "stage": call.name, "from": chain[0], "to": cheapest})
+                if i < n_stage_calls:
+                    chains[i] = _model_chain(cheapest, chain)
+                    stages[i] = {**stages[i], "model": cheapest}
+                else:
+                    synth_chain = _model_chain(cheapest, chain)
+                    synth_model = cheapest
+                estimate = _estimate()
+                if not _over_budget():
+                    break
+        if _over_budget() and cfg.budget_policy in ("trim", "downgrade") and not simple:
+            # 뒤쪽 스테이지부터 뺀다. (deps는 앞 스테이지만 가리키므로 남은 그래프는 그대로 유효)
+            while _over_budget() and len(stages) > 1:
+                removed = stages.pop()
+                chains.pop()
+                actions.append({"action": "trim", "stage": removed["name"]})
+                estimate = _estimate()
+        monitoring["estimate"] = estimate.as_dict()
+        if actions:
+            monitoring["budget_actions"] = actions
+        if _over_budget() and cfg.budget_policy in _ENFORCING_POLICIES:
+            _record_circuits()
+            return {
+                "final": (
+                    f"예상 비용 ${estimate.required_usd}이 예산 ${budget.max_usd}을 넘어 실행하지 않았습니다. "
+                    "Settings에서 더 싼 모델이나 fallback을 지정해주세요."
+                ),
+                "decision": decision,
+                "stages": [],
+                "usage": {},
+                "monitoring": monitoring,
+                "refused": True,
+            }
+
+    if ledger_user_id is not None:
+        first_call = estimate.calls[0].cost_usd if estimate is not None else 0.0
+        try:
+            spend_ledger.check(ledger_user_id, _split_model(chains[0][0])[0], first_call)
+        except SpendCapExceeded as e:
+            monitoring["spend_cap_triggered"] = True
+            _record_circuits()
+            return {
+                "final": f"지출 한도에 도달해 실행하지 않았습니다. ({e})",
+                "decision": decision,
+                "stages": [],
+                "usage": {},
+                "monitoring": monitoring,
+                "refused": True,
+            }
+
+    def _with_estimate(name: str, stage_usage: Dict[str, Any]) -> Dict[str, Any]:
+        call = estimate.get(name) if estimate is not None else None
+        if call is not None:
+            stage_usage["estimated_cost_usd"] = call.cost_usd
+        return stage_usage
+
+    deps = _deps_for(stages)
+
+    if simple:
+        first = stages[0]
+        await _emit({"type": "stage_start", "stage": first["name"], "model": first["model"]})
+        cancelled, outcome = await _until_cancelled(_call_tracked(
+            first["name"],
+            chains[0],
+            first["system_prompt"],
+            _build_stage_user_prompt(question, thread_summary, []),
+            budget.max_tokens_per_stage,
+            run_deadline,  # Synth가 없으므로 run 전체 시간을 쓴다.
+        ))
+        if cancelled:
+            return _cancelled_result([])
+        first_result, rt = outcome
         if not first_result:
             return {"final": f"{first['name']} 실행 실패: {rt.get('error', 'unknown error')}"}
-        usage[first["name"]] = _payload(first_result, rt)
-        monitoring["total_cost_usd"] = usage[first["name"]].get("cost_usd", 0.0)
-        monitoring["total_input_tokens"] = usage[first["name"]].get("input_tokens", 0)
-        monitoring["total_output_tokens"] = usage[first["name"]].get("output_tokens", 0)
-        monitoring["stage_metrics"][first["name"]] = rt
-        monitoring["total_latency_ms"] = rt.get("latency_ms", 0)
+        await _emit({"type": "stage_done", "stage": first["name"], "text": first_result.text, **_stage_metric(rt)})
+        usage[first["name"]] = _with_estimate(first["name"], _payload(first_result, rt))
+        monitoring["stage_metrics"][first["name"]] = _stage_metric(usage[first["name"]])
+        _accumulate_usage(monitoring, usage[first["name"]])
         quality = _quality_matrix(question, first_result.text, [{"name": first["name"], "text": first_result.text}])
+        _record_circuits()
         return {
             "final": first_result.text,
             "decision": decision,
@@ -343,140 +1135,229 @@ async def run_orchestrator(
 
     levels = _topology_levels(len(stages), deps)
     monitoring["graph_levels"] = levels
+    monitoring["scheduler"] = cfg.scheduler
 
-    for level in levels:
-        async def _run_stage(stage_idx: int) -> tuple[int, Dict[str, str], Dict[str, Any]]:
-            stage = stages[stage_idx]
-            provider_name, model_id = _split_model(stage["model"])
-            provider = PROVIDERS.get(provider_name, first_provider)
-            key = user_api_keys.get(provider_name) or first_key
+    skipped: set[int] = set()
 
-            dep_results = [stage_results_by_idx[d] for d in deps.get(stage_idx, []) if d in stage_results_by_idx]
-            if stage_idx == 0:
-                prompt_user = _build_stage_user_prompt(question, thread_summary, [])
-            else:
-                prompt_user = _build_stage_user_prompt(question, "", dep_results)
+    def _cannot_finish(full_model: str, deadline: float | None) -> bool:
+        """남은 시간이 이 모델의 최근 중앙값 지연시간보다 짧으면 끝낼 수 없다고 본다."""
+        if deadline is None:
+            return False
+        p, m = _split_model(full_model)
+        expected_ms = latency_tracker.percentile(p, m, 0.5) or 0.0
+        return _remaining(deadline) <= expected_ms / 1000
 
-            result, rt = await _call_with_resilience(
-                provider=provider,
-                api_key=key,
-                model=model_id,
-                system=stage["system_prompt"],
-                user=prompt_user,
-                max_tokens=budget.max_tokens_per_stage,
-                cfg=cfg,
+    async def _run_stage(stage_idx: int) -> tuple[int, Dict[str, str], Dict[str, Any]]:
+        stage = stages[stage_idx]
+        provider_name, model_id = _split_model(stage["model"])
+        if stage_idx > 0 and _cannot_finish(stage["model"], stage_deadline):
+            # 첫 스테이지를 뺀 나머지는 마감에 맞출 수 없으면 건너뛰어 Synth 시간을 지킨다.
+            await _emit({"type": "stage_done", "stage": stage["name"], "text": "", "status": "skipped",
+                         "latency_ms": 0, "retries": 0})
+            return stage_idx, {"name": stage["name"], "text": ""}, {"status": "skipped", "latency_ms": 0, "retries": 0}
+        await _emit({"type": "stage_start", "stage": stage["name"], "model": stage["model"]})
+
+        dep_results = [
+            stage_results_by_idx[d] for d in deps.get(stage_idx, [])
+            if d in stage_results_by_idx and d not in skipped
+        ]
+        if stage_idx == 0:
+            prompt_user = _build_stage_user_prompt(question, thread_summary, [])
+        else:
+            prompt_user = _build_stage_user_prompt(question, "", dep_results)
+
+        result, rt = await _call_tracked(
+            stage["name"], chains[stage_idx], stage["system_prompt"], prompt_user,
+            budget.max_tokens_per_stage, stage_deadline,
+        )
+        if not result:
+            degraded_text = (
+                f"[{stage['name']} skipped due to transient failure]\n"
+                f"Reason: {rt.get('error', 'unknown error')}"
             )
-            if not result:
-                degraded_text = (
-                    f"[{stage['name']} skipped due to transient failure]\n"
-                    f"Reason: {rt.get('error', 'unknown error')}"
-                )
-                result = LLMResult(
-                    text=degraded_text,
-                    provider=provider_name,
-                    model=model_id,
-                    input_tokens=0,
-                    output_tokens=0,
-                    cost_usd=0.0,
-                )
-            return stage_idx, {"name": stage["name"], "text": result.text}, _payload(result, rt)
-
-        stage_outcomes = await asyncio.gather(*[_run_stage(i) for i in level])
-        for idx, stage_data, stage_usage in stage_outcomes:
-            stage_results_by_idx[idx] = stage_data
-            usage[stage_data["name"]] = stage_usage
-            monitoring["stage_metrics"][stage_data["name"]] = {
-                "latency_ms": stage_usage.get("latency_ms", 0),
-                "retries": stage_usage.get("retries", 0),
-                "status": stage_usage.get("status", "ok"),
-            }
-            monitoring["total_latency_ms"] += int(stage_usage.get("latency_ms", 0) or 0)
-            monitoring["total_input_tokens"] += int(stage_usage.get("input_tokens", 0) or 0)
-            monitoring["total_output_tokens"] += int(stage_usage.get("output_tokens", 0) or 0)
-            monitoring["total_cost_usd"] = round(
-                float(monitoring["total_cost_usd"]) + float(stage_usage.get("cost_usd", 0.0) or 0.0), 6
+            result = LLMResult(
+                text=degraded_text,
+                provider=provider_name,
+                model=model_id,
+                input_tokens=0,
+                output_tokens=0,
+                cost_usd=0.0,
             )
-            total_cost += float(stage_usage.get("cost_usd", 0.0) or 0.0)
+        await _emit({"type": "stage_done", "stage": stage["name"], "text": result.text, **_stage_metric(rt)})
+        return stage_idx, {"name": stage["name"], "text": result.text}, _payload(result, rt)
 
-        if budget.max_usd > 0 and total_cost >= budget.max_usd:
-            monitoring["budget_guard_triggered"] = True
-            break
+    def _record_stage(idx: int, stage_data: Dict[str, str], stage_usage: Dict[str, Any]) -> None:
+        nonlocal total_cost
+        stage_results_by_idx[idx] = stage_data
+        if stage_usage.get("status") == "skipped":
+            skipped.add(idx)
+            monitoring["skipped_stages"].append(stage_data["name"])
+            monitoring["stage_metrics"][stage_data["name"]] = _stage_metric(stage_usage)
+            return
+        usage[stage_data["name"]] = _with_estimate(stage_data["name"], stage_usage)
+        monitoring["stage_metrics"][stage_data["name"]] = _stage_metric(stage_usage)
+        _accumulate_usage(monitoring, stage_usage)
+        total_cost += float(stage_usage.get("cost_usd", 0.0) or 0.0)
 
-    ordered_stage_results = [stage_results_by_idx[i] for i in sorted(stage_results_by_idx.keys())]
-    synth_provider_name, synth_model_id = _split_model(synth_model)
-    synth_provider = PROVIDERS.get(synth_provider_name, first_provider)
-    synth_key = user_api_keys.get(synth_provider_name) or first_key
-
-    synth_result, synth_rt = await _call_with_resilience(
-        provider=synth_provider,
-        api_key=synth_key,
-        model=synth_model_id,
-        system=prompts.SYNTH_SYSTEM,
-        user=_build_synth_user_prompt(question, ordered_stage_results),
-        max_tokens=budget.synth_max_tokens,
-        cfg=cfg,
-    )
+    def _budget_exceeded() -> bool:
+        return budget.max_usd > 0 and total_cost >= budget.max_usd
+
+    pipeline_started = time.perf_counter()
+    timeline: Dict[int, tuple[int, int]] = {}
+
+    async def _timed_stage(stage_idx: int) -> tuple[int, Dict[str, str], Dict[str, Any]]:
+        started_ms = int((time.perf_counter() - pipeline_started) * 1000)
+        outcome = await _run_stage(stage_idx)
+        if outcome[2].get("status") != "skipped":
+            timeline[stage_idx] = (started_ms, int((time.perf_counter() - pipeline_started) * 1000))
+        return outcome
+
+    async def _cancel_tasks(tasks: List[asyncio.Future]) -> None:
+        # 취소된 스테이지는 _call_tracked에서 추정 사용량을 기록한다.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run_levels() -> None:
+        for level in levels:
+            pending = {asyncio.ensure_future(_timed_stage(i)) for i in level}
+            try:
+                while pending:
+                    finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for idx, stage_data, stage_usage in sorted((t.result() for t in finished), key=lambda o: o[0]):
+                        _record_stage(idx, stage_data, stage_usage)
+                    if _budget_exceeded():
+                        # 같은 레벨에서 아직 실행 중인 스테이지도 취소한다.
+                        monitoring["budget_guard_triggered"] = True
+                        return
+            finally:
+                await _cancel_tasks([t for t in pending if not t.done()])
+
+    async def _run_dataflow() -> None:
+        # Dataflow: 각 스테이지는 자기 deps가 모두 끝나는 즉시 시작한다 (레벨 단위 대기 없음).
+        running: Dict[asyncio.Task, int] = {}
+        launched: set[int] = set()
+
+        def _launch_ready() -> None:
+            for i in range(len(stages)):
+                if i not in launched and all(d in stage_results_by_idx for d in deps.get(i, [])):
+                    launched.add(i)
+                    running[asyncio.ensure_future(_timed_stage(i))] = i
+            if not running and len(launched) < len(stages):
+                # Cycle guard: fall back to deterministic order.
+                i = min(set(range(len(stages))) - launched)
+                launched.add(i)
+                running[asyncio.ensure_future(_timed_stage(i))] = i
+
+        try:
+            _launch_ready()
+            while running:
+                finished, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(finished, key=lambda t: running[t]):
+                    running.pop(task)
+                    _record_stage(*task.result())
+                if _budget_exceeded():
+                    # 새 스테이지는 시작하지 않고, 실행 중인 스테이지는 취소한다.
+                    monitoring["budget_guard_triggered"] = True
+                    return
+                _launch_ready()
+        finally:
+            await _cancel_tasks(list(running))
+
+    cancelled, _ = await _until_cancelled(_run_levels() if cfg.scheduler == "levels" else _run_dataflow())
+
+    monitoring["critical_path"], monitoring["critical_path_ms"] = _critical_path(stages, deps, timeline)
+
+    ordered_stage_results = [stage_results_by_idx[i] for i in sorted(stage_results_by_idx.keys()) if i not in skipped]
+    if cancelled:
+        return _cancelled_result(ordered_stage_results)
+    await _emit({"type": "stage_start", "stage": "synth", "model": synth_model})
+    cancelled, outcome = await _until_cancelled(_call_tracked(
+        "synth",
+        synth_chain,
+        prompts.SYNTH_SYSTEM,
+        _build_synth_user_prompt(question, ordered_stage_results),
+        budget.synth_max_tokens,
+        run_deadline,
+    ))
+    if cancelled:
+        return _cancelled_result(ordered_stage_results)
+    synth_result, synth_rt = outcome
     if not synth_result:
-        return {"final": f"Synth 실행 실패: {synth_rt.get('error', 'unknown error')}"}
+        monitoring["stage_metrics"]["synth"] = _stage_metric({**synth_rt, "status": synth_rt.get("status") or "failed"})
+        _record_circuits()
+        # 앞 스테이지에서 쓴 토큰은 저장되도록 usage를 함께 돌려준다.
+        return {
+            "final": f"Synth 실행 실패: {synth_rt.get('error', 'unknown error')}",
+            "stages": ordered_stage_results,
+            "usage": usage,
+            "monitoring": monitoring,
+            "failed": True,
+        }
+    await _emit({"type": "stage_done", "stage": "synth", "text": synth_result.text, **_stage_metric(synth_rt)})
 
-    usage["synth"] = _payload(synth_result, synth_rt)
-    monitoring["stage_metrics"]["synth"] = {
-        "latency_ms": synth_rt.get("latency_ms", 0),
-        "retries": synth_rt.get("retries", 0),
-        "status": synth_rt.get("status", "ok"),
-    }
-    monitoring["total_latency_ms"] += int(synth_rt.get("latency_ms", 0) or 0)
-    monitoring["total_input_tokens"] += int(usage["synth"].get("input_tokens", 0) or 0)
-    monitoring["total_output_tokens"] += int(usage["synth"].get("output_tokens", 0) or 0)
-    monitoring["total_cost_usd"] = round(
-        float(monitoring["total_cost_usd"]) + float(usage["synth"].get("cost_usd", 0.0) or 0.0), 6
-    )
+    usage["synth"] = _with_estimate("synth", _payload(synth_result, synth_rt))
+    monitoring["stage_metrics"]["synth"] = _stage_metric(usage["synth"])
+    _accumulate_usage(monitoring, usage["synth"])
 
     final_text = synth_result.text
     quality = _quality_matrix(question, final_text, ordered_stage_results)
     refined = False
 
-    if (
+    needs_refine = (
         cfg.enable_quality_matrix
         and cfg.auto_refine_once
         and min(quality["accuracy"], quality["completeness"], quality["consistency"], quality["format"]) < cfg.quality_min_threshold
-    ):
-        refine_user = (
-            f"Question:\n{question}\n\n"
-            f"Current answer:\n{final_text}\n\n"
-            f"Quality scores:\n{quality}\n\n"
-            "Improve weak dimensions while keeping facts conservative and format clean."
-        )
-        refined_result, refined_rt = await _call_with_resilience(
-            provider=synth_provider,
-            api_key=synth_key,
-            model=synth_model_id,
-            system=prompts.QUALITY_REFINE_SYSTEM,
-            user=refine_user,
-            max_tokens=budget.synth_max_tokens,
-            cfg=cfg,
-        )
+    )
+    refine_call = estimate.get("quality_refine") if estimate is not None else None
+    refine_over_budget = (
+        refine_call is not None
+        and cfg.budget_policy in _ENFORCING_POLICIES
+        and budget.max_usd > 0
+        and monitoring["total_cost_usd"] + refine_call.cost_usd > budget.max_usd
+    )
+    if needs_refine and (refine_over_budget or _cannot_finish(synth_chain[0], run_deadline)):
+        # refine은 선택 단계이므로 예산이나 남은 시간이 부족하면 건너뛴다.
+        needs_refine = False
+        monitoring["skipped_stages"].append("quality_refine")
+        monitoring["refine"] = "skipped"
+    if needs_refine:
+        refine_user = _build_refine_user_prompt(question, final_text, quality)
+        await _emit({"type": "stage_start", "stage": "quality_refine", "model": synth_model})
+        cancelled, outcome = await _until_cancelled(_call_tracked(
+            "quality_refine", synth_chain, prompts.QUALITY_REFINE_SYSTEM, refine_user,
+            budget.synth_max_tokens, run_deadline,
+        ))
+        if cancelled:
+            # Synth 답변은 이미 있으므로 취소돼도 그대로 돌려준다.
+            monitoring["cancelled"] = True
+            monitoring["refine"] = "cancelled"
+            refined_result, refined_rt = None, {"status": "cancelled"}
+        else:
+            refined_result, refined_rt = outcome
+        adopted = False
         if refined_result and refined_result.text.strip():
             candidate_quality = _quality_matrix(question, refined_result.text, ordered_stage_results)
-            if candidate_quality["overall"] >= quality["overall"]:
+            adopted = candidate_quality["overall"] >= quality["overall"]
+            if adopted:
                 final_text = refined_result.text
                 quality = candidate_quality
                 refined = True
-                usage["quality_refine"] = _payload(refined_result, refined_rt)
-                monitoring["stage_metrics"]["quality_refine"] = {
-                    "latency_ms": refined_rt.get("latency_ms", 0),
-                    "retries": refined_rt.get("retries", 0),
-                    "status": refined_rt.get("status", "ok"),
-                }
-                monitoring["total_latency_ms"] += int(refined_rt.get("latency_ms", 0) or 0)
-                monitoring["total_input_tokens"] += int(usage["quality_refine"].get("input_tokens", 0) or 0)
-                monitoring["total_output_tokens"] += int(usage["quality_refine"].get("output_tokens", 0) or 0)
-                monitoring["total_cost_usd"] = round(
-                    float(monitoring["total_cost_usd"]) + float(usage["quality_refine"].get("cost_usd", 0.0) or 0.0),
-                    6,
-                )
+                usage["quality_refine"] = _with_estimate("quality_refine", _payload(refined_result, refined_rt))
+                monitoring["stage_metrics"]["quality_refine"] = _stage_metric(usage["quality_refine"])
+                _accumulate_usage(monitoring, usage["quality_refine"])
+        if not cancelled:
+            monitoring["refine"] = "adopted" if adopted else ("rejected" if refined_result else "failed")
+        await _emit({
+            "type": "stage_done",
+            "stage": "quality_refine",
+            "text": refined_result.text if refined_result else "",
+            "adopted": adopted,
+            **_stage_metric(refined_rt),
+        })
 
     quality["refined"] = refined
+    _record_circuits()
 
     return {
         "final": final_text,
@@ -1,33 +1,80 @@
-import httpx
-from .base import LLMResult
+import time
+from typing import AsyncIterator
+
+from .base import LLMResult, StreamEvent
+from .limits import raise_for_status, rate_limit_info
+from .sse import iter_sse_json
+from ..http_client import get_client, network_timings
 
 class AnthropicProvider:
     provider_name = "anthropic"
+    base_url = "https://api.anthropic.com"
 
-    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
-        url = "https://api.anthropic.com/v1/messages"
+    def _request(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> tuple[str, dict, dict]:
+        url = f"{self.base_url}/v1/messages"
         headers = {
             "x-api-key": api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
         }
+        # cache breakpoint는 호출마다 같은 system 블록 끝에만 둔다. user 블록은 stage마다 달라 캐시에 써도
+        # 다시 읽히지 않고 쓰기 할증만 붙는다. 최소 길이에 못 미치는 prefix는 API가 캐시하지 않고 그냥 처리한다.
         payload = {
             "model": model,
             "max_tokens": max_tokens,
-            "system": system,
-            "messages": [{"role": "user", "content": user}],
+            "messages": [{"role": "user", "content": [{"type": "text", "text": user}]}],
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            r.raise_for_status()
-            data = r.json()
+        if system:
+            payload["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return url, headers, payload
+
+    @staticmethod
+    def _usage(usage: dict) -> tuple[int, int, int]:
+        """(전체 input 토큰, 캐시에서 읽은 토큰, 캐시에 쓴 토큰). Anthropic의 input_tokens는 캐시 토큰을 제외한 값이다."""
+        cache_read = int(usage.get("cache_read_input_tokens", 0) or 0)
+        cache_write = int(usage.get("cache_creation_input_tokens", 0) or 0)
+        return int(usage.get("input_tokens", 0) or 0) + cache_read + cache_write, cache_read, cache_write
+
+    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
+        url, headers, payload = self._request(api_key, model, system, user, max_tokens)
+        r = await get_client(self.provider_name).post(url, headers=headers, json=payload)
+        raise_for_status(r)
+        parse_started = time.perf_counter()
+        data = r.json()
+        parse_ms = (time.perf_counter() - parse_started) * 1000
 
         text = ""
         for c in data.get("content", []):
             if c.get("type") == "text":
                 text += c.get("text", "")
         usage = data.get("usage", {}) or {}
-        in_tok = int(usage.get("input_tokens", 0) or 0)
+        in_tok, cached_tok, written_tok = self._usage(usage)
         out_tok = int(usage.get("output_tokens", 0) or 0)
 
-        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="anthropic", model=model, cost_usd=0.0)
+        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="anthropic", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, cache_write_input_tokens=written_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r, parse_ms))
+
+    async def generate_stream(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> AsyncIterator[StreamEvent]:
+        url, headers, payload = self._request(api_key, model, system, user, max_tokens)
+        payload["stream"] = True
+        text = ""
+        in_tok = out_tok = cached_tok = written_tok = 0
+        async with get_client(self.provider_name).stream("POST", url, headers=headers, json=payload) as r:
+            raise_for_status(r)
+            async for event in iter_sse_json(r):
+                etype = event.get("type")
+                if etype == "message_start":
+                    usage = (event.get("message") or {}).get("usage") or {}
+                    in_tok, cached_tok, written_tok = self._usage(usage)
+                    out_tok = int(usage.get("output_tokens", 0) or 0)
+                elif etype == "content_block_delta":
+                    delta = event.get("delta") or {}
+                    if delta.get("type") == "text_delta" and delta.get("text"):
+                        text += delta["text"]
+                        yield StreamEvent(delta=delta["text"])
+                elif etype == "message_delta":
+                    usage = event.get("usage") or {}
+                    out_tok = int(usage.get("output_tokens", out_tok) or 0)
+                elif etype == "error":
+                    raise RuntimeError(f"anthropic stream error: {event.get('error')}")
+
+        yield StreamEvent(result=LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="anthropic", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, cache_write_input_tokens=written_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r)))
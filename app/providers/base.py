@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Protocol
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Protocol
 
 @dataclass
 class LLMResult:
@@ -9,7 +9,18 @@ class LLMResult:
     provider: str = ""
     model: str = ""
     cost_usd: float = 0.0
+    cached_input_tokens: int = 0  # input_tokens 중 provider prompt cache에서 읽힌 토큰
+    cache_write_input_tokens: int = 0  # input_tokens 중 prompt cache에 새로 쓰인 토큰 (쓰기 할증 대상)
+    rate_limit: dict = field(default_factory=dict)  # 응답 헤더의 남은 한도 (limits.rate_limit_info)
+    network: dict = field(default_factory=dict)  # 네트워크 단계별 시간과 응답 크기 (http_client.network_timings)
+
+@dataclass
+class StreamEvent:
+    """generate_stream()이 내보내는 조각. 마지막 이벤트만 result를 가진다."""
+    delta: str = ""
+    result: LLMResult | None = None
 
 class Provider(Protocol):
     provider_name: str
     async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult: ...
+    def generate_stream(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> AsyncIterator[StreamEvent]: ...
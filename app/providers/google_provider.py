@@ -1,22 +1,33 @@
-import httpx
-from .base import LLMResult
+import time
+from typing import AsyncIterator
+
+from .base import LLMResult, StreamEvent
+from .limits import raise_for_status, rate_limit_info
+from .sse import iter_sse_json
+from ..http_client import get_client, network_timings
 
 
 class GoogleProvider:
     provider_name = "google"
+    base_url = "https://generativelanguage.googleapis.com"
 
-    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+    def _request(self, model: str, system: str, user: str, max_tokens: int, method: str) -> tuple[str, dict, dict]:
+        url = f"{self.base_url}/v1beta/models/{model}:{method}"
         headers = {"Content-Type": "application/json"}
         payload = {
             "systemInstruction": {"parts": [{"text": system}]},
             "contents": [{"role": "user", "parts": [{"text": user}]}],
             "generationConfig": {"maxOutputTokens": max_tokens},
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, headers=headers, json=payload, params={"key": api_key})
-            r.raise_for_status()
-            data = r.json()
+        return url, headers, payload
+
+    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
+        url, headers, payload = self._request(model, system, user, max_tokens, "generateContent")
+        r = await get_client(self.provider_name).post(url, headers=headers, json=payload, params={"key": api_key})
+        raise_for_status(r)
+        parse_started = time.perf_counter()
+        data = r.json()
+        parse_ms = (time.perf_counter() - parse_started) * 1000
 
         text = ""
         for candidate in data.get("candidates", []):
@@ -26,5 +37,27 @@ class GoogleProvider:
         usage = data.get("usageMetadata", {})
         in_tok  = int(usage.get("promptTokenCount", 0) or 0)
         out_tok = int(usage.get("candidatesTokenCount", 0) or 0)
+        cached_tok = int(usage.get("cachedContentTokenCount", 0) or 0)
+
+        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="google", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r, parse_ms))
+
+    async def generate_stream(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> AsyncIterator[StreamEvent]:
+        url, headers, payload = self._request(model, system, user, max_tokens, "streamGenerateContent")
+        text = ""
+        in_tok = out_tok = cached_tok = 0
+        params = {"key": api_key, "alt": "sse"}
+        async with get_client(self.provider_name).stream("POST", url, headers=headers, json=payload, params=params) as r:
+            raise_for_status(r)
+            async for chunk in iter_sse_json(r):
+                for candidate in chunk.get("candidates", []):
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            text += part["text"]
+                            yield StreamEvent(delta=part["text"])
+                usage = chunk.get("usageMetadata") or {}
+                if usage:
+                    in_tok  = int(usage.get("promptTokenCount", in_tok) or 0)
+                    out_tok = int(usage.get("candidatesTokenCount", out_tok) or 0)
+                    cached_tok = int(usage.get("cachedContentTokenCount", cached_tok) or 0)
 
-        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="google", model=model, cost_usd=0.0)
+        yield StreamEvent(result=LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="google", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r)))
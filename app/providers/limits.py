@@ -0,0 +1,92 @@
+import re
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+
+class RateLimitError(Exception):
+    """provider가 429를 돌려줬을 때. retry_after는 초 단위(알 수 없으면 None)."""
+
+    def __init__(self, message: str, retry_after: float | None = None, rate_limit: dict | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit or {}
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str) -> float | None:
+    """'1s', '6m0s', '20ms', '0.5' 같은 reset 값을 초로 바꾼다. RFC3339/HTTP-date 시각도 받는다."""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+    for parse in (lambda v: datetime.fromisoformat(v.replace("Z", "+00:00")), parsedate_to_datetime):
+        try:
+            return max(0.0, parse(value).timestamp() - time.time())
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _int_header(headers: httpx.Headers, *names: str) -> int | None:
+    for name in names:
+        raw = headers.get(name)
+        if raw is not None:
+            try:
+                return int(float(raw))
+            except ValueError:
+                continue
+    return None
+
+
+def retry_after(headers: httpx.Headers) -> float | None:
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return _parse_duration(headers.get("retry-after", ""))
+
+
+def rate_limit_info(headers: httpx.Headers) -> dict:
+    """OpenAI/Groq(x-ratelimit-*)와 Anthropic(anthropic-ratelimit-*) 헤더에서 남은 한도와 reset 시간을 읽는다."""
+    info: dict = {}
+    remaining_requests = _int_header(headers, "x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining")
+    remaining_tokens = _int_header(headers, "x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining")
+    if remaining_requests is not None:
+        info["remaining_requests"] = remaining_requests
+    if remaining_tokens is not None:
+        info["remaining_tokens"] = remaining_tokens
+    resets = [
+        _parse_duration(headers.get(name, ""))
+        for name in (
+            "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens",
+            "anthropic-ratelimit-requests-reset", "anthropic-ratelimit-tokens-reset",
+        )
+    ]
+    resets = [r for r in resets if r is not None]
+    if resets:
+        info["reset_sec"] = max(resets)
+    return info
+
+
+def raise_for_status(response: httpx.Response) -> None:
+    """429는 RateLimitError로, 나머지 오류는 httpx.HTTPStatusError로 올린다."""
+    if response.status_code == 429:
+        raise RateLimitError(
+            "rate limited (HTTP 429)",
+            retry_after=retry_after(response.headers),
+            rate_limit=rate_limit_info(response.headers),
+        )
+    response.raise_for_status()
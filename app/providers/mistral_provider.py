@@ -1,12 +1,18 @@
-import httpx
-from .base import LLMResult
+import time
+from typing import AsyncIterator
+
+from .base import LLMResult, StreamEvent
+from .limits import raise_for_status, rate_limit_info
+from .sse import iter_sse_json
+from ..http_client import get_client, network_timings
 
 
 class MistralProvider:
     provider_name = "mistral"
+    base_url = "https://api.mistral.ai"
 
-    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
-        url = "https://api.mistral.ai/v1/chat/completions"
+    def _request(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> tuple[str, dict, dict]:
+        url = f"{self.base_url}/v1/chat/completions"
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
@@ -19,14 +25,41 @@ class MistralProvider:
             ],
             "max_tokens": max_tokens,
         }
-        async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            r.raise_for_status()
-            data = r.json()
+        return url, headers, payload
+
+    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
+        url, headers, payload = self._request(api_key, model, system, user, max_tokens)
+        r = await get_client(self.provider_name).post(url, headers=headers, json=payload)
+        raise_for_status(r)
+        parse_started = time.perf_counter()
+        data = r.json()
+        parse_ms = (time.perf_counter() - parse_started) * 1000
 
         text = data.get("choices", [{}])[0].get("message", {}).get("content", "")
         usage   = data.get("usage", {})
         in_tok  = int(usage.get("prompt_tokens", 0) or 0)
         out_tok = int(usage.get("completion_tokens", 0) or 0)
+        cached_tok = int((usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0)
+
+        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="mistral", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r, parse_ms))
+
+    async def generate_stream(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> AsyncIterator[StreamEvent]:
+        url, headers, payload = self._request(api_key, model, system, user, max_tokens)
+        payload["stream"] = True
+        text = ""
+        in_tok = out_tok = cached_tok = 0
+        async with get_client(self.provider_name).stream("POST", url, headers=headers, json=payload) as r:
+            raise_for_status(r)
+            async for chunk in iter_sse_json(r):
+                for choice in chunk.get("choices", []):
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        text += delta
+                        yield StreamEvent(delta=delta)
+                usage = chunk.get("usage") or {}
+                if usage:
+                    in_tok  = int(usage.get("prompt_tokens", 0) or 0)
+                    out_tok = int(usage.get("completion_tokens", 0) or 0)
+                    cached_tok = int((usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0)
 
-        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="mistral", model=model, cost_usd=0.0)
+        yield StreamEvent(result=LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="mistral", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r)))
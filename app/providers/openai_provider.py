@@ -1,15 +1,18 @@
-import asyncio
-import httpx
-from .base import LLMResult
+import hashlib
+import time
+from typing import AsyncIterator
 
-MAX_RETRIES = 4
-BASE_BACKOFF = 5  # seconds
+from .base import LLMResult, StreamEvent
+from .limits import raise_for_status, rate_limit_info
+from .sse import iter_sse_json
+from ..http_client import get_client, network_timings
 
 class OpenAIProvider:
     provider_name = "openai"
+    base_url = "https://api.openai.com"
 
-    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
-        url = "https://api.openai.com/v1/responses"
+    def _request(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> tuple[str, dict, dict]:
+        url = f"{self.base_url}/v1/responses"
         headers = {"Authorization": f"Bearer {api_key}"}
         payload = {
             "model": model,
@@ -18,29 +21,55 @@ class OpenAIProvider:
                 {"role": "user", "content": user},
             ],
             "max_output_tokens": max_tokens,
+            # 같은 system prompt를 쓰는 요청을 같은 캐시 머신으로 보내 자동 prefix caching 적중률을 높인다.
+            "prompt_cache_key": hashlib.sha256(f"{model}\n{system}".encode()).hexdigest()[:32],
         }
+        return url, headers, payload
+
+    @staticmethod
+    def _usage(usage: dict) -> tuple[int, int, int]:
+        details = usage.get("input_tokens_details") or {}
+        return (
+            int(usage.get("input_tokens", 0) or 0),
+            int(usage.get("output_tokens", 0) or 0),
+            int(details.get("cached_tokens", 0) or 0),
+        )
 
-        for attempt in range(MAX_RETRIES):
-            async with httpx.AsyncClient(timeout=60) as client:
-                r = await client.post(url, headers=headers, json=payload)
+    async def generate(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> LLMResult:
+        url, headers, payload = self._request(api_key, model, system, user, max_tokens)
 
-            if r.status_code == 429:
-                retry_after = int(r.headers.get("retry-after", BASE_BACKOFF * (2 ** attempt)))
-                if attempt < MAX_RETRIES - 1:
-                    await asyncio.sleep(retry_after)
-                    continue
-            r.raise_for_status()
-            break
+        r = await get_client(self.provider_name).post(url, headers=headers, json=payload)
+        # 429는 RateLimitError로 올리고, 재시도/대기는 runner의 limiter와 재시도 루프가 맡는다.
+        raise_for_status(r)
 
+        parse_started = time.perf_counter()
         data = r.json()
+        parse_ms = (time.perf_counter() - parse_started) * 1000
         text = ""
         for item in data.get("output", []):
             if item.get("type") == "message":
                 for c in item.get("content", []):
                     if c.get("type") == "output_text":
                         text += c.get("text", "")
-        usage = data.get("usage", {}) or {}
-        in_tok = int(usage.get("input_tokens", 0) or 0)
-        out_tok = int(usage.get("output_tokens", 0) or 0)
+        in_tok, out_tok, cached_tok = self._usage(data.get("usage", {}) or {})
+
+        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="openai", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r, parse_ms))
+
+    async def generate_stream(self, api_key: str, model: str, system: str, user: str, max_tokens: int) -> AsyncIterator[StreamEvent]:
+        url, headers, payload = self._request(api_key, model, system, user, max_tokens)
+        payload["stream"] = True
+        text = ""
+        in_tok = out_tok = cached_tok = 0
+        async with get_client(self.provider_name).stream("POST", url, headers=headers, json=payload) as r:
+            raise_for_status(r)
+            async for event in iter_sse_json(r):
+                etype = event.get("type")
+                if etype == "response.output_text.delta" and event.get("delta"):
+                    text += event["delta"]
+                    yield StreamEvent(delta=event["delta"])
+                elif etype == "response.completed":
+                    in_tok, out_tok, cached_tok = self._usage((event.get("response") or {}).get("usage") or {})
+                elif etype in ("response.failed", "error"):
+                    raise RuntimeError(f"openai stream error: {event}")
 
-        return LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="openai", model=model, cost_usd=0.0)
+        yield StreamEvent(result=LLMResult(text=text.strip(), input_tokens=in_tok, output_tokens=out_tok, provider="openai", model=model, cost_usd=0.0, cached_input_tokens=cached_tok, rate_limit=rate_limit_info(r.headers), network=network_timings(r)))
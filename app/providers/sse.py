@@ -0,0 +1,30 @@
+import json
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+
+
+async def iter_sse_json(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """SSE 응답에서 data: 필드를 JSON으로 파싱해 순서대로 내보낸다. ([DONE] 종료 신호 지원)"""
+    data_lines: list[str] = []
+    async for line in response.aiter_lines():
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip())
+            continue
+        if line.strip() or not data_lines:
+            continue
+        data = "\n".join(data_lines)
+        data_lines = []
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data != "[DONE]":
+            try:
+                yield json.loads(data)
+            except ValueError:
+                pass
@@ -1,11 +1,19 @@
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+import re
 import secrets
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from .models import LinkCode, UserPreference, PipelineStage
+from .crypto import decrypt_text
+from .db import db_writer, run_db
+from .models import ApiKey, LinkCode, Message, PipelineStage, Thread, UsageEvent, UserPreference
 from .settings import settings
+from .tracing import tracer
 
 MAX_PIPELINE_STAGES = 6
+PREVIEW_CHARS = 255
 
 DEFAULT_STAGES = [
     {
@@ -25,6 +33,11 @@ DEFAULT_STAGES = [
 
 # ── Pipeline stages ───────────────────────────────────────────────────────────
 
+def parse_model_list(raw: str) -> list[str]:
+    """쉼표/줄바꿈으로 구분된 "provider:model" 목록을 순서를 지켜 중복 없이 나눈다."""
+    return list(dict.fromkeys(m.strip() for m in re.split(r"[,\n]", raw or "") if m.strip()))
+
+
 def get_pipeline_stages(db: Session, user_id: int) -> list[PipelineStage]:
     return (
         db.query(PipelineStage)
@@ -55,10 +68,13 @@ def save_pipeline_stages(
     names: list[str],
     prompts: list[str],
     models: list[str],
+    fallbacks: list[str] | None = None,
 ) -> None:
     # 기존 전부 삭제 후 재삽입 (최대 6개 적용)
     db.query(PipelineStage).filter(PipelineStage.user_id == user_id).delete()
-    for i, (name, prompt, model) in enumerate(zip(names, prompts, models)):
+    fallbacks = list(fallbacks or [])
+    fallbacks += [""] * (len(names) - len(fallbacks))
+    for i, (name, prompt, model, fallback) in enumerate(zip(names, prompts, models, fallbacks)):
         if i >= MAX_PIPELINE_STAGES:
             break
         name = name.strip()
@@ -69,6 +85,7 @@ def save_pipeline_stages(
             name=name,
             system_prompt=prompt.strip(),
             model=model.strip() or settings.default_model,
+            fallback_models=", ".join(parse_model_list(fallback)),
             order_index=i,
         ))
     db.commit()
@@ -83,12 +100,19 @@ def get_synth_model(db: Session, user_id: int) -> str:
     return pref.synth_model
 
 
-def save_synth_model(db: Session, user_id: int, synth_model: str) -> None:
+def get_synth_fallbacks(db: Session, user_id: int) -> list[str]:
+    pref = db.query(UserPreference).filter(UserPreference.user_id == user_id).first()
+    return parse_model_list(pref.synth_fallbacks) if pref else []
+
+
+def save_synth_model(db: Session, user_id: int, synth_model: str, fallbacks: str | None = None) -> None:
     pref = db.query(UserPreference).filter(UserPreference.user_id == user_id).first()
     if not pref:
         pref = UserPreference(user_id=user_id)
         db.add(pref)
     pref.synth_model = synth_model.strip() or settings.default_model
+    if fallbacks is not None:
+        pref.synth_fallbacks = ", ".join(parse_model_list(fallbacks))
     pref.updated_at = datetime.utcnow()
     db.commit()
 
@@ -96,11 +120,14 @@ def save_synth_model(db: Session, user_id: int, synth_model: str) -> None:
 # ── Link codes ────────────────────────────────────────────────────────────────
 
 def get_user_preferences(db: Session, user_id: int) -> dict:
-    return {"synth_model": get_synth_model(db, user_id)}
+    return {
+        "synth_model": get_synth_model(db, user_id),
+        "synth_fallbacks": get_synth_fallbacks(db, user_id),
+    }
 
 
-def save_user_preferences(db, user_id, synth_model="", **_):
-    save_synth_model(db, user_id, synth_model)
+def save_user_preferences(db, user_id, synth_model="", synth_fallbacks=None, **_):
+    save_synth_model(db, user_id, synth_model, synth_fallbacks)
 
 
 def create_link_code(db: Session, user_id: int, ttl_minutes: int = 5) -> LinkCode:
@@ -119,23 +146,253 @@ def create_link_code(db: Session, user_id: int, ttl_minutes: int = 5) -> LinkCod
 
 def consume_valid_link_code(db: Session, code: str) -> LinkCode | None:
     now = datetime.utcnow()
-    rec = (
-        db.query(LinkCode)
-        .filter(
+    # 조건부 UPDATE로 compare-and-set: 다른 replica가 같은 코드를 먼저 썼으면 rowcount == 0
+    res = db.execute(
+        update(LinkCode)
+        .where(
             LinkCode.code == code.upper(),
             LinkCode.status == "active",
             LinkCode.expires_at > now,
         )
-        .first()
+        .values(status="consumed", consumed_at=now)
     )
-    if not rec:
-        return None
-    rec.status = "consumed"
-    rec.consumed_at = now
     db.commit()
-    db.refresh(rec)
-    return rec
+    if res.rowcount != 1:
+        return None
+    return get_link_code(db, code)
 
 
 def get_link_code(db: Session, code: str) -> LinkCode | None:
     return db.query(LinkCode).filter(LinkCode.code == code.upper()).first()
+
+
+# ── Keys / threads / run results ──────────────────────────────────────────────
+
+def get_user_keys(db: Session, user_id: int) -> dict:
+    keys = {}
+    rows = db.query(ApiKey).filter(ApiKey.user_id == user_id).all()
+    with tracer.span("crypto.decrypt_keys", timing="decrypt", keys=len(rows)):
+        for k in rows:
+            try:
+                keys[k.provider] = decrypt_text(k.encrypted_key)
+            except Exception:
+                pass
+    return keys
+
+
+def get_or_create_thread(db: Session, user_id: int, thread_key: str) -> Thread:
+    t = db.query(Thread).filter(Thread.user_id == user_id, Thread.thread_key == thread_key).first()
+    if not t:
+        t = Thread(user_id=user_id, thread_key=thread_key, summary="")
+        db.add(t)
+        try:
+            db.commit()
+        except IntegrityError:
+            # 다른 replica/worker가 같은 thread를 먼저 만들었다.
+            db.rollback()
+            return db.query(Thread).filter(Thread.user_id == user_id, Thread.thread_key == thread_key).one()
+        db.refresh(t)
+    return t
+
+
+def update_summary(prev: str, question: str, answer: str) -> str:
+    chunk = f"Q: {question}\nA: {answer}\n"
+    return (prev + "\n" + chunk).strip()[-4000:]
+
+
+def add_run_result(db: Session, user_id: int, thread: Thread, question: str, result: dict) -> str:
+    """run_orchestrator 결과를 Message/Thread/UsageEvent로 세션에 추가한다. (commit은 호출자가 한다)"""
+    final = result.get("final", "").strip() or "(빈 응답)"
+
+    for sr in result.get("stages", []):
+        db.add(Message(thread_id=thread.id, role=sr["name"], content=sr["text"]))
+    db.add(Message(thread_id=thread.id, role="assistant", content=final))
+    thread.summary = update_summary(thread.summary or "", question, final)
+    thread.updated_at = datetime.utcnow()
+    thread.has_answer = True
+    if not thread.stage_names:
+        thread.stage_names = " · ".join(sr["name"] for sr in result.get("stages", []))
+    _add_usage_events(db, user_id, result)
+    return final
+
+
+def _add_usage_events(db: Session, user_id: int, result: dict) -> None:
+    for stage_name, su in (result.get("usage") or {}).items():
+        if not su or su.get("recorded"):
+            continue  # recorded: spend ledger가 호출 시점에 이미 기록
+        db.add(UsageEvent(
+            user_id=user_id,
+            provider=(su.get("provider") or "")[:32],
+            model=(su.get("model") or "")[:64],
+            input_tokens=int(su.get("input_tokens", 0) or 0),
+            output_tokens=int(su.get("output_tokens", 0) or 0),
+            cost_usd=float(su.get("cost_usd", 0.0) or 0.0),
+        ))
+
+
+def save_run_result(db: Session, user_id: int, thread: Thread, question: str, result: dict) -> str:
+    """run_orchestrator 결과를 저장하고 최종 답변을 반환한다."""
+    final = add_run_result(db, user_id, thread, question, result)
+    db.commit()
+    return final
+
+
+@dataclass
+class RunInputs:
+    user_api_keys: dict
+    stages: list[dict]
+    synth_model: str
+    synth_fallbacks: list[str] = field(default_factory=list)
+
+
+def get_key_flags(db: Session, user_id: int) -> dict:
+    return {k.provider: True for k in db.query(ApiKey).filter(ApiKey.user_id == user_id).all()}
+
+
+def load_run_inputs(db: Session, user_id: int) -> RunInputs:
+    """파이프라인 실행에 필요한 값(복호화된 키, 스테이지, synth 모델과 fallback)을 일반 값으로 모은다."""
+    stages = get_pipeline_stages(db, user_id)
+    return RunInputs(
+        user_api_keys=get_user_keys(db, user_id),
+        stages=[
+            {
+                "name": s.name,
+                "system_prompt": s.system_prompt,
+                "model": s.model,
+                "fallback_models": parse_model_list(s.fallback_models),
+            }
+            for s in stages
+        ],
+        synth_model=get_synth_model(db, user_id),
+        synth_fallbacks=get_synth_fallbacks(db, user_id),
+    )
+
+
+def start_thread_turn(db: Session, user_id: int, thread_key: str, question: str) -> tuple[int, str]:
+    """thread를 (없으면 만들어) 가져오고 user 메시지를 기록한다. (thread_id, 이전 summary) 반환."""
+    thread = get_or_create_thread(db, user_id, thread_key)
+    db.add(Message(thread_id=thread.id, role="user", content=question))
+    if not thread.preview:
+        thread.preview = question[:PREVIEW_CHARS]
+    db.commit()
+    return thread.id, thread.summary or ""
+
+
+def save_thread_run_result(db: Session, user_id: int, thread_id: int, question: str, result: dict) -> str:
+    return save_run_result(db, user_id, db.get(Thread, thread_id), question, result)
+
+
+def add_thread_run_result(db: Session, user_id: int, thread_id: int, question: str, result: dict) -> str:
+    return add_run_result(db, user_id, db.get(Thread, thread_id), question, result)
+
+
+def add_cancelled_thread_run(db: Session, user_id: int, thread_id: int, question: str, result: dict) -> None:
+    """취소된 run은 답변으로 남기지 않는다. 그때까지 쓴 토큰만 UsageEvent로 남기고 turn은 지운다. (commit은 호출자가 한다)"""
+    _add_usage_events(db, user_id, result)
+    _remove_pending_turn(db, thread_id, question)
+
+
+# ── History ───────────────────────────────────────────────────────────────────
+
+def encode_history_cursor(thread: Thread) -> str:
+    return f"{thread.updated_at.isoformat()}_{thread.id}"
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime, int]:
+    """"<updated_at ISO>_<thread id>" → (updated_at, id). 형식이 틀리면 ValueError."""
+    ts, _, tid = cursor.rpartition("_")
+    return datetime.fromisoformat(ts), int(tid)
+
+
+def list_answered_threads(
+    db: Session, user_id: int, limit: int = 30, before: tuple[datetime, int] | None = None,
+) -> tuple[list[Thread], str | None]:
+    """답변이 있는 thread를 최신순으로 limit개 가져온다. (thread 목록, 다음 페이지 cursor)
+
+    (updated_at, id) keyset으로 넘기므로 페이지가 깊어져도 OFFSET처럼 앞 행을 다시 읽지 않는다.
+    """
+    q = db.query(Thread).filter(Thread.user_id == user_id, Thread.has_answer.is_(True))
+    if before is not None:
+        ts, tid = before
+        q = q.filter(or_(Thread.updated_at < ts, and_(Thread.updated_at == ts, Thread.id < tid)))
+    rows = q.order_by(Thread.updated_at.desc(), Thread.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], encode_history_cursor(rows[limit - 1])
+    return rows, None
+
+
+def get_first_answers(db: Session, thread_ids: list[int]) -> dict[int, str]:
+    """thread마다 첫 assistant 답변을 한 번의 쿼리로 가져온다. {thread_id: 본문}"""
+    if not thread_ids:
+        return {}
+    first_ids = (
+        db.query(func.min(Message.id))
+        .filter(Message.thread_id.in_(thread_ids), Message.role == "assistant")
+        .group_by(Message.thread_id)
+    )
+    rows = db.query(Message.thread_id, Message.content).filter(Message.id.in_(first_ids)).all()
+    return {thread_id: content for thread_id, content in rows}
+
+
+def get_stage_messages(db: Session, user_id: int, thread_id: int) -> list[Message] | None:
+    """thread의 토론 스테이지 메시지 (기록 페이지에서 펼칠 때 읽는다). 다른 사용자의 thread면 None."""
+    thread = db.get(Thread, thread_id)
+    if thread is None or thread.user_id != user_id:
+        return None
+    return (
+        db.query(Message)
+        .filter(Message.thread_id == thread_id, Message.role.notin_(("user", "assistant")))
+        .order_by(Message.created_at.asc(), Message.id.asc())
+        .all()
+    )
+
+
+def delete_thread(db: Session, thread_id: int) -> None:
+    t = db.get(Thread, thread_id)
+    if t:
+        db.delete(t)
+        db.commit()
+
+
+def discard_thread_turn(db: Session, thread_id: int, question: str) -> None:
+    """답변을 저장하지 못한 turn의 user 메시지를 지운다. 메시지가 남지 않으면 thread도 지운다.
+
+    Telegram thread는 chat마다 하나라 thread 전체를 지우면 이전 대화까지 사라진다.
+    """
+    _remove_pending_turn(db, thread_id, question)
+    db.commit()
+
+
+def _remove_pending_turn(db: Session, thread_id: int, question: str) -> None:
+    pending = (
+        db.query(Message)
+        .filter(Message.thread_id == thread_id, Message.role == "user", Message.content == question)
+        .order_by(Message.id.desc())
+        .first()
+    )
+    if pending:
+        db.delete(pending)
+        db.flush()
+    if not db.query(Message.id).filter(Message.thread_id == thread_id).first():
+        thread = db.get(Thread, thread_id)
+        if thread:
+            db.delete(thread)
+
+
+# ── Async variants (전용 DB 스레드풀에서 실행, 이벤트 루프를 막지 않음) ──────────────
+
+async def save_thread_run_result_async(user_id: int, thread_id: int, question: str, result: dict) -> str:
+    # 결과 저장은 쓰기가 가장 많은 경로라 write batcher로 다른 run의 저장과 한 트랜잭션에 묶는다.
+    return await db_writer.write(add_thread_run_result, user_id, thread_id, question, result)
+
+
+async def save_cancelled_run_async(user_id: int, thread_id: int, question: str, result: dict) -> None:
+    await db_writer.write(add_cancelled_thread_run, user_id, thread_id, question, result)
+
+
+async def delete_thread_async(thread_id: int) -> None:
+    await run_db(delete_thread, thread_id)
+
+
+async def discard_thread_turn_async(thread_id: int, question: str) -> None:
+    await run_db(discard_thread_turn, thread_id, question)
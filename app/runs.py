@@ -0,0 +1,158 @@
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+
+class RunQueueFull(Exception):
+    pass
+
+
+@dataclass
+class RunState:
+    id: str
+    question: str
+    status: str = "queued"  # queued | running | done | failed
+    stages: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    result: Dict[str, Any] | None = None
+    error: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.id,
+            "status": self.status,
+            "question": self.question,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+RunJob = Callable[[RunState, Callable[[Dict[str, Any]], Awaitable[None]]], Awaitable[Dict[str, Any]]]
+
+
+class RunManager:
+    """제출된 run을 고정 개수 worker로 실행하고 진행 상태를 메모리에 보관한다.
+
+    토큰 이벤트는 구독자에게만 실시간으로 전달하고, 나머지 이벤트는 늦게 붙은 구독자를 위해 기록한다.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 100, retention: int = 500):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retention = retention
+        self.runs: "OrderedDict[str, RunState]" = OrderedDict()
+        self._queue: asyncio.Queue | None = None
+        self._tasks: List[asyncio.Task] = []
+
+    def configure(self, workers: int, max_queue: int, retention: int) -> None:
+        self.workers, self.max_queue, self.retention = workers, max_queue, retention
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, question: str, job: RunJob) -> RunState:
+        if self._queue is None:
+            raise RuntimeError("RunManager is not started")
+        run = RunState(id=secrets.token_urlsafe(12), question=question)
+        try:
+            self._queue.put_nowait((run, job))
+        except asyncio.QueueFull as e:
+            raise RunQueueFull("run queue is full") from e
+        self.runs[run.id] = run
+        self._evict()
+        return run
+
+    def get(self, run_id: str) -> RunState | None:
+        return self.runs.get(run_id)
+
+    async def subscribe(self, run_id: str) -> AsyncIterator[Dict[str, Any]]:
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        # 기록된 이벤트를 먼저 재생한 뒤 실시간 이벤트를 이어서 보낸다.
+        queue: asyncio.Queue = asyncio.Queue()
+        replay = list(run.events)
+        if not run.finished:
+            run.subscribers.append(queue)
+        try:
+            for ev in replay:
+                yield ev
+            if run.finished:
+                return
+            while (ev := await queue.get()) is not None:
+                yield ev
+        finally:
+            if queue in run.subscribers:
+                run.subscribers.remove(queue)
+
+    def _evict(self) -> None:
+        while len(self.runs) > self.retention:
+            oldest_id = next(iter(self.runs))
+            if not self.runs[oldest_id].finished:
+                break
+            self.runs.pop(oldest_id)
+
+    async def _publish(self, run: RunState, event: Dict[str, Any]) -> None:
+        etype = event.get("type")
+        stage = event.get("stage")
+        if etype == "stage_start" and stage:
+            run.stages[stage] = {"status": "running", "model": event.get("model", "")}
+        elif etype == "stage_done" and stage:
+            info = run.stages.setdefault(stage, {})
+            info.update({k: v for k, v in event.items() if k not in ("type", "stage", "text")})
+            info["status"] = "done" if event.get("status", "ok") == "ok" else event.get("status")
+        if etype != "token":
+            run.events.append(event)
+        for q in run.subscribers:
+            q.put_nowait(event)
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            run, job = await self._queue.get()
+            run.status = "running"
+            run.started_at = time.time()
+            await self._publish(run, {"type": "run_status", "status": "running"})
+            try:
+                run.result = await job(run, lambda ev: self._publish(run, ev))
+                run.status = "done"
+            except asyncio.CancelledError:
+                run.status, run.error = "failed", "cancelled"
+                raise
+            except Exception as e:
+                run.status, run.error = "failed", f"{type(e).__name__}: {e}"
+            finally:
+                run.finished_at = time.time()
+                final_event = {"type": "run_status", "status": run.status}
+                if run.error:
+                    final_event["error"] = run.error
+                await self._publish(run, final_event)
+                for q in run.subscribers:
+                    q.put_nowait(None)
+                run.subscribers.clear()
+                self._queue.task_done()
+
+
+run_manager = RunManager()
@@ -0,0 +1,189 @@
+"""대화 기록 전문 검색.
+
+SQLite는 FTS5 외부 content 테이블(messages_fts), Postgres는 to_tsvector('simple', content) GIN 인덱스를 쓴다.
+인덱스는 마이그레이션 0004가 만들고, SQLite는 messages 트리거로 INSERT/UPDATE/DELETE마다 함께 갱신된다.
+"""
+import html
+import re
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.orm import Session
+
+FTS_TABLE = "messages_fts"
+MIN_TRIGRAM_CHARS = 3
+# 관련도 순위는 가장 최근에 일치한 메시지 RANK_WINDOW개 안에서 매긴다.
+# 흔한 단어가 수백만 행에 걸려도 전부 점수를 매기지 않아 검색 시간이 일정하다.
+RANK_WINDOW = 2000
+_BM25_K1, _BM25_B = 1.2, 0.75
+
+# snippet 강조 표시. 본문을 escape한 뒤 <mark>로 바꾸므로 본문에 나올 일 없는 사설 영역 문자를 쓴다.
+_HL_START, _HL_END = "\ue000", "\ue001"
+
+
+@dataclass
+class SearchHit:
+    thread_id: int
+    message_id: int
+    role: str
+    preview: str
+    updated_at: datetime | None
+    snippet: str          # HTML (escape 후 일치 부분만 <mark>)
+    rank: float           # 작을수록 관련도 높음 (음수 점수)
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """alembic autogenerate/compare에서 FTS 가상 테이블과 shadow 테이블을 모델 비교 대상에서 뺀다."""
+    return not (type_ == "table" and name.startswith(FTS_TABLE))
+
+
+def _highlight(raw: str) -> str:
+    return html.escape(raw or "").replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+
+def _terms(query: str) -> list[str]:
+    return [t for t in re.split(r"\s+", query.strip()) if t]
+
+
+def _fts_quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _sqlite_tokenizer(db: Session) -> str:
+    sql = db.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).scalar() or ""
+    return "trigram" if "trigram" in sql else "unicode61"
+
+
+def _score(occurrences: list[int], length: int, avg_length: float) -> float:
+    """BM25의 TF 포화/길이 정규화 부분. (IDF는 일치 행 전체를 세야 해서 쓰지 않는다)"""
+    norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * length / max(avg_length, 1.0))
+    return sum(tf * (_BM25_K1 + 1) / (tf + norm) for tf in occurrences if tf > 0)
+
+
+def _search_sqlite(db: Session, user_id: int, terms: list[str], limit: int) -> list[SearchHit]:
+    params: dict = {"user_id": user_id, "window": RANK_WINDOW}
+    trigram = _sqlite_tokenizer(db) == "trigram"
+    if trigram:
+        # trigram은 3글자 미만 term을 인덱스로 찾지 못한다. (한국어 2글자 단어 등은 LIKE로 거른다)
+        match_terms = [t for t in terms if len(t) >= MIN_TRIGRAM_CHARS]
+        like_terms = [t for t in terms if len(t) < MIN_TRIGRAM_CHARS]
+        match = " ".join(_fts_quote(t) for t in match_terms)
+    else:
+        match_terms, like_terms = terms, []
+        match = " ".join(_fts_quote(t) + "*" for t in terms)
+
+    where = " AND t.user_id = :user_id"
+    for i, t in enumerate(like_terms):
+        params[f"like{i}"] = "%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        where += f" AND m.content LIKE :like{i} ESCAPE '\\'"
+    # 메시지마다 term 등장 횟수를 SQL 안에서 센다. (본문을 가져오지 않는다)
+    occurrences = []
+    for i, t in enumerate(terms):
+        params[f"occ{i}"] = t.lower()
+        occurrences.append(
+            f"(length(m.content) - length(replace(lower(m.content), :occ{i}, ''))) / length(:occ{i}) AS occ{i}"
+        )
+
+    # 1) 최근 RANK_WINDOW개 일치 (FTS는 rowid 역순으로 읽다가 멈춘다)
+    if match_terms:
+        params["match"] = match
+        source = (
+            f" FROM {FTS_TABLE} JOIN messages m ON m.id = {FTS_TABLE}.rowid"
+            f" JOIN threads t ON t.id = m.thread_id WHERE {FTS_TABLE} MATCH :match"
+        )
+        order = f"{FTS_TABLE}.rowid"
+    else:
+        # 짧은 term만 있으면 색인 없이 최근 메시지부터 훑는다.
+        source = " FROM messages m JOIN threads t ON t.id = m.thread_id WHERE 1 = 1"
+        order = "m.id"
+    window = db.execute(text(
+        "SELECT m.id, length(m.content) AS length, " + ", ".join(occurrences) + source + where +
+        f" ORDER BY {order} DESC LIMIT :window"
+    ), params).all()
+    if not window:
+        return []
+
+    # 2) 창 안에서 점수를 매겨 상위 limit개 (동점이면 최근 메시지 먼저)
+    avg_length = sum(r.length for r in window) / len(window)
+    scored = sorted(
+        ((-_score([getattr(r, f"occ{i}") for i in range(len(terms))], r.length, avg_length), -r.id) for r in window)
+    )[:limit]
+    rank_of = {-neg_id: rank for rank, neg_id in scored}
+
+    # 3) 남은 행에만 snippet을 만든다.
+    ids = bindparam("ids", expanding=True)
+    if match_terms:
+        rows = db.execute(
+            text(
+                "SELECT m.id, m.thread_id, m.role, t.preview, t.updated_at,"
+                f" snippet({FTS_TABLE}, 0, :hl_start, :hl_end, '…', :snippet_tokens) AS snippet"
+                f" FROM {FTS_TABLE} JOIN messages m ON m.id = {FTS_TABLE}.rowid"
+                " JOIN threads t ON t.id = m.thread_id"
+                f" WHERE {FTS_TABLE} MATCH :match AND {FTS_TABLE}.rowid IN :ids"
+            ).bindparams(ids).columns(updated_at=DateTime),
+            {
+                "match": match, "ids": list(rank_of), "hl_start": _HL_START, "hl_end": _HL_END,
+                # snippet 길이는 토큰 단위: trigram은 글자 하나가 토큰 하나라 최대치(64)를 쓴다.
+                "snippet_tokens": 64 if trigram else 24,
+            },
+        ).all()
+        snippets = {r.id: _highlight(r.snippet) for r in rows}
+    else:
+        rows = db.execute(
+            text(
+                "SELECT m.id, m.thread_id, m.role, t.preview, t.updated_at, m.content"
+                " FROM messages m JOIN threads t ON t.id = m.thread_id WHERE m.id IN :ids"
+            ).bindparams(ids).columns(updated_at=DateTime),
+            {"ids": list(rank_of)},
+        ).all()
+        snippets = {r.id: _like_snippet(r.content, like_terms) for r in rows}
+    hits = [SearchHit(r.thread_id, r.id, r.role, r.preview, r.updated_at, snippets[r.id], rank_of[r.id]) for r in rows]
+    return sorted(hits, key=lambda h: (h.rank, -h.message_id))
+
+
+def _like_snippet(content: str, terms: list[str], width: int = 60) -> str:
+    lower = content.lower()
+    pos = min((p for p in (lower.find(t.lower()) for t in terms) if p >= 0), default=0)
+    start = max(0, pos - width)
+    raw = content[start:pos + width * 2]
+    for t in terms:
+        raw = re.sub(re.escape(t), lambda m: _HL_START + m.group(0) + _HL_END, raw, flags=re.IGNORECASE)
+    return ("…" if start else "") + _highlight(raw) + ("…" if pos + width * 2 < len(content) else "")
+
+
+def _search_postgres(db: Session, user_id: int, terms: list[str], limit: int) -> list[SearchHit]:
+    # 최근 RANK_WINDOW개 일치만 ts_rank로 순위를 매기고, 남은 limit개에만 ts_headline을 계산한다.
+    rows = db.execute(text(
+        "SELECT r.id, r.thread_id, r.role, r.preview, r.updated_at, r.rank,"
+        " ts_headline('simple', r.content, r.q,"
+        "   'StartSel=' || :hl_start || ', StopSel=' || :hl_end || ', MaxWords=30, MinWords=10') AS snippet"
+        " FROM ("
+        "   SELECT w.*, -ts_rank(to_tsvector('simple', w.content), w.q) AS rank FROM ("
+        "     SELECT m.id, m.thread_id, m.role, m.content, t.preview, t.updated_at, q"
+        "     FROM messages m JOIN threads t ON t.id = m.thread_id,"
+        "       plainto_tsquery('simple', :query) q"
+        "     WHERE to_tsvector('simple', m.content) @@ q AND t.user_id = :user_id"
+        "     ORDER BY m.id DESC LIMIT :window"
+        "   ) w ORDER BY rank, w.id DESC LIMIT :limit"
+        " ) r ORDER BY r.rank, r.id DESC"
+    ).columns(updated_at=DateTime), {
+        "query": " ".join(terms), "user_id": user_id, "window": RANK_WINDOW, "limit": limit,
+        "hl_start": _HL_START, "hl_end": _HL_END,
+    }).all()
+    return [
+        SearchHit(r.thread_id, r.id, r.role, r.preview, r.updated_at, _highlight(r.snippet), float(r.rank))
+        for r in rows
+    ]
+
+
+def search_messages(db: Session, user_id: int, query: str, limit: int = 20) -> list[SearchHit]:
+    """user_id의 대화 메시지를 관련도순으로 찾는다. 검색어는 공백으로 나눈 단어를 모두 포함(AND)해야 한다."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, user_id, terms, limit)
+    return _search_sqlite(db, user_id, terms, limit)
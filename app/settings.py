@@ -12,10 +12,68 @@ class Settings(BaseSettings):
     session_cookie_path: str = Field(default="/", alias="SESSION_COOKIE_PATH")
     webhook_secret: str = Field(default="dev-webhook-secret", alias="WEBHOOK_SECRET")
     telegram_bot_token: str = Field(default="", alias="TELEGRAM_BOT_TOKEN")
+    telegram_api_url: str = Field(default="https://api.telegram.org", alias="TELEGRAM_API_URL")
+    telegram_streaming: bool = Field(default=True, alias="TELEGRAM_STREAMING")
+    telegram_edit_interval_sec: float = Field(default=1.5, alias="TELEGRAM_EDIT_INTERVAL_SEC")
+    telegram_workers: int = Field(default=2, alias="TELEGRAM_WORKERS")
+    telegram_job_lease_sec: int = Field(default=900, alias="TELEGRAM_JOB_LEASE_SEC")
+    telegram_job_max_attempts: int = Field(default=3, alias="TELEGRAM_JOB_MAX_ATTEMPTS")
+    telegram_job_retry_backoff_sec: float = Field(default=30.0, alias="TELEGRAM_JOB_RETRY_BACKOFF_SEC")
 
     master_key: str = Field(alias="MASTER_KEY")
 
     default_provider: str = Field(default="openai", alias="DEFAULT_PROVIDER")
     default_model: str = Field(default="openai:gpt-4o-mini", alias="DEFAULT_MODEL")
 
+    provider_base_url: str = Field(default="", alias="PROVIDER_BASE_URL")
+    openai_base_url: str = Field(default="", alias="OPENAI_BASE_URL")
+    anthropic_base_url: str = Field(default="", alias="ANTHROPIC_BASE_URL")
+    google_base_url: str = Field(default="", alias="GOOGLE_BASE_URL")
+    groq_base_url: str = Field(default="", alias="GROQ_BASE_URL")
+    mistral_base_url: str = Field(default="", alias="MISTRAL_BASE_URL")
+
+    run_workers: int = Field(default=4, alias="RUN_WORKERS")
+    run_queue_size: int = Field(default=100, alias="RUN_QUEUE_SIZE")
+    run_retention: int = Field(default=500, alias="RUN_RETENTION")
+
+    http_timeout_sec: float = Field(default=60.0, alias="HTTP_TIMEOUT_SEC")
+    http_max_connections: int = Field(default=100, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive: int = Field(default=20, alias="HTTP_MAX_KEEPALIVE")
+    http_keepalive_expiry_sec: float = Field(default=30.0, alias="HTTP_KEEPALIVE_EXPIRY_SEC")
+    http2_enabled: bool = Field(default=False, alias="HTTP2_ENABLED")
+
+    response_cache_enabled: bool = Field(default=False, alias="RESPONSE_CACHE_ENABLED")
+    response_cache_max_entries: int = Field(default=512, alias="RESPONSE_CACHE_MAX_ENTRIES")
+    response_cache_ttl_sec: int = Field(default=60 * 60 * 24, alias="RESPONSE_CACHE_TTL_SEC")
+    response_cache_path: str = Field(default="./response_cache.db", alias="RESPONSE_CACHE_PATH")
+    response_cache_max_disk_entries: int = Field(default=5000, alias="RESPONSE_CACHE_MAX_DISK_ENTRIES")
+
+    rate_limit_rpm: int = Field(default=0, alias="RATE_LIMIT_RPM")
+    rate_limit_tpm: int = Field(default=0, alias="RATE_LIMIT_TPM")
+    rate_limit_max_concurrency: int = Field(default=8, alias="RATE_LIMIT_MAX_CONCURRENCY")
+
+    hedging_enabled: bool = Field(default=False, alias="HEDGING_ENABLED")
+    hedge_percentile: float = Field(default=0.95, alias="HEDGE_PERCENTILE")
+    hedge_model: str = Field(default="", alias="HEDGE_MODEL")
+
+    breaker_failure_threshold: int = Field(default=5, alias="BREAKER_FAILURE_THRESHOLD")
+    breaker_reset_timeout_sec: float = Field(default=30.0, alias="BREAKER_RESET_TIMEOUT_SEC")
+    breaker_half_open_max_calls: int = Field(default=1, alias="BREAKER_HALF_OPEN_MAX_CALLS")
+
+    run_deadline_sec: float = Field(default=180.0, alias="RUN_DEADLINE_SEC")
+    synth_reserve_sec: float = Field(default=30.0, alias="SYNTH_RESERVE_SEC")
+
+    budget_policy: str = Field(default="downgrade", alias="BUDGET_POLICY")
+
+    spend_cap_user_hourly_usd: float = Field(default=0.0, alias="SPEND_CAP_USER_HOURLY_USD")
+    spend_cap_user_daily_usd: float = Field(default=0.0, alias="SPEND_CAP_USER_DAILY_USD")
+    spend_cap_user_monthly_usd: float = Field(default=0.0, alias="SPEND_CAP_USER_MONTHLY_USD")
+    spend_cap_provider_hourly_usd: float = Field(default=0.0, alias="SPEND_CAP_PROVIDER_HOURLY_USD")
+    spend_cap_provider_daily_usd: float = Field(default=0.0, alias="SPEND_CAP_PROVIDER_DAILY_USD")
+    spend_cap_provider_monthly_usd: float = Field(default=0.0, alias="SPEND_CAP_PROVIDER_MONTHLY_USD")
+    ledger_flush_interval_sec: float = Field(default=5.0, alias="LEDGER_FLUSH_INTERVAL_SEC")
+
+    tracing_enabled: bool = Field(default=False, alias="TRACING_ENABLED")
+    trace_export_path: str = Field(default="./traces.jsonl", alias="TRACE_EXPORT_PATH")
+
 settings = Settings()
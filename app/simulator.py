@@ -0,0 +1,439 @@
+"""로컬 provider simulator. 실제 vendor 대신 부하/장애 테스트에 쓰는 HTTP 서버.
+
+OpenAI Responses(/v1/responses), Anthropic Messages(/v1/messages), Gemini(/v1beta/models/{model}:generateContent,
+:streamGenerateContent?alt=sse), OpenAI 호환 chat(/v1/chat/completions, Groq/Mistral) 형식으로 응답하며 SSE 스트리밍도 지원한다.
+
+    python -m app.simulator --port 9100 --ttfb lognormal:0.6,0.4 --rate-429 0.05 --rate-5xx 0.02
+    PROVIDER_BASE_URL=http://127.0.0.1:9100 uvicorn app.main:app
+
+지연시간과 출력 토큰 수는 분포("fixed:0.2", "uniform:0.1,0.5", "normal:0.5,0.1", "lognormal:0.5,0.4",
+"exponential:0.3")에서 뽑는다. 요청마다 (seed, 형식, 모델, 프롬프트, 같은 요청의 순번)으로 난수를 정하므로
+동시에 들어온 요청의 순서와 상관없이 같은 요청열에는 같은 응답/지연/장애가 나온다.
+장애는 429(retry-after 포함), 503, timeout(hang_sec 동안 응답하지 않음) 순서로 확률을 나눠 주입한다.
+앱의 TELEGRAM_API_URL을 같은 주소로 돌리면 Telegram sendMessage/editMessageText 답장도 받아 준다.
+실행 중에도 PUT /_sim/config로 설정을 바꾸고 GET /_sim/stats로 형식/결과별 요청 수를 볼 수 있다.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+WORDS = (
+    "the cache layer keeps hot keys close to the application while the database remains the source of truth "
+    "so invalidation latency replication and failover must be planned together with clear ownership"
+).split()
+
+
+class Distribution:
+    """"kind:a,b" 형식의 분포. sample()은 음수를 내지 않는다."""
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+    def __init__(self, spec: str):
+        kind, _, raw = spec.strip().partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown distribution: {spec!r}")
+        try:
+            params = [float(p) for p in raw.split(",")] if raw else []
+        except ValueError:
+            raise ValueError(f"invalid distribution parameters: {spec!r}") from None
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"{kind} takes {self.KINDS[kind]} parameter(s): {spec!r}")
+        self.spec = spec
+        self.kind = kind
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = p[0] * math.exp(rng.gauss(0.0, p[1]))   # p[0]은 중앙값
+        else:
+            value = rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+@dataclass
+class SimConfig:
+    seed: int = 0
+    ttfb: str = "lognormal:0.4,0.3"         # 첫 토큰(비스트리밍은 생성 시작)까지 초
+    token_interval: str = "fixed:0.01"      # 토큰 하나를 생성하는 데 걸리는 초
+    output_tokens: str = "uniform:50,300"   # max_tokens를 넘지 않는다
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_timeout: float = 0.0
+    retry_after_sec: float = 1.0
+    hang_sec: float = 300.0
+
+    def distributions(self) -> tuple[Distribution, Distribution, Distribution]:
+        return Distribution(self.ttfb), Distribution(self.token_interval), Distribution(self.output_tokens)
+
+    def validate(self) -> None:
+        self.distributions()
+        rates = (self.rate_429, self.rate_5xx, self.rate_timeout)
+        if any(r < 0 for r in rates) or sum(rates) > 1:
+            raise ValueError("fault rates must be >= 0 and sum to at most 1")
+
+
+@dataclass
+class _Call:
+    """파싱한 요청. api별 parser가 만든다."""
+    api: str
+    model: str
+    prompt: str
+    max_tokens: int
+    stream: bool
+
+
+@dataclass
+class _Plan:
+    """요청 하나에 대해 정해진 결과."""
+    fault: str              # "", "429", "5xx", "timeout"
+    ttfb_sec: float
+    token_sec: List[float]
+    tokens: List[str]
+    input_tokens: int
+
+
+class Simulator:
+    def __init__(self, config: SimConfig | None = None):
+        self.config = config or SimConfig()
+        self.config.validate()
+        self._ttfb, self._interval, self._output_tokens = self.config.distributions()
+        self.stats: Counter = Counter()
+        self._seen: Counter = Counter()
+
+    def configure(self, **changes: Any) -> SimConfig:
+        known = {f.name for f in fields(SimConfig)}
+        unknown = set(changes) - known
+        if unknown:
+            raise ValueError(f"unknown config keys: {sorted(unknown)}")
+        config = SimConfig(**{**asdict(self.config), **changes})
+        config.validate()
+        self.config = config
+        self._ttfb, self._interval, self._output_tokens = config.distributions()
+        self._seen.clear()
+        return config
+
+    def plan(self, call: _Call) -> _Plan:
+        cfg = self.config
+        digest = hashlib.sha256(f"{call.api}\n{call.model}\n{call.prompt}".encode()).hexdigest()[:16]
+        n = self._seen[digest]
+        self._seen[digest] += 1
+        rng = random.Random(f"{cfg.seed}:{digest}:{n}")
+
+        u = rng.random()
+        fault = ""
+        if u < cfg.rate_429:
+            fault = "429"
+        elif u < cfg.rate_429 + cfg.rate_5xx:
+            fault = "5xx"
+        elif u < cfg.rate_429 + cfg.rate_5xx + cfg.rate_timeout:
+            fault = "timeout"
+
+        count = max(1, min(call.max_tokens or 1 << 30, int(round(self._output_tokens.sample(rng)))))
+        return _Plan(
+            fault=fault,
+            ttfb_sec=self._ttfb.sample(rng),
+            token_sec=[self._interval.sample(rng) for _ in range(count)],
+            tokens=[rng.choice(WORDS) + " " for _ in range(count)],
+            input_tokens=max(1, len(call.prompt) // 4),
+        )
+
+    async def respond(self, call: _Call, render: "_Renderer") -> Response:
+        plan = self.plan(call)
+        outcome = plan.fault or "ok"
+        self.stats[f"{call.api}:{outcome}"] += 1
+        if plan.fault == "timeout":
+            await asyncio.sleep(self.config.hang_sec)
+            return JSONResponse(render.error(504, "simulated timeout"), status_code=504)
+        if plan.fault == "429":
+            await asyncio.sleep(min(plan.ttfb_sec, 0.05))
+            return JSONResponse(
+                render.error(429, "simulated rate limit"), status_code=429,
+                headers={"retry-after": f"{self.config.retry_after_sec:g}"},
+            )
+        if plan.fault == "5xx":
+            await asyncio.sleep(plan.ttfb_sec)
+            return JSONResponse(render.error(503, "simulated upstream error"), status_code=503)
+
+        if not call.stream:
+            await asyncio.sleep(plan.ttfb_sec + sum(plan.token_sec))
+            return JSONResponse(render.body(call, plan))
+
+        async def events() -> AsyncIterator[str]:
+            await asyncio.sleep(plan.ttfb_sec)
+            for chunk in render.stream(call, plan):
+                if isinstance(chunk, float):
+                    await asyncio.sleep(chunk)
+                else:
+                    yield chunk
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _sse(data: Dict[str, Any], event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _text_of(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(_text_of(c.get("text", c.get("content", ""))) if isinstance(c, dict) else str(c) for c in content)
+    return ""
+
+
+class _Renderer:
+    """api 하나의 응답 형식. stream()은 SSE 문자열과 대기 시간(float, 초)을 섞어 내보낸다."""
+
+    def error(self, status: int, message: str) -> Dict[str, Any]:
+        return {"error": {"message": message, "code": status}}
+
+    def body(self, call: _Call, plan: _Plan) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def stream(self, call: _Call, plan: _Plan) -> List[str | float]:
+        raise NotImplementedError
+
+
+class _OpenAIResponses(_Renderer):
+    def usage(self, plan: _Plan) -> Dict[str, Any]:
+        return {
+            "input_tokens": plan.input_tokens, "output_tokens": len(plan.tokens),
+            "input_tokens_details": {"cached_tokens": 0},
+        }
+
+    def body(self, call: _Call, plan: _Plan) -> Dict[str, Any]:
+        return {
+            "object": "response", "model": call.model, "status": "completed",
+            "output": [{"type": "message", "role": "assistant",
+                        "content": [{"type": "output_text", "text": "".join(plan.tokens)}]}],
+            "usage": self.usage(plan),
+        }
+
+    def stream(self, call: _Call, plan: _Plan) -> List[str | float]:
+        out: List[str | float] = []
+        for token, delay in zip(plan.tokens, plan.token_sec):
+            out += [delay, _sse({"type": "response.output_text.delta", "delta": token}, "response.output_text.delta")]
+        out.append(_sse({"type": "response.completed", "response": self.body(call, plan)}, "response.completed"))
+        return out
+
+
+class _AnthropicMessages(_Renderer):
+    def error(self, status: int, message: str) -> Dict[str, Any]:
+        kind = {429: "rate_limit_error", 503: "overloaded_error"}.get(status, "api_error")
+        return {"type": "error", "error": {"type": kind, "message": message}}
+
+    def body(self, call: _Call, plan: _Plan) -> Dict[str, Any]:
+        return {
+            "type": "message", "role": "assistant", "model": call.model, "stop_reason": "end_turn",
+            "content": [{"type": "text", "text": "".join(plan.tokens)}],
+            "usage": {"input_tokens": plan.input_tokens, "output_tokens": len(plan.tokens),
+                      "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0},
+        }
+
+    def stream(self, call: _Call, plan: _Plan) -> List[str | float]:
+        start = {"type": "message_start", "message": {
+            "type": "message", "role": "assistant", "model": call.model, "content": [],
+            "usage": {"input_tokens": plan.input_tokens, "output_tokens": 1},
+        }}
+        out: List[str | float] = [
+            _sse(start, "message_start"),
+            _sse({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}, "content_block_start"),
+        ]
+        for token, delay in zip(plan.tokens, plan.token_sec):
+            delta = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}}
+            out += [delay, _sse(delta, "content_block_delta")]
+        out += [
+            _sse({"type": "content_block_stop", "index": 0}, "content_block_stop"),
+            _sse({"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": len(plan.tokens)}}, "message_delta"),
+            _sse({"type": "message_stop"}, "message_stop"),
+        ]
+        return out
+
+
+class _Gemini(_Renderer):
+    def error(self, status: int, message: str) -> Dict[str, Any]:
+        return {"error": {"code": status, "message": message, "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"}}
+
+    def usage(self, plan: _Plan, output_tokens: int) -> Dict[str, Any]:
+        return {"promptTokenCount": plan.input_tokens, "candidatesTokenCount": output_tokens,
+                "totalTokenCount": plan.input_tokens + output_tokens}
+
+    def body(self, call: _Call, plan: _Plan) -> Dict[str, Any]:
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": "".join(plan.tokens)}]}, "finishReason": "STOP"}],
+            "usageMetadata": self.usage(plan, len(plan.tokens)),
+            "modelVersion": call.model,
+        }
+
+    def stream(self, call: _Call, plan: _Plan) -> List[str | float]:
+        out: List[str | float] = []
+        for i, (token, delay) in enumerate(zip(plan.tokens, plan.token_sec), start=1):
+            chunk = {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": token}]}}],
+                "usageMetadata": self.usage(plan, i),
+            }
+            out += [delay, _sse(chunk)]
+        return out
+
+
+class _ChatCompletions(_Renderer):
+    def usage(self, plan: _Plan) -> Dict[str, Any]:
+        return {"prompt_tokens": plan.input_tokens, "completion_tokens": len(plan.tokens),
+                "total_tokens": plan.input_tokens + len(plan.tokens)}
+
+    def body(self, call: _Call, plan: _Plan) -> Dict[str, Any]:
+        return {
+            "object": "chat.completion", "model": call.model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(plan.tokens)}}],
+            "usage": self.usage(plan),
+        }
+
+    def stream(self, call: _Call, plan: _Plan) -> List[str | float]:
+        out: List[str | float] = []
+        for token, delay in zip(plan.tokens, plan.token_sec):
+            chunk = {"object": "chat.completion.chunk", "model": call.model,
+                     "choices": [{"index": 0, "delta": {"content": token}}]}
+            out += [delay, _sse(chunk)]
+        out += [
+            _sse({"object": "chat.completion.chunk", "model": call.model,
+                  "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": self.usage(plan)}),
+            "data: [DONE]\n\n",
+        ]
+        return out
+
+
+async def _json_body(request: Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="request body must be JSON") from None
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="request body must be a JSON object")
+    return body
+
+
+def create_app(config: SimConfig | None = None) -> FastAPI:
+    sim = Simulator(config)
+    app = FastAPI(title="Debait provider simulator")
+    app.state.simulator = sim
+    renderers: Dict[str, _Renderer] = {
+        "openai_responses": _OpenAIResponses(),
+        "anthropic_messages": _AnthropicMessages(),
+        "gemini": _Gemini(),
+        "chat_completions": _ChatCompletions(),
+    }
+
+    def endpoint(api: str, parse: Callable[[Dict[str, Any]], tuple[str, str, int, bool]]):
+        async def handle(request: Request) -> Response:
+            model, prompt, max_tokens, stream = parse(await _json_body(request))
+            return await sim.respond(_Call(api, model, prompt, int(max_tokens or 0), bool(stream)), renderers[api])
+        return handle
+
+    app.post("/v1/responses")(endpoint("openai_responses", lambda b: (
+        b.get("model", ""),
+        "\n".join(_text_of(m.get("content")) for m in b.get("input", []) if isinstance(m, dict))
+        if isinstance(b.get("input"), list) else _text_of(b.get("input")),
+        b.get("max_output_tokens"), b.get("stream"),
+    )))
+    app.post("/v1/messages")(endpoint("anthropic_messages", lambda b: (
+        b.get("model", ""),
+        "\n".join([_text_of(b.get("system"))] + [_text_of(m.get("content")) for m in b.get("messages", [])]),
+        b.get("max_tokens"), b.get("stream"),
+    )))
+    app.post("/v1/chat/completions")(endpoint("chat_completions", lambda b: (
+        b.get("model", ""),
+        "\n".join(_text_of(m.get("content")) for m in b.get("messages", [])),
+        b.get("max_tokens"), b.get("stream"),
+    )))
+
+    @app.post("/v1beta/models/{target}")
+    async def gemini(target: str, request: Request) -> Response:
+        model, _, method = target.partition(":")
+        if method not in ("generateContent", "streamGenerateContent"):
+            raise HTTPException(status_code=404, detail=f"unknown method: {method}")
+        b = await _json_body(request)
+        parts = [_text_of((b.get("systemInstruction") or {}).get("parts"))]
+        parts += [_text_of(c.get("parts")) for c in b.get("contents", [])]
+        call = _Call(
+            "gemini", model, "\n".join(parts), int((b.get("generationConfig") or {}).get("maxOutputTokens") or 0),
+            method == "streamGenerateContent",
+        )
+        return await sim.respond(call, renderers["gemini"])
+
+    @app.post("/bot{token}/{method}")
+    async def telegram(token: str, method: str, request: Request) -> Dict[str, Any]:
+        # Telegram Bot API 답장 sink. 지연 없이 성공만 돌려주고 호출 수를 센다.
+        if method not in ("sendMessage", "editMessageText"):
+            raise HTTPException(status_code=404, detail=f"unknown method: {method}")
+        b = await _json_body(request)
+        sim.stats[f"telegram:{method}"] += 1
+        message_id = b.get("message_id") or sim.stats["telegram:sendMessage"]
+        return {"ok": True, "result": {"message_id": message_id, "chat": {"id": b.get("chat_id")}, "text": b.get("text", "")}}
+
+    @app.get("/_sim/config")
+    def get_config() -> Dict[str, Any]:
+        return asdict(sim.config)
+
+    @app.put("/_sim/config")
+    async def put_config(request: Request) -> Dict[str, Any]:
+        try:
+            return asdict(sim.configure(**await _json_body(request)))
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=str(e)) from None
+
+    @app.get("/_sim/stats")
+    def get_stats() -> Dict[str, int]:
+        return dict(sim.stats)
+
+    @app.delete("/_sim/stats")
+    def reset_stats() -> Dict[str, int]:
+        sim.stats.clear()
+        return {}
+
+    return app
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    defaults = SimConfig()
+    parser = argparse.ArgumentParser(description="Debait provider simulator (OpenAI/Anthropic/Gemini/chat-completions)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--ttfb", default=defaults.ttfb, help="첫 토큰까지 초 (분포)")
+    parser.add_argument("--token-interval", default=defaults.token_interval, help="토큰당 초 (분포)")
+    parser.add_argument("--output-tokens", default=defaults.output_tokens, help="출력 토큰 수 (분포)")
+    parser.add_argument("--rate-429", type=float, default=defaults.rate_429)
+    parser.add_argument("--rate-5xx", type=float, default=defaults.rate_5xx)
+    parser.add_argument("--rate-timeout", type=float, default=defaults.rate_timeout)
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after_sec, dest="retry_after_sec")
+    parser.add_argument("--hang-sec", type=float, default=defaults.hang_sec, help="timeout 장애에서 응답을 미루는 초")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> None:
+    import uvicorn
+
+    args = parse_args(argv)
+    config = SimConfig(**{f.name: getattr(args, f.name) for f in fields(SimConfig)})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
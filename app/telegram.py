@@ -1,11 +1,91 @@
-import httpx
+import time
+
 from .settings import settings
+from .http_client import get_client
+
+
+def _api_url(method: str) -> str:
+    return f"{settings.telegram_api_url.rstrip('/')}/bot{settings.telegram_bot_token}/{method}"
 
-TELEGRAM_API = "https://api.telegram.org"
 
 async def send_message(chat_id: str, text: str):
-    url = f"{TELEGRAM_API}/bot{settings.telegram_bot_token}/sendMessage"
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.post(url, json={"chat_id": chat_id, "text": text})
-        r.raise_for_status()
-        return r.json()
+    url = _api_url("sendMessage")
+    r = await get_client("telegram").post(url, json={"chat_id": chat_id, "text": text})
+    r.raise_for_status()
+    return r.json()
+
+
+async def edit_message(chat_id: str, message_id: int, text: str):
+    url = _api_url("editMessageText")
+    r = await get_client("telegram").post(url, json={"chat_id": chat_id, "message_id": message_id, "text": text})
+    r.raise_for_status()
+    return r.json()
+
+
+class StreamingReply:
+    """하나의 Telegram 메시지를 run_orchestrator 진행 이벤트로 주기적으로 갱신한다.
+
+    Telegram은 편집 빈도 제한이 있으므로 min_interval_sec 간격으로만 editMessageText를 호출한다.
+    """
+
+    MAX_LEN = 4096
+
+    def __init__(self, chat_id: str, min_interval_sec: float = 1.5):
+        self.chat_id = chat_id
+        self.min_interval_sec = min_interval_sec
+        self.message_id: int | None = None
+        self.stage_status: dict[str, str] = {}
+        self.live_stage = ""
+        self.live_text = ""
+        self._last_rendered = ""
+        self._last_flush = 0.0
+
+    async def start(self, text: str) -> None:
+        data = await send_message(self.chat_id, text)
+        self.message_id = (data.get("result") or {}).get("message_id")
+        self._last_rendered = text
+        self._last_flush = time.monotonic()
+
+    def render(self) -> str:
+        lines = [f"{'✅' if done == 'done' else '⏳'} {name}" for name, done in self.stage_status.items()]
+        if self.live_text:
+            lines += ["", self.live_text]
+        text = "\n".join(lines).strip() or "..."
+        return text[-self.MAX_LEN:]
+
+    async def on_event(self, event: dict) -> None:
+        etype = event.get("type")
+        stage = event.get("stage", "")
+        if etype == "stage_start":
+            self.stage_status[stage] = "running"
+            self.live_stage, self.live_text = stage, ""
+        elif etype == "token" and stage == self.live_stage:
+            self.live_text += event.get("text", "")
+        elif etype == "retry" and stage == self.live_stage:
+            self.live_text = ""
+        elif etype == "stage_done":
+            self.stage_status[stage] = "done"
+        else:
+            return
+        if time.monotonic() - self._last_flush >= self.min_interval_sec:
+            await self.flush()
+
+    async def flush(self) -> None:
+        text = self.render()
+        self._last_flush = time.monotonic()
+        if self.message_id is None or text == self._last_rendered:
+            return
+        try:
+            await edit_message(self.chat_id, self.message_id, text)
+            self._last_rendered = text
+        except Exception:
+            pass
+
+    async def finish(self, final: str) -> None:
+        if self.message_id is not None and len(final) <= self.MAX_LEN:
+            try:
+                await edit_message(self.chat_id, self.message_id, final)
+                return
+            except Exception:
+                pass
+        await send_message(self.chat_id, final)
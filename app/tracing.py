@@ -0,0 +1,410 @@
+"""요청/run 단위 tracing. span 모델과 export 형식은 OpenTelemetry(OTLP/JSON)와 같다.
+
+span은 contextvars로 부모를 찾으므로 asyncio task와 run_db 스레드로도 이어진다.
+trace의 root span이 끝나면 그 trace의 span을 모아 OTLP/JSON 한 줄(resourceSpans)로 파일에 쓴다.
+(OpenTelemetry Collector의 file exporter 형식이라 otlpjsonfile receiver로 그대로 다시 보낼 수 있다)
+파일 쓰기는 별도 스레드에서 하므로 이벤트 루프를 막지 않는다.
+
+span에 timing(db/decrypt/provider/backoff/render)을 달면 trace별로 합산해 Server-Timing 헤더에 쓴다.
+합산은 자기 시간 기준이다. 다른 timing span 안에서 열린 span의 시간은 바깥 span 몫에서 뺀다.
+꺼져 있으면 span()은 아무것도 기록하지 않는 공유 객체를 돌려준다.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, TypeVar
+
+T = TypeVar("T")
+
+# OTLP SpanKind / StatusCode
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+# Server-Timing에 쓰는 순서
+TIMINGS = ("db", "decrypt", "provider", "backoff", "render")
+
+
+@dataclass
+class TraceConfig:
+    enabled: bool = False
+    export_path: str = "./traces.jsonl"   # 비우면 파일로 내보내지 않는다 (Server-Timing만)
+    service_name: str = "debait"
+
+
+class _Trace:
+    """한 trace에서 끝난 span과 timing 합계. root span이 끝나면 export된다."""
+    __slots__ = ("trace_id", "spans", "timings", "exported")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.timings: Dict[str, float] = {}
+        self.exported = False
+
+
+class Span:
+    __slots__ = (
+        "name", "kind", "span_id", "parent", "parent_span_id", "start_ns", "end_ns", "attributes", "events",
+        "status", "status_message", "timing", "_trace", "_tracer", "_token",
+    )
+
+    def __init__(
+        self, tracer: "Tracer", name: str, trace: _Trace, parent: "Span | None", parent_span_id: str,
+        kind: int, timing: str | None, attributes: Dict[str, Any],
+    ):
+        self.name = name
+        self.kind = kind
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent = parent
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.events: List[tuple[int, str, Dict[str, Any]]] = []
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.timing = timing
+        self._trace = trace
+        self._tracer = tracer
+        self._token: contextvars.Token | None = None
+
+    @property
+    def trace_id(self) -> str:
+        return self._trace.trace_id
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append((time.time_ns(), name, attributes))
+
+    def record_error(self, error: BaseException | str) -> None:
+        self.status = STATUS_ERROR
+        self.status_message = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+    def end(self, error: BaseException | str | None = None) -> None:
+        """여러 번 불러도 된다. (두 번째부터는 무시)"""
+        if self.end_ns:
+            return
+        if error is not None:
+            self.record_error(error)
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # 다른 context(task)에서 끝난 span: 그 context는 이미 사라졌으므로 되돌릴 것이 없다.
+                pass
+            self._token = None
+        self._tracer._finish(self)
+
+    def __enter__(self) -> "Span":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end(exc if exc is not None and not isinstance(exc, GeneratorExit) else None)
+
+
+class _NoopSpan:
+    """tracing이 꺼져 있을 때 돌려주는 span. 아무것도 기록하지 않는다."""
+    __slots__ = ()
+    name = ""
+    trace_id = ""
+    span_id = ""
+    recording = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException | str) -> None:
+        pass
+
+    def end(self, error: BaseException | str | None = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("debait_current_span", default=None)
+
+
+def current_span() -> Span | _NoopSpan:
+    return _current.get() or NOOP_SPAN
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str] | None:
+    """W3C traceparent("00-<trace_id>-<span_id>-<flags>")에서 (trace_id, parent span_id)를 꺼낸다."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+def server_timing(timings: Dict[str, float], total_ms: float | None = None) -> str:
+    """Server-Timing 헤더 값. provider는 병렬 호출의 합이라 total보다 클 수 있다."""
+    parts = [f"{name};dur={timings[name]:.1f}" for name in TIMINGS if timings.get(name, 0.0) > 0]
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+class Tracer:
+    def __init__(self):
+        self.config = TraceConfig()
+        self._exporter: JsonlExporter | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    def configure(self, config: TraceConfig) -> None:
+        self.shutdown()
+        self.config = config
+        if config.enabled and config.export_path:
+            self._exporter = JsonlExporter(config.export_path, config.service_name)
+
+    def shutdown(self) -> None:
+        """남은 trace를 모두 파일에 쓰고 exporter 스레드를 끝낸다."""
+        exporter, self._exporter = self._exporter, None
+        if exporter is not None:
+            exporter.stop()
+
+    def start_span(
+        self, name: str, *, kind: int = KIND_INTERNAL, timing: str | None = None,
+        remote_parent: tuple[str, str] | None = None, **attributes: Any,
+    ) -> Span | _NoopSpan:
+        """span을 열고 현재 span으로 만든다. 반드시 end()로 닫는다. (with 문도 된다)
+
+        현재 span이 없으면 새 trace의 root가 된다. remote_parent(traceparent)가 있으면 그 trace를 잇는다.
+        """
+        if not self.config.enabled:
+            return NOOP_SPAN
+        parent = _current.get()
+        if parent is not None:
+            trace, parent_span_id = parent._trace, parent.span_id
+        elif remote_parent is not None:
+            trace, parent_span_id = _Trace(remote_parent[0]), remote_parent[1]
+        else:
+            trace, parent_span_id = _Trace("%032x" % random.getrandbits(128)), ""
+        span = Span(self, name, trace, parent, parent_span_id, kind, timing, attributes)
+        span._token = _current.set(span)
+        return span
+
+    span = start_span
+
+    def timings(self, span: Span | _NoopSpan | None = None) -> Dict[str, float]:
+        """span(기본: 현재 span)이 속한 trace의 timing별 합계(ms). 지금까지 끝난 span만 들어간다."""
+        span = span if span is not None else _current.get()
+        if not isinstance(span, Span):
+            return {}
+        return dict(span._trace.timings)
+
+    def _finish(self, span: Span) -> None:
+        trace = span._trace
+        if span.timing is not None:
+            dur_ms = (span.end_ns - span.start_ns) / 1e6
+            trace.timings[span.timing] = trace.timings.get(span.timing, 0.0) + dur_ms
+            outer = span.parent
+            while outer is not None and outer.timing is None:
+                outer = outer.parent
+            if outer is not None:
+                # 바깥 timing span이 자기 전체 시간을 더하므로 겹치는 몫을 뺀다.
+                trace.timings[outer.timing] = trace.timings.get(outer.timing, 0.0) - dur_ms
+        trace.spans.append(span)
+        if span.parent is None:
+            self._export(trace)
+        elif trace.exported:
+            # root가 먼저 끝난 뒤(예: 분리된 task) 닫힌 span은 따로 내보낸다.
+            self._export(trace)
+
+    def _export(self, trace: _Trace) -> None:
+        spans, trace.spans = trace.spans, []
+        trace.exported = True
+        if self._exporter is not None and spans:
+            self._exporter.export(spans)
+
+    def traced(self, name: str | None = None, *, timing: str | None = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """함수(동기/async) 호출 전체를 span으로 감싼다. name을 생략하면 함수의 qualified name."""
+        def decorate(fn: Callable[..., T]) -> Callable[..., T]:
+            span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    if not self.config.enabled:
+                        return await fn(*args, **kwargs)
+                    with self.start_span(span_name, timing=timing):
+                        return await fn(*args, **kwargs)
+                return async_wrapper  # type: ignore[return-value]
+
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.config.enabled:
+                    return fn(*args, **kwargs)
+                with self.start_span(span_name, timing=timing):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+
+# ── OTLP/JSON file exporter ──────────────────────────────────────────────────
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": span.status},
+    }
+    if span.parent_span_id:
+        out["parentSpanId"] = span.parent_span_id
+    if span.status_message:
+        out["status"]["message"] = span.status_message
+    if span.events:
+        out["events"] = [
+            {"timeUnixNano": str(ts), "name": name, "attributes": _otlp_attributes(attrs)}
+            for ts, name, attrs in span.events
+        ]
+    return out
+
+
+class JsonlExporter:
+    """끝난 trace를 OTLP/JSON(ExportTraceServiceRequest) 한 줄씩 파일에 덧붙이는 writer 스레드."""
+
+    def __init__(self, path: str, service_name: str = "debait"):
+        self.path = path
+        self.service_name = service_name
+        self._queue: "queue.SimpleQueue[List[Span] | None]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, spans: List[Span]) -> None:
+        self._queue.put(spans)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _line(self, spans: List[Span]) -> str:
+        return json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{"scope": {"name": "debait"}, "spans": [otlp_span(s) for s in spans]}],
+            }],
+        }, ensure_ascii=False, default=str)
+
+    def _run(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            lines = [self._line(spans) for spans in batch if spans]
+            if lines:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            if stopping:
+                return
+
+
+tracer = Tracer()
+
+
+class TracingMiddleware:
+    """ASGI middleware. HTTP 요청마다 SERVER span을 열고, 응답 헤더를 보낼 때 Server-Timing을 붙인다.
+
+    요청에 traceparent 헤더가 있으면 그 trace를 잇는다.
+    스트리밍 응답은 헤더를 먼저 보내므로 Server-Timing에는 그때까지 끝난 몫만 들어간다. (span은 본문이 끝날 때 닫힌다)
+    """
+
+    def __init__(self, app: Any, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        traceparent = dict(scope.get("headers") or []).get(b"traceparent", b"").decode("latin-1")
+        span = self.tracer.start_span(
+            f"{method} {scope['path']}", kind=KIND_SERVER, remote_parent=parse_traceparent(traceparent),
+            **{"http.request.method": method, "url.path": scope["path"]},
+        )
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.name = f"{method} {route}"
+                    span.set_attribute("http.route", route)
+                span.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.record_error(f"HTTP {message['status']}")
+                value = server_timing(self.tracer.timings(span), (time.perf_counter() - started) * 1000)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", value.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except BaseException as e:
+            span.end(e)
+            raise
+        finally:
+            span.end()
@@ -0,0 +1,141 @@
+"""DB 쓰기 처리량 벤치마크: run 결과를 run마다 따로 commit할 때와 write batcher로 묶을 때를 비교한다.
+
+    python scripts/bench_db_writes.py --runs 500 --concurrency 50
+    python scripts/bench_db_writes.py --journal-mode DELETE --synchronous FULL   # 튜닝 전 SQLite 기본값
+
+임시 SQLite 파일을 사용하며, 초당 commit 수와 run 처리량, 저장 지연시간을 JSON으로 출력한다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--stages", type=int, default=3, help="run 하나가 남기는 스테이지 메시지/UsageEvent 수")
+    parser.add_argument("--journal-mode", default="WAL")
+    parser.add_argument("--synchronous", default="NORMAL")
+    parser.add_argument("--batch", type=int, default=64, help="write batcher 최대 묶음 크기")
+    parser.add_argument("--delay-ms", type=float, default=2.0, help="write batcher 대기 시간")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+# app.db는 import 시점에 환경변수를 읽는다.
+os.environ.setdefault("MASTER_KEY", Fernet.generate_key().decode())
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='debait-bench-'), 'bench.db')}"
+os.environ["SQLITE_JOURNAL_MODE"] = ARGS.journal_mode
+os.environ["SQLITE_SYNCHRONOUS"] = ARGS.synchronous
+
+from sqlalchemy import event  # noqa: E402
+
+from app.db import Base, SessionLocal, db_writer, engine, run_db  # noqa: E402
+from app.models import User  # noqa: E402
+from app.repositories import add_thread_run_result, save_thread_run_result, start_thread_turn  # noqa: E402
+
+USER_ID = 1
+commits = 0
+
+
+@event.listens_for(engine, "commit")
+def _count_commit(_conn) -> None:
+    global commits
+    commits += 1
+
+
+def fake_result(stages: int) -> dict:
+    return {
+        "final": "answer " * 50,
+        "stages": [{"name": f"Stage{i}", "text": "draft " * 100} for i in range(stages)],
+        "usage": {f"Stage{i}": {"provider": "openai", "model": "gpt-4o-mini", "input_tokens": 100,
+                                "output_tokens": 50, "cost_usd": 0.001} for i in range(stages)},
+    }
+
+
+def setup() -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(User(id=USER_ID, email="bench@local", password_hash=""))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def measure(mode: str, runs: int, concurrency: int, result: dict) -> dict:
+    global commits
+    # 결과 저장 단계만 비교하도록 thread와 user 메시지는 미리 만든다.
+    thread_ids = []
+    db = SessionLocal()
+    try:
+        for n in range(runs):
+            thread_ids.append(start_thread_turn(db, USER_ID, f"bench:{mode}:{n}", "question")[0])
+    finally:
+        db.close()
+
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def one(thread_id: int):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                if mode == "per_run_commit":
+                    await run_db(save_thread_run_result, USER_ID, thread_id, "question", result)
+                else:
+                    await db_writer.write(add_thread_run_result, USER_ID, thread_id, "question", result)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    commits = 0
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(t) for t in thread_ids))
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "runs": runs,
+        "errors": errors,
+        "elapsed_sec": round(elapsed, 3),
+        "commits": commits,
+        "commits_per_sec": round(commits / elapsed, 1),
+        "runs_per_sec": round(runs / elapsed, 1),
+        "save_latency_ms": {
+            "p50": round(statistics.median(latencies), 2),
+            "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        },
+    }
+
+
+def main() -> None:
+    setup()
+    db_writer.configure(ARGS.batch, ARGS.delay_ms)
+    result = fake_result(ARGS.stages)
+    results = [
+        asyncio.run(measure(mode, ARGS.runs, ARGS.concurrency, result))
+        for mode in ("per_run_commit", "batched")
+    ]
+    db_writer.stop()
+    print(json.dumps({
+        "sqlite": {"journal_mode": ARGS.journal_mode, "synchronous": ARGS.synchronous},
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
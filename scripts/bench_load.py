@@ -0,0 +1,441 @@
+"""부하 벤치마크: /ask, Telegram webhook(/tg/{secret}), run_orchestrator를 동시성 단계별로 돌려 한계를 잰다.
+
+    python scripts/bench_load.py --scenarios ask,telegram,orchestrator --concurrency 1,8,32 --requests 32
+    python scripts/bench_load.py --output bench-v2.json --compare bench-v1.json   # 회귀 비교 (회귀가 있으면 exit 1)
+    python scripts/bench_load.py --ttfb lognormal:0.8,0.5 --rate-429 0.05 --rate-5xx 0.02  # 느리고 불안정한 provider
+
+provider와 Telegram Bot API는 app.simulator 하위 프로세스(또는 --sim-url)로 대신한다.
+앱은 같은 프로세스의 uvicorn으로 띄우고 실제 HTTP로 요청하므로, 이벤트 루프 지연과 RSS는 앱 프로세스 기준이다.
+(부하 생성기도 같은 루프에서 돌기 때문에 그만큼 여유가 줄어든 값이다)
+단계마다 처리량, 지연시간 p50/p95/p99, 루프 지연, RSS 증가량, 초당 DB commit 수, run 결과별 개수를 JSON으로 남긴다.
+telegram 지연시간은 webhook 요청부터 답장 처리(worker)가 끝날 때까지이고, webhook 응답 시간은 ack_latency_ms로 따로 낸다.
+DB는 기본으로 임시 SQLite 파일을 쓴다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+from cryptography.fernet import Fernet
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("ask", "telegram", "orchestrator")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="쉼표로 구분 (ask, telegram, orchestrator)")
+    parser.add_argument("--concurrency", default="1,8,32", help="쉼표로 구분한 동시성 단계")
+    parser.add_argument("--requests", type=int, default=32, help="단계마다 보낼 요청 수")
+    parser.add_argument("--warmup", type=int, default=2, help="시나리오마다 측정 전에 보낼 요청 수")
+    parser.add_argument("--timeout-sec", type=float, default=300.0, help="요청 하나의 최대 대기 시간")
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="loop lag / RSS 측정 주기")
+    parser.add_argument("--db-url", default="", help="비우면 임시 SQLite 파일")
+    parser.add_argument("--telegram-workers", type=int, default=0, help="0이면 가장 큰 동시성 단계")
+    parser.add_argument("--sim-url", default="", help="이미 떠 있는 simulator 주소 (비우면 하위 프로세스로 띄움)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ttfb", default="lognormal:0.2,0.3", help="simulator 첫 토큰까지 초 (분포)")
+    parser.add_argument("--token-interval", default="fixed:0.002", help="simulator 토큰당 초 (분포)")
+    parser.add_argument("--output-tokens", default="uniform:50,200", help="simulator 출력 토큰 수 (분포)")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--rate-timeout", type=float, default=0.0)
+    parser.add_argument("--output", default="", help="결과 JSON 파일 (비우면 stdout만)")
+    parser.add_argument("--compare", default="", help="이전 결과 JSON과 단계별로 비교")
+    parser.add_argument("--regress-pct", type=float, default=10.0, help="처리량 감소/p95 증가가 이 비율을 넘으면 회귀")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    args.levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {sorted(unknown)}")
+    return args
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_simulator(args: argparse.Namespace) -> tuple[str, subprocess.Popen | None]:
+    if args.sim_url:
+        return args.sim_url.rstrip("/"), None
+    port = free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "app.simulator", "--port", str(port), "--seed", str(args.seed),
+            "--ttfb", args.ttfb, "--token-interval", args.token_interval, "--output-tokens", args.output_tokens,
+            "--rate-429", str(args.rate_429), "--rate-5xx", str(args.rate_5xx), "--rate-timeout", str(args.rate_timeout),
+        ],
+        cwd=ROOT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15
+    while True:
+        try:
+            httpx.get(f"{url}/_sim/config", timeout=1).raise_for_status()
+            return url, proc
+        except httpx.HTTPError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise SystemExit("simulator did not start")
+            time.sleep(0.1)
+
+
+ARGS = parse_args()
+STARTED_AT = datetime.now(timezone.utc).isoformat(timespec="seconds")
+SIM_URL, SIM_PROC = start_simulator(ARGS)
+# app.settings / app.db는 import 시점에 환경변수를 읽고, 템플릿 경로는 작업 디렉터리 기준이다.
+os.chdir(ROOT)
+os.environ.setdefault("MASTER_KEY", Fernet.generate_key().decode())
+os.environ["DB_URL"] = ARGS.db_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='debait-bench-'), 'load.db')}"
+os.environ["PROVIDER_BASE_URL"] = SIM_URL
+os.environ["TELEGRAM_API_URL"] = SIM_URL
+os.environ["TELEGRAM_BOT_TOKEN"] = "bench"
+os.environ["WEBHOOK_SECRET"] = "bench-secret"
+os.environ["TELEGRAM_WORKERS"] = str(ARGS.telegram_workers or max(ARGS.levels))
+for name in ("OPENAI_BASE_URL", "ANTHROPIC_BASE_URL", "GOOGLE_BASE_URL", "GROQ_BASE_URL", "MISTRAL_BASE_URL"):
+    os.environ[name] = ""
+
+import uvicorn  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.db import engine, run_db  # noqa: E402
+from app.metrics import registry  # noqa: E402
+from app.models import TelegramLink  # noqa: E402
+from app.orchestrator.runner import Budget, run_orchestrator  # noqa: E402
+from app.repositories import load_run_inputs  # noqa: E402
+
+USER_ID = app_main.SINGLE_USER_ID
+PROVIDERS = ("openai", "anthropic", "google", "groq", "mistral")
+OUTCOMES = ("ok", "failed", "refused", "cancelled", "error")
+QUESTIONS = (
+    "Compare Redis and Memcached for session caching in a multi-region deployment",
+    "Design a retry and backoff policy for a payment webhook consumer with exactly-once side effects",
+    "Explain how to shard a Postgres table of 2 billion events and migrate without downtime",
+    "What are the trade-offs between Kafka and a Postgres outbox for service-to-service events",
+)
+
+commits = 0
+telegram_done: dict[str, asyncio.Event] = {}
+update_ids = iter(range(1, 1 << 62))
+
+
+@event.listens_for(engine, "commit")
+def _count_commit(_conn) -> None:
+    global commits
+    commits += 1
+
+
+def _track_telegram(handler):
+    """worker가 메시지 처리를 끝낸 시각을 chat_id별로 알린다. (startup에서 worker에 넘기기 전에 바꿔 끼운다)"""
+    async def handle(chat_id: str, text: str):
+        try:
+            await handler(chat_id, text)
+        finally:
+            if chat_id in telegram_done:
+                telegram_done[chat_id].set()
+    return handle
+
+
+app_main.process_telegram_message = _track_telegram(app_main.process_telegram_message)
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # /proc가 없으면 최대 RSS로 대신한다
+
+
+def pct(values: list[float], q: float) -> float:
+    return round(values[min(len(values) - 1, int(len(values) * q))], 2) if values else 0.0
+
+
+def summary(values: list[float]) -> dict:
+    values = sorted(values)
+    return {
+        "p50": round(statistics.median(values), 2) if values else 0.0,
+        "p95": pct(values, 0.95),
+        "p99": pct(values, 0.99),
+        "max": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def question(scenario: str, level: int, n: int) -> str:
+    return f"{QUESTIONS[n % len(QUESTIONS)]} (load test {scenario} c{level} #{n})"
+
+
+def link_chats(db, chat_ids: list[str]) -> None:
+    db.add_all(TelegramLink(user_id=USER_ID, chat_id=c) for c in chat_ids)
+    db.commit()
+
+
+class Scenario:
+    def __init__(self, client: httpx.AsyncClient, level: int):
+        self.client = client
+        self.level = level
+        self.acks: list[float] = []
+
+    async def prepare(self, ns: range) -> None:
+        pass
+
+    async def one(self, n: int) -> None:
+        raise NotImplementedError
+
+
+class Ask(Scenario):
+    async def one(self, n: int) -> None:
+        r = await self.client.post("/ask", data={"question": question("ask", self.level, n), "skip_clarify": "1"})
+        r.raise_for_status()
+
+
+class Telegram(Scenario):
+    def chat_id(self, n: int) -> str:
+        return str(1_000_000 + n)  # n은 단계/warmup 전체에서 겹치지 않는다
+
+    async def prepare(self, ns: range) -> None:
+        await run_db(link_chats, [self.chat_id(n) for n in ns])
+
+    async def one(self, n: int) -> None:
+        chat_id = self.chat_id(n)
+        telegram_done[chat_id] = done = asyncio.Event()
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.post(f"/tg/{app_main.settings.webhook_secret}", json={
+                "update_id": next(update_ids),
+                "message": {"chat": {"id": int(chat_id)}, "text": question("telegram", self.level, n)},
+            })
+            r.raise_for_status()
+            self.acks.append((time.perf_counter() - t0) * 1000)
+            await done.wait()
+        finally:
+            telegram_done.pop(chat_id, None)
+
+
+class Orchestrator(Scenario):
+    async def prepare(self, ns: range) -> None:
+        self.inputs = await run_db(load_run_inputs, USER_ID)
+
+    async def one(self, n: int) -> None:
+        await run_orchestrator(
+            question=question("orchestrator", self.level, n),
+            thread_summary="",
+            user_api_keys=self.inputs.user_api_keys,
+            stages=self.inputs.stages,
+            synth_model=self.inputs.synth_model,
+            synth_fallbacks=self.inputs.synth_fallbacks,
+            budget=Budget(),
+            use_llm_gate=False,
+            execution_config=app_main.execution_config(),
+            user_id=USER_ID,
+        )
+
+
+SCENARIO_TYPES = {"ask": Ask, "telegram": Telegram, "orchestrator": Orchestrator}
+
+
+async def measure(scenario: str, level: int, app_url: str, sim: httpx.AsyncClient, offset: int) -> dict:
+    global commits
+    limits = httpx.Limits(max_connections=level, max_keepalive_connections=level)
+    async with httpx.AsyncClient(base_url=app_url, timeout=ARGS.timeout_sec, limits=limits) as client:
+        runner = SCENARIO_TYPES[scenario](client, level)
+        ns = range(offset, offset + ARGS.requests)
+        await runner.prepare(ns)
+
+        lags: list[float] = []
+        rss_peak = rss_start = rss_mb()
+        stop = asyncio.Event()
+        interval = ARGS.interval_ms / 1000
+
+        async def monitor():
+            nonlocal rss_peak
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                await asyncio.sleep(interval)
+                lags.append((time.perf_counter() - t0 - interval) * 1000)
+                rss_peak = max(rss_peak, rss_mb())
+
+        sem = asyncio.Semaphore(level)
+        latencies: list[float] = []
+        errors: dict[str, int] = {}
+
+        async def one(n: int):
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    await asyncio.wait_for(runner.one(n), ARGS.timeout_sec)
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+        await sim.delete("/_sim/stats")
+        runs_before = {o: registry.value("runs_total", outcome=o) for o in OUTCOMES}
+        commits = 0
+        mon = asyncio.create_task(monitor())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in ns))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await mon
+        rss_end = rss_mb()
+        sim_stats = (await sim.get("/_sim/stats")).json()
+
+    result = {
+        "scenario": scenario,
+        "concurrency": level,
+        "requests": ARGS.requests,
+        "completed": len(latencies),
+        "errors": errors,
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": summary(latencies),
+        "loop_lag_ms": {"samples": len(lags), **summary(lags)},
+        "rss_mb": {
+            "start": round(rss_start, 1),
+            "end": round(rss_end, 1),
+            "peak": round(rss_peak, 1),
+            "growth": round(rss_end - rss_start, 1),
+        },
+        "db": {"commits": commits, "commits_per_sec": round(commits / elapsed, 1)},
+        "runs": {o: int(registry.value("runs_total", outcome=o) - runs_before[o]) for o in OUTCOMES
+                 if registry.value("runs_total", outcome=o) > runs_before[o]},
+        "simulator": sim_stats,
+    }
+    if runner.acks:
+        result["ack_latency_ms"] = summary(runner.acks)
+    return result
+
+
+async def warmup(scenario: str, app_url: str, offset: int) -> None:
+    async with httpx.AsyncClient(base_url=app_url, timeout=ARGS.timeout_sec) as client:
+        runner = SCENARIO_TYPES[scenario](client, 0)
+        ns = range(offset, offset + ARGS.warmup)
+        await runner.prepare(ns)
+        for n in ns:
+            await asyncio.wait_for(runner.one(n), ARGS.timeout_sec)
+
+
+async def bench() -> list[dict]:
+    server = uvicorn.Server(uvicorn.Config(app_main.app, host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+    app_url = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=app_url) as client:
+            for provider in PROVIDERS:
+                r = await client.post("/keys", data={"provider": provider, "api_key": f"sk-bench-{provider}"})
+                if r.status_code != 302:
+                    r.raise_for_status()
+        async with httpx.AsyncClient(base_url=SIM_URL) as sim:
+            offset = 0
+            for scenario in ARGS.scenarios:
+                if ARGS.warmup:
+                    await warmup(scenario, app_url, offset)
+                    offset += ARGS.warmup
+                for level in ARGS.levels:
+                    results.append(await measure(scenario, level, app_url, sim, offset))
+                    offset += ARGS.requests
+                    print(f"{scenario} c={level}: {results[-1]['throughput_rps']} req/s, "
+                          f"p95 {results[-1]['latency_ms']['p95']} ms", file=sys.stderr)
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+
+def compare(results: list[dict], baseline: dict, threshold_pct: float) -> list[dict]:
+    """(scenario, concurrency)가 같은 단계끼리 처리량과 지연시간 변화율을 계산한다."""
+    def change(new: float, old: float) -> float | None:
+        return round((new - old) / old * 100, 1) if old else None
+
+    before = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in results:
+        old = before.get((r["scenario"], r["concurrency"]))
+        if not old:
+            continue
+        row = {
+            "scenario": r["scenario"],
+            "concurrency": r["concurrency"],
+            "throughput_rps_pct": change(r["throughput_rps"], old["throughput_rps"]),
+            "latency_p95_pct": change(r["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            "latency_p99_pct": change(r["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+            "loop_lag_p99_ms": round(r["loop_lag_ms"]["p99"] - old["loop_lag_ms"]["p99"], 2),
+            "rss_growth_mb": round(r["rss_mb"]["growth"] - old["rss_mb"]["growth"], 1),
+        }
+        row["regression"] = (
+            (row["throughput_rps_pct"] or 0) < -threshold_pct
+            or (row["latency_p95_pct"] or 0) > threshold_pct
+            or r["completed"] < old["completed"]
+        )
+        rows.append(row)
+    return rows
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> int:
+    try:
+        results = asyncio.run(bench())
+    finally:
+        if SIM_PROC:
+            SIM_PROC.terminate()
+            SIM_PROC.wait(10)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started_at": STARTED_AT,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db": engine.dialect.name,
+            "args": {k: v for k, v in vars(ARGS).items() if k not in ("scenarios", "levels")},
+        },
+        "results": results,
+    }
+    regressed = False
+    if ARGS.compare:
+        with open(ARGS.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, ARGS.regress_pct)
+        report["comparison"] = {"baseline_revision": baseline.get("meta", {}).get("revision", ""), "results": rows}
+        regressed = any(r["regression"] for r in rows)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if ARGS.output:
+        with open(ARGS.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
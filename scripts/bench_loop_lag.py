@@ -0,0 +1,127 @@
+"""이벤트 루프 지연(loop lag) 벤치마크: DB 작업을 루프에서 직접 실행할 때와 run_db로 넘길 때를 비교한다.
+
+    python scripts/bench_loop_lag.py --requests 200 --concurrency 20
+
+임시 SQLite 파일을 사용하며, 결과는 JSON으로 출력한다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("MASTER_KEY", Fernet.generate_key().decode())
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='debait-bench-'), 'bench.db')}"
+
+from app.crypto import encrypt_text  # noqa: E402
+from app.db import Base, SessionLocal, engine, run_db  # noqa: E402
+from app.models import ApiKey, User  # noqa: E402
+from app.repositories import (  # noqa: E402
+    ensure_default_pipeline,
+    load_run_inputs,
+    save_thread_run_result,
+    start_thread_turn,
+)
+
+USER_ID = 1
+FAKE_RESULT = {
+    "final": "answer " * 50,
+    "stages": [{"name": f"Stage{i}", "text": "draft " * 100} for i in range(3)],
+    "usage": {f"Stage{i}": {"provider": "openai", "model": "gpt-4o-mini", "input_tokens": 100,
+                            "output_tokens": 50, "cost_usd": 0.001} for i in range(3)},
+}
+
+
+def setup() -> None:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.add(User(id=USER_ID, email="bench@local", password_hash=""))
+        for p in ("openai", "anthropic", "google", "groq", "mistral"):
+            db.add(ApiKey(user_id=USER_ID, provider=p, encrypted_key=encrypt_text(f"sk-{p}")))
+        db.commit()
+        ensure_default_pipeline(db, USER_ID)
+    finally:
+        db.close()
+
+
+def request_work(db, n: int) -> None:
+    """한 요청이 하는 DB 작업: 키 복호화/스테이지 조회, user 메시지 기록, 결과 저장."""
+    load_run_inputs(db, USER_ID)
+    thread_id, _ = start_thread_turn(db, USER_ID, f"bench:{n}:{time.time_ns()}", "question")
+    save_thread_run_result(db, USER_ID, thread_id, "question", FAKE_RESULT)
+
+
+def inline(n: int) -> None:
+    db = SessionLocal()
+    try:
+        request_work(db, n)
+    finally:
+        db.close()
+
+
+async def measure(mode: str, requests: int, concurrency: int, interval: float) -> dict:
+    lags: list[float] = []
+    stop = asyncio.Event()
+
+    async def monitor():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - t0 - interval) * 1000)
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(n: int):
+        async with sem:
+            if mode == "inline":
+                inline(n)
+            else:
+                await run_db(request_work, n)
+            await asyncio.sleep(0)
+
+    mon = asyncio.create_task(monitor())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await mon
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "requests": requests,
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "loop_lag_ms": {
+            "samples": len(lags),
+            "p50": round(statistics.median(lags), 2) if lags else 0.0,
+            "p99": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 2) if lags else 0.0,
+            "max": round(lags[-1], 2) if lags else 0.0,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--interval-ms", type=float, default=1.0, help="loop lag 측정 주기")
+    args = parser.parse_args()
+
+    setup()
+    results = [
+        asyncio.run(measure(mode, args.requests, args.concurrency, args.interval_ms / 1000))
+        for mode in ("inline", "offloaded")
+    ]
+    print(json.dumps({"results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
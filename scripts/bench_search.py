@@ -0,0 +1,129 @@
+"""대화 기록 검색 벤치마크: 메시지 N개를 만든 뒤 FTS 검색과 LIKE 전체 스캔의 지연시간을 비교한다.
+
+    python scripts/bench_search.py --messages 1000000
+    python scripts/bench_search.py --messages 200000 --queries 50
+
+임시 SQLite 파일을 사용하며 (마이그레이션으로 FTS5 색인 생성) 결과를 JSON으로 출력한다.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--per-thread", type=int, default=5, help="thread 하나의 메시지 수")
+    parser.add_argument("--queries", type=int, default=30, help="검색어 종류마다 반복 횟수")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+os.environ.setdefault("MASTER_KEY", Fernet.generate_key().decode())
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='debait-bench-'), 'search.db')}"
+
+from sqlalchemy import text  # noqa: E402
+
+from app.db import SessionLocal, engine, upgrade_schema  # noqa: E402
+from app.search import search_messages  # noqa: E402
+
+USER_ID = 1
+WORDS = (
+    "redis cache cluster failover postgres replication index query latency throughput pool "
+    "connection shard partition queue worker retry timeout budget token model provider stream "
+    "캐시 전략 무효화 복제 인덱스 지연 처리량 분산 缓存 策略 复制 索引 延迟 分布式"
+).split()
+RARE = "zookeeperquorum"
+
+
+def setup(rng: random.Random) -> None:
+    upgrade_schema()
+    threads = max(1, ARGS.messages // ARGS.per_thread)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, password_hash) VALUES (:id, 'bench@local', '')"), {"id": USER_ID})
+        conn.execute(
+            text(
+                "INSERT INTO threads (id, user_id, thread_key, summary, updated_at, has_answer, preview, stage_names)"
+                " VALUES (:id, :user_id, :key, '', CURRENT_TIMESTAMP, 1, :preview, '')"
+            ),
+            [{"id": i + 1, "user_id": USER_ID, "key": f"bench:{i}", "preview": f"question {i}"} for i in range(threads)],
+        )
+        batch = []
+        for n in range(ARGS.messages):
+            words = rng.choices(WORDS, k=rng.randint(20, 80))
+            if n % 10_000 == 0:
+                words.append(RARE)
+            batch.append({"thread_id": n // ARGS.per_thread + 1, "role": "assistant", "content": " ".join(words)})
+            if len(batch) == 10_000:
+                conn.execute(
+                    text("INSERT INTO messages (thread_id, role, content, created_at) VALUES (:thread_id, :role, :content, CURRENT_TIMESTAMP)"),
+                    batch,
+                )
+                batch = []
+        if batch:
+            conn.execute(
+                text("INSERT INTO messages (thread_id, role, content, created_at) VALUES (:thread_id, :role, :content, CURRENT_TIMESTAMP)"),
+                batch,
+            )
+
+
+def timed(fn, repeat: int) -> dict:
+    latencies = []
+    hits = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        hits = fn()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "hits": hits,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+    }
+
+
+def main() -> None:
+    rng = random.Random(ARGS.seed)
+    t0 = time.perf_counter()
+    setup(rng)
+    build_sec = time.perf_counter() - t0
+
+    db = SessionLocal()
+    try:
+        results = {}
+        for label, query in (("rare_term", RARE), ("common_term", "replication"), ("two_terms", "redis failover"),
+                             ("korean", "무효화"), ("chinese", "分布式")):
+            results[label] = {
+                "query": query,
+                "fts": timed(lambda: len(search_messages(db, USER_ID, query)), ARGS.queries),
+            }
+        like = f"%{RARE}%"
+        results["rare_term"]["like_scan"] = timed(
+            lambda: len(db.execute(text(
+                "SELECT m.id FROM messages m JOIN threads t ON t.id = m.thread_id"
+                " WHERE t.user_id = :u AND m.content LIKE :q LIMIT 20"
+            ), {"u": USER_ID, "q": like}).all()),
+            max(1, ARGS.queries // 10),
+        )
+    finally:
+        db.close()
+
+    print(json.dumps({
+        "messages": ARGS.messages,
+        "build_sec": round(build_sec, 1),
+        "results": results,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
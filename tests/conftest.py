@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+import pytest
+from cryptography.fernet import Fernet
+
+# app.settings / app.db는 import 시점에 환경변수를 읽으므로 테스트용 값을 먼저 채운다.
+os.environ.setdefault("MASTER_KEY", Fernet.generate_key().decode())
+os.environ.setdefault("DB_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='debait-test-'), 'test.db')}")
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    # circuit 상태는 프로세스 전역이므로 테스트 간에 실패 기록이 넘어가지 않게 비운다.
+    from app.orchestrator.breaker import breakers
+    breakers.clear()
+    yield
+    breakers.clear()
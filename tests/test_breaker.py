@@ -0,0 +1,181 @@
+"""
+Tests for the per-(provider, model) circuit breaker (app.orchestrator.breaker)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+
+from app.orchestrator.breaker import BreakerConfig, CircuitBreaker, breakers, is_vendor_failure
+from app.orchestrator.runner import _call_with_resilience, run_orchestrator, Budget, ExecutionConfig, PROVIDERS
+from app.providers.base import LLMResult
+from app.providers.limits import RateLimitError
+
+
+def http_error(status):
+    req = httpx.Request("POST", "https://x")
+    return httpx.HTTPStatusError("err", request=req, response=httpx.Response(status, request=req))
+
+
+# ═══════════════════════════════════════════════════════════════
+# CircuitBreaker 상태 전이
+# ═══════════════════════════════════════════════════════════════
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        b = CircuitBreaker(BreakerConfig(failure_threshold=3))
+        for _ in range(2):
+            b.record_failure("x")
+        assert b.allow()
+        b.record_failure("x")
+        assert b.state == "open"
+        assert not b.allow()
+
+    def test_success_resets_count(self):
+        b = CircuitBreaker(BreakerConfig(failure_threshold=2))
+        b.record_failure()
+        b.record_success()
+        b.record_failure()
+        assert b.state == "closed"
+
+    def test_half_open_probe(self):
+        b = CircuitBreaker(BreakerConfig(failure_threshold=1, reset_timeout_sec=10, half_open_max_calls=1))
+        with patch("app.orchestrator.breaker.time.monotonic", return_value=100.0):
+            b.record_failure()
+        with patch("app.orchestrator.breaker.time.monotonic", return_value=111.0):
+            assert b.allow()          # probe
+            assert not b.allow()      # probe 한 개만
+            b.record_success()
+        assert b.state == "closed"
+
+    def test_failed_probe_reopens(self):
+        b = CircuitBreaker(BreakerConfig(failure_threshold=1, reset_timeout_sec=10))
+        with patch("app.orchestrator.breaker.time.monotonic", return_value=100.0):
+            b.record_failure()
+        with patch("app.orchestrator.breaker.time.monotonic", return_value=111.0):
+            assert b.allow()
+            b.record_failure()
+            assert b.state == "open"
+            assert not b.allow()
+
+    def test_released_probe_frees_slot(self):
+        b = CircuitBreaker(BreakerConfig(failure_threshold=1, reset_timeout_sec=0))
+        b.record_failure()
+        assert b.allow()
+        b.release()
+        assert b.allow()
+
+    def test_vendor_failure_classification(self):
+        assert is_vendor_failure(asyncio.TimeoutError())
+        assert is_vendor_failure(http_error(503))
+        assert not is_vendor_failure(http_error(401))
+        assert not is_vendor_failure(RateLimitError("429"))
+
+
+# ═══════════════════════════════════════════════════════════════
+# runner 연동
+# ═══════════════════════════════════════════════════════════════
+class TestRunnerBreaker:
+    def _prov(self, side_effect):
+        prov = MagicMock()
+        prov.provider_name = "breaker-test"
+        prov.generate = AsyncMock(side_effect=side_effect)
+        return prov
+
+    def test_open_circuit_fails_fast(self):
+        breakers.configure(BreakerConfig(failure_threshold=2, reset_timeout_sec=60))
+        prov = self._prov(http_error(503))
+        cfg = ExecutionConfig(retries_per_stage=3, stage_timeout_sec=5)
+        with patch("app.orchestrator.runner.asyncio.sleep", new=AsyncMock()) as sleep:
+            result, rt = asyncio.run(_call_with_resilience(
+                provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=cfg,
+            ))
+        assert result is None
+        # 두 번 실패로 open → 나머지 재시도는 vendor 호출 없이 끝난다.
+        assert prov.generate.call_count == 2
+        assert sleep.await_count == 1
+        assert rt["retries"] == 1
+
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=cfg,
+        ))
+        assert rt["status"] == "circuit_open"
+        assert "CircuitOpenError" in rt["error"]
+        assert prov.generate.call_count == 2
+        breakers.configure(BreakerConfig())
+
+    def test_cancel_during_rate_limit_wait_returns_probe(self):
+        breakers.configure(BreakerConfig(failure_threshold=1, reset_timeout_sec=0, half_open_max_calls=1))
+        breakers.get("breaker-test", "m").record_failure()
+        waiting = []
+
+        async def acquire(tokens):
+            waiting.append(tokens)
+            await asyncio.Event().wait()  # 용량이 끝내 나지 않는다.
+
+        limiter = MagicMock()
+        limiter.acquire = acquire
+        prov = self._prov(http_error(503))
+
+        async def main():
+            task = asyncio.create_task(_call_with_resilience(
+                provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=ExecutionConfig(),
+            ))
+            await asyncio.sleep(0.01)
+            assert len(waiting) == 1  # probe 슬롯을 잡고 용량을 기다리는 중
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        with patch("app.orchestrator.runner.rate_limiters.get", return_value=limiter):
+            asyncio.run(main())
+        breaker = breakers.get("breaker-test", "m")
+        assert breaker.state == "half_open"
+        assert breaker.allow()  # probe 슬롯이 반납되어 다음 호출이 probe를 잡을 수 있다.
+        prov.generate.assert_not_called()
+        breakers.configure(BreakerConfig())
+
+    def test_client_errors_do_not_open(self):
+        breakers.configure(BreakerConfig(failure_threshold=1))
+        prov = self._prov(http_error(400))
+        cfg = ExecutionConfig(retries_per_stage=0)
+        asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=cfg,
+        ))
+        assert breakers.state("breaker-test", "m") == "closed"
+        breakers.configure(BreakerConfig())
+
+    def test_monitoring_reports_circuits(self):
+        prov = MagicMock()
+        prov.generate = AsyncMock(return_value=LLMResult(text="Redis answer.", provider="openai", model="gpt-4o-mini"))
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result = asyncio.run(run_orchestrator(
+                question="Explain Redis caching strategies in detail for production.",
+                thread_summary="",
+                user_api_keys={"openai": "sk"},
+                stages=[{"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"}],
+                synth_model="openai:gpt-4o-mini",
+                budget=Budget(),
+                execution_config=ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False),
+            ))
+        assert result["monitoring"]["circuits"] == {"openai:gpt-4o-mini": "closed"}
+
+
+class TestHealthEndpoint:
+    def test_health_lists_circuits(self):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        with patch.object(main.telegram_jobs, "start", new=AsyncMock()), TestClient(main.app) as client:
+            assert client.get("/health").json() == {"status": "ok", "circuits": {}}
+            b = breakers.get("openai", "gpt-4o-mini")
+            for _ in range(b.config.failure_threshold):
+                b.record_failure("HTTPStatusError: 503")
+            body = client.get("/health").json()
+        assert body["status"] == "degraded"
+        assert body["circuits"]["openai:gpt-4o-mini"]["state"] == "open"
@@ -0,0 +1,219 @@
+"""
+Tests for cooperative cancellation (client disconnect / mid-level budget breach)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db import Base, SessionLocal, engine
+from app.models import Thread, UsageEvent, User
+from app.orchestrator.runner import Budget, ExecutionConfig, PROVIDERS, run_orchestrator
+from app.providers.base import LLMResult
+from app.repositories import start_thread_turn
+
+
+@pytest.fixture(autouse=True, scope="module")
+def tables():
+    Base.metadata.create_all(bind=engine)
+
+
+QUESTION = "Explain Redis caching strategies in detail for production."
+CFG = ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False)
+
+
+def provider_by_model(delays, costs=None):
+    """model 이름별로 지연시간(초)과 비용을 다르게 주는 mock provider."""
+    costs = costs or {}
+    prov = MagicMock()
+    prov.provider_name = "openai"
+    prov.calls = []
+
+    async def generate(**kwargs):
+        model = kwargs["model"]
+        prov.calls.append(model)
+        await asyncio.sleep(delays.get(model, 0))
+        return LLMResult(
+            text=f"Redis answer from {model}.", provider="openai", model=model,
+            input_tokens=10, output_tokens=5, cost_usd=costs.get(model, 0.0),
+        )
+    prov.generate = AsyncMock(side_effect=generate)
+    return prov
+
+
+PARALLEL_STAGES = [
+    {"name": "Fast", "system_prompt": "Answer independently.", "model": "openai:fast"},
+    {"name": "Slow", "system_prompt": "Answer independently.", "model": "openai:slow"},
+]
+
+
+# ═══════════════════════════════════════════════════════════════
+# cancel_event
+# ═══════════════════════════════════════════════════════════════
+class TestCancelEvent:
+    def test_cancel_mid_stage_returns_partial_usage(self):
+        prov = provider_by_model({"fast": 0, "slow": 5.0})
+
+        async def main():
+            cancel = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.1, cancel.set)
+            return await run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+                stages=PARALLEL_STAGES, synth_model="openai:fast", budget=Budget(max_usd=10.0),
+                execution_config=CFG, cancel_event=cancel,
+            )
+
+        started = time.monotonic()
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result = asyncio.run(main())
+        assert time.monotonic() - started < 2.0
+        assert result["cancelled"] is True
+        assert result["monitoring"]["cancelled"] is True
+        assert result["usage"]["Fast"]["status"] == "ok"
+        slow = result["usage"]["Slow"]
+        assert slow["status"] == "cancelled"
+        assert slow["input_tokens"] > 0 and slow["cost_usd"] > 0
+        assert "synth" not in result["usage"]
+        assert [s["name"] for s in result["stages"]] == ["Fast"]
+
+    def test_cancel_during_synth(self):
+        prov = provider_by_model({"synth-slow": 5.0})
+
+        async def main():
+            cancel = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.1, cancel.set)
+            return await run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+                stages=PARALLEL_STAGES[:1] + [{"name": "Critic", "system_prompt": "Critique.", "model": "openai:fast"}],
+                synth_model="openai:synth-slow", budget=Budget(max_usd=10.0),
+                execution_config=CFG, cancel_event=cancel,
+            )
+
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result = asyncio.run(main())
+        assert result["cancelled"] is True
+        assert result["usage"]["synth"]["status"] == "cancelled"
+        assert result["monitoring"]["stage_metrics"]["synth"]["status"] == "cancelled"
+
+    def test_cancel_after_failover_charges_fallback_model(self):
+        import httpx
+
+        broken = MagicMock()
+        broken.provider_name = "openai"
+        req = httpx.Request("POST", "https://x")
+        broken.generate = AsyncMock(side_effect=httpx.HTTPStatusError(
+            "err", request=req, response=httpx.Response(503, request=req)))
+        fallback = provider_by_model({"slow": 5.0})
+        stages = [{"name": "Solver", "system_prompt": "Answer.", "model": "openai:primary",
+                   "fallback_models": ["groq:slow"]}]
+
+        async def main():
+            cancel = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.1, cancel.set)
+            return await run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk", "groq": "gk"},
+                stages=stages, synth_model="openai:primary", budget=Budget(max_usd=10.0),
+                execution_config=CFG, cancel_event=cancel,
+            )
+
+        with patch.dict(PROVIDERS, {"openai": broken, "groq": fallback}):
+            result = asyncio.run(main())
+        assert result["cancelled"] is True
+        solver = result["usage"]["Solver"]
+        assert solver["status"] == "cancelled"
+        assert (solver["provider"], solver["model"]) == ("groq", "slow")
+
+    def test_unset_event_does_not_interfere(self):
+        prov = provider_by_model({})
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result = asyncio.run(run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+                stages=PARALLEL_STAGES, synth_model="openai:fast", budget=Budget(max_usd=10.0),
+                execution_config=CFG, cancel_event=asyncio.Event(),
+            ))
+        assert "cancelled" not in result
+        assert set(result["usage"]) == {"Fast", "Slow", "synth"}
+
+
+# ═══════════════════════════════════════════════════════════════
+# 레벨 중간 예산 초과
+# ═══════════════════════════════════════════════════════════════
+class TestBudgetCancellation:
+    @pytest.mark.parametrize("scheduler", ["dataflow", "levels"])
+    def test_budget_breach_cancels_siblings(self, scheduler):
+        prov = provider_by_model({"fast": 0, "slow": 5.0}, costs={"fast": 1.0})
+        cfg = ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False, scheduler=scheduler)
+        started = time.monotonic()
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result = asyncio.run(run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+                stages=PARALLEL_STAGES, synth_model="openai:fast", budget=Budget(max_usd=0.5),
+                execution_config=cfg,
+            ))
+        assert time.monotonic() - started < 2.0
+        assert result["monitoring"]["budget_guard_triggered"] is True
+        assert result["usage"]["Slow"]["status"] == "cancelled"
+        # 취소된 스테이지 없이 Synth는 계속 실행된다.
+        assert result["final"] == "Redis answer from fast."
+        assert [s["name"] for s in result["stages"]] == ["Fast"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# web 계층: 연결 종료 감지와 부분 결과 저장
+# ═══════════════════════════════════════════════════════════════
+class TestWebCancellation:
+    def test_watch_disconnect_sets_event(self):
+        from app.main import watch_disconnect
+
+        request = MagicMock()
+        request.is_disconnected = AsyncMock(side_effect=[False, False, True])
+
+        async def main():
+            cancel = asyncio.Event()
+            await asyncio.wait_for(watch_disconnect(request, cancel, interval_sec=0.01), timeout=1)
+            return cancel.is_set()
+
+        assert asyncio.run(main()) is True
+
+    def test_cancelled_run_saves_usage_events(self):
+        from app.main import PipelineRun, execute_run
+
+        db = SessionLocal()
+        try:
+            if not db.get(User, 91):
+                db.add(User(id=91, email="cancel@local", password_hash=""))
+                db.commit()
+            thread_id, _ = start_thread_turn(db, 91, "web:cancel", QUESTION)
+        finally:
+            db.close()
+
+        ctx = PipelineRun(
+            user_id=91, thread_id=thread_id, question=QUESTION, thread_summary="",
+            user_api_keys={"openai": "sk"}, stages=PARALLEL_STAGES, synth_model="openai:fast",
+        )
+        prov = provider_by_model({"fast": 0, "slow": 5.0})
+
+        async def main():
+            cancel = asyncio.Event()
+            asyncio.get_running_loop().call_later(0.1, cancel.set)
+            return await execute_run(ctx, cancel_event=cancel)
+
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result, final = asyncio.run(main())
+        assert result["cancelled"] is True
+
+        db = SessionLocal()
+        try:
+            events = db.query(UsageEvent).filter(UsageEvent.user_id == 91).all()
+            # 취소된 turn은 답변으로 남지 않는다. (새 thread였으므로 thread째 지워진다)
+            thread = db.get(Thread, thread_id)
+        finally:
+            db.close()
+        assert len(events) == 2
+        assert all(e.input_tokens > 0 for e in events)
+        assert thread is None
@@ -0,0 +1,238 @@
+"""
+Tests for running DB work off the event loop (app.db.run_db / async repositories)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from sqlalchemy import text
+
+from app.db import Base, SessionLocal, WriteBatcher, engine, run_db, run_in_db_thread
+from app.models import Message, TelegramLink, Thread, UsageEvent
+from app.providers.base import LLMResult
+from app.repositories import (
+    create_link_code,
+    delete_thread_async,
+    save_thread_run_result_async,
+    start_thread_turn,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def tables():
+    Base.metadata.create_all(bind=engine)
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_db / run_in_db_thread
+# ═══════════════════════════════════════════════════════════════
+class TestRunDb:
+    def test_runs_on_db_thread(self):
+        name = asyncio.run(run_in_db_thread(lambda: threading.current_thread().name))
+        assert name.startswith("db")
+
+    def test_passes_fresh_session(self):
+        async def main():
+            return await run_db(lambda db, x: (db.is_active, x), 7)
+        assert asyncio.run(main()) == (True, 7)
+
+    def test_loop_keeps_ticking_during_blocking_call(self):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        async def main():
+            t = asyncio.create_task(ticker())
+            await run_db(lambda db: time.sleep(0.2))
+            t.cancel()
+
+        asyncio.run(main())
+        assert ticks >= 10
+
+
+# ═══════════════════════════════════════════════════════════════
+# SQLite pragma / write batcher
+# ═══════════════════════════════════════════════════════════════
+class TestSqliteTuning:
+    def test_connection_pragmas(self):
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+class TestWriteBatcher:
+    def test_groups_concurrent_writes_into_one_commit(self):
+        writer = WriteBatcher(max_batch=64, max_delay_ms=50)
+
+        def add(db, n):
+            db.add(UsageEvent(user_id=71, provider="batch", model=str(n)))
+            return n
+
+        async def main():
+            return await asyncio.gather(*(writer.write(add, n) for n in range(20)))
+
+        try:
+            assert asyncio.run(main()) == list(range(20))
+        finally:
+            writer.stop()
+        assert writer.jobs == 20
+        assert writer.commits <= 2  # 첫 작업이 먼저 혼자 나갈 수 있다.
+        db = SessionLocal()
+        try:
+            assert db.query(UsageEvent).filter(UsageEvent.user_id == 71).count() == 20
+        finally:
+            db.close()
+
+    def test_failing_job_does_not_drop_others(self):
+        writer = WriteBatcher(max_batch=64, max_delay_ms=50)
+
+        def add(db, n):
+            if n == 3:
+                raise ValueError("bad row")
+            db.add(UsageEvent(user_id=72, provider="batch", model=str(n)))
+
+        async def main():
+            return await asyncio.gather(*(writer.write(add, n) for n in range(6)), return_exceptions=True)
+
+        try:
+            results = asyncio.run(main())
+        finally:
+            writer.stop()
+        assert isinstance(results[3], ValueError)
+        assert sum(r is None for r in results) == 5
+        db = SessionLocal()
+        try:
+            assert db.query(UsageEvent).filter(UsageEvent.user_id == 72).count() == 5
+        finally:
+            db.close()
+
+    def test_stop_drains_queue(self):
+        writer = WriteBatcher(max_batch=2, max_delay_ms=0)
+        futures = [writer.submit(lambda db: db.execute(text("SELECT 1")).scalar()) for _ in range(5)]
+        writer.stop()
+        assert [f.result(timeout=1) for f in futures] == [1] * 5
+
+
+# ═══════════════════════════════════════════════════════════════
+# async repositories
+# ═══════════════════════════════════════════════════════════════
+class TestAsyncRepositories:
+    def test_save_and_delete_thread(self):
+        db = SessionLocal()
+        try:
+            thread_id, summary = start_thread_turn(db, 1, "test:offload", "Q?")
+        finally:
+            db.close()
+        assert summary == ""
+
+        result = {
+            "final": "A!",
+            "stages": [{"name": "Solver", "text": "draft"}],
+            "usage": {"Solver": {"provider": "openai", "model": "m", "input_tokens": 3, "output_tokens": 2, "cost_usd": 0.01}},
+        }
+        final = asyncio.run(save_thread_run_result_async(1, thread_id, "Q?", result))
+        assert final == "A!"
+
+        db = SessionLocal()
+        try:
+            roles = [m.role for m in db.query(Message).filter(Message.thread_id == thread_id)]
+            assert roles == ["user", "Solver", "assistant"]
+            assert "A: A!" in db.get(Thread, thread_id).summary
+            assert db.query(UsageEvent).filter(UsageEvent.cost_usd == 0.01).count() >= 1
+        finally:
+            db.close()
+
+        asyncio.run(delete_thread_async(thread_id))
+        db = SessionLocal()
+        try:
+            assert db.get(Thread, thread_id) is None
+        finally:
+            db.close()
+
+
+# ═══════════════════════════════════════════════════════════════
+# Telegram 처리 (DB 작업은 run_db 경유)
+# ═══════════════════════════════════════════════════════════════
+class TestTelegramProcessing:
+    def test_link_then_question(self):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        prov = MagicMock()
+        prov.generate = AsyncMock(return_value=LLMResult(text="tg answer", provider="openai", model="gpt-4o-mini"))
+        sent = []
+
+        async def fake_send(chat_id, text):
+            sent.append(text)
+
+        with patch.object(main.telegram_jobs, "start", new=AsyncMock()), TestClient(main.app) as client:
+            client.post("/keys", data={"provider": "openai", "api_key": "sk-test"})
+            db = SessionLocal()
+            try:
+                code = create_link_code(db, 1, ttl_minutes=5).code
+            finally:
+                db.close()
+
+            with patch.object(main, "send_message", new=fake_send), \
+                    patch.object(main.settings, "telegram_streaming", False), \
+                    patch.dict(main.PROVIDERS, {"openai": prov}):
+                asyncio.run(main.process_telegram_message("tg-offload", "what now?"))
+                asyncio.run(main.process_telegram_message("tg-offload", code))
+                asyncio.run(main.process_telegram_message("tg-offload", "Compare Redis and Memcached"))
+
+        assert "연결되지 않았어" in sent[0]
+        assert sent[1].startswith("연결 완료")
+        assert sent[2] == "tg answer"
+        db = SessionLocal()
+        try:
+            assert db.query(TelegramLink).filter(TelegramLink.chat_id == "tg-offload").count() == 1
+            t = db.query(Thread).filter(Thread.thread_key == "telegram:tg-offload").one()
+            assert [m.role for m in db.query(Message).filter(Message.thread_id == t.id)][-1] == "assistant"
+        finally:
+            db.close()
+
+    def test_failed_run_is_raised_and_turn_discarded(self):
+        from app import main
+
+        db = SessionLocal()
+        try:
+            main.ensure_single_user(db)
+            db.add(TelegramLink(user_id=1, chat_id="tg-fail"))
+            db.commit()
+            thread_id, _ = start_thread_turn(db, 1, "telegram:tg-fail", "earlier question")
+        finally:
+            db.close()
+
+        prov = MagicMock()
+        prov.generate = AsyncMock(return_value=LLMResult(text="tg answer", provider="openai", model="gpt-4o-mini"))
+        sent = []
+
+        async def fake_send(chat_id, text):
+            sent.append(text)
+
+        with patch.object(main, "send_message", new=fake_send), \
+                patch.object(main.settings, "telegram_streaming", False), \
+                patch.object(main, "save_thread_run_result_async", new=AsyncMock(side_effect=RuntimeError("db down"))), \
+                patch.dict(main.PROVIDERS, {"openai": prov}):
+            with pytest.raises(RuntimeError):
+                asyncio.run(main.process_telegram_message("tg-fail", "Compare Redis and Memcached"))
+
+        assert sent == []  # 사용자 알림은 재시도를 다 쓴 뒤 worker가 한다.
+        db = SessionLocal()
+        try:
+            contents = [m.content for m in db.query(Message).filter(Message.thread_id == thread_id)]
+            assert contents == ["earlier question"]
+        finally:
+            db.close()
@@ -0,0 +1,169 @@
+"""
+Tests for per-run deadline propagation (ExecutionConfig.run_deadline_sec / synth_reserve_sec)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.orchestrator.breaker import breakers
+from app.orchestrator.latency import latency_tracker
+from app.orchestrator.runner import Budget, ExecutionConfig, PROVIDERS, _call_with_resilience, run_orchestrator
+from app.providers.base import LLMResult
+
+
+@pytest.fixture(autouse=True)
+def clear_latency():
+    latency_tracker.clear()
+    yield
+    latency_tracker.clear()
+
+
+def slow_provider(name, delay, text="ok"):
+    prov = MagicMock()
+    prov.provider_name = name
+
+    async def generate(**kwargs):
+        await asyncio.sleep(delay)
+        return LLMResult(text=text, provider=name, model=kwargs["model"], input_tokens=10, output_tokens=5)
+    prov.generate = AsyncMock(side_effect=generate)
+    return prov
+
+
+# ═══════════════════════════════════════════════════════════════
+# _call_with_resilience: 남은 시간 기반 timeout/재시도
+# ═══════════════════════════════════════════════════════════════
+class TestCallDeadline:
+    def test_timeout_capped_by_deadline(self):
+        prov = slow_provider("deadline-test", 2.0)
+        cfg = ExecutionConfig(retries_per_stage=2, stage_timeout_sec=75)
+        started = time.monotonic()
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=cfg,
+            deadline=time.monotonic() + 0.1,
+        ))
+        assert result is None
+        assert time.monotonic() - started < 1.0
+        assert rt["status"] == "deadline_exceeded"
+        assert "DeadlineExceeded" in rt["error"]
+        assert prov.generate.call_count == 1
+        # 마감으로 잘린 timeout은 vendor 장애가 아니다.
+        assert breakers.get("deadline-test", "m").consecutive_failures == 0
+
+    def test_no_retry_when_backoff_exceeds_remaining(self):
+        prov = MagicMock()
+        prov.provider_name = "deadline-test"
+        prov.generate = AsyncMock(side_effect=RuntimeError("boom"))
+        cfg = ExecutionConfig(retries_per_stage=3)
+        started = time.monotonic()
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=cfg,
+            deadline=time.monotonic() + 0.3,
+        ))
+        assert prov.generate.call_count == 1  # 첫 backoff(0.8s)가 남은 시간보다 길다.
+        assert time.monotonic() - started < 0.3
+        assert rt["status"] == "deadline_exceeded"
+        assert "RuntimeError: boom" in rt["error"]
+
+    def test_expired_deadline_skips_call(self):
+        prov = slow_provider("deadline-test", 0)
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5,
+            cfg=ExecutionConfig(), deadline=time.monotonic() - 1,
+        ))
+        prov.generate.assert_not_called()
+        assert rt["status"] == "deadline_exceeded"
+
+    def test_without_deadline_unchanged(self):
+        prov = slow_provider("deadline-test", 0)
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=ExecutionConfig(),
+        ))
+        assert result.text == "ok"
+        assert rt["status"] == "ok"
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_orchestrator: 스테이지 skip과 Synth 시간 보장
+# ═══════════════════════════════════════════════════════════════
+QUESTION = "Explain Redis caching strategies in detail for production."
+
+
+class TestRunDeadline:
+    def test_slow_stage_leaves_time_for_synth(self):
+        openai = slow_provider("openai", 5.0, text="never")
+        groq = slow_provider("groq", 0.01, text="Redis answer.")
+        cfg = ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False,
+                              run_deadline_sec=1.0, synth_reserve_sec=0.5)
+        started = time.monotonic()
+        with patch.dict(PROVIDERS, {"openai": openai, "groq": groq}):
+            result = asyncio.run(run_orchestrator(
+                question=QUESTION,
+                thread_summary="",
+                user_api_keys={"openai": "sk", "groq": "gk"},
+                stages=[
+                    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:slow"},
+                    {"name": "Critic", "system_prompt": "Critique.", "model": "openai:slow"},
+                ],
+                synth_model="groq:fast",
+                budget=Budget(),
+                execution_config=cfg,
+            ))
+        assert time.monotonic() - started < 1.0
+        assert result["final"] == "Redis answer."
+        metrics = result["monitoring"]["stage_metrics"]
+        assert metrics["Solver"]["status"] == "deadline_exceeded"
+        assert metrics["Critic"]["status"] == "skipped"
+        assert result["monitoring"]["skipped_stages"] == ["Critic"]
+        assert result["monitoring"]["run_deadline_sec"] == 1.0
+        assert "Critic" not in result["usage"]
+
+    def test_skips_stage_whose_median_latency_does_not_fit(self):
+        for _ in range(latency_tracker.min_samples):
+            latency_tracker.record("anthropic", "slow", 60_000)
+        openai = slow_provider("openai", 0, text="Solver says Redis.")
+        anthropic = slow_provider("anthropic", 0, text="Critic says Redis.")
+        cfg = ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False,
+                              run_deadline_sec=30, synth_reserve_sec=10)
+        with patch.dict(PROVIDERS, {"openai": openai, "anthropic": anthropic}):
+            result = asyncio.run(run_orchestrator(
+                question=QUESTION,
+                thread_summary="",
+                user_api_keys={"openai": "sk", "anthropic": "ak"},
+                stages=[
+                    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:fast"},
+                    {"name": "Critic", "system_prompt": "Critique.", "model": "anthropic:slow"},
+                ],
+                synth_model="openai:fast",
+                budget=Budget(),
+                execution_config=cfg,
+            ))
+        anthropic.generate.assert_not_called()
+        assert result["monitoring"]["skipped_stages"] == ["Critic"]
+        assert [s["name"] for s in result["stages"]] == ["Solver"]
+        synth_user = openai.generate.await_args_list[-1].kwargs["user"]
+        assert "Critic" not in synth_user
+
+    def test_no_deadline_runs_everything(self):
+        openai = slow_provider("openai", 0, text="Redis answer.")
+        with patch.dict(PROVIDERS, {"openai": openai}):
+            result = asyncio.run(run_orchestrator(
+                question=QUESTION,
+                thread_summary="",
+                user_api_keys={"openai": "sk"},
+                stages=[
+                    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:a"},
+                    {"name": "Critic", "system_prompt": "Critique.", "model": "openai:a"},
+                ],
+                synth_model="openai:a",
+                budget=Budget(),
+                execution_config=ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False),
+            ))
+        assert result["monitoring"]["skipped_stages"] == []
+        assert "run_deadline_sec" not in result["monitoring"]
+        assert set(result["usage"]) == {"Solver", "Critic", "synth"}
@@ -0,0 +1,233 @@
+"""
+Tests for per-stage / synth fallback model chains (app.orchestrator.runner._call_with_failover)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app import db as db_module
+from app.db import Base, SessionLocal, add_missing_columns, engine
+from app.models import User
+from app.orchestrator.breaker import breakers
+from app.orchestrator.runner import (
+    Budget,
+    ExecutionConfig,
+    PROVIDERS,
+    _call_with_failover,
+    _model_chain,
+    run_orchestrator,
+)
+from app.providers.base import LLMResult
+from app.repositories import (
+    get_synth_fallbacks,
+    load_run_inputs,
+    parse_model_list,
+    save_pipeline_stages,
+    save_synth_model,
+)
+
+
+@pytest.fixture(autouse=True, scope="module")
+def tables():
+    Base.metadata.create_all(bind=engine)
+
+
+def http_error(status):
+    req = httpx.Request("POST", "https://x")
+    return httpx.HTTPStatusError("err", request=req, response=httpx.Response(status, request=req))
+
+
+def make_provider(name, side_effect=None, text="ok"):
+    prov = MagicMock()
+    prov.provider_name = name
+    if side_effect is not None:
+        prov.generate = AsyncMock(side_effect=side_effect)
+    else:
+        prov.generate = AsyncMock(return_value=LLMResult(text=text, provider=name, model="m", input_tokens=10, output_tokens=5))
+    return prov
+
+
+CFG = ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False)
+
+
+# ═══════════════════════════════════════════════════════════════
+# 모델 목록 파싱
+# ═══════════════════════════════════════════════════════════════
+class TestModelLists:
+    def test_parse_commas_and_newlines(self):
+        assert parse_model_list("groq:llama, anthropic:haiku\nopenai:gpt-4o-mini,,groq:llama") == [
+            "groq:llama", "anthropic:haiku", "openai:gpt-4o-mini",
+        ]
+
+    def test_parse_empty(self):
+        assert parse_model_list("") == []
+        assert parse_model_list(None) == []
+
+    def test_chain_puts_primary_first_and_dedupes(self):
+        assert _model_chain("openai:a", ["groq:b", "openai:a", " "]) == ["openai:a", "groq:b"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# _call_with_failover
+# ═══════════════════════════════════════════════════════════════
+class TestCallWithFailover:
+    def _call(self, chain, keys, providers, on_event=None):
+        with patch.dict(PROVIDERS, providers):
+            return asyncio.run(_call_with_failover(
+                chain=chain, user_api_keys=keys,
+                default_provider=providers.get("openai"), default_key=keys.get("openai", ""),
+                system="s", user="u", max_tokens=5, cfg=CFG, on_event=on_event,
+            ))
+
+    def test_primary_success_records_served_by(self):
+        openai = make_provider("openai")
+        result, rt = self._call(["openai:m"], {"openai": "k"}, {"openai": openai})
+        assert result.text == "ok"
+        assert rt["served_by"] == "openai:m"
+        assert "failovers" not in rt
+
+    def test_moves_to_next_on_failure(self):
+        openai = make_provider("openai", side_effect=http_error(503))
+        groq = make_provider("groq", text="from groq")
+        result, rt = self._call(["openai:m", "groq:g"], {"openai": "k", "groq": "g"}, {"openai": openai, "groq": groq})
+        assert result.text == "from groq"
+        assert rt["served_by"] == "groq:g"
+        assert rt["failovers"] == 1
+        assert groq.generate.await_args.kwargs["model"] == "g"
+
+    def test_skips_fallback_without_key(self):
+        openai = make_provider("openai", side_effect=http_error(503))
+        groq = make_provider("groq")
+        mistral = make_provider("mistral", text="from mistral")
+        result, rt = self._call(
+            ["openai:m", "groq:g", "mistral:x"], {"openai": "k", "mistral": "k"},
+            {"openai": openai, "groq": groq, "mistral": mistral},
+        )
+        assert rt["served_by"] == "mistral:x"
+        groq.generate.assert_not_called()
+
+    def test_open_circuit_fails_over_without_calling(self):
+        b = breakers.get("openai", "m")
+        for _ in range(b.config.failure_threshold):
+            b.record_failure("HTTPStatusError: 503")
+        openai = make_provider("openai")
+        groq = make_provider("groq")
+        result, rt = self._call(["openai:m", "groq:g"], {"openai": "k", "groq": "g"}, {"openai": openai, "groq": groq})
+        openai.generate.assert_not_called()
+        assert rt["served_by"] == "groq:g"
+
+    def test_all_fail_reports_each_error(self):
+        openai = make_provider("openai", side_effect=http_error(503))
+        groq = make_provider("groq", side_effect=RuntimeError("boom"))
+        result, rt = self._call(["openai:m", "groq:g"], {"openai": "k", "groq": "g"}, {"openai": openai, "groq": groq})
+        assert result is None
+        assert "openai:m" in rt["error"] and "groq:g: RuntimeError: boom" in rt["error"]
+        assert "served_by" not in rt
+
+    def test_emits_retry_before_failover(self):
+        events = []
+
+        async def on_event(ev):
+            events.append(ev)
+
+        openai = make_provider("openai", side_effect=http_error(503))
+        groq = make_provider("groq")
+        self._call(["openai:m", "groq:g"], {"openai": "k", "groq": "g"}, {"openai": openai, "groq": groq}, on_event)
+        assert any(ev["type"] == "retry" and "groq:g" in ev["error"] for ev in events)
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_orchestrator에서의 stage/synth failover
+# ═══════════════════════════════════════════════════════════════
+class TestOrchestratorFailover:
+    def test_stage_and_synth_fall_back(self):
+        openai = make_provider("openai", side_effect=http_error(503))
+        groq = make_provider("groq", text="Redis answer from groq.")
+        with patch.dict(PROVIDERS, {"openai": openai, "groq": groq}):
+            result = asyncio.run(run_orchestrator(
+                question="Explain Redis caching strategies in detail for production.",
+                thread_summary="",
+                user_api_keys={"openai": "sk", "groq": "gk"},
+                stages=[
+                    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini",
+                     "fallback_models": ["groq:llama"]},
+                    {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o-mini",
+                     "fallback_models": ["groq:llama"]},
+                ],
+                synth_model="openai:gpt-4o-mini",
+                synth_fallbacks=["groq:llama"],
+                budget=Budget(),
+                execution_config=CFG,
+            ))
+        assert result["final"] == "Redis answer from groq."
+        for name in ("Solver", "Critic", "synth"):
+            assert result["usage"][name]["served_by"] == "groq:llama"
+            assert result["usage"][name]["provider"] == "groq"
+            assert result["monitoring"]["stage_metrics"][name]["served_by"] == "groq:llama"
+            assert result["monitoring"]["stage_metrics"][name]["failovers"] == 1
+        assert "groq:llama" in result["monitoring"]["circuits"]
+
+    def test_missing_primary_key_uses_fallback(self):
+        groq = make_provider("groq", text="Redis answer.")
+        with patch.dict(PROVIDERS, {"groq": groq}):
+            result = asyncio.run(run_orchestrator(
+                question="Explain Redis caching strategies in detail for production.",
+                thread_summary="",
+                user_api_keys={"groq": "gk"},
+                stages=[{"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini",
+                         "fallback_models": ["groq:llama"]}],
+                synth_model="groq:llama",
+                budget=Budget(),
+                execution_config=CFG,
+            ))
+        assert result["final"] == "Redis answer."
+        assert result["usage"]["Solver"]["served_by"] == "groq:llama"
+
+
+# ═══════════════════════════════════════════════════════════════
+# 저장소 / 스키마
+# ═══════════════════════════════════════════════════════════════
+class TestPersistence:
+    def test_fallbacks_round_trip(self):
+        db = SessionLocal()
+        try:
+            if not db.get(User, 77):
+                db.add(User(id=77, email="fallback@local", password_hash=""))
+                db.commit()
+            save_pipeline_stages(
+                db, 77, ["Solver", "Critic"], ["a", "b"], ["openai:x", "openai:y"],
+                ["groq:llama\nanthropic:haiku", ""],
+            )
+            save_synth_model(db, 77, "openai:x", "mistral:small, groq:llama")
+            inputs = load_run_inputs(db, 77)
+            assert inputs.stages[0]["fallback_models"] == ["groq:llama", "anthropic:haiku"]
+            assert inputs.stages[1]["fallback_models"] == []
+            assert inputs.synth_fallbacks == ["mistral:small", "groq:llama"]
+
+            # fallbacks를 넘기지 않으면 기존 값을 유지한다.
+            save_synth_model(db, 77, "openai:z")
+            assert get_synth_fallbacks(db, 77) == ["mistral:small", "groq:llama"]
+        finally:
+            db.close()
+
+    def test_add_missing_columns_upgrades_old_table(self, tmp_path):
+        old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        with old.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE pipeline_stages (id INTEGER PRIMARY KEY, user_id INTEGER, name VARCHAR(64), "
+                "system_prompt TEXT, model VARCHAR(128), order_index INTEGER)"
+            ))
+            conn.execute(text("INSERT INTO pipeline_stages VALUES (1, 1, 'Solver', 'p', 'openai:x', 0)"))
+        with patch.object(db_module, "engine", old):
+            add_missing_columns()
+        columns = {c["name"] for c in inspect(old).get_columns("pipeline_stages")}
+        assert "fallback_models" in columns
+        with old.connect() as conn:
+            assert conn.execute(text("SELECT fallback_models FROM pipeline_stages")).scalar() == ""
@@ -0,0 +1,174 @@
+"""
+Tests for hedged requests (app.orchestrator.latency / _call_with_resilience hedging)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app.orchestrator.latency import LatencyTracker, latency_tracker
+from app.orchestrator.runner import (
+    _call_with_resilience,
+    _payload,
+    run_orchestrator,
+    Budget,
+    ExecutionConfig,
+    PROVIDERS,
+)
+from app.providers.base import LLMResult
+
+
+HEDGE_CFG = ExecutionConfig(retries_per_stage=0, stage_timeout_sec=5, enable_hedging=True,
+                            enable_quality_matrix=False)
+
+
+class SlowProvider:
+    def __init__(self, name, delay, text):
+        self.provider_name = name
+        self.delay = delay
+        self.text = text
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, api_key, model, system, user, max_tokens):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return LLMResult(text=self.text, provider=self.provider_name, model=model,
+                         input_tokens=1000, output_tokens=100)
+
+
+@pytest.fixture(autouse=True)
+def seeded_latency():
+    latency_tracker.clear()
+    for _ in range(20):
+        latency_tracker.record("hedge-primary", "m", 20)
+    yield
+    latency_tracker.clear()
+
+
+def call(prov, cfg=HEDGE_CFG, user="u", **kw):
+    return asyncio.run(_call_with_resilience(
+        provider=prov, api_key="k", model="m", system="s", user=user, max_tokens=10, cfg=cfg, **kw,
+    ))
+
+
+# ═══════════════════════════════════════════════════════════════
+# LatencyTracker
+# ═══════════════════════════════════════════════════════════════
+class TestLatencyTracker:
+    def test_requires_min_samples(self):
+        t = LatencyTracker(min_samples=3)
+        t.record("p", "m", 10)
+        t.record("p", "m", 20)
+        assert t.percentile("p", "m", 0.5) is None
+        t.record("p", "m", 30)
+        assert t.percentile("p", "m", 0.5) == 20.0
+
+    def test_window_and_percentile(self):
+        t = LatencyTracker(window=100, min_samples=1)
+        for ms in range(1, 201):
+            t.record("p", "m", ms)
+        assert t.percentile("p", "m", 0.0) == 101.0
+        assert t.percentile("p", "m", 0.95) == 195.0
+
+
+# ═══════════════════════════════════════════════════════════════
+# _call_with_resilience hedging
+# ═══════════════════════════════════════════════════════════════
+class TestHedging:
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        prov = SlowProvider("hedge-primary", 0.0, "ok")
+        prov.delay = 1.0
+        # 같은 provider로 hedge: 두 번째 호출은 빠르게 끝나도록 한다.
+        orig = prov.generate
+
+        async def generate(**kwargs):
+            if prov.calls == 1:
+                prov.delay = 0.0
+            return await orig(**kwargs)
+        prov.generate = generate
+
+        result, rt = call(prov, user="long prompt " * 400)
+        assert result.text == "ok"
+        assert prov.calls == 2
+        assert prov.cancelled == 1
+        assert rt["hedges"] == 1
+        assert rt["hedge_extra_cost_usd"] > 0
+
+    def test_fast_primary_not_hedged(self):
+        prov = SlowProvider("hedge-primary", 0.0, "fast")
+        result, rt = call(prov)
+        assert result.text == "fast"
+        assert prov.calls == 1
+        assert "hedges" not in rt
+
+    def test_alternate_model_target(self):
+        primary = SlowProvider("hedge-primary", 1.0, "primary")
+        alt = SlowProvider("hedge-alt", 0.0, "alternate")
+        result, rt = call(primary, hedge_target=(alt, "k2", "alt-model"))
+        assert result.text == "alternate"
+        assert result.model == "alt-model"
+        assert primary.cancelled == 1
+        assert rt["hedges"] == 1
+
+    def test_disabled_by_default(self):
+        prov = SlowProvider("hedge-primary", 0.1, "slow")
+        cfg = ExecutionConfig(retries_per_stage=0, stage_timeout_sec=5)
+        result, rt = call(prov, cfg)
+        assert prov.calls == 1 and "hedges" not in rt
+
+    def test_hedge_winner_resets_streamed_text(self):
+        primary = SlowProvider("hedge-primary", 1.0, "primary")
+        alt = SlowProvider("hedge-alt", 0.0, "alternate")
+        seen = []
+
+        async def primary_stream(api_key, model, system, user, max_tokens):
+            await asyncio.sleep(1.0)
+            yield  # pragma: no cover
+        primary.generate_stream = primary_stream
+
+        async def on_event(ev):
+            seen.append(ev)
+        result, _ = call(primary, hedge_target=(alt, "k2", "alt-model"), on_event=on_event)
+        assert result.text == "alternate"
+        assert [e["type"] for e in seen] == ["retry", "token"]
+        assert seen[-1]["text"] == "alternate"
+
+    def test_payload_includes_hedge_cost(self):
+        res = LLMResult(text="a", provider="openai", input_tokens=1_000_000)
+        p = _payload(res, {"status": "ok", "hedges": 1, "hedge_extra_cost_usd": 0.25})
+        assert p["hedges"] == 1
+        assert p["hedge_extra_cost_usd"] == 0.25
+        assert abs(p["cost_usd"] - 0.75) < 1e-6
+
+
+class TestOrchestratorHedging:
+    def test_hedge_model_used_for_stages(self):
+        primary = SlowProvider("hedge-primary", 1.0, "primary")
+        alt = SlowProvider("hedge-alt", 0.0, "alternate answer")
+        cfg = ExecutionConfig(retries_per_stage=0, stage_timeout_sec=5, enable_hedging=True,
+                              hedge_model="groq:alt-model", enable_quality_matrix=False)
+        with patch.dict(PROVIDERS, {"openai": primary, "groq": alt}):
+            # openai:m 의 지연 표본을 provider 이름 기준으로 맞춘다.
+            for _ in range(20):
+                latency_tracker.record("hedge-primary", "gpt-4o-mini", 20)
+            result = asyncio.run(run_orchestrator(
+                question="Explain Redis caching strategies in detail for production.",
+                thread_summary="",
+                user_api_keys={"openai": "sk", "groq": "gk"},
+                stages=[{"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"}],
+                synth_model="openai:gpt-4o-mini",
+                budget=Budget(max_usd=10.0),
+                execution_config=cfg,
+            ))
+        assert result["final"] == "alternate answer"
+        assert result["usage"]["Solver"]["hedges"] == 1
+        assert result["monitoring"]["stage_metrics"]["Solver"]["hedges"] == 1
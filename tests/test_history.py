@@ -0,0 +1,183 @@
+"""
+Tests for the history page: keyset pagination, batched answer loading and lazy stage transcripts
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db import SessionLocal, alembic_config, upgrade_schema
+from app.models import Thread, User
+from app.repositories import (
+    decode_history_cursor, get_first_answers, get_stage_messages, list_answered_threads,
+    save_thread_run_result, start_thread_turn,
+)
+
+
+@pytest.fixture
+def engine():
+    path = os.path.join(tempfile.mkdtemp(prefix="debait-history-"), "h.db")
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+@pytest.fixture
+def Session(engine):
+    upgrade_schema(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add_all([User(id=1, email="h@local", password_hash=""), User(id=2, email="o@local", password_hash="")])
+        db.commit()
+    return factory
+
+
+def answer(db, user_id, key, question, stages=("Solver", "Critic")):
+    thread_id, _ = start_thread_turn(db, user_id, key, question)
+    save_thread_run_result(db, user_id, thread_id, question, {
+        "final": f"answer to {question}",
+        "stages": [{"name": s, "text": f"{s} on {question}"} for s in stages],
+    })
+    return thread_id
+
+
+class count_statements:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+# ═══════════════════════════════════════════════════════════════
+# 비정규화 값
+# ═══════════════════════════════════════════════════════════════
+class TestDenormalizedColumns:
+    def test_turns_fill_preview_and_answer_flag(self, Session):
+        with Session() as db:
+            thread_id, _ = start_thread_turn(db, 1, "web:a", "Q" * 400)
+            t = db.get(Thread, thread_id)
+            assert t.preview == "Q" * 255 and t.has_answer is False and t.stage_names == ""
+
+            save_thread_run_result(db, 1, thread_id, "Q", {"final": "A", "stages": [{"name": "Solver", "text": "s"}]})
+            start_thread_turn(db, 1, "web:a", "second question")
+            db.refresh(t)
+            assert t.has_answer is True
+            assert t.stage_names == "Solver"
+            assert t.preview == "Q" * 255  # 첫 질문 유지
+
+    def test_0003_backfills_existing_threads(self, engine):
+        with engine.connect() as conn:
+            command.upgrade(alembic_config(conn), "0002")
+            conn.commit()
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, email, password_hash) VALUES (1, 'b@local', '')"))
+            conn.execute(text(
+                "INSERT INTO threads (id, user_id, thread_key, summary, updated_at) VALUES"
+                " (1, 1, 'web:done', '', '2026-01-01'), (2, 1, 'web:failed', '', '2026-01-02')"
+            ))
+            conn.execute(text(
+                "INSERT INTO messages (thread_id, role, content, created_at) VALUES"
+                " (1, 'user', 'first q', '2026-01-01'), (1, 'Solver', 's', '2026-01-01'),"
+                " (1, 'Critic', 'c', '2026-01-01'), (1, 'assistant', 'a', '2026-01-01'),"
+                " (2, 'user', 'broken q', '2026-01-02')"
+            ))
+        upgrade_schema(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            done, failed = db.get(Thread, 1), db.get(Thread, 2)
+            assert (done.has_answer, done.preview, done.stage_names) == (True, "first q", "Solver · Critic")
+            assert (failed.has_answer, failed.preview, failed.stage_names) == (False, "broken q", "")
+
+
+# ═══════════════════════════════════════════════════════════════
+# keyset 페이지네이션 / 일괄 조회
+# ═══════════════════════════════════════════════════════════════
+class TestHistoryQueries:
+    def test_pages_walk_all_answered_threads_once(self, Session):
+        with Session() as db:
+            ids = [answer(db, 1, f"web:{i}", f"q{i}") for i in range(7)]
+            start_thread_turn(db, 1, "web:unanswered", "no answer")
+            answer(db, 2, "web:other", "other user")
+            # 같은 updated_at이 있어도 id로 순서가 정해진다.
+            same = datetime.utcnow() - timedelta(hours=1)
+            db.query(Thread).filter(Thread.id.in_(ids[2:5])).update({Thread.updated_at: same})
+            db.commit()
+
+            seen, cursor = [], None
+            while True:
+                page, next_cursor = list_answered_threads(db, 1, limit=3, before=cursor)
+                seen.extend(t.id for t in page)
+                if next_cursor is None:
+                    break
+                cursor = decode_history_cursor(next_cursor)
+            assert sorted(seen) == sorted(ids)
+            assert len(seen) == len(set(seen))
+            assert seen[-3:] == sorted(ids[2:5], reverse=True)
+
+    def test_invalid_cursor(self):
+        with pytest.raises(ValueError):
+            decode_history_cursor("garbage")
+
+    def test_first_answers_in_one_query(self, Session, engine):
+        with Session() as db:
+            ids = [answer(db, 1, f"web:{i}", f"q{i}") for i in range(5)]
+            save_thread_run_result(db, 1, ids[0], "follow-up", {"final": "later answer", "stages": []})
+            with count_statements(engine) as stmts:
+                answers = get_first_answers(db, ids)
+            assert stmts.count == 1
+            assert answers[ids[0]] == "answer to q0"
+            assert set(answers) == set(ids)
+
+    def test_stage_messages_are_scoped_to_user(self, Session):
+        with Session() as db:
+            thread_id = answer(db, 1, "web:s", "q")
+            assert [m.role for m in get_stage_messages(db, 1, thread_id)] == ["Solver", "Critic"]
+            assert get_stage_messages(db, 2, thread_id) is None
+            assert get_stage_messages(db, 1, 999999) is None
+
+
+# ═══════════════════════════════════════════════════════════════
+# /conversations
+# ═══════════════════════════════════════════════════════════════
+class TestConversationsPage:
+    def test_page_and_lazy_stages(self):
+        from fastapi.testclient import TestClient
+        from app import main
+        from app.db import engine as app_engine
+
+        with patch.object(main.telegram_jobs, "start", new=AsyncMock()), TestClient(main.app) as client:
+            db = SessionLocal()
+            try:
+                for i in range(main.HISTORY_PAGE_SIZE + 2):
+                    thread_id = answer(db, 1, f"web:history-{i}", f"history question {i}")
+            finally:
+                db.close()
+
+            with count_statements(app_engine) as stmts:
+                page = client.get("/conversations")
+            assert page.status_code == 200
+            # thread 수와 상관없이 사용자 확인 + 목록 + 답변 일괄 조회
+            assert stmts.count <= 4
+            assert f"history question {main.HISTORY_PAGE_SIZE + 1}" in page.text
+            assert "Solver on history question" not in page.text
+            assert "이전 대화 더 보기" in page.text
+
+            stages = client.get(f"/conversations/{thread_id}/stages")
+            assert stages.status_code == 200
+            assert "Critic on history question" in stages.text
+            assert client.get("/conversations/999999/stages").status_code == 404
+            assert client.get("/conversations", params={"before": "nope"}).status_code == 400
@@ -0,0 +1,190 @@
+"""
+Unit tests for app.http_client (공유 커넥션 풀)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app import http_client
+from app.http_client import HttpClientConfig, get_client, aclose_all, network_timings
+from app.providers.groq_provider import GroqProvider
+
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    http_client.configure(HttpClientConfig())
+    yield
+    asyncio.run(aclose_all())
+    http_client.configure(HttpClientConfig())
+
+
+class TestGetClient:
+    def test_same_client_within_loop(self):
+        async def main():
+            return get_client("openai"), get_client("openai")
+        a, b = asyncio.run(main())
+        assert a is b
+
+    def test_clients_are_per_name(self):
+        async def main():
+            return get_client("openai"), get_client("groq")
+        a, b = asyncio.run(main())
+        assert a is not b
+
+    def test_new_loop_gets_new_client(self):
+        async def main():
+            return get_client("openai")
+        a = asyncio.run(main())
+        b = asyncio.run(main())
+        assert a is not b
+
+    def test_closed_client_is_replaced(self):
+        async def main():
+            a = get_client("openai")
+            await a.aclose()
+            return a, get_client("openai")
+        a, b = asyncio.run(main())
+        assert a is not b
+        assert not b.is_closed
+
+    def test_limits_and_timeout_from_config(self):
+        http_client.configure(HttpClientConfig(timeout_sec=12, max_connections=7))
+
+        async def main():
+            return get_client("openai"), get_client("telegram")
+        c, tg = asyncio.run(main())
+        assert c.timeout.read == 12
+        assert tg.timeout.read == 20
+
+    def test_aclose_all_closes_clients(self):
+        async def main():
+            c = get_client("openai")
+            await aclose_all()
+            return c
+        assert asyncio.run(main()).is_closed
+
+
+class TestProviderUsesSharedClient:
+    def test_client_stays_open_across_calls(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request.url.host)
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "hi"}}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 1},
+            })
+
+        async def main():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            http_client._clients["groq"] = (asyncio.get_running_loop(), client)
+            prov = GroqProvider()
+            r1 = await prov.generate(api_key="k", model="m", system="s", user="u", max_tokens=5)
+            r2 = await prov.generate(api_key="k", model="m", system="s", user="u", max_tokens=5)
+            return client, r1, r2
+
+        client, r1, r2 = asyncio.run(main())
+        assert r1.text == r2.text == "hi"
+        assert r1.input_tokens == 3
+        assert seen == ["api.groq.com", "api.groq.com"]
+        assert not client.is_closed
+
+
+# ═══════════════════════════════════════════════════════════════
+# 네트워크 단계별 시간 (httpcore trace extension)
+# ═══════════════════════════════════════════════════════════════
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.05)  # vendor 처리 시간 (ttfb)
+        if body.get("stream"):
+            chunks = [
+                {"choices": [{"delta": {"content": "hel"}}]},
+                {"choices": [{"delta": {"content": "lo"}}], "usage": {"prompt_tokens": 4, "completion_tokens": 2}},
+            ]
+            payload = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+            content_type = "text/event-stream"
+        else:
+            payload = json.dumps({
+                "choices": [{"message": {"content": "hello " + "x" * 4000}}],
+                "usage": {"prompt_tokens": 4, "completion_tokens": 2},
+            })
+            content_type = "application/json"
+        data = payload.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def chat_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    server.shutdown()
+    server.server_close()
+
+
+class TestNetworkTimings:
+    def test_phases_and_connection_reuse(self, chat_server):
+        async def main():
+            client = get_client("groq")
+            first = await client.post(chat_server, json={})
+            second = await client.post(chat_server, json={})
+            await aclose_all()
+            return network_timings(first, parse_ms=0.5), network_timings(second)
+
+        first, second = asyncio.run(main())
+        assert first["connection_reused"] is False
+        assert first["connect_ms"] >= 0 and "tls_ms" not in first
+        assert first["ttfb_ms"] >= 45
+        assert first["response_bytes"] > 4000
+        assert first["parse_ms"] == 0.5
+        assert {"pool_wait_ms", "send_ms", "download_ms"} <= set(first)
+        assert second["connection_reused"] is True
+        assert "connect_ms" not in second and second["ttfb_ms"] >= 45
+
+    def test_providers_report_network_timings(self, chat_server):
+        real_request = GroqProvider._request
+
+        def local_request(self, *args):
+            _, headers, payload = real_request(self, *args)
+            return chat_server, headers, payload
+
+        async def main():
+            prov = GroqProvider()
+            result = await prov.generate(api_key="k", model="m", system="s", user="u", max_tokens=5)
+            streamed = [ev async for ev in prov.generate_stream(api_key="k", model="m", system="s", user="u", max_tokens=5)]
+            await aclose_all()
+            return result, streamed[-1].result
+
+        with patch.object(GroqProvider, "_request", local_request):
+            result, streamed = asyncio.run(main())
+        assert result.text.startswith("hello")
+        assert result.network["ttfb_ms"] >= 45 and "parse_ms" in result.network
+        assert streamed.text == "hello" and streamed.output_tokens == 2
+        assert streamed.network["connection_reused"] is True
+        assert streamed.network["response_bytes"] > 0 and "download_ms" in streamed.network
+
+    def test_responses_without_timer(self):
+        response = httpx.Response(200, content=b"{}", request=httpx.Request("POST", "http://x"))
+        response.read()
+        assert network_timings(response) == {"response_bytes": 0}
@@ -0,0 +1,265 @@
+"""
+Tests for the durable Telegram job queue (app.jobqueue)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.jobqueue import TelegramJobQueue
+from app.models import TelegramJob
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+class TestQueueOperations:
+    def test_enqueue_dedupes_update_id(self, session_factory):
+        q = TelegramJobQueue()
+        db = session_factory()
+        assert q.enqueue(db, 100, "c1", "hello") is True
+        assert q.enqueue(db, 100, "c1", "hello") is False
+        assert db.query(TelegramJob).count() == 1
+
+    def test_claim_marks_running_with_lease(self, session_factory):
+        q = TelegramJobQueue(lease_sec=60)
+        db = session_factory()
+        q.enqueue(db, 1, "c", "t")
+        job = q.claim(db)
+        assert job.status == "running"
+        assert job.attempts == 1
+        assert job.lease_until > datetime.utcnow()
+        assert q.claim(db) is None
+
+    def test_claim_is_fifo(self, session_factory):
+        q = TelegramJobQueue()
+        db = session_factory()
+        for uid in (1, 2, 3):
+            q.enqueue(db, uid, "c", str(uid))
+        assert [q.claim(db).text for _ in range(3)] == ["1", "2", "3"]
+
+    def test_expired_lease_is_reclaimed(self, session_factory):
+        q = TelegramJobQueue(lease_sec=60)
+        db = session_factory()
+        q.enqueue(db, 1, "c", "t")
+        job = q.claim(db)
+        job.lease_until = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        again = q.claim(db)
+        assert again.id == job.id
+        assert again.attempts == 2
+
+    def test_fail_requeues_until_max_attempts(self, session_factory):
+        q = TelegramJobQueue(max_attempts=2, retry_backoff_sec=0)
+        db = session_factory()
+        q.enqueue(db, 1, "c", "t")
+        job = q.claim(db)
+        q.fail(db, job.id, "boom")
+        assert db.get(TelegramJob, job.id).status == "queued"
+        job = q.claim(db)
+        q.fail(db, job.id, "boom")
+        db.expire_all()
+        final = db.get(TelegramJob, job.id)
+        assert final.status == "failed"
+        assert final.last_error == "boom"
+
+    def test_failed_job_waits_for_backoff(self, session_factory):
+        q = TelegramJobQueue(max_attempts=3, retry_backoff_sec=60)
+        db = session_factory()
+        q.enqueue(db, 1, "c", "t")
+        job = q.claim(db)
+        before = datetime.utcnow()
+        assert q.fail(db, job.id, "boom") is False
+        job = db.get(TelegramJob, job.id)
+        assert job.status == "queued"
+        assert job.lease_until >= before + timedelta(seconds=60)
+        assert q.claim(db) is None  # backoff 중에는 claim되지 않는다.
+
+        job.lease_until = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+        job = q.claim(db)
+        assert job.attempts == 2
+        before = datetime.utcnow()
+        q.fail(db, job.id, "boom")
+        assert db.get(TelegramJob, job.id).lease_until >= before + timedelta(seconds=120)  # 시도마다 두 배
+
+    def test_recover_requeues_expired_running_and_purges_old(self, session_factory):
+        q = TelegramJobQueue(retention_days=7, lease_sec=60)
+        db = session_factory()
+        q.enqueue(db, 1, "c", "orphaned")
+        q.enqueue(db, 2, "c", "other replica")
+        q.enqueue(db, 3, "c", "old")
+        orphaned, _ = q.claim(db), q.claim(db)
+        orphaned.lease_until = datetime.utcnow() - timedelta(seconds=1)
+        old = db.query(TelegramJob).filter(TelegramJob.update_id == 3).one()
+        old.status = "done"
+        old.updated_at = datetime.utcnow() - timedelta(days=30)
+        db.commit()
+
+        assert q.recover(db) == 1
+        db.expire_all()
+        jobs = db.query(TelegramJob).order_by(TelegramJob.update_id).all()
+        assert [(j.update_id, j.status) for j in jobs] == [(1, "queued"), (2, "running")]
+
+
+class TestWorkers:
+    def test_workers_process_jobs_with_concurrency_limit(self, session_factory):
+        handled = []
+        active = 0
+        peak = 0
+
+        async def handler(chat_id, text):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            # claim이 DB 스레드를 거치므로 두 worker가 겹칠 만큼 충분히 오래 잡고 있는다.
+            await asyncio.sleep(0.1)
+            handled.append(text)
+            active -= 1
+
+        async def main():
+            q = TelegramJobQueue(workers=2, poll_interval_sec=0.05)
+            db = session_factory()
+            for i in range(6):
+                q.enqueue(db, i, "c", str(i))
+            db.close()
+            await q.start(session_factory, handler)
+            # handler가 끝난 뒤 complete()가 DB 스레드에서 기록될 때까지 기다린다.
+            for _ in range(200):
+                db = session_factory()
+                done = db.query(TelegramJob).filter(TelegramJob.status == "done").count()
+                db.close()
+                if done == 6:
+                    break
+                await asyncio.sleep(0.02)
+            await q.stop()
+
+        asyncio.run(main())
+        assert sorted(handled) == [str(i) for i in range(6)]
+        assert peak == 2
+        db = session_factory()
+        assert {j.status for j in db.query(TelegramJob)} == {"done"}
+
+    def test_worker_survives_db_errors(self, session_factory):
+        handled = []
+
+        async def handler(chat_id, text):
+            handled.append(text)
+
+        async def main():
+            q = TelegramJobQueue(workers=1, poll_interval_sec=0.05)
+            claim_values = q._claim_values
+            calls = 0
+
+            def flaky_claim(db):
+                nonlocal calls
+                calls += 1
+                if calls == 1:
+                    raise OperationalError("SELECT", {}, Exception("database is locked"))
+                return claim_values(db)
+
+            q._claim_values = flaky_claim
+            db = session_factory()
+            q.enqueue(db, 1, "c", "t")
+            db.close()
+            await q.start(session_factory, handler)
+            for _ in range(100):
+                if handled:
+                    break
+                await asyncio.sleep(0.02)
+            await q.stop()
+            return calls
+
+        assert asyncio.run(main()) >= 2
+        assert handled == ["t"]
+
+    def test_stop_releases_running_job(self, session_factory):
+        async def main():
+            running = asyncio.Event()
+
+            async def handler(chat_id, text):
+                running.set()
+                await asyncio.Event().wait()
+
+            q = TelegramJobQueue(workers=1, lease_sec=900, poll_interval_sec=0.05)
+            db = session_factory()
+            q.enqueue(db, 1, "c", "t")
+            db.close()
+            await q.start(session_factory, handler)
+            await asyncio.wait_for(running.wait(), timeout=2)
+            await q.stop()
+
+        asyncio.run(main())
+        db = session_factory()
+        job = db.query(TelegramJob).one()
+        assert (job.status, job.attempts, job.lease_until) == ("queued", 0, None)
+        # 재시작한 worker는 lease 만료를 기다리지 않고 바로 가져간다.
+        assert TelegramJobQueue().claim(db).id == job.id
+
+    def test_handler_error_is_retried_then_reported_once(self, session_factory):
+        attempts = []
+        reported = []
+
+        async def handler(chat_id, text):
+            attempts.append(text)
+            raise RuntimeError("nope")
+
+        async def on_failed(chat_id, error):
+            reported.append((chat_id, error))
+
+        async def main():
+            q = TelegramJobQueue(workers=1, max_attempts=2, poll_interval_sec=0.05, retry_backoff_sec=0)
+            db = session_factory()
+            q.enqueue(db, 1, "c", "t")
+            db.close()
+            await q.start(session_factory, handler, on_failed=on_failed)
+            # failed 기록 뒤 on_failed가 불릴 때까지 기다린다.
+            for _ in range(100):
+                if reported:
+                    break
+                await asyncio.sleep(0.02)
+            await q.stop()
+            db = session_factory()
+            status = db.query(TelegramJob).one().status
+            db.close()
+            return status
+
+        assert asyncio.run(main()) == "failed"
+        assert attempts == ["t", "t"]
+        assert reported == [("c", "RuntimeError: nope")]
+
+
+class TestWebhook:
+    def test_webhook_enqueues_once_per_update(self):
+        from unittest.mock import AsyncMock, patch
+        from fastapi.testclient import TestClient
+        from app import main
+        from app.db import SessionLocal
+        from app.settings import settings
+
+        update = {"update_id": 987654, "message": {"chat": {"id": 42}, "text": "hello"}}
+        # worker는 띄우지 않고 큐 적재만 확인한다.
+        with patch.object(main.telegram_jobs, "start", new=AsyncMock()), \
+                patch.object(main.telegram_jobs, "notify") as notify, \
+                TestClient(main.app) as client:
+            r1 = client.post(f"/tg/{settings.webhook_secret}", json=update)
+            r2 = client.post(f"/tg/{settings.webhook_secret}", json=update)
+        assert r1.json() == {"ok": True} and r2.json() == {"ok": True}
+        assert notify.call_count == 1
+        db = SessionLocal()
+        try:
+            assert db.query(TelegramJob).filter(TelegramJob.update_id == 987654).count() == 1
+        finally:
+            db.close()
@@ -0,0 +1,232 @@
+"""
+Tests for the global spend ledger (hourly/daily/monthly caps with reservations)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db import Base, SessionLocal, engine
+from app.ledger import LedgerConfig, SpendCapExceeded, SpendLedger, spend_ledger
+from app.models import UsageEvent
+from app.orchestrator.runner import Budget, ExecutionConfig, PROVIDERS, run_orchestrator
+from app.providers.base import LLMResult
+
+
+@pytest.fixture(autouse=True, scope="module")
+def tables():
+    Base.metadata.create_all(bind=engine)
+
+
+def commit(ledger, res, cost, provider="openai"):
+    ledger.commit(res, provider=provider, model="m", input_tokens=10, output_tokens=5, cost_usd=cost)
+
+
+# ═══════════════════════════════════════════════════════════════
+# 예약/정산
+# ═══════════════════════════════════════════════════════════════
+class TestReservations:
+    def test_reserve_within_cap(self):
+        ledger = SpendLedger(LedgerConfig(user_daily_usd=1.0))
+        res = ledger.reserve(1, "openai", 0.4)
+        assert ledger.usage(1, "openai")["user:1"]["reserved"] == 0.4
+        commit(ledger, res, 0.1)
+        usage = ledger.usage(1, "openai")["user:1"]
+        assert usage["daily"] == 0.1 and usage["reserved"] == 0.0
+
+    def test_reservations_count_against_cap(self):
+        ledger = SpendLedger(LedgerConfig(user_daily_usd=1.0))
+        ledger.reserve(1, "openai", 0.6)
+        with pytest.raises(SpendCapExceeded):
+            ledger.reserve(1, "openai", 0.6)
+        # 다른 사용자는 영향 없음
+        ledger.reserve(2, "openai", 0.6)
+
+    def test_release_frees_reservation(self):
+        ledger = SpendLedger(LedgerConfig(user_hourly_usd=1.0))
+        res = ledger.reserve(1, "openai", 0.9)
+        ledger.release(res)
+        ledger.reserve(1, "openai", 0.9)
+
+    def test_double_commit_is_ignored(self):
+        ledger = SpendLedger(LedgerConfig(user_daily_usd=1.0))
+        res = ledger.reserve(1, "openai", 0.2)
+        commit(ledger, res, 0.2)
+        commit(ledger, res, 0.2)
+        assert ledger.usage(1, "openai")["user:1"]["daily"] == 0.2
+
+    def test_provider_cap_spans_users(self):
+        ledger = SpendLedger(LedgerConfig(provider_monthly_usd=1.0))
+        commit(ledger, ledger.reserve(1, "openai", 0.5), 0.7)
+        with pytest.raises(SpendCapExceeded, match="provider:openai monthly"):
+            ledger.reserve(2, "openai", 0.5)
+        ledger.reserve(2, "groq", 0.5)
+
+    def test_commit_records_failover_provider(self):
+        ledger = SpendLedger(LedgerConfig(provider_daily_usd=1.0))
+        commit(ledger, ledger.reserve(1, "openai", 0.1), 0.3, provider="groq")
+        usage = ledger.usage(1, "groq")
+        assert usage["provider:groq"]["daily"] == 0.3
+        assert ledger.usage(1, "openai")["provider:openai"]["daily"] == 0.0
+
+    def test_disabled_without_caps(self):
+        assert SpendLedger().enabled is False
+        assert SpendLedger(LedgerConfig(provider_hourly_usd=2)).enabled is True
+
+
+# ═══════════════════════════════════════════════════════════════
+# 동시성
+# ═══════════════════════════════════════════════════════════════
+class TestConcurrency:
+    def test_concurrent_runs_share_cap(self):
+        ledger = SpendLedger(LedgerConfig(user_daily_usd=1.0))
+        admitted = []
+
+        async def call():
+            try:
+                res = ledger.reserve(1, "openai", 0.3)
+            except SpendCapExceeded:
+                return
+            admitted.append(res)
+            await asyncio.sleep(0.01)
+            commit(ledger, res, 0.25)
+
+        async def main():
+            await asyncio.gather(*(call() for _ in range(50)))
+
+        asyncio.run(main())
+        assert len(admitted) == 3
+        assert ledger.usage(1, "openai")["user:1"]["daily"] == 0.75
+
+    def test_threads_never_overbook(self):
+        ledger = SpendLedger(LedgerConfig(user_daily_usd=1.0))
+        admitted = []
+        barrier = threading.Barrier(20)
+
+        def worker():
+            barrier.wait()
+            try:
+                admitted.append(ledger.reserve(1, "openai", 0.1))
+            except SpendCapExceeded:
+                pass
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(admitted) == 10
+
+
+# ═══════════════════════════════════════════════════════════════
+# UsageEvent 동기화
+# ═══════════════════════════════════════════════════════════════
+class TestPersistence:
+    def test_load_sums_current_windows(self):
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.query(UsageEvent).filter(UsageEvent.user_id == 81).delete()
+            db.add_all([
+                UsageEvent(user_id=81, provider="openai", model="m", cost_usd=0.2, created_at=now),
+                UsageEvent(user_id=81, provider="openai", model="m", cost_usd=0.3, created_at=now - timedelta(days=40)),
+            ])
+            db.commit()
+            ledger = SpendLedger(LedgerConfig(user_monthly_usd=1.0))
+            ledger.load(db)
+        finally:
+            db.close()
+        usage = ledger.usage(81, "openai")["user:81"]
+        assert usage["hourly"] == usage["daily"] == usage["monthly"] == 0.2
+
+    def test_flush_writes_buffered_events_once(self):
+        ledger = SpendLedger(LedgerConfig(user_daily_usd=1.0))
+        db = SessionLocal()
+        try:
+            db.query(UsageEvent).filter(UsageEvent.user_id == 82).delete()
+            db.commit()
+            for _ in range(3):
+                commit(ledger, ledger.reserve(82, "openai", 0.1), 0.05)
+            assert db.query(UsageEvent).filter(UsageEvent.user_id == 82).count() == 0
+            assert ledger.flush(db) == 3
+            assert ledger.flush(db) == 0
+            assert db.query(UsageEvent).filter(UsageEvent.user_id == 82).count() == 3
+        finally:
+            db.close()
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_orchestrator 연동
+# ═══════════════════════════════════════════════════════════════
+QUESTION = "Explain Redis caching strategies in detail for production."
+STAGES = [
+    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"},
+    {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o-mini"},
+]
+
+
+@pytest.fixture
+def global_ledger():
+    spend_ledger.clear()
+    yield spend_ledger
+    spend_ledger.configure(LedgerConfig())
+    spend_ledger.clear()
+
+
+def provider(cost):
+    prov = MagicMock()
+    prov.provider_name = "openai"
+    prov.generate = AsyncMock(side_effect=lambda **kw: LLMResult(
+        text="Redis answer.", provider="openai", model=kw["model"], input_tokens=100, output_tokens=50, cost_usd=cost,
+    ))
+    return prov
+
+
+def run(user_id, prov):
+    with patch.dict(PROVIDERS, {"openai": prov}):
+        return asyncio.run(run_orchestrator(
+            question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+            stages=STAGES, synth_model="openai:gpt-4o-mini", budget=Budget(max_usd=10.0),
+            execution_config=ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False),
+            user_id=user_id,
+        ))
+
+
+class TestRunnerIntegration:
+    def test_calls_are_settled_and_marked_recorded(self, global_ledger):
+        global_ledger.configure(LedgerConfig(user_daily_usd=10.0))
+        result = run(83, provider(0.01))
+        assert all(u["recorded"] for u in result["usage"].values())
+        assert global_ledger.usage(83, "openai")["user:83"] == {
+            "hourly": 0.03, "daily": 0.03, "monthly": 0.03, "reserved": 0.0,
+        }
+
+    def test_refuses_when_cap_already_reached(self, global_ledger):
+        global_ledger.configure(LedgerConfig(user_daily_usd=0.01))
+        commit(global_ledger, global_ledger.reserve(84, "openai", 0.0), 0.01)
+        prov = provider(0.0)
+        result = run(84, prov)
+        assert result["refused"] is True
+        assert result["monitoring"]["spend_cap_triggered"] is True
+        prov.generate.assert_not_called()
+
+    def test_stage_capped_mid_run(self, global_ledger):
+        # 첫 호출 실제 비용이 예약보다 커서 다음 스테이지부터 한도에 걸린다.
+        global_ledger.configure(LedgerConfig(user_daily_usd=0.01))
+        result = run(85, provider(0.0099))
+        metrics = result["monitoring"]["stage_metrics"]
+        assert metrics["Solver"]["status"] == "ok"
+        assert metrics["Critic"]["status"] == "spend_capped"
+        assert result["final"].startswith("Synth 실행 실패: SpendCapExceeded")
+
+    def test_without_user_id_ledger_is_bypassed(self, global_ledger):
+        global_ledger.configure(LedgerConfig(user_daily_usd=0.0001))
+        result = run(None, provider(0.01))
+        assert "recorded" not in result["usage"]["synth"]
+        assert result["final"] == "Redis answer."
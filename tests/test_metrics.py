@@ -0,0 +1,212 @@
+"""
+Tests for the Prometheus /metrics endpoint and orchestrator run metrics
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.metrics import MetricsRegistry, registry
+from app.orchestrator import prompts
+from app.orchestrator.run_metrics import record_run
+from app.orchestrator.runner import Budget, ExecutionConfig, PROVIDERS, run_orchestrator
+from app.providers.base import LLMResult
+
+
+# ═══════════════════════════════════════════════════════════════
+# registry / text format
+# ═══════════════════════════════════════════════════════════════
+class TestRegistry:
+    def test_counter_and_histogram_exposition(self):
+        reg = MetricsRegistry(prefix="t_")
+        calls = reg.counter("calls_total", "Calls.", ("provider",))
+        latency = reg.histogram("latency_seconds", "Latency.", ("provider",), buckets=(0.1, 1.0))
+        calls.inc(provider="openai")
+        calls.inc(2, provider="openai")
+        latency.observe(0.05, provider="openai")
+        latency.observe(0.1, provider="openai")
+        latency.observe(3.0, provider="openai")
+
+        text = reg.render()
+        assert "# TYPE t_calls_total counter" in text
+        assert 't_calls_total{provider="openai"} 3' in text
+        assert "# TYPE t_latency_seconds histogram" in text
+        assert 't_latency_seconds_bucket{provider="openai",le="0.1"} 2' in text
+        assert 't_latency_seconds_bucket{provider="openai",le="1"} 2' in text
+        assert 't_latency_seconds_bucket{provider="openai",le="+Inf"} 3' in text
+        assert 't_latency_seconds_sum{provider="openai"} 3.15' in text
+        assert 't_latency_seconds_count{provider="openai"} 3' in text
+
+    def test_label_values_are_escaped(self):
+        reg = MetricsRegistry()
+        reg.counter("c", "C.", ("stage",)).inc(stage='Devil\'s "Advocate"\\\n')
+        assert 'c{stage="Devil\'s \\"Advocate\\"\\\\\\n"} 1' in reg.render()
+
+    def test_threads_record_without_losing_updates(self):
+        reg = MetricsRegistry()
+        counter = reg.counter("c", "C.", ("k",))
+        hist = reg.histogram("h", "H.")
+        barrier = threading.Barrier(8)
+
+        def worker():
+            barrier.wait()
+            for _ in range(5000):
+                counter.inc(k="x")
+                hist.observe(0.2)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert reg.value("c", k="x") == 40000
+        assert reg.value("h") == 40000
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_orchestrator 연동
+# ═══════════════════════════════════════════════════════════════
+QUESTION = "Explain Redis caching strategies in detail for production."
+STAGES = [
+    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"},
+    {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o-mini"},
+]
+
+
+@pytest.fixture
+def metrics():
+    registry.clear()
+    yield registry
+    registry.clear()
+
+
+def provider(fail_system=None):
+    async def generate(**kw):
+        if kw["system"] == fail_system:
+            raise RuntimeError("boom")
+        return LLMResult(text="Redis answer.", provider="openai", model=kw["model"],
+                         input_tokens=100, output_tokens=50, cost_usd=0.01)
+    prov = MagicMock()
+    prov.provider_name = "openai"
+    prov.generate = AsyncMock(side_effect=generate)
+    return prov
+
+
+def run(prov, **cfg):
+    with patch.dict(PROVIDERS, {"openai": prov}):
+        return asyncio.run(run_orchestrator(
+            question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+            stages=STAGES, synth_model="openai:gpt-4o-mini", budget=Budget(max_usd=10.0),
+            execution_config=ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False, **cfg),
+        ))
+
+
+class TestRunMetrics:
+    def test_successful_run(self, metrics):
+        run(provider())
+        labels = {"provider": "openai", "model": "gpt-4o-mini"}
+        assert metrics.value("runs_total", outcome="ok") == 1
+        assert metrics.value("run_duration_seconds", outcome="ok") == 1
+        for stage in ("Solver", "Critic", "synth"):
+            assert metrics.value("stage_calls_total", stage=stage, status="ok", **labels) == 1
+            assert metrics.value("stage_latency_seconds", stage=stage, **labels) == 1
+            assert metrics.value("tokens_total", stage=stage, kind="input", **labels) == 100
+            assert metrics.value("cost_usd_total", stage=stage, **labels) == pytest.approx(0.01)
+        assert metrics.value("stage_failures_total", stage="Solver", **labels) == 0
+
+    def test_network_phases(self, metrics):
+        network = {"response_bytes": 2048, "pool_wait_ms": 1.5, "connection_reused": False,
+                   "connect_ms": 30.0, "ttfb_ms": 800.0, "download_ms": 12.0, "parse_ms": 0.4}
+        prov = provider()
+        prov.generate = AsyncMock(return_value=LLMResult(
+            text="Redis answer.", provider="openai", model="gpt-4o-mini", input_tokens=100, output_tokens=50, network=network,
+        ))
+        result = run(prov)
+        assert result["monitoring"]["stage_metrics"]["Solver"]["network"] == network
+        labels = {"provider": "openai", "model": "gpt-4o-mini"}
+        assert metrics.value("provider_network_phase_seconds", phase="ttfb", **labels) == 3
+        assert metrics.value("provider_network_phase_seconds", phase="tls", **labels) == 0
+        assert metrics.value("provider_new_connections_total", **labels) == 3
+        assert metrics.value("provider_response_bytes_total", **labels) == 3 * 2048
+
+    def test_failed_stage_is_degraded(self, metrics):
+        run(provider(fail_system="Critique."))
+        labels = {"provider": "openai", "model": "gpt-4o-mini", "stage": "Critic"}
+        assert metrics.value("stage_calls_total", status="failed", **labels) == 1
+        assert metrics.value("stage_failures_total", **labels) == 1
+        assert metrics.value("stage_degraded_total", reason="failed", **labels) == 1
+        assert metrics.value("runs_total", outcome="ok") == 1
+
+    @pytest.mark.parametrize("status", ["failed", "circuit_open", "deadline_exceeded"])
+    def test_terminal_stage_statuses_count_as_failures(self, metrics, status):
+        result = {
+            "final": "answer",
+            "usage": {},
+            "monitoring": {"stage_metrics": {"Critic": {"latency_ms": 5, "retries": 0, "status": status}}},
+        }
+        record_run(result, 0.1, stages=STAGES, synth_model="openai:gpt-4o-mini")
+        labels = {"provider": "openai", "model": "gpt-4o-mini", "stage": "Critic"}
+        assert metrics.value("stage_calls_total", status=status, **labels) == 1
+        assert metrics.value("stage_failures_total", **labels) == 1
+        assert metrics.value("stage_degraded_total", reason=status, **labels) == 1
+
+    def test_failed_synth_fails_the_run(self, metrics):
+        result = run(provider(fail_system=prompts.SYNTH_SYSTEM))
+        assert result["final"].startswith("Synth 실행 실패")
+        assert result["monitoring"]["stage_metrics"]["synth"]["status"] == "failed"
+        labels = {"provider": "openai", "model": "gpt-4o-mini", "stage": "synth"}
+        assert metrics.value("stage_calls_total", status="failed", **labels) == 1
+        assert metrics.value("stage_failures_total", **labels) == 1
+        assert metrics.value("runs_total", outcome="failed") == 1
+        assert metrics.value("runs_total", outcome="ok") == 0
+
+    def test_budget_trips_and_refused_runs(self, metrics):
+        with patch.dict(PROVIDERS, {"openai": provider()}):
+            asyncio.run(run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+                stages=STAGES, synth_model="openai:gpt-4o-mini", budget=Budget(max_usd=1e-9),
+                execution_config=ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False, budget_policy="refuse"),
+            ))
+        assert metrics.value("runs_total", outcome="refused") == 1
+        assert metrics.value("budget_guard_trips_total", kind="refuse") == 1
+
+    def test_exceptions_are_counted(self, metrics):
+        with patch("app.orchestrator.runner._infer_dependencies", side_effect=ValueError("bad graph")):
+            with pytest.raises(ValueError):
+                run(provider())
+        assert metrics.value("runs_total", outcome="error") == 1
+
+    def test_refine_outcome(self, metrics):
+        with patch.dict(PROVIDERS, {"openai": provider()}):
+            asyncio.run(run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+                stages=STAGES, synth_model="openai:gpt-4o-mini", budget=Budget(max_usd=10.0),
+                execution_config=ExecutionConfig(
+                    retries_per_stage=0, enable_quality_matrix=True, auto_refine_once=True, quality_min_threshold=5.0,
+                ),
+            ))
+        refines = sum(metrics.value("quality_refine_total", outcome=o) for o in ("adopted", "rejected", "failed"))
+        assert refines == 1
+
+
+# ═══════════════════════════════════════════════════════════════
+# /metrics
+# ═══════════════════════════════════════════════════════════════
+class TestMetricsEndpoint:
+    def test_scrape(self, metrics):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        run(provider())
+        with patch.object(main.telegram_jobs, "start", new=AsyncMock()), TestClient(main.app) as client:
+            resp = client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE debait_stage_latency_seconds histogram" in resp.text
+        assert 'debait_runs_total{outcome="ok"} 1' in resp.text
+        assert 'debait_stage_calls_total{provider="openai",model="gpt-4o-mini",stage="synth",status="ok"} 1' in resp.text
@@ -0,0 +1,171 @@
+"""
+Tests for per-model pricing, token estimation and pre-run budget policies
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.orchestrator.estimator import count_tokens, estimate_call
+from app.orchestrator.pricing import cost_usd, price_for
+from app.orchestrator.runner import Budget, ExecutionConfig, PROVIDERS, run_orchestrator
+from app.providers.base import LLMResult
+
+
+# ═══════════════════════════════════════════════════════════════
+# 모델별 단가
+# ═══════════════════════════════════════════════════════════════
+class TestPriceRegistry:
+    def test_longest_prefix_wins(self):
+        assert price_for("openai", "gpt-4o-mini-2024-07-18").input == 0.15
+        assert price_for("openai", "gpt-4o-2024-11-20").input == 2.50
+
+    def test_unknown_model_falls_back_to_provider_default(self):
+        price = price_for("anthropic", "claude-unknown")
+        assert (price.input, price.output) == (0.80, 4.00)
+        assert price.cached_input == pytest.approx(0.08)  # anthropic cached ratio 0.10
+
+    def test_unknown_provider_falls_back_to_openai(self):
+        price = price_for("acme", "x")
+        assert (price.input, price.output) == (0.50, 1.50)
+
+    def test_cached_input_priced_separately(self):
+        full = cost_usd("anthropic", "claude-sonnet-4-5", 1_000_000, 0)
+        cached = cost_usd("anthropic", "claude-sonnet-4-5", 1_000_000, 0, cached_input_tokens=1_000_000)
+        assert full == 3.0
+        assert cached == 0.3
+
+
+# ═══════════════════════════════════════════════════════════════
+# 토큰 추정
+# ═══════════════════════════════════════════════════════════════
+class TestTokenEstimate:
+    def test_empty(self):
+        assert count_tokens("") == 0
+
+    def test_english_words(self):
+        # 짧은 단어는 1토큰, 긴 단어는 5자당 1토큰
+        assert count_tokens("the cat sat") == 3
+        assert count_tokens("internationalization") == 4
+
+    def test_korean_counts_per_character(self):
+        assert count_tokens("레디스 캐시") == 5
+
+    def test_digits_grouped_by_three(self):
+        assert count_tokens("1234567") == 3
+
+    def test_estimate_call_includes_overhead_and_extra(self):
+        base = estimate_call("s", "openai", "gpt-4o-mini", "sys", "user", 100)
+        more = estimate_call("s", "openai", "gpt-4o-mini", "sys", "user", 100, extra_input_tokens=50)
+        assert more.input_tokens == base.input_tokens + 50
+        assert base.output_tokens == 100
+        assert base.cost_usd == cost_usd("openai", "gpt-4o-mini", base.input_tokens, 100)
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_orchestrator: 실행 전 예산 정책
+# ═══════════════════════════════════════════════════════════════
+QUESTION = "Explain Redis caching strategies in detail for production."
+
+
+def recording_provider(name):
+    prov = MagicMock()
+    prov.provider_name = name
+    prov.calls = []
+
+    async def generate(**kwargs):
+        prov.calls.append(kwargs["model"])
+        return LLMResult(
+            text="Redis answer.", provider=name, model=kwargs["model"],
+            input_tokens=100, output_tokens=50, cost_usd=0.0001,
+        )
+    prov.generate = AsyncMock(side_effect=generate)
+    return prov
+
+
+STAGES = [
+    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o", "fallback_models": ["openai:gpt-4o-mini"]},
+    {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o"},
+    {"name": "Checker", "system_prompt": "Check.", "model": "openai:gpt-4o"},
+]
+
+
+def run(policy, max_usd, stages=STAGES, synth_model="openai:gpt-4o", synth_fallbacks=None):
+    prov = recording_provider("openai")
+    cfg = ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False, budget_policy=policy)
+    with patch.dict(PROVIDERS, {"openai": prov}):
+        result = asyncio.run(run_orchestrator(
+            question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+            stages=stages, synth_model=synth_model, synth_fallbacks=synth_fallbacks,
+            budget=Budget(max_usd=max_usd), execution_config=cfg,
+        ))
+    return result, prov
+
+
+class TestBudgetPolicy:
+    def test_estimate_recorded_next_to_actual(self):
+        result, _ = run("estimate", 10.0)
+        estimate = result["monitoring"]["estimate"]
+        assert set(estimate["calls"]) == {"Solver", "Critic", "Checker", "synth"}
+        # 뒤 스테이지는 앞 스테이지 출력 상한만큼 input이 커진다.
+        assert estimate["calls"]["Critic"]["input_tokens"] > estimate["calls"]["Solver"]["input_tokens"]
+        metric = result["monitoring"]["stage_metrics"]["Solver"]
+        assert metric["estimated_cost_usd"] == estimate["calls"]["Solver"]["cost_usd"]
+        assert metric["cost_usd"] == 0.0001
+        assert result["usage"]["synth"]["estimated_cost_usd"] > 0
+
+    def test_estimate_policy_does_not_intervene(self):
+        result, prov = run("estimate", 0.001)
+        assert "budget_actions" not in result["monitoring"]
+        assert "refused" not in result
+        assert len(prov.calls) == 4
+
+    def test_off_skips_estimate(self):
+        result, _ = run("off", 10.0)
+        assert "estimate" not in result["monitoring"]
+        assert "estimated_cost_usd" not in result["monitoring"]["stage_metrics"]["Solver"]
+
+    def test_refuse(self):
+        result, prov = run("refuse", 0.001)
+        assert result["refused"] is True
+        assert "예산" in result["final"]
+        assert result["monitoring"]["estimate"]["required_usd"] > 0.001
+        assert prov.calls == []
+
+    def test_trim_drops_trailing_stages(self):
+        full, _ = run("estimate", 10.0)
+        calls = full["monitoring"]["estimate"]["calls"]
+        # Solver + Critic + synth 까지만 들어가는 예산
+        limit = calls["Solver"]["cost_usd"] + calls["Critic"]["cost_usd"] + calls["synth"]["cost_usd"]
+        result, _ = run("trim", limit)
+        assert result["monitoring"]["budget_actions"] == [{"action": "trim", "stage": "Checker"}]
+        assert set(result["usage"]) == {"Solver", "Critic", "synth"}
+        assert result["monitoring"]["estimate"]["required_usd"] <= limit
+
+    def test_downgrade_uses_cheaper_fallback(self):
+        full, _ = run("estimate", 10.0)
+        required = full["monitoring"]["estimate"]["required_usd"]
+        synth_cost = full["monitoring"]["estimate"]["calls"]["synth"]["cost_usd"]
+        result, prov = run("downgrade", required - synth_cost / 2, synth_fallbacks=["openai:gpt-4o-mini"])
+        actions = result["monitoring"]["budget_actions"]
+        # 가장 비싼 호출(synth)부터 바꾸고 예산 안에 들어오면 멈춘다.
+        assert actions == [{"action": "downgrade", "stage": "synth", "from": "openai:gpt-4o", "to": "openai:gpt-4o-mini"}]
+        assert prov.calls[-1] == "gpt-4o-mini"
+        assert result["monitoring"]["estimate"]["calls"]["synth"]["model"] == "openai:gpt-4o-mini"
+
+    def test_downgrade_falls_back_to_trim_then_refuse(self):
+        result, prov = run("downgrade", 0.000001)
+        assert result["refused"] is True
+        actions = result["monitoring"]["budget_actions"]
+        assert actions[0]["action"] == "downgrade" and actions[0]["stage"] == "Solver"
+        assert [a["stage"] for a in actions if a["action"] == "trim"] == ["Checker", "Critic"]
+        assert prov.calls == []
+
+    def test_does_not_mutate_caller_stages(self):
+        stages = [dict(s) for s in STAGES]
+        run("downgrade", 0.000001, stages=stages)
+        assert [s["model"] for s in stages] == ["openai:gpt-4o"] * 3
@@ -0,0 +1,127 @@
+"""
+Tests for provider prompt caching (cache_control / cached input token accounting)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+
+from app import http_client
+from app.http_client import aclose_all
+from app.orchestrator.runner import _payload, run_orchestrator, Budget, ExecutionConfig, PROVIDERS
+from app.providers.anthropic_provider import AnthropicProvider
+from app.providers.base import LLMResult
+from app.providers.groq_provider import GroqProvider
+from app.providers.openai_provider import OpenAIProvider
+
+
+def call_with_transport(name, handler, coro_fn):
+    async def main():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        http_client._clients[name] = (asyncio.get_running_loop(), client)
+        try:
+            return await coro_fn()
+        finally:
+            await aclose_all()
+    return asyncio.run(main())
+
+
+# ═══════════════════════════════════════════════════════════════
+# provider 요청 구조 / usage 파싱
+# ═══════════════════════════════════════════════════════════════
+class TestProviderPromptCache:
+    def test_anthropic_caches_only_the_system_prefix(self):
+        _, _, payload = AnthropicProvider()._request("k", "claude", "sys", "user", 10)
+        assert payload["system"] == [{"type": "text", "text": "sys", "cache_control": {"type": "ephemeral"}}]
+        assert payload["messages"] == [{"role": "user", "content": [{"type": "text", "text": "user"}]}]
+        _, _, payload = AnthropicProvider()._request("k", "claude", "", "user", 10)
+        assert "system" not in payload
+        assert "cache_control" not in json.dumps(payload)
+
+    def test_anthropic_counts_cache_reads_in_input(self):
+        def handler(request):
+            return httpx.Response(200, json={
+                "content": [{"type": "text", "text": "hi"}],
+                "usage": {"input_tokens": 10, "cache_read_input_tokens": 900,
+                          "cache_creation_input_tokens": 100, "output_tokens": 5},
+            })
+        r = call_with_transport("anthropic", handler, lambda: AnthropicProvider().generate(
+            api_key="k", model="claude", system="s", user="u", max_tokens=10))
+        assert (r.input_tokens, r.cached_input_tokens, r.cache_write_input_tokens) == (1010, 900, 100)
+
+    def test_openai_cached_tokens_and_cache_key(self):
+        seen = {}
+
+        def handler(request):
+            seen.update(json.loads(request.content))
+            return httpx.Response(200, json={
+                "output": [{"type": "message", "content": [{"type": "output_text", "text": "ok"}]}],
+                "usage": {"input_tokens": 2000, "output_tokens": 3, "input_tokens_details": {"cached_tokens": 1536}},
+            })
+        r = call_with_transport("openai", handler, lambda: OpenAIProvider().generate(
+            api_key="k", model="gpt", system="s", user="u", max_tokens=10))
+        assert r.cached_input_tokens == 1536
+        assert seen["prompt_cache_key"] == OpenAIProvider()._request("k", "gpt", "s", "other", 1)[2]["prompt_cache_key"]
+
+    def test_chat_completions_cached_tokens(self):
+        def handler(request):
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 1, "prompt_tokens_details": {"cached_tokens": 64}},
+            })
+        r = call_with_transport("groq", handler, lambda: GroqProvider().generate(
+            api_key="k", model="m", system="s", user="u", max_tokens=1))
+        assert r.cached_input_tokens == 64
+
+
+# ═══════════════════════════════════════════════════════════════
+# 비용 / 모니터링
+# ═══════════════════════════════════════════════════════════════
+class TestCachedPricing:
+    def test_cached_tokens_discounted(self):
+        rt = {"status": "ok"}
+        full = _payload(LLMResult(text="a", provider="anthropic", input_tokens=1_000_000), rt)
+        cached = _payload(LLMResult(text="a", provider="anthropic", input_tokens=1_000_000,
+                                    cached_input_tokens=1_000_000), rt)
+        assert abs(full["cost_usd"] - 0.80) < 1e-6
+        assert abs(cached["cost_usd"] - 0.08) < 1e-6
+        assert cached["cached_input_tokens"] == 1_000_000
+
+    def test_cache_writes_charged_at_premium(self):
+        rt = {"status": "ok"}
+        written = _payload(LLMResult(text="a", provider="anthropic", input_tokens=1_000_000,
+                                     cache_write_input_tokens=1_000_000), rt)
+        assert abs(written["cost_usd"] - 1.00) < 1e-6  # 0.80 × 1.25
+        assert written["cache_write_input_tokens"] == 1_000_000
+        # 쓰기 할증이 없는 provider는 일반 input 단가다.
+        plain = _payload(LLMResult(text="a", provider="groq", input_tokens=1_000_000,
+                                   cache_write_input_tokens=1_000_000), rt)
+        assert abs(plain["cost_usd"] - 0.10) < 1e-6
+
+    def test_monitoring_cache_hit_ratio(self):
+        prov = MagicMock()
+        prov.generate = AsyncMock(return_value=LLMResult(
+            text="Redis caching answer.", provider="openai", model="m",
+            input_tokens=100, output_tokens=10, cached_input_tokens=25))
+        stages = [
+            {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"},
+            {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o-mini"},
+        ]
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result = asyncio.run(run_orchestrator(
+                question="Explain Redis caching strategies in detail for production.",
+                thread_summary="",
+                user_api_keys={"openai": "sk"},
+                stages=stages,
+                synth_model="openai:gpt-4o-mini",
+                budget=Budget(max_usd=10.0),
+                execution_config=ExecutionConfig(retries_per_stage=0, enable_quality_matrix=False),
+            ))
+        m = result["monitoring"]
+        assert m["total_cached_input_tokens"] == 75
+        assert m["cache_hit_ratio"] == 0.25
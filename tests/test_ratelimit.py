@@ -0,0 +1,172 @@
+"""
+Tests for provider rate limiting (app.providers.limits / app.orchestrator.ratelimit)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+from app import http_client
+from app.http_client import aclose_all
+from app.orchestrator.ratelimit import ProviderLimiter, RateLimitConfig, RateLimiterRegistry, _Bucket
+from app.orchestrator.runner import _call_with_resilience, ExecutionConfig
+from app.providers.base import LLMResult
+from app.providers.limits import RateLimitError, rate_limit_info, raise_for_status, retry_after
+from app.providers.openai_provider import OpenAIProvider
+
+
+# ═══════════════════════════════════════════════════════════════
+# 헤더 파싱 / 429 → RateLimitError
+# ═══════════════════════════════════════════════════════════════
+class TestHeaders:
+    def test_retry_after_variants(self):
+        assert retry_after(httpx.Headers({"retry-after": "3"})) == 3.0
+        assert retry_after(httpx.Headers({"retry-after-ms": "250"})) == 0.25
+        assert retry_after(httpx.Headers({})) is None
+
+    def test_openai_style_headers(self):
+        info = rate_limit_info(httpx.Headers({
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-remaining-tokens": "1200",
+            "x-ratelimit-reset-requests": "6m0s",
+            "x-ratelimit-reset-tokens": "20ms",
+        }))
+        assert info == {"remaining_requests": 0, "remaining_tokens": 1200, "reset_sec": 360.0}
+
+    def test_anthropic_reset_timestamp(self):
+        info = rate_limit_info(httpx.Headers({
+            "anthropic-ratelimit-requests-remaining": "5",
+            "anthropic-ratelimit-requests-reset": "2000-01-01T00:00:00Z",
+        }))
+        assert info == {"remaining_requests": 5, "reset_sec": 0.0}
+
+    def test_raise_for_status_429(self):
+        resp = httpx.Response(429, headers={"retry-after": "7"}, request=httpx.Request("POST", "https://x"))
+        with pytest.raises(RateLimitError) as exc:
+            raise_for_status(resp)
+        assert exc.value.retry_after == 7.0
+
+    def test_openai_no_longer_retries_internally(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(429, headers={"retry-after": "30"})
+
+        async def main():
+            http_client._clients["openai"] = (asyncio.get_running_loop(),
+                                              httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+            try:
+                await OpenAIProvider().generate(api_key="k", model="m", system="s", user="u", max_tokens=1)
+            finally:
+                await aclose_all()
+
+        with pytest.raises(RateLimitError):
+            asyncio.run(main())
+        assert len(calls) == 1
+
+
+# ═══════════════════════════════════════════════════════════════
+# ProviderLimiter
+# ═══════════════════════════════════════════════════════════════
+class TestLimiter:
+    def test_bucket_wait_time(self):
+        b = _Bucket(60)  # 초당 1개
+        b.take(60, b.updated)
+        assert b.wait_time(1, b.updated) == pytest.approx(1.0)
+        assert b.wait_time(1, b.updated + 1.0) == 0.0
+
+    def test_concurrency_cap(self):
+        limiter = ProviderLimiter(RateLimitConfig(max_concurrency=2))
+        peak = 0
+
+        async def job():
+            nonlocal peak
+            await limiter.acquire(10)
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+            limiter.release(used_tokens=10)
+
+        async def main():
+            await asyncio.gather(*(job() for _ in range(6)))
+        asyncio.run(main())
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+    def test_aimd_adjusts_limit(self):
+        limiter = ProviderLimiter(RateLimitConfig(max_concurrency=8, min_concurrency=1))
+        limiter.in_flight = 1
+        limiter.release(rate_limited=True, retry_after=0)
+        assert limiter.limit == 4
+        limiter.in_flight = 1
+        limiter.release(used_tokens=1)
+        assert limiter.limit == pytest.approx(4.25)
+
+    def test_retry_after_pauses_new_requests(self):
+        limiter = ProviderLimiter(RateLimitConfig())
+
+        async def main():
+            await limiter.acquire(1)
+            limiter.release(rate_limited=True, retry_after=0.1)
+            return await limiter.acquire(1)
+        assert asyncio.run(main()) >= 90
+
+    def test_exhausted_headers_pause(self):
+        limiter = ProviderLimiter(RateLimitConfig())
+        limiter.in_flight = 1
+        limiter.release(used_tokens=1, rate_limit={"remaining_requests": 0, "reset_sec": 5})
+        assert limiter.snapshot()["paused_for_sec"] > 4
+
+    def test_registry_per_key_and_loop(self):
+        reg = RateLimiterRegistry()
+
+        async def main():
+            return reg.get("openai", "a"), reg.get("openai", "a"), reg.get("openai", "b")
+        a1, a2, b = asyncio.run(main())
+        assert a1 is a2 and a1 is not b
+        a3, _, _ = asyncio.run(main())
+        assert a3 is not a1
+
+
+# ═══════════════════════════════════════════════════════════════
+# runner 연동
+# ═══════════════════════════════════════════════════════════════
+class TestResilienceRateLimit:
+    def test_429_waits_for_retry_after_and_reports_queue_wait(self):
+        prov = MagicMock()
+        prov.provider_name = "ratelimit-test"
+        prov.generate = AsyncMock(side_effect=[
+            RateLimitError("429", retry_after=0.1),
+            LLMResult(text="ok", input_tokens=1, output_tokens=1),
+        ])
+        cfg = ExecutionConfig(retries_per_stage=1, stage_timeout_sec=5)
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=cfg,
+        ))
+        assert result.text == "ok"
+        assert rt["retries"] == 1
+        assert rt["queue_wait_ms"] >= 90
+
+    def test_slot_released_on_timeout(self):
+        async def slow(**kwargs):
+            await asyncio.sleep(1)
+
+        prov = MagicMock()
+        prov.provider_name = "ratelimit-timeout"
+        prov.generate = slow
+        cfg = ExecutionConfig(retries_per_stage=0, stage_timeout_sec=0.01)
+
+        async def main():
+            from app.orchestrator.ratelimit import rate_limiters
+            result, rt = await _call_with_resilience(
+                provider=prov, api_key="k", model="m", system="s", user="u", max_tokens=5, cfg=cfg,
+            )
+            return result, rate_limiters.get("ratelimit-timeout", "k").in_flight
+        result, in_flight = asyncio.run(main())
+        assert result is None
+        assert in_flight == 0
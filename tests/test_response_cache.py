@@ -0,0 +1,195 @@
+"""
+Tests for the LLM response cache (app.orchestrator.cache)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.orchestrator.cache import CacheConfig, ResponseCache, cache_key, response_cache
+from app.orchestrator.runner import (
+    _call_with_resilience,
+    _payload,
+    run_orchestrator,
+    Budget,
+    ExecutionConfig,
+    PROVIDERS,
+)
+from app.providers.base import LLMResult
+
+
+CFG = ExecutionConfig(retries_per_stage=0, stage_timeout_sec=10, enable_quality_matrix=False)
+
+
+def res(text="answer"):
+    return LLMResult(text=text, provider="openai", model="m", input_tokens=10, output_tokens=5)
+
+
+@pytest.fixture
+def shared_cache():
+    response_cache.configure(CacheConfig(enabled=True, max_entries=16))
+    yield response_cache
+    response_cache.configure(CacheConfig())
+
+
+# ═══════════════════════════════════════════════════════════════
+# ResponseCache
+# ═══════════════════════════════════════════════════════════════
+class TestResponseCache:
+    def test_key_depends_on_all_inputs(self):
+        base = cache_key("openai", "m", "sys", "user", 100)
+        assert base == cache_key("openai", "m", "sys", "user", 100)
+        assert base != cache_key("openai", "m", "sys", "user", 101)
+        assert base != cache_key("groq", "m", "sys", "user", 100)
+
+    def test_disabled_by_default(self):
+        cache = ResponseCache()
+
+        async def main():
+            await cache.put("k", res())
+            return await cache.get("k")
+        assert asyncio.run(main()) is None
+
+    def test_memory_lru_eviction(self):
+        cache = ResponseCache(CacheConfig(enabled=True, max_entries=2))
+
+        async def main():
+            await cache.put("a", res("A"))
+            await cache.put("b", res("B"))
+            await cache.get("a")
+            await cache.put("c", res("C"))
+            return [await cache.get(k) for k in ("a", "b", "c")]
+        a, b, c = asyncio.run(main())
+        assert a.text == "A" and b is None and c.text == "C"
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(CacheConfig(enabled=True, ttl_sec=10))
+
+        async def main():
+            with patch("app.orchestrator.cache.time.time", return_value=1000.0):
+                await cache.put("k", res())
+            with patch("app.orchestrator.cache.time.time", return_value=1011.0):
+                return await cache.get("k")
+        assert asyncio.run(main()) is None
+
+    def test_disk_persists_across_instances(self, tmp_path):
+        cfg = CacheConfig(enabled=True, max_entries=4, path=str(tmp_path / "cache.db"))
+
+        async def main():
+            await ResponseCache(cfg).put("k", res("persisted"))
+            return await ResponseCache(cfg).get("k")
+        hit = asyncio.run(main())
+        assert hit.text == "persisted"
+        assert (hit.input_tokens, hit.output_tokens) == (10, 5)
+
+    def test_disk_size_eviction(self, tmp_path):
+        cfg = CacheConfig(enabled=True, max_entries=0, path=str(tmp_path / "cache.db"), max_disk_entries=2)
+        cache = ResponseCache(cfg)
+
+        async def main():
+            for i, k in enumerate(("a", "b", "c")):
+                with patch("app.orchestrator.cache.time.time", return_value=1000.0 + i):
+                    await cache.put(k, res(k))
+            with patch("app.orchestrator.cache.time.time", return_value=1010.0):
+                return [await cache.get(k) for k in ("a", "b", "c")]
+        a, b, c = asyncio.run(main())
+        assert a is None and b.text == "b" and c.text == "c"
+
+    def test_empty_text_not_cached(self):
+        cache = ResponseCache(CacheConfig(enabled=True))
+
+        async def main():
+            await cache.put("k", res("  "))
+            return await cache.get("k")
+        assert asyncio.run(main()) is None
+
+
+# ═══════════════════════════════════════════════════════════════
+# runner 연동
+# ═══════════════════════════════════════════════════════════════
+class TestRunnerCaching:
+    def _call(self, prov, cfg=CFG, on_event=None):
+        return asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u",
+            max_tokens=10, cfg=cfg, on_event=on_event,
+        ))
+
+    def test_second_call_served_from_cache(self, shared_cache):
+        prov = MagicMock()
+        prov.provider_name = "openai"
+        prov.generate = AsyncMock(return_value=res())
+        self._call(prov)
+        result, rt = self._call(prov)
+        assert prov.generate.call_count == 1
+        assert result.text == "answer"
+        assert rt["cached"] is True
+
+    def test_config_toggle_bypasses_cache(self, shared_cache):
+        prov = MagicMock()
+        prov.provider_name = "openai"
+        prov.generate = AsyncMock(return_value=res())
+        cfg = ExecutionConfig(retries_per_stage=0, enable_response_cache=False)
+        self._call(prov, cfg)
+        self._call(prov, cfg)
+        assert prov.generate.call_count == 2
+
+    def test_cached_hit_emits_text_as_token(self, shared_cache):
+        prov = MagicMock()
+        prov.provider_name = "openai"
+        prov.generate = AsyncMock(return_value=res("cached text"))
+        self._call(prov)
+        seen = []
+
+        async def on_event(ev):
+            seen.append(ev)
+        self._call(prov, on_event=on_event)
+        assert seen == [{"type": "token", "text": "cached text"}]
+
+    def test_failed_call_not_cached(self, shared_cache):
+        prov = MagicMock()
+        prov.provider_name = "openai"
+        prov.generate = AsyncMock(side_effect=RuntimeError("down"))
+        result, _ = self._call(prov)
+        assert result is None
+        prov.generate = AsyncMock(return_value=res())
+        self._call(prov)
+        prov.generate.assert_called_once()
+
+    def test_payload_flags_cached_with_zero_cost(self):
+        payload = _payload(res(), {"latency_ms": 0, "retries": 0, "status": "ok", "cached": True})
+        assert payload["cached"] is True
+        assert payload["cost_usd"] == 0.0
+        assert "cached" not in _payload(res(), {"status": "ok"})
+
+    def test_repeated_question_uses_cache(self, shared_cache):
+        prov = MagicMock()
+        prov.provider_name = "openai"
+        prov.generate = AsyncMock(return_value=res("Redis caching answer. " * 20))
+        stages = [
+            {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"},
+            {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o-mini"},
+        ]
+
+        def ask():
+            return asyncio.run(run_orchestrator(
+                question="Explain Redis caching strategies in detail for production.",
+                thread_summary="",
+                user_api_keys={"openai": "sk"},
+                stages=stages,
+                synth_model="openai:gpt-4o-mini",
+                budget=Budget(max_usd=10.0),
+                execution_config=CFG,
+            ))
+
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            first = ask()
+            calls = prov.generate.call_count
+            second = ask()
+        assert prov.generate.call_count == calls
+        assert all(u.get("cached") for u in second["usage"].values())
+        assert second["monitoring"]["total_cost_usd"] == 0.0
+        assert first["monitoring"]["total_cost_usd"] > 0
@@ -257,6 +257,70 @@ class TestDynamicGraph:
         assert result["final"]
 
 
+class TestDataflowScheduler:
+    STAGES = [
+        {"name": "Slowpoke", "system_prompt": "Independent standalone analysis.", "model": "openai:gpt-4o-mini"},
+        {"name": "Quick", "system_prompt": "Independent standalone answer.", "model": "openai:gpt-4o-mini"},
+        {"name": "Follower", "system_prompt": "Refine the Quick answer.", "model": "openai:gpt-4o-mini"},
+    ]
+    DELAYS = {"Independent standalone analysis.": 0.3, "Independent standalone answer.": 0.02,
+              "Refine the Quick answer.": 0.4}
+
+    def _run(self, scheduler):
+        events = []
+
+        async def generate(**kwargs):
+            system = kwargs["system"]
+            events.append(("start", system))
+            await asyncio.sleep(self.DELAYS.get(system, 0))
+            events.append(("end", system))
+            return make_llm_result(f"out[{system}|{kwargs['user']}]")
+
+        prov = MagicMock()
+        prov.generate = generate
+        cfg = ExecutionConfig(retries_per_stage=0, stage_timeout_sec=10,
+                              enable_quality_matrix=False, scheduler=scheduler)
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            result = asyncio.run(
+                run_orchestrator(
+                    question="Explain caching strategies in detail for production.",
+                    thread_summary="",
+                    user_api_keys=BASE_KEYS,
+                    stages=self.STAGES,
+                    synth_model="openai:gpt-4o-mini",
+                    budget=BASE_BUDGET,
+                    execution_config=cfg,
+                )
+            )
+        return result, events
+
+    def test_dependent_starts_before_slow_sibling_finishes(self):
+        _, events = self._run("dataflow")
+        follower_start = events.index(("start", "Refine the Quick answer."))
+        slow_end = events.index(("end", "Independent standalone analysis."))
+        assert follower_start < slow_end
+
+    def test_levels_mode_waits_for_whole_level(self):
+        _, events = self._run("levels")
+        follower_start = events.index(("start", "Refine the Quick answer."))
+        slow_end = events.index(("end", "Independent standalone analysis."))
+        assert follower_start > slow_end
+
+    def test_results_match_level_mode(self):
+        dataflow, _ = self._run("dataflow")
+        levels, _ = self._run("levels")
+        assert dataflow["stages"] == levels["stages"]
+        assert dataflow["final"] == levels["final"]
+        assert dataflow["monitoring"]["graph_levels"] == levels["monitoring"]["graph_levels"]
+
+    def test_critical_path_reported(self):
+        result, _ = self._run("dataflow")
+        m = result["monitoring"]
+        assert m["scheduler"] == "dataflow"
+        assert m["critical_path"] == ["Quick", "Follower"]
+        assert m["critical_path_ms"] >= 400
+
+
 # ═══════════════════════════════════════════════════════════════
 # 6) Feature #2 — 복원력: 스테이지 실패 시 degraded fallback
 # ═══════════════════════════════════════════════════════════════
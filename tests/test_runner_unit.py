@@ -14,6 +14,7 @@ from app.orchestrator.runner import (
     _contains_any,
     _infer_dependencies,
     _topology_levels,
+    _critical_path,
     _quality_matrix,
     _payload,
     Budget,
@@ -215,6 +216,36 @@ class TestTopologyLevels:
         assert sorted(all_nodes) == [0, 1, 2, 3, 4]
 
 
+# ═══════════════════════════════════════════════════════════════
+# Dataflow scheduler — _critical_path
+# ═══════════════════════════════════════════════════════════════
+class TestCriticalPath:
+    STAGES = [{"name": n} for n in ("A", "B", "C", "D")]
+
+    def test_empty_timeline(self):
+        assert _critical_path(self.STAGES, {0: []}, {}) == ([], 0)
+
+    def test_follows_latest_finishing_dep(self):
+        # 0 → 1,2 → 3 ; 2가 1보다 늦게 끝남
+        deps = {0: [], 1: [0], 2: [0], 3: [1, 2]}
+        timeline = {0: (0, 100), 1: (100, 150), 2: (100, 400), 3: (400, 500)}
+        path, ms = _critical_path(self.STAGES, deps, timeline)
+        assert path == ["A", "C", "D"]
+        assert ms == 500
+
+    def test_slow_independent_stage_is_critical(self):
+        deps = {0: [], 1: [], 2: [1]}
+        timeline = {0: (0, 900), 1: (0, 50), 2: (50, 200)}
+        path, ms = _critical_path(self.STAGES, deps, timeline)
+        assert path == ["A"]
+        assert ms == 900
+
+    def test_skips_deps_that_never_ran(self):
+        deps = {0: [], 1: [0]}
+        path, _ = _critical_path(self.STAGES, deps, {1: (0, 10)})
+        assert path == ["B"]
+
+
 # ═══════════════════════════════════════════════════════════════
 # Feature #4 — _quality_matrix
 # ═══════════════════════════════════════════════════════════════
@@ -327,15 +358,15 @@ class TestPayload:
         result = self._make_result(provider="openai", input_tokens=1_000_000, output_tokens=0, cost_usd=0.0)
         rt = {"latency_ms": 200, "retries": 0, "status": "ok"}
         p = _payload(result, rt)
-        # openai: in=0.50/1M → 1M tokens = $0.50
-        assert abs(p["cost_usd"] - 0.50) < 0.0001
+        # openai:gpt-4o-mini: in=0.15/1M → 1M tokens = $0.15
+        assert abs(p["cost_usd"] - 0.15) < 0.0001
 
     def test_calculates_output_cost(self):
         result = self._make_result(provider="openai", input_tokens=0, output_tokens=1_000_000, cost_usd=0.0)
         rt = {"latency_ms": 200, "retries": 0, "status": "ok"}
         p = _payload(result, rt)
-        # openai: out=1.50/1M → 1M tokens = $1.50
-        assert abs(p["cost_usd"] - 1.50) < 0.0001
+        # openai:gpt-4o-mini: out=0.60/1M → 1M tokens = $0.60
+        assert abs(p["cost_usd"] - 0.60) < 0.0001
 
     def test_anthropic_pricing(self):
         result = self._make_result(provider="anthropic", input_tokens=1_000_000, output_tokens=0, cost_usd=0.0)
@@ -343,6 +374,12 @@ class TestPayload:
         p = _payload(result, rt)
         assert abs(p["cost_usd"] - 0.80) < 0.0001
 
+    def test_unknown_model_uses_provider_pricing(self):
+        result = self._make_result(provider="openai", model="some-new-model", input_tokens=1_000_000, output_tokens=0)
+        p = _payload(result, {"status": "ok"})
+        # 등록되지 않은 모델 → openai 기본 단가 (0.50, 1.50)
+        assert abs(p["cost_usd"] - 0.50) < 0.0001
+
     def test_unknown_provider_falls_back_to_openai_pricing(self):
         result = self._make_result(provider="unknown_llm", input_tokens=1_000_000, output_tokens=0, cost_usd=0.0)
         rt = {"latency_ms": 0, "retries": 0, "status": "ok"}
@@ -379,6 +416,7 @@ class TestExecutionConfig:
         assert cfg.enable_quality_matrix is True
         assert cfg.quality_min_threshold == 3.0
         assert cfg.auto_refine_once is True
+        assert cfg.scheduler == "dataflow"
 
     def test_custom_values(self):
         cfg = ExecutionConfig(retries_per_stage=3, stage_timeout_sec=30, enable_dynamic_graph=False)
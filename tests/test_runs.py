@@ -0,0 +1,201 @@
+"""
+Tests for the asynchronous run API (app.runs + /runs endpoints)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.runs import RunManager, RunQueueFull
+from app.providers.base import LLMResult
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestRunManager:
+    def test_job_result_and_stage_status(self):
+        async def job(state, emit):
+            await emit({"type": "stage_start", "stage": "Solver", "model": "openai:m"})
+            await emit({"type": "token", "stage": "Solver", "text": "hi"})
+            await emit({"type": "stage_done", "stage": "Solver", "text": "hi", "latency_ms": 5, "status": "ok"})
+            return {"final": "hi"}
+
+        async def main():
+            mgr = RunManager(workers=1)
+            await mgr.start()
+            state = mgr.submit("q", job)
+            while not state.finished:
+                await asyncio.sleep(0.01)
+            await mgr.stop()
+            return state
+
+        state = run(main())
+        assert state.status == "done"
+        assert state.result == {"final": "hi"}
+        assert state.stages["Solver"]["status"] == "done"
+        assert state.stages["Solver"]["latency_ms"] == 5
+        # 토큰은 기록하지 않는다
+        assert all(e["type"] != "token" for e in state.events)
+
+    def test_failed_job_records_error(self):
+        async def job(state, emit):
+            raise ValueError("boom")
+
+        async def main():
+            mgr = RunManager(workers=1)
+            await mgr.start()
+            state = mgr.submit("q", job)
+            while not state.finished:
+                await asyncio.sleep(0.01)
+            await mgr.stop()
+            return state
+
+        state = run(main())
+        assert state.status == "failed"
+        assert "boom" in state.error
+
+    def test_worker_pool_bounds_concurrency(self):
+        active = 0
+        peak = 0
+
+        async def job(state, emit):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return {}
+
+        async def main():
+            mgr = RunManager(workers=2)
+            await mgr.start()
+            states = [mgr.submit(str(i), job) for i in range(6)]
+            while not all(s.finished for s in states):
+                await asyncio.sleep(0.01)
+            await mgr.stop()
+
+        run(main())
+        assert peak == 2
+
+    def test_queue_full_raises(self):
+        async def job(state, emit):
+            await asyncio.sleep(1)
+
+        async def main():
+            mgr = RunManager(workers=1, max_queue=1)
+            await mgr.start()
+            mgr.submit("a", job)
+            with pytest.raises(RunQueueFull):
+                mgr.submit("b", job)
+                mgr.submit("c", job)
+            await mgr.stop()
+
+        run(main())
+
+    def test_subscriber_gets_replay_and_live_events(self):
+        gate = None
+
+        async def job(state, emit):
+            await emit({"type": "stage_start", "stage": "A"})
+            await gate.wait()
+            await emit({"type": "token", "stage": "A", "text": "x"})
+            await emit({"type": "stage_done", "stage": "A", "text": "x"})
+            return {}
+
+        async def main():
+            nonlocal gate
+            gate = asyncio.Event()
+            mgr = RunManager(workers=1)
+            await mgr.start()
+            state = mgr.submit("q", job)
+            while not state.events:
+                await asyncio.sleep(0.01)
+            received = []
+
+            async def consume():
+                async for ev in mgr.subscribe(state.id):
+                    received.append(ev["type"])
+
+            consumer = asyncio.create_task(consume())
+            await asyncio.sleep(0.01)
+            gate.set()
+            await asyncio.wait_for(consumer, timeout=2)
+            await mgr.stop()
+            return received
+
+        received = run(main())
+        assert received[:2] == ["run_status", "stage_start"]
+        assert "token" in received
+        assert received[-1] == "run_status"
+
+    def test_retention_evicts_finished_runs(self):
+        async def job(state, emit):
+            return {}
+
+        async def main():
+            mgr = RunManager(workers=1, retention=2)
+            await mgr.start()
+            states = []
+            for i in range(4):
+                states.append(mgr.submit(str(i), job))
+                while not states[-1].finished:
+                    await asyncio.sleep(0.01)
+            await mgr.stop()
+            return mgr, states
+
+        mgr, states = run(main())
+        assert mgr.get(states[0].id) is None
+        assert mgr.get(states[-1].id) is not None
+
+
+class TestRunsEndpoint:
+    def test_submit_poll_and_persist(self):
+        from fastapi.testclient import TestClient
+        from app import main
+        from app.db import SessionLocal
+        from app.models import Message, UsageEvent
+
+        prov = MagicMock()
+        prov.generate = AsyncMock(return_value=LLMResult(
+            text="answer", provider="openai", model="gpt-4o-mini",
+            input_tokens=10, output_tokens=5, cost_usd=0.001))
+
+        with TestClient(main.app) as client, patch.dict(main.PROVIDERS, {"openai": prov}):
+            client.post("/keys", data={"provider": "openai", "api_key": "sk-test"})
+            r = client.post("/runs", json={"question": "Compare Redis and Memcached for caching"})
+            assert r.status_code == 202
+            run_id = r.json()["run_id"]
+
+            deadline = time.time() + 5
+            snap = client.get(f"/runs/{run_id}").json()
+            while snap["status"] in ("queued", "running") and time.time() < deadline:
+                time.sleep(0.05)
+                snap = client.get(f"/runs/{run_id}").json()
+
+            assert snap["status"] == "done"
+            assert snap["result"]["final"] == "answer"
+            assert snap["stages"]["synth"]["status"] == "done"
+
+            events = client.get(f"/runs/{run_id}/events").text
+            assert "event: stage_done" in events
+
+            thread_id = snap["result"]["thread_id"]
+            db = SessionLocal()
+            try:
+                roles = [m.role for m in db.query(Message).filter(Message.thread_id == thread_id)]
+                assert roles[0] == "user" and "assistant" in roles
+                assert db.query(UsageEvent).count() >= 1
+            finally:
+                db.close()
+
+    def test_unknown_run_404(self):
+        from fastapi.testclient import TestClient
+        from app import main
+        with TestClient(main.app) as client:
+            assert client.get("/runs/nope").status_code == 404
@@ -0,0 +1,204 @@
+"""
+Tests for full-text search over conversation history (SQLite FTS5 / Postgres tsvector)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import tempfile
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db import SessionLocal, _engine_options, _normalize_url, alembic_config, upgrade_schema
+from app.models import Message, User
+from app.repositories import delete_thread, save_thread_run_result, start_thread_turn
+from app.search import search_messages
+
+
+def sqlite_engine():
+    path = os.path.join(tempfile.mkdtemp(prefix="debait-search-"), "s.db")
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+def seed_users(Session):
+    with Session() as db:
+        db.add_all([User(id=1, email="s@local", password_hash=""), User(id=2, email="o@local", password_hash="")])
+        db.commit()
+
+
+@pytest.fixture
+def Session():
+    engine = sqlite_engine()
+    upgrade_schema(bind=engine)
+    factory = sessionmaker(bind=engine)
+    seed_users(factory)
+    return factory
+
+
+def ask(db, user_id, key, question, final):
+    thread_id, _ = start_thread_turn(db, user_id, key, question)
+    save_thread_run_result(db, user_id, thread_id, question, {
+        "final": final, "stages": [{"name": "Critic", "text": f"critique of {question}"}],
+    })
+    return thread_id
+
+
+# ═══════════════════════════════════════════════════════════════
+# 색인 동기화
+# ═══════════════════════════════════════════════════════════════
+class TestIndexSync:
+    def test_new_messages_are_searchable(self, Session):
+        with Session() as db:
+            thread_id = ask(db, 1, "web:1", "How should I size a Postgres connection pool?", "Use pgbouncer.")
+            hits = search_messages(db, 1, "pgbouncer")
+            assert [(h.thread_id, h.role) for h in hits] == [(thread_id, "assistant")]
+            assert hits[0].preview.startswith("How should I size")
+
+    def test_update_and_delete_follow_rows(self, Session):
+        with Session() as db:
+            thread_id = ask(db, 1, "web:1", "question", "memcached is fine")
+            msg = db.query(Message).filter(Message.role == "assistant").one()
+            msg.content = "valkey is fine"
+            db.commit()
+            assert search_messages(db, 1, "memcached") == []
+            assert len(search_messages(db, 1, "valkey")) == 1
+
+            delete_thread(db, thread_id)
+            assert search_messages(db, 1, "valkey") == []
+            assert db.execute(text("SELECT count(*) FROM messages_fts")).scalar() == 0
+
+    def test_existing_messages_are_backfilled(self):
+        engine = sqlite_engine()
+        with engine.connect() as conn:
+            command.upgrade(alembic_config(conn), "0003")
+            conn.commit()
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO users (id, email, password_hash) VALUES (1, 'b@local', '')"))
+            conn.execute(text(
+                "INSERT INTO threads (id, user_id, thread_key, summary, updated_at, has_answer, preview, stage_names)"
+                " VALUES (1, 1, 'web:old', '', '2026-01-01', 1, 'old question', '')"
+            ))
+            conn.execute(text(
+                "INSERT INTO messages (thread_id, role, content, created_at)"
+                " VALUES (1, 'assistant', 'an old answer about sharding', '2026-01-01')"
+            ))
+        upgrade_schema(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            assert [h.thread_id for h in search_messages(db, 1, "sharding")] == [1]
+
+
+# ═══════════════════════════════════════════════════════════════
+# 검색 결과
+# ═══════════════════════════════════════════════════════════════
+class TestSearch:
+    def test_ranked_by_relevance(self, Session):
+        with Session() as db:
+            ask(db, 1, "web:weak", "misc", "A long answer that mentions replication once among many other words " * 3)
+            strong = ask(db, 1, "web:strong", "replication", "replication replication replication")
+            hits = search_messages(db, 1, "replication")
+            assert hits[0].thread_id == strong
+            assert [h.rank for h in hits] == sorted(h.rank for h in hits)
+
+    def test_all_terms_required(self, Session):
+        with Session() as db:
+            ask(db, 1, "web:a", "q", "redis cluster failover")
+            ask(db, 1, "web:b", "q", "redis sentinel")
+            assert len(search_messages(db, 1, "redis failover")) == 1
+            assert len(search_messages(db, 1, "redis")) == 2
+
+    def test_snippet_is_escaped_and_highlighted(self, Session):
+        with Session() as db:
+            ask(db, 1, "web:x", "q", "<script>alert(1)</script> tune the redis cache")
+            snippet = search_messages(db, 1, "redis")[0].snippet
+            assert "<script>" not in snippet and "&lt;script&gt;" in snippet
+            assert "<mark>redis</mark>" in snippet
+
+    def test_cjk_substring_and_short_terms(self, Session):
+        with Session() as db:
+            ask(db, 1, "web:ko", "캐시 전략", "Redis는 캐시 무효화가 어렵습니다")
+            ask(db, 1, "web:zh", "缓存", "分布式缓存策略")
+            assert len(search_messages(db, 1, "무효화")) == 1
+            assert len(search_messages(db, 1, "缓存策")) == 1
+            # 3글자 미만 term은 LIKE로 거른다.
+            hits = search_messages(db, 1, "캐시")
+            assert {"user", "assistant"} <= {h.role for h in hits}
+            assert all("<mark>캐시</mark>" in h.snippet for h in hits)
+            assert len(search_messages(db, 1, "무효화 캐시")) == 1
+
+    def test_query_syntax_is_literal(self, Session):
+        with Session() as db:
+            ask(db, 1, "web:q", "q", 'said "NEAR" OR AND*')
+            assert search_messages(db, 1, '"NEAR" OR') != []
+            assert search_messages(db, 1, "   ") == []
+            assert search_messages(db, 1, "100%") == []
+
+    def test_unicode61_fallback_uses_prefix_match(self, Session):
+        # SQLite 3.34 미만에서 만들어진 색인
+        with Session() as db:
+            db.execute(text("DROP TABLE messages_fts"))
+            db.execute(text(
+                "CREATE VIRTUAL TABLE messages_fts USING fts5("
+                "content, content='messages', content_rowid='id', tokenize='unicode61')"
+            ))
+            db.commit()
+            ask(db, 1, "web:u", "q", "Partitioning strategies")
+            assert len(search_messages(db, 1, "partition")) == 1
+            assert "<mark>Partitioning</mark>" in search_messages(db, 1, "partition")[0].snippet
+
+    def test_scoped_to_user(self, Session):
+        with Session() as db:
+            ask(db, 2, "web:other", "q", "kubernetes autoscaling")
+            assert search_messages(db, 1, "kubernetes") == []
+            assert len(search_messages(db, 2, "kubernetes")) == 1
+
+
+# ═══════════════════════════════════════════════════════════════
+# /conversations 검색
+# ═══════════════════════════════════════════════════════════════
+class TestSearchEndpoints:
+    def test_json_and_page(self):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        with patch.object(main.telegram_jobs, "start", new=AsyncMock()), TestClient(main.app) as client:
+            db = SessionLocal()
+            try:
+                thread_id = ask(db, 1, "web:search-endpoint", "What is a bloom filter?", "A probabilistic set (bloomfilterxyz).")
+            finally:
+                db.close()
+
+            data = client.get("/conversations/search", params={"q": "bloomfilterxyz"}).json()
+            assert [r["thread_id"] for r in data["results"]] == [thread_id]
+            assert "<mark>bloomfilterxyz</mark>" in data["results"][0]["snippet"]
+            assert data["took_ms"] >= 0
+
+            page = client.get("/conversations", params={"q": "bloomfilterxyz"})
+            assert page.status_code == 200
+            assert "<mark>bloomfilterxyz</mark>" in page.text
+            assert "검색 결과 1건" in page.text
+
+
+PG_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+@pytest.mark.skipif(not PG_URL, reason="TEST_POSTGRES_URL not set")
+class TestPostgresSearch:
+    def test_tsvector_search(self):
+        url = _normalize_url(PG_URL)
+        engine = create_engine(url, **_engine_options(url))
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA public CASCADE"))
+            conn.execute(text("CREATE SCHEMA public"))
+        upgrade_schema(bind=engine)
+        Session = sessionmaker(bind=engine)
+        seed_users(Session)
+        with Session() as db:
+            thread_id = ask(db, 1, "web:pg", "q", "<b>vacuum</b> the table")
+            hits = search_messages(db, 1, "vacuum")
+            assert [h.thread_id for h in hits] == [thread_id]
+            assert "<mark>vacuum</mark>" in hits[0].snippet and "&lt;b&gt;" in hits[0].snippet
+        engine.dispose()
@@ -0,0 +1,190 @@
+"""
+Tests for the local provider simulator (app.simulator) driven through the real providers over HTTP
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import random
+import threading
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+import uvicorn
+
+from app import http_client
+from app.http_client import HttpClientConfig, aclose_all
+from app.orchestrator.runner import Budget, ExecutionConfig, PROVIDERS, run_orchestrator
+from app.providers.limits import RateLimitError
+from app.simulator import Distribution, SimConfig, create_app
+
+FAST = SimConfig(seed=7, ttfb="fixed:0.01", token_interval="fixed:0", output_tokens="uniform:5,20")
+
+
+@pytest.fixture
+def sim():
+    """simulator를 실제 포트에 띄우고 모든 provider의 base_url을 그쪽으로 돌린다."""
+    app = create_app(SimConfig(**vars(FAST)))
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    base = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+    originals = {name: p.base_url for name, p in PROVIDERS.items()}
+    for p in PROVIDERS.values():
+        p.base_url = base
+    http_client.configure(HttpClientConfig(timeout_sec=5))
+    yield app.state.simulator
+    for name, url in originals.items():
+        PROVIDERS[name].base_url = url
+    http_client.configure(HttpClientConfig())
+    server.should_exit = True
+    thread.join(5)
+
+
+def call(name, stream=False, model="m", user="What is a cache stampede?", max_tokens=50):
+    async def main():
+        prov = PROVIDERS[name]
+        try:
+            if stream:
+                events = [ev async for ev in prov.generate_stream(api_key="k", model=model, system="s", user=user, max_tokens=max_tokens)]
+                return "".join(ev.delta for ev in events), events[-1].result
+            return None, await prov.generate(api_key="k", model=model, system="s", user=user, max_tokens=max_tokens)
+        finally:
+            await aclose_all()
+    return asyncio.run(main())
+
+
+# ═══════════════════════════════════════════════════════════════
+# 분포
+# ═══════════════════════════════════════════════════════════════
+class TestDistribution:
+    def test_parse_and_sample(self):
+        assert Distribution("fixed:0.2").sample(random.Random(1)) == 0.2
+        samples = [Distribution("uniform:1,2").sample(random.Random(i)) for i in range(50)]
+        assert all(1 <= s <= 2 for s in samples)
+        assert Distribution("normal:0,5").sample(random.Random(3)) >= 0
+        median = sorted(Distribution("lognormal:0.5,0.4").sample(random.Random(i)) for i in range(501))[250]
+        assert median == pytest.approx(0.5, rel=0.15)
+
+    @pytest.mark.parametrize("spec", ["gamma:1", "uniform:1", "fixed:x", ""])
+    def test_invalid_specs(self, spec):
+        with pytest.raises(ValueError):
+            Distribution(spec)
+
+
+# ═══════════════════════════════════════════════════════════════
+# API 형식 (실제 provider 코드로 호출)
+# ═══════════════════════════════════════════════════════════════
+class TestFormats:
+    @pytest.mark.parametrize("name", ["openai", "anthropic", "google", "groq", "mistral"])
+    def test_generate_and_stream(self, sim, name):
+        _, result = call(name)
+        assert result.text and 5 <= result.output_tokens <= 20
+        assert len(result.text.split()) == result.output_tokens
+        assert result.input_tokens > 0
+        assert result.network["ttfb_ms"] >= 5
+
+        streamed, final = call(name, stream=True)
+        assert final.text == streamed.strip()
+        assert final.output_tokens == len(streamed.split())
+        assert sim.stats[next(k for k in sim.stats if k.endswith(":ok"))] >= 1
+
+    def test_max_tokens_caps_output(self, sim):
+        _, result = call("openai", max_tokens=3)
+        assert result.output_tokens == 3
+
+    def test_same_seed_same_responses(self, sim):
+        first = [call("groq")[1].text for _ in range(3)]
+        sim.configure()  # 요청 순번을 처음으로 되돌린다.
+        again = [call("groq")[1].text for _ in range(3)]
+        assert first == again
+        assert len(set(first)) > 1  # 같은 요청이라도 순번마다 다르다.
+
+
+# ═══════════════════════════════════════════════════════════════
+# 장애 주입
+# ═══════════════════════════════════════════════════════════════
+class TestFaults:
+    def test_rate_limit_with_retry_after(self, sim):
+        sim.configure(rate_429=1.0, retry_after_sec=2.5)
+        with pytest.raises(RateLimitError) as exc:
+            call("openai")
+        assert exc.value.retry_after == 2.5
+        assert sim.stats["openai_responses:429"] == 1
+
+    def test_server_error(self, sim):
+        sim.configure(rate_5xx=1.0)
+        with pytest.raises(httpx.HTTPStatusError) as exc:
+            call("anthropic", stream=True)
+        assert exc.value.response.status_code == 503
+
+    def test_timeout_through_orchestrator(self, sim):
+        sim.configure(rate_timeout=1.0, hang_sec=2.0)
+        stages = [{"name": "Solver", "system_prompt": "Answer.", "model": "mistral:m"}]
+        result = asyncio.run(run_orchestrator(
+            question="Explain Redis caching strategies in detail for production.", thread_summary="",
+            user_api_keys={"mistral": "k"}, stages=stages, synth_model="mistral:m", budget=Budget(),
+            execution_config=ExecutionConfig(retries_per_stage=1, stage_timeout_sec=0.3, enable_quality_matrix=False),
+        ))
+        assert "TimeoutError" in result["final"]
+        assert sim.stats["chat_completions:timeout"] == 2  # 첫 시도 + 재시도 1회
+
+    def test_runtime_config_endpoints(self):
+        from fastapi.testclient import TestClient
+
+        with TestClient(create_app(SimConfig(**vars(FAST)))) as client:
+            assert client.put("/_sim/config", json={"rate_5xx": 1.0}).json()["rate_5xx"] == 1.0
+            assert client.put("/_sim/config", json={"rate_429": 0.5}).status_code == 400  # 합이 1을 넘는다
+            assert client.put("/_sim/config", json={"nope": 1}).status_code == 400
+            resp = client.post("/v1/chat/completions", json={"model": "m", "messages": [{"role": "user", "content": "hi"}]})
+            assert resp.status_code == 503
+            assert client.get("/_sim/stats").json() == {"chat_completions:5xx": 1}
+            assert client.post("/v1beta/models/m:countTokens", json={}).status_code == 404
+
+
+# ═══════════════════════════════════════════════════════════════
+# Telegram Bot API sink
+# ═══════════════════════════════════════════════════════════════
+class TestTelegramSink:
+    def test_streaming_reply_goes_to_simulator(self, sim):
+        from app import telegram
+
+        async def main():
+            try:
+                reply = telegram.StreamingReply("42", min_interval_sec=0)
+                await reply.start("thinking")
+                await reply.finish("done")
+                return reply.message_id
+            finally:
+                await aclose_all()
+
+        with patch.object(telegram.settings, "telegram_api_url", PROVIDERS["openai"].base_url + "/"), \
+                patch.object(telegram.settings, "telegram_bot_token", "123:abc"):
+            assert asyncio.run(main()) == 1
+        assert sim.stats["telegram:sendMessage"] == 1
+        assert sim.stats["telegram:editMessageText"] == 1
+
+
+# ═══════════════════════════════════════════════════════════════
+# base URL 설정
+# ═══════════════════════════════════════════════════════════════
+class TestBaseUrlSettings:
+    def test_startup_applies_overrides(self):
+        from app import main
+
+        try:
+            with patch.object(main.settings, "provider_base_url", "http://sim:9100/"), \
+                    patch.object(main.settings, "groq_base_url", "http://groq-proxy"):
+                main.configure_provider_base_urls()
+                assert PROVIDERS["openai"].base_url == "http://sim:9100"
+                assert PROVIDERS["groq"].base_url == "http://groq-proxy"
+            main.configure_provider_base_urls()
+            assert PROVIDERS["openai"].base_url == "https://api.openai.com"
+            assert PROVIDERS["groq"].base_url == "https://api.groq.com/openai"
+        finally:
+            main.configure_provider_base_urls()
@@ -0,0 +1,253 @@
+"""
+Tests for token streaming (generate_stream → run_orchestrator on_event)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app import http_client
+from app.http_client import aclose_all
+from app.orchestrator.runner import (
+    _call_with_resilience,
+    run_orchestrator,
+    Budget,
+    ExecutionConfig,
+    PROVIDERS,
+)
+from app.providers.anthropic_provider import AnthropicProvider
+from app.providers.base import LLMResult, StreamEvent
+from app.providers.groq_provider import GroqProvider
+from app.providers.openai_provider import OpenAIProvider
+from app.providers.sse import iter_sse_json
+
+
+NO_RETRY_CFG = ExecutionConfig(retries_per_stage=0, stage_timeout_sec=10, enable_quality_matrix=False)
+
+
+def sse_body(events, done=False):
+    out = ""
+    for ev in events:
+        out += f"data: {json.dumps(ev)}\n\n"
+    if done:
+        out += "data: [DONE]\n\n"
+    return out.encode()
+
+
+def run_with_transport(name, handler, coro_fn):
+    async def main():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        http_client._clients[name] = (asyncio.get_running_loop(), client)
+        try:
+            return await coro_fn()
+        finally:
+            await aclose_all()
+    return asyncio.run(main())
+
+
+async def collect(agen):
+    return [ev async for ev in agen]
+
+
+class FakeStreamingProvider:
+    provider_name = "openai"
+
+    def __init__(self, chunks=("Hel", "lo"), fail_first=False):
+        self.chunks = chunks
+        self.fail_first = fail_first
+        self.calls = 0
+        self.generate = AsyncMock(return_value=LLMResult(text="non-stream", provider="openai", model="m"))
+
+    async def generate_stream(self, api_key, model, system, user, max_tokens):
+        self.calls += 1
+        for c in self.chunks:
+            await asyncio.sleep(0)
+            yield StreamEvent(delta=c)
+            if self.fail_first and self.calls == 1:
+                raise RuntimeError("dropped")
+        yield StreamEvent(result=LLMResult(text="".join(self.chunks), provider="openai", model=model,
+                                           input_tokens=7, output_tokens=2))
+
+
+# ═══════════════════════════════════════════════════════════════
+# SSE 파서 / provider 스트리밍
+# ═══════════════════════════════════════════════════════════════
+class TestSseParser:
+    def test_parses_data_lines_and_stops_at_done(self):
+        body = b'event: x\ndata: {"a": 1}\n\ndata: {"a": 2}\n\ndata: [DONE]\n\ndata: {"a": 3}\n\n'
+
+        async def main():
+            resp = httpx.Response(200, content=body)
+            return await collect(iter_sse_json(resp))
+        assert asyncio.run(main()) == [{"a": 1}, {"a": 2}]
+
+    def test_skips_invalid_json(self):
+        async def main():
+            resp = httpx.Response(200, content=b"data: not-json\n\ndata: {\"ok\": true}\n")
+            return await collect(iter_sse_json(resp))
+        assert asyncio.run(main()) == [{"ok": True}]
+
+
+class TestProviderStreams:
+    def test_anthropic_stream(self):
+        body = sse_body([
+            {"type": "message_start", "message": {"usage": {"input_tokens": 11, "output_tokens": 1}}},
+            {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Hi "}},
+            {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "there"}},
+            {"type": "message_delta", "usage": {"output_tokens": 4}},
+            {"type": "message_stop"},
+        ])
+
+        def handler(request):
+            assert json.loads(request.content)["stream"] is True
+            return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+        events = run_with_transport("anthropic", handler, lambda: collect(
+            AnthropicProvider().generate_stream(api_key="k", model="claude", system="s", user="u", max_tokens=10)))
+        assert [e.delta for e in events if e.delta] == ["Hi ", "there"]
+        final = events[-1].result
+        assert final.text == "Hi there"
+        assert (final.input_tokens, final.output_tokens) == (11, 4)
+
+    def test_openai_responses_stream(self):
+        body = sse_body([
+            {"type": "response.output_text.delta", "delta": "A"},
+            {"type": "response.output_text.delta", "delta": "B"},
+            {"type": "response.completed", "response": {"usage": {"input_tokens": 5, "output_tokens": 2}}},
+        ])
+        events = run_with_transport("openai", lambda r: httpx.Response(200, content=body), lambda: collect(
+            OpenAIProvider().generate_stream(api_key="k", model="gpt", system="s", user="u", max_tokens=10)))
+        assert events[-1].result.text == "AB"
+        assert events[-1].result.input_tokens == 5
+
+    def test_chat_completions_stream(self):
+        body = sse_body([
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "x"}}]},
+            {"choices": [{"delta": {"content": "y"}}], "x_groq": {"usage": {"prompt_tokens": 3, "completion_tokens": 2}}},
+        ], done=True)
+        events = run_with_transport("groq", lambda r: httpx.Response(200, content=body), lambda: collect(
+            GroqProvider().generate_stream(api_key="k", model="llama", system="s", user="u", max_tokens=10)))
+        assert [e.delta for e in events if e.delta] == ["x", "y"]
+        assert events[-1].result.output_tokens == 2
+
+    def test_stream_http_error_raises(self):
+        with pytest.raises(httpx.HTTPStatusError):
+            run_with_transport("groq", lambda r: httpx.Response(500), lambda: collect(
+                GroqProvider().generate_stream(api_key="k", model="m", system="s", user="u", max_tokens=1)))
+
+
+# ═══════════════════════════════════════════════════════════════
+# _call_with_resilience 스트리밍 경로
+# ═══════════════════════════════════════════════════════════════
+class TestResilienceStreaming:
+    def test_tokens_forwarded_and_ttft_recorded(self):
+        prov = FakeStreamingProvider()
+        seen = []
+
+        async def on_event(ev):
+            seen.append(ev)
+
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u",
+            max_tokens=10, cfg=NO_RETRY_CFG, on_event=on_event,
+        ))
+        assert result.text == "Hello"
+        assert [e["text"] for e in seen if e["type"] == "token"] == ["Hel", "lo"]
+        assert rt["ttft_ms"] >= 0
+        prov.generate.assert_not_called()
+
+    def test_without_callback_uses_generate(self):
+        prov = FakeStreamingProvider()
+        result, rt = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u",
+            max_tokens=10, cfg=NO_RETRY_CFG,
+        ))
+        assert result.text == "non-stream"
+        assert "ttft_ms" not in rt
+
+    def test_mock_provider_without_stream_falls_back(self):
+        prov = MagicMock()
+        prov.generate = AsyncMock(return_value=LLMResult(text="plain"))
+
+        async def on_event(ev):
+            pass
+
+        result, _ = asyncio.run(_call_with_resilience(
+            provider=prov, api_key="k", model="m", system="s", user="u",
+            max_tokens=10, cfg=NO_RETRY_CFG, on_event=on_event,
+        ))
+        assert result.text == "plain"
+
+    def test_retry_event_after_partial_stream(self):
+        prov = FakeStreamingProvider(fail_first=True)
+        seen = []
+
+        async def on_event(ev):
+            seen.append(ev["type"])
+
+        cfg = ExecutionConfig(retries_per_stage=1, stage_timeout_sec=10, enable_quality_matrix=False)
+        with patch("app.orchestrator.runner.asyncio.sleep", new=AsyncMock()):
+            result, rt = asyncio.run(_call_with_resilience(
+                provider=prov, api_key="k", model="m", system="s", user="u",
+                max_tokens=10, cfg=cfg, on_event=on_event,
+            ))
+        assert result.text == "Hello"
+        assert rt["retries"] == 1
+        assert seen[:2] == ["token", "retry"]
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_orchestrator on_event
+# ═══════════════════════════════════════════════════════════════
+class TestOrchestratorEvents:
+    def _run(self, stages, on_event):
+        prov = FakeStreamingProvider()
+        with patch.dict(PROVIDERS, {"openai": prov}):
+            return asyncio.run(run_orchestrator(
+                question="Explain Redis caching strategies in detail for production.",
+                thread_summary="",
+                user_api_keys={"openai": "sk"},
+                stages=stages,
+                synth_model="openai:gpt-4o-mini",
+                budget=Budget(max_usd=10.0),
+                execution_config=NO_RETRY_CFG,
+                on_event=on_event,
+            ))
+
+    def test_events_per_stage_and_synth(self):
+        events = []
+
+        async def on_event(ev):
+            events.append(ev)
+
+        stages = [
+            {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"},
+            {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o-mini"},
+        ]
+        result = self._run(stages, on_event)
+        assert events[0]["type"] == "decision"
+        for name in ("Solver", "Critic", "synth"):
+            types = [e["type"] for e in events if e.get("stage") == name]
+            assert types[0] == "stage_start"
+            assert "token" in types
+            assert types[-1] == "stage_done"
+        assert result["final"] == "Hello"
+        assert "ttft_ms" in result["monitoring"]["stage_metrics"]["synth"]
+        assert "ttft_ms" in result["usage"]["Solver"]
+
+    def test_simple_path_streams(self):
+        events = []
+
+        async def on_event(ev):
+            events.append(ev)
+
+        stages = [{"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"}]
+        result = self._run(stages, on_event)
+        assert any(e["type"] == "token" and e["stage"] == "Solver" for e in events)
+        assert "ttft_ms" in result["monitoring"]["stage_metrics"]["Solver"]
@@ -0,0 +1,211 @@
+"""
+Tests for per-request / per-run tracing (OTLP/JSON file export, Server-Timing)
+"""
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import asyncio
+import json
+import tempfile
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.db import run_db
+from app.orchestrator.runner import Budget, ExecutionConfig, PROVIDERS, run_orchestrator
+from app.providers.base import LLMResult
+from app.tracing import (
+    NOOP_SPAN, STATUS_ERROR, TraceConfig, Tracer, parse_traceparent, server_timing, tracer,
+)
+
+
+def export_path() -> str:
+    return os.path.join(tempfile.mkdtemp(prefix="debait-trace-"), "traces.jsonl")
+
+
+def read_spans(path: str) -> list[dict]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for rs in json.loads(line)["resourceSpans"]:
+                assert rs["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "debait"}}]
+                for ss in rs["scopeSpans"]:
+                    spans.extend(ss["spans"])
+    return spans
+
+
+def attrs(span: dict) -> dict:
+    return {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+
+
+@pytest.fixture
+def traces():
+    path = export_path()
+    tracer.configure(TraceConfig(enabled=True, export_path=path))
+    yield path
+    tracer.configure(TraceConfig())
+
+
+# ═══════════════════════════════════════════════════════════════
+# span / export
+# ═══════════════════════════════════════════════════════════════
+class TestTracer:
+    def test_disabled_tracer_records_nothing(self):
+        t = Tracer()
+        assert t.start_span("x") is NOOP_SPAN
+        with t.span("y", timing="db") as span:
+            span.set_attribute("k", 1)
+        assert t.timings() == {}
+
+    def test_nested_spans_are_exported_as_one_trace(self):
+        path = export_path()
+        t = Tracer()
+        t.configure(TraceConfig(enabled=True, export_path=path))
+        with t.span("root", question_len=3) as root:
+            with t.span("child") as child:
+                child.add_event("cache.hit", model="m")
+            try:
+                with t.span("failing"):
+                    raise ValueError("boom")
+            except ValueError:
+                pass
+        t.shutdown()
+
+        spans = {s["name"]: s for s in read_spans(path)}
+        assert set(spans) == {"root", "child", "failing"}
+        assert {s["traceId"] for s in spans.values()} == {root.trace_id}
+        assert "parentSpanId" not in spans["root"]
+        assert spans["child"]["parentSpanId"] == spans["failing"]["parentSpanId"] == root.span_id
+        assert attrs(spans["root"]) == {"question_len": "3"}
+        assert spans["child"]["events"][0]["name"] == "cache.hit"
+        assert spans["failing"]["status"] == {"code": STATUS_ERROR, "message": "ValueError: boom"}
+        assert int(spans["root"]["endTimeUnixNano"]) >= int(spans["child"]["endTimeUnixNano"])
+
+    def test_timings_are_exclusive(self):
+        t = Tracer()
+        t.configure(TraceConfig(enabled=True, export_path=""))
+        with t.span("root") as root:
+            with t.span("db", timing="db") as db:
+                with t.span("decrypt", timing="decrypt"):
+                    pass
+                with t.span("db again", timing="db"):
+                    pass
+            timings = t.timings(root)
+        db_ms = (db.end_ns - db.start_ns) / 1e6
+        assert timings["db"] + timings["decrypt"] == pytest.approx(db_ms)
+
+    def test_context_follows_tasks_and_db_thread(self, traces):
+        def in_thread(db):
+            with tracer.span("in thread"):
+                return True
+
+        async def main():
+            with tracer.span("root") as root:
+                await asyncio.gather(run_db(in_thread), asyncio.create_task(asyncio.sleep(0)))
+            return root
+
+        root = asyncio.run(main())
+        tracer.shutdown()
+        spans = {s["name"]: s for s in read_spans(traces)}
+        assert spans["db in_thread"]["parentSpanId"] == root.span_id
+        assert spans["in thread"]["parentSpanId"] == spans["db in_thread"]["spanId"]
+
+    def test_traceparent_and_header(self):
+        assert parse_traceparent("00-" + "a" * 32 + "-" + "b" * 16 + "-01") == ("a" * 32, "b" * 16)
+        assert parse_traceparent("00-" + "0" * 32 + "-" + "b" * 16 + "-01") is None
+        assert parse_traceparent("garbage") is None
+        assert server_timing({"render": 1.25, "db": 3.0, "backoff": 0.0}, 10.0) == "db;dur=3.0, render;dur=1.2, total;dur=10.0"
+
+
+# ═══════════════════════════════════════════════════════════════
+# run_orchestrator spans
+# ═══════════════════════════════════════════════════════════════
+QUESTION = "Explain Redis caching strategies in detail for production."
+STAGES = [
+    {"name": "Solver", "system_prompt": "Answer.", "model": "openai:gpt-4o-mini"},
+    {"name": "Critic", "system_prompt": "Critique.", "model": "openai:gpt-4o-mini"},
+]
+
+
+class TestRunSpans:
+    def test_stage_attempt_and_backoff_spans(self, traces):
+        calls = {"n": 0}
+
+        async def generate(**kw):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise RuntimeError("503 upstream")
+            return LLMResult(text="ok", provider="openai", model=kw["model"], input_tokens=10, output_tokens=5)
+
+        prov = MagicMock()
+        prov.provider_name = "openai"
+        prov.generate = AsyncMock(side_effect=generate)
+        with patch.dict(PROVIDERS, {"openai": prov}), patch("app.orchestrator.runner.asyncio.sleep", new=AsyncMock()):
+            asyncio.run(run_orchestrator(
+                question=QUESTION, thread_summary="", user_api_keys={"openai": "sk"},
+                stages=STAGES, synth_model="openai:gpt-4o-mini", budget=Budget(max_usd=10.0),
+                execution_config=ExecutionConfig(retries_per_stage=1, enable_quality_matrix=False),
+            ))
+        tracer.shutdown()
+
+        spans = read_spans(traces)
+        by_id = {s["spanId"]: s for s in spans}
+        root = next(s for s in spans if s["name"] == "orchestrator.run")
+        assert "parentSpanId" not in root
+        assert attrs(root)["orchestrator.stages"] == "2"
+        stages = {s["name"]: s for s in spans if s["name"].startswith("stage ")}
+        assert set(stages) == {"stage Solver", "stage Critic", "stage synth"}
+        assert all(s["parentSpanId"] == root["spanId"] for s in stages.values())
+
+        solver_calls = [s for s in spans if s["name"] == "llm.call" and s["parentSpanId"] == stages["stage Solver"]["spanId"]]
+        assert [attrs(s)["llm.attempt"] for s in solver_calls] == ["1", "2"]
+        assert solver_calls[0]["status"]["code"] == STATUS_ERROR
+        assert attrs(solver_calls[1])["gen_ai.usage.output_tokens"] == "5"
+        assert attrs(solver_calls[1])["gen_ai.request.model"] == "gpt-4o-mini"
+        backoff = next(s for s in spans if s["name"] == "retry.backoff")
+        assert by_id[backoff["parentSpanId"]]["name"] == "stage Solver"
+        assert attrs(backoff)["delay_sec"] == pytest.approx(0.8)
+
+
+# ═══════════════════════════════════════════════════════════════
+# 웹 요청 / Server-Timing
+# ═══════════════════════════════════════════════════════════════
+class TestWebTracing:
+    def test_ask_has_server_timing_and_trace(self):
+        from fastapi.testclient import TestClient
+        from app import main
+
+        prov = MagicMock()
+        prov.provider_name = "openai"
+        prov.generate = AsyncMock(return_value=LLMResult(text="answer", provider="openai", model="gpt-4o-mini"))
+        path = export_path()
+        with patch.object(main.telegram_jobs, "start", new=AsyncMock()), TestClient(main.app) as client:
+            client.post("/keys", data={"provider": "openai", "api_key": "sk-test"})
+            tracer.configure(TraceConfig(enabled=True, export_path=path))
+            try:
+                with patch.dict(main.PROVIDERS, {"openai": prov}):
+                    resp = client.post(
+                        "/ask",
+                        data={"question": "Compare Redis and Memcached for session caching", "skip_clarify": "1"},
+                        headers={"traceparent": "00-" + "c" * 32 + "-" + "d" * 16 + "-01"},
+                    )
+                plain = client.get("/conversations/search", params={"q": "redis"})
+            finally:
+                tracer.configure(TraceConfig())
+
+        assert resp.status_code == 200
+        timing = dict(part.split(";dur=") for part in resp.headers["server-timing"].split(", "))
+        assert {"db", "decrypt", "provider", "render", "total"} <= set(timing)
+        assert float(timing["total"]) >= float(timing["render"])
+        assert "total" in plain.headers["server-timing"]
+
+        spans = read_spans(path)
+        ask = [s for s in spans if s["traceId"] == "c" * 32]
+        names = {s["name"] for s in ask}
+        assert {"POST /ask", "orchestrator.run", "stage synth", "llm.call", "crypto.decrypt_keys",
+                "db prepare_pipeline_run", "db.write add_thread_run_result", "render dashboard.html"} <= names
+        server = next(s for s in ask if s["name"] == "POST /ask")
+        assert server["parentSpanId"] == "d" * 16
+        assert attrs(server)["http.response.status_code"] == "200"
+        assert any(s["name"] == "GET /conversations/search" for s in spans)